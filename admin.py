@@ -4,9 +4,10 @@ Handles admin/teacher commands and mass notifications
 """
 
 import asyncio
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from aiogram import Bot
 from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
+from broadcast import BroadcastEngine
 from database import Database
 from translations import get_text
 
@@ -14,9 +15,11 @@ from translations import get_text
 from config import ADMIN_IDS
 
 class AdminManager:
-    def __init__(self, bot: Bot, db: Database):
+    def __init__(self, bot: Bot, db: Database, broadcaster: Optional[BroadcastEngine] = None):
         self.bot = bot
         self.db = db
+        # Share one engine per bot so every broadcast goes through the same rate limit
+        self.broadcaster = broadcaster or BroadcastEngine(bot, db)
     
     def is_admin(self, user_id: int) -> bool:
         """Check if user is admin/teacher"""
@@ -24,49 +27,29 @@ class AdminManager:
     
     async def get_all_users(self) -> List[Dict]:
         """Get all registered users for mass notifications"""
-        async with self.db.db_path and __import__('aiosqlite').connect(self.db.db_path) as conn:
-            conn.row_factory = __import__('aiosqlite').Row
+        async with self.db.pool.reader() as conn:
             async with conn.execute("SELECT telegram_id, language FROM users") as cursor:
                 rows = await cursor.fetchall()
                 return [dict(row) for row in rows]
     
     async def send_mass_notification(self, message_text: str, admin_id: int) -> Dict[str, int]:
-        """Send message to all users"""
-        users = await self.get_all_users()
-        success_count = 0
-        error_count = 0
-        
-        for user in users:
-            try:
-                if user['telegram_id'] != admin_id:  # Don't send to admin who sent it
-                    await self.bot.send_message(
-                        chat_id=user['telegram_id'],
-                        text=f"📢 {message_text}"
-                    )
-                    success_count += 1
-                    # Small delay to avoid rate limiting
-                    await asyncio.sleep(0.1)
-            except Exception as e:
-                error_count += 1
-                print(f"Failed to send message to {user['telegram_id']}: {e}")
-        
-        return {"success": success_count, "errors": error_count}
+        """Start a background broadcast to all users; progress is reported to the admin chat"""
+        return await self.broadcaster.start(f"📢 {message_text}", admin_id)
     
     async def add_material(self, subject: str, topic: str, material_type: str, 
                           title: str, url: str, description: str = "", language: str = "ru"):
         """Add new material to database"""
-        async with __import__('aiosqlite').connect(self.db.db_path) as conn:
-            await conn.execute("""
-                INSERT INTO materials (subject, topic, type, title, url, description, language)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (subject, topic, material_type, title, url, description, language))
-            await conn.commit()
+        # Through Database so the material cache is invalidated (category is required; use the topic)
+        return await self.db.add_material({
+            'subject': subject, 'topic': topic, 'type': material_type, 'title': title,
+            'url': url, 'description': description, 'language': language, 'category': topic,
+        })
     
     async def add_test_question(self, subject: str, question: str, option_a: str, 
                                option_b: str, option_c: str, option_d: str, 
                                correct_answer: str, explanation: str = "", language: str = "ru"):
         """Add new test question to database"""
-        async with __import__('aiosqlite').connect(self.db.db_path) as conn:
+        async with self.db.pool.writer() as conn:
             await conn.execute("""
                 INSERT INTO tests (subject, question, option_a, option_b, option_c, option_d, 
                                  correct_answer, explanation, language)
@@ -74,11 +57,12 @@ class AdminManager:
             """, (subject, question, option_a, option_b, option_c, option_d, 
                   correct_answer, explanation, language))
             await conn.commit()
+        self.db.question_bank.invalidate()
     
     async def update_schedule(self, day_of_week: int, time: str, subject: str, 
                              topic: str = "", teacher: str = ""):
         """Update schedule entry"""
-        async with __import__('aiosqlite').connect(self.db.db_path) as conn:
+        async with self.db.pool.writer() as conn:
             # First, deactivate existing entry for this day and time
             await conn.execute("""
                 UPDATE schedule SET is_active = 0 
@@ -94,9 +78,7 @@ class AdminManager:
     
     async def get_user_stats(self) -> Dict[str, Any]:
         """Get bot usage statistics"""
-        async with __import__('aiosqlite').connect(self.db.db_path) as conn:
-            conn.row_factory = __import__('aiosqlite').Row
-            
+        async with self.db.pool.reader() as conn:
             # Total users
             async with conn.execute("SELECT COUNT(*) as count FROM users") as cursor:
                 total_users = (await cursor.fetchone())['count']
@@ -106,7 +88,7 @@ class AdminManager:
                 active_users = (await cursor.fetchone())['count']
             
             # Total tests taken
-            async with conn.execute("SELECT COUNT(*) as count FROM user_progress WHERE progress_type = 'test'") as cursor:
+            async with conn.execute("SELECT COUNT(*) as count FROM test_attempts") as cursor:
                 total_tests = (await cursor.fetchone())['count']
             
             # Language distribution
@@ -9,9 +9,9 @@ from aiogram import Bot
 from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
+from broadcast import BroadcastEngine
 from database import Database
 from config import ADMIN_IDS
-import aiosqlite
 
 class AdminStates(StatesGroup):
     # Schedule management
@@ -50,9 +50,10 @@ class AdminStates(StatesGroup):
     waiting_for_quest_reward = State()
 
 class AdvancedAdminPanel:
-    def __init__(self, bot: Bot, db: Database):
+    def __init__(self, bot: Bot, db: Database, broadcaster: Optional[BroadcastEngine] = None):
         self.bot = bot
         self.db = db
+        self.broadcaster = broadcaster or BroadcastEngine(bot, db)
     
     def is_admin(self, user_id: int) -> bool:
         """Check if user is admin"""
@@ -172,9 +173,7 @@ class AdvancedAdminPanel:
             top_users = await self.db.get_leaderboard(5)
             
             # Simple stats without complex queries
-            async with aiosqlite.connect(self.db.db_path) as conn:
-                conn.row_factory = aiosqlite.Row
-                
+            async with self.db.pool.reader() as conn:
                 # Active users (with points > 0)
                 async with conn.execute("SELECT COUNT(*) as count FROM users WHERE points > 0") as cursor:
                     result = await cursor.fetchone()
@@ -208,27 +207,12 @@ class AdvancedAdminPanel:
         return await self.db.get_all_users()
     
     async def send_mass_notification(self, message_text: str, admin_id: int) -> Dict[str, int]:
-        """Send message to all users"""
-        users = await self.get_all_users_list()
-        success_count = 0
-        error_count = 0
-        
-        for user in users:
-            try:
-                if user['telegram_id'] != admin_id:  # Don't send to admin who sent it
-                    await self.bot.send_message(
-                        chat_id=user['telegram_id'],
-                        text=f"📢 **Уведомление от администрации:**\n\n{message_text}",
-                        parse_mode="Markdown"
-                    )
-                    success_count += 1
-                    # Small delay to avoid rate limiting
-                    await asyncio.sleep(0.1)
-            except Exception as e:
-                error_count += 1
-                print(f"Failed to send message to {user['telegram_id']}: {e}")
-        
-        return {"success": success_count, "errors": error_count}
+        """Start a background broadcast to all users; progress is reported to the admin chat"""
+        return await self.broadcaster.start(
+            f"📢 **Уведомление от администрации:**\n\n{message_text}",
+            admin_id,
+            parse_mode="Markdown"
+        )
     
     def format_schedule_display(self, schedule: List[Dict]) -> str:
         """Format schedule for display"""
@@ -0,0 +1,74 @@
+"""
+Answer checking for free-form physics answers.
+A number with an optional unit ("240 кДж", "5.7×10⁻⁵ м", "72 км/сағ") is
+parsed into its value as written and its value in SI units (quantities.py);
+correct answers can come pre-parsed, as QuestionBank.answer_keys keeps them
+per question. A batch is then compared in bulk with NumPy: within a
+relative tolerance of the correct value (or an absolute one around zero), in
+SI units when both sides carry a unit, as written when either side has none.
+Answers that are not numbers are compared as normalised strings.
+"""
+
+from typing import Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from config import ANSWER_CHECK_SETTINGS
+from quantities import Quantity, parse_quantity
+
+
+def normalize_answer(text: str) -> str:
+    return ''.join(text.lower().split())
+
+
+def check_answers(user_answers: Sequence[str], correct_answers: Sequence[str],
+                  rel_tolerance: Union[float, Sequence[float], None] = None,
+                  abs_tolerance: Optional[float] = None,
+                  correct_quantities: Optional[Sequence[Optional[Quantity]]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """(is_correct, unit_mismatch) boolean arrays for pairs of answers.
+    rel_tolerance may be one value or one per answer (NaN: the default);
+    correct_quantities are the correct answers already parsed"""
+    n = len(user_answers)
+    if len(correct_answers) != n or (correct_quantities is not None and len(correct_quantities) != n):
+        raise ValueError("user_answers and correct_answers differ in length")
+    if correct_quantities is None:
+        correct_quantities = [parse_quantity(correct) for correct in correct_answers]
+    default_rel = ANSWER_CHECK_SETTINGS['rel_tolerance']
+    abs_tolerance = ANSWER_CHECK_SETTINGS['abs_tolerance'] if abs_tolerance is None else abs_tolerance
+
+    # Per item: values as compared (NaN when not numeric) and whether both sides' units disagree
+    user_values = np.full(n, np.nan)
+    correct_values = np.full(n, np.nan)
+    unit_mismatch = np.zeros(n, dtype=bool)
+    exact = np.zeros(n, dtype=bool)
+    for i, (user, correct, correct_q) in enumerate(zip(user_answers, correct_answers, correct_quantities)):
+        if normalize_answer(user) == normalize_answer(correct):
+            exact[i] = True
+            continue
+        user_q = parse_quantity(user)
+        if user_q is None or correct_q is None:
+            continue
+        if user_q[2] is None or correct_q[2] is None:
+            user_values[i], correct_values[i] = user_q[0], correct_q[0]
+        elif user_q[2] == correct_q[2]:
+            user_values[i], correct_values[i] = user_q[1], correct_q[1]
+        else:
+            unit_mismatch[i] = True
+
+    if rel_tolerance is None:
+        rel = default_rel
+    else:
+        rel = np.asarray(rel_tolerance, dtype=float)
+        if rel.ndim:
+            rel = np.where(np.isnan(rel), default_rel, rel)
+    # A tolerance relative to the correct value, but never below abs_tolerance: a correct 0 still matches 0
+    allowed = np.maximum(rel * np.abs(correct_values), abs_tolerance)
+    with np.errstate(invalid='ignore'):
+        close = np.abs(user_values - correct_values) <= allowed
+    return exact | close, unit_mismatch
+
+
+def check_answer(user_answer: str, correct_answer: str, rel_tolerance: Optional[float] = None) -> Tuple[bool, bool]:
+    """(is_correct, unit_mismatch) for one answer"""
+    is_correct, unit_mismatch = check_answers([user_answer], [correct_answer], rel_tolerance)
+    return bool(is_correct[0]), bool(unit_mismatch[0])
@@ -0,0 +1,129 @@
+"""
+Answer flow for tests taken in the bot.
+An answer costs one conditional UPDATE of the test session and one message
+edit: the user's language and the test's questions come from per-process
+caches (the whole question set is prefetched when the test starts, or in one
+query by whichever worker sees the session first), and the feedback is shown
+in the same edit as the next question instead of sleeping in the handler
+between two edits.
+"""
+
+from typing import Dict, List, Optional
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from bot_storage import TestSession, TestSessionStore
+from config import ANSWER_FLOW_SETTINGS, BOT_SETTINGS
+from translations import get_text
+from ttl_cache import TTLCache
+
+ANSWER_KEYBOARD = InlineKeyboardMarkup(inline_keyboard=[
+    [
+        InlineKeyboardButton(text="A", callback_data="answer_A"),
+        InlineKeyboardButton(text="B", callback_data="answer_B"),
+    ],
+    [
+        InlineKeyboardButton(text="C", callback_data="answer_C"),
+        InlineKeyboardButton(text="D", callback_data="answer_D"),
+    ]
+])
+
+
+class AnswerFlow:
+    def __init__(self, db, sessions: TestSessionStore):
+        self.db = db
+        self.sessions = sessions
+        self.languages = TTLCache(ANSWER_FLOW_SETTINGS['language_cache_size'],
+                                  ANSWER_FLOW_SETTINGS['language_ttl_seconds'])
+        self.questions = TTLCache(ANSWER_FLOW_SETTINGS['question_cache_size'],
+                                  ANSWER_FLOW_SETTINGS['question_ttl_seconds'])
+
+    async def language(self, user_id: int) -> str:
+        """A user's language, from the cache or the users table"""
+        async def load():
+            user = await self.db.get_user(user_id)
+            return user['language'] if user else BOT_SETTINGS['default_language']
+        return await self.languages.get_or_load(user_id, load)
+
+    def remember_language(self, user_id: int, language: str):
+        self.languages.set(user_id, language)
+
+    async def question(self, session: TestSession) -> Optional[Dict]:
+        """The session's current question; on a miss the rest of the test is loaded in one query"""
+        test_id = session.current_test_id
+        test = self.questions.get(test_id)
+        if test is None:
+            rows = await self.db.get_tests_by_ids(session.test_ids[session.position:])
+            for row_id, row in rows.items():
+                self.questions.set(row_id, row)
+            test = rows.get(test_id)
+        return test
+
+    async def start(self, user_id: int, tests: List[Dict], subject: str, started_at: str) -> TestSession:
+        """Start a test over already-loaded question rows, keeping the rows for the answers"""
+        for test in tests:
+            self.questions.set(test['id'], test)
+        return await self.sessions.start(user_id, [test['id'] for test in tests], subject=subject,
+                                         started_at=started_at)
+
+    @staticmethod
+    def question_text(session: TestSession, test: Dict, language: str) -> str:
+        text = get_text('test_question', language, current=session.position + 1, total=session.total)
+        text += f"\n\n❓ {test['question']}\n\n"
+        text += f"A) {test['option_a']}\n"
+        text += f"B) {test['option_b']}\n"
+        text += f"C) {test['option_c']}\n"
+        text += f"D) {test['option_d']}"
+        return text
+
+    async def show_question(self, message, session: TestSession, language: str, feedback: str = None):
+        """Edit the message into the current question, with the previous answer's feedback on top"""
+        text = self.question_text(session, await self.question(session), language)
+        if feedback:
+            text = f"{feedback}\n\n{text}"
+        await message.edit_text(text, reply_markup=ANSWER_KEYBOARD)
+
+    async def answer(self, message, user_id: int, answer: str) -> Optional[TestSession]:
+        """Record an answer and show the next question (or the result).
+        Returns the updated session, or None if there is no running test or this
+        question was already answered (double tap, another worker)"""
+        session = await self.sessions.get(user_id)
+        if not session or session.finished or answer not in ("A", "B", "C", "D"):
+            return None
+        language = await self.language(user_id)
+        test = await self.question(session)
+        if test is None:
+            # The question was deleted while the test was running
+            await self.sessions.finish(user_id)
+            return None
+        correct_answer = test['correct_answer'].strip().upper()
+        is_correct = answer == correct_answer
+
+        session = await self.sessions.record_answer(user_id, session.position, answer, is_correct)
+        if not session:
+            return None
+        feedback = get_text('correct_answer', language) if is_correct else \
+            get_text('wrong_answer', language, answer=correct_answer)
+        if session.finished:
+            await self.finish(message, session, language, feedback)
+        else:
+            await self.show_question(message, session, language, feedback)
+        return session
+
+    async def finish(self, message, session: TestSession, language: str, feedback: str = None):
+        """Score and store the finished test, then show the result"""
+        # Scored again server-side and stored with the user's counters in one transaction
+        result = await self.db.record_test_attempt(
+            session.user_id, session.answered(),
+            subject=session.subject, source='bot', started_at=session.started_at
+        )
+        text = get_text('test_result', language, correct=result['correct'], total=result['total'],
+                        percentage=int(result['score']), points=result['points'])
+        # record_test_attempt has already moved the user in the in-memory leaderboard
+        position = self.db.leaderboard.rank(session.user_id)
+        if position:
+            text += "\n" + get_text('your_position', language, position=position)
+        if feedback:
+            text = f"{feedback}\n\n{text}"
+        await message.edit_text(text)
+        await self.sessions.finish(session.user_id)
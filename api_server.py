@@ -1,15 +1,26 @@
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
+from fastapi.responses import FileResponse
 from pydantic import BaseModel
 from typing import Dict, Any, List, Optional
 import asyncio
+import base64
+import hashlib
+from answer_checker import check_answer, check_answers
+from quantities import parse_quantity
+from question_templates import QuestionPool
+from blob_store import BlobStore, blob_url, move_inline_photos
+from config import ANSWER_CHECK_SETTINGS, WEBHOOK_SETTINGS
+from upload_pipeline import receive_photo, shutdown_executor
 from database import Database
+from database_migrations import create_schedules_table
+from database_pool import SQLitePool
 from database_schedule import ScheduleDatabase
+from skill_model import prior_difficulty
 import json
 import traceback
-from datetime import datetime
-import aiosqlite
+from datetime import date, datetime, timedelta
 import os
 
 # Lifespan event handler to replace deprecated on_event
@@ -40,16 +51,22 @@ class ScheduleCreate(BaseModel):
 async def lifespan(app: FastAPI):
     """Lifespan event handler with full error protection"""
     try:
-        global db, schedule_db
+        global db, schedule_db, db_pool
         print("🚀 Starting API server...")
         
         # Safe database initialization
         try:
-            db = Database()
+            # One long-lived pool shared by every database helper
+            db_pool = SQLitePool(db_file, readers=int(os.environ.get('DATABASE_READERS', 4)))
+            await db_pool.open()
+            db = Database(db_file, pool=db_pool)
             await db.init_db()
-            schedule_db = ScheduleDatabase()
+            schedule_db = ScheduleDatabase(db_file, pool=db_pool)
             await schedule_db.init_schedule_tables()
+            # Photos still stored inline as base64 from before migration 9
+            await move_inline_photos(db_pool, blob_store)
             print("✅ Database initialized successfully")
+            app.state.leaderboard_task = asyncio.create_task(db.resync_leaderboard())
         except Exception as db_error:
             print(f"❌ Database initialization error: {db_error}")
             print(f"📜 DB Error traceback: {traceback.format_exc()}")
@@ -59,6 +76,18 @@ async def lifespan(app: FastAPI):
             await create_safe_test_data()
         except Exception as test_error:
             print(f"⚠️ Test data creation error: {test_error}")
+
+        try:
+            await asyncio.to_thread(question_pool.build)
+        except Exception as pool_error:
+            print(f"⚠️ Question pool build error: {pool_error}")
+            
+        # Telegram bot updates, when this app serves the bot's webhook
+        if bot_webhook:
+            try:
+                await bot_webhook.start()
+            except Exception as webhook_error:
+                print(f"❌ Bot webhook startup error: {webhook_error}")
             
         print("🎯 API server startup completed")
         
@@ -71,6 +100,13 @@ async def lifespan(app: FastAPI):
     # Cleanup on shutdown
     try:
         print("🛑 Shutting down API server...")
+        leaderboard_task = getattr(app.state, 'leaderboard_task', None)
+        if leaderboard_task:
+            leaderboard_task.cancel()
+        if bot_webhook:
+            await bot_webhook.stop()
+        shutdown_executor()
+        await db_pool.close()
     except Exception as shutdown_error:
         print(f"⚠️ Shutdown error: {shutdown_error}")
 
@@ -84,11 +120,25 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],  # keyset pagination cursors, material ETags
 )
 
+# Serve the Telegram bot's webhook from this app too (BOT_WEBHOOK_IN_API=1, see bot_webhook.py)
+bot_webhook = None
+if WEBHOOK_SETTINGS['mount_in_api']:
+    from bot_webhook import bot_webhook_from_bot_module
+    bot_webhook = bot_webhook_from_bot_module()
+    app.include_router(bot_webhook.router)
+
 # Initialize database
 db_file = os.environ.get('DATABASE_FILE', 'ent_bot.db')
-db = Database(db_file)
+# Uploaded photos, content-addressed (see blob_store.py)
+blob_store = BlobStore(os.environ.get('BLOB_STORE_DIR', 'blobs'))
+# Generated physics questions; built at startup (or on first use)
+question_pool = QuestionPool()
+db_pool = SQLitePool(db_file)
+db = Database(db_file, pool=db_pool)
+schedule_db = ScheduleDatabase(db_file, pool=db_pool)
 
 # Global exception handler to prevent cascade errors
 @app.exception_handler(Exception)
@@ -158,6 +208,16 @@ class TestAnswer(BaseModel):
     answer: str
     user_id: int
 
+class AttemptAnswer(BaseModel):
+    test_id: int
+    answer: str
+
+class TestAttempt(BaseModel):
+    user_id: int
+    answers: List[AttemptAnswer]
+    subject: Optional[str] = None
+    started_at: Optional[str] = None
+
 class ScheduleEntry(BaseModel):
     day_of_week: int
     time_start: str
@@ -234,6 +294,41 @@ async def create_safe_test_data():
 async def health_check():
     return {"status": "OK", "service": "Physics Bot API"}
 
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """Hit/miss counters of the in-process material cache"""
+    return {"materials": db.material_cache.stats()}
+
+@app.get("/api/blobs/{blob_hash}")
+async def get_blob(blob_hash: str, request: Request):
+    """Serve a stored photo by its SHA-256 (streamed from disk; immutable, so cacheable forever)"""
+    if not blob_store.exists(blob_hash):
+        raise HTTPException(status_code=404, detail="Blob not found")
+    headers = {"ETag": f'"{blob_hash}"', "Cache-Control": "public, max-age=31536000, immutable"}
+    if blob_hash in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(blob_store.path(blob_hash), media_type=blob_store.media_type(blob_hash), headers=headers)
+
+def json_etag(body: Any) -> str:
+    """Weak ETag over the JSON body (same content, same tag)"""
+    raw = json.dumps(body, sort_keys=True, default=str, ensure_ascii=False).encode()
+    return f'W/"{hashlib.blake2b(raw, digest_size=16).hexdigest()}"'
+
+def conditional_json(request: Request, response: Response, body: Any, cached: Any = None):
+    """Return body with an ETag, or an empty 304 if the client already has this version.
+    cached is the material-cache value body is built from (body itself by default);
+    its ETag is computed once per cache entry instead of on every hit"""
+    etag = db.material_cache.etag(body if cached is None else cached, json_etag)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        # Weak comparison (RFC 9110): ignore the W/ prefix on either side
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if "*" in tags or etag.removeprefix("W/") in tags:
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return body
+
 # User endpoints with error protection
 @app.post("/api/users")
 async def create_user(user: User):
@@ -331,18 +426,35 @@ async def get_tests(language: str = 'ru'):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/tests/{subject}")
-async def get_tests_by_subject(subject: str, language: str = 'ru', limit: int = 10):
-    """Get tests by subject"""
-    tests = db.get_tests_by_subject(subject, language, limit)
+async def get_tests_by_subject(subject: str, language: str = 'ru', limit: int = 10,
+                               difficulty: Optional[str] = None, user_id: Optional[int] = None):
+    """Get random tests by subject (user_id: avoid the user's recently answered questions)"""
+    tests = await db.get_tests_by_subject(subject, language, limit, difficulty, user_id)
     return {"tests": tests}
 
+@app.post("/api/tests/attempts")
+async def submit_test_attempt(attempt: TestAttempt):
+    """Score a finished test server-side and store it (same path as the bot's finish_test).
+    Returns correct/total/score/points and the user's updated tests_completed/avg_score/streak"""
+    try:
+        return await db.record_test_attempt(
+            attempt.user_id, [(a.test_id, a.answer) for a in attempt.answers],
+            subject=attempt.subject, source='api', started_at=attempt.started_at
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/api/tests/submit")
 async def submit_test_answer(answer: TestAnswer):
+    """Single-answer submission, stored and scored as a one-question attempt"""
     try:
-        # Here you would implement test scoring logic
-        # For now, just add points to user
-        await db.add_points(answer.user_id, 10)  # 10 points per correct answer
-        return {"message": "Answer submitted successfully", "points_awarded": 10}
+        result = await db.record_test_attempt(answer.user_id, [(answer.test_id, answer.answer)], source='api')
+        return {"message": "Answer submitted successfully", "points_awarded": result['points'],
+                "is_correct": result['correct'] == 1, "correct_answer": result['answers'][0]['correct_answer']}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -356,40 +468,43 @@ async def get_all_materials():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/materials/published")
-async def get_published_materials(user_id: Optional[int] = None, category: Optional[str] = None):
-    """Get all published materials for students"""
+MATERIALS_PAGE_LIMIT = 200
+
+def encode_page_cursor(sort_value, row_id: int) -> str:
+    """Opaque keyset cursor for the (sort column, id) of the last row on a page"""
+    raw = json.dumps([sort_value, row_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_page_cursor(cursor: str):
     try:
-        print(f"📚 Loading published materials for student, category: {category}")
-        
-        # Get all materials from database with error handling
-        try:
-            materials = await db.get_all_materials()
-            print(f"📊 Found {len(materials)} total materials in database")
-        except Exception as db_error:
-            print(f"❌ Database error getting materials: {db_error}")
-            print(f"📜 Database error traceback: {traceback.format_exc()}")
-            # Return empty list if database fails
-            return []
-        
-        if not materials:
-            print("📭 No materials found in database")
-            return []
-        
-        # Filter only published materials
-        published_materials = []
-        for m in materials:
-            is_published = m.get('is_published')
-            print(f"🔍 Material {m.get('id')}: {m.get('title')} - is_published: {is_published} (type: {type(is_published)})")
-            if is_published == 1 or is_published is True:
-                published_materials.append(m)
-        
-        # Filter by category if specified
-        if category and category != 'all':
-            published_materials = [m for m in published_materials if m.get('category') == category]
-        
-        print(f"✅ Found {len(published_materials)} published materials")
-        return published_materials
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(sort_value), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def encode_materials_cursor(material: Dict) -> str:
+    """Keyset cursor for the (updated_at, id) of the last material on a page"""
+    return encode_page_cursor(material['updated_at'], material['id'])
+
+decode_materials_cursor = decode_page_cursor
+
+@app.get("/api/materials/published")
+async def get_published_materials(request: Request, response: Response, user_id: Optional[int] = None, category: Optional[str] = None,
+                                  cursor: Optional[str] = None, limit: int = 50):
+    """Get published materials for students (newest first, without content/attachments;
+    fetch those from /api/materials/{id}). Rows carry both is_published and isPublished.
+    The cursor for the next page is returned in the X-Next-Cursor header"""
+    limit = max(1, min(limit, MATERIALS_PAGE_LIMIT))
+    after = decode_materials_cursor(cursor) if cursor else None
+    if category == 'all':
+        category = None
+
+    try:
+        materials = await db.get_published_materials(category=category, after=after, limit=limit)
+        if len(materials) == limit:
+            response.headers["X-Next-Cursor"] = encode_materials_cursor(materials[-1])
+        print(f"📚 Published materials page: {len(materials)} (category: {category or 'all'})")
+        return conditional_json(request, response, materials)
     except Exception as e:
         print(f"❌ Error loading published materials: {e}")
         print(f"📜 Full traceback: {traceback.format_exc()}")
@@ -447,23 +562,23 @@ async def remove_bookmark(user_id: int, material_id: int):
         return {"success": False}
 
 @app.get("/api/materials/{material_id}")
-async def get_material_by_id(material_id: int):
+async def get_material_by_id(material_id: int, request: Request, response: Response):
     """Get material by ID"""
     try:
         material = await db.get_material_by_id(material_id)
         if not material:
             raise HTTPException(status_code=404, detail="Material not found")
-        return material
+        return conditional_json(request, response, material)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/materials/by-subject/{subject}")
-async def get_materials_by_subject(subject: str, language: str = 'ru'):
+async def get_materials_by_subject(subject: str, request: Request, response: Response, language: str = 'ru'):
     try:
         materials = await db.get_materials_by_subject(subject, language)
-        return {"materials": materials}
+        return conditional_json(request, response, {"materials": materials}, cached=materials)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -479,7 +594,10 @@ async def clear_all_users():
         print(f"📊 Found {count} users to delete")
         
         # Clear all users
-        await db.execute_query("DELETE FROM users")
+        async with db.pool.writer() as conn:
+            await conn.execute("DELETE FROM users")
+            await conn.commit()
+        db.leaderboard.clear()
         
         print(f"✅ Successfully deleted {count} users")
         return {"message": f"Successfully cleared {count} users", "deleted_count": count}
@@ -494,38 +612,12 @@ async def reset_schedules_table():
     try:
         print("🔄 Resetting schedules table...")
         
-        async with aiosqlite.connect(db.db_path) as conn:
+        async with db.pool.writer() as conn:
             # Drop existing table
             await conn.execute('DROP TABLE IF EXISTS schedules')
             
-            # Create new table with correct structure
-            await conn.execute('''
-                CREATE TABLE schedules (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    title TEXT NOT NULL,
-                    description TEXT,
-                    subject TEXT,
-                    day_of_week TEXT,
-                    start_time TEXT,
-                    end_time TEXT,
-                    start_date TEXT,
-                    end_date TEXT,
-                    location TEXT,
-                    max_students INTEGER DEFAULT 30,
-                    teacher_id INTEGER,
-                    user_id INTEGER,
-                    is_recurring BOOLEAN DEFAULT 0,
-                    type TEXT DEFAULT 'lecture',
-                    difficulty TEXT DEFAULT 'intermediate',
-                    duration INTEGER DEFAULT 90,
-                    price INTEGER DEFAULT 0,
-                    tags TEXT,
-                    is_online BOOLEAN DEFAULT 0,
-                    requirements TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
+            # Create new table with correct structure and its indexes
+            await create_schedules_table(conn)
             
             await conn.commit()
             
@@ -565,36 +657,7 @@ async def create_schedule(schedule_data: Dict[str, Any]):
         is_online = schedule_data.get('isOnline', False)
         requirements = schedule_data.get('requirements', '')
         
-        # Ensure table exists with proper structure
-        async with aiosqlite.connect(db.db_path) as conn:
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS schedules (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    title TEXT NOT NULL,
-                    description TEXT,
-                    subject TEXT,
-                    day_of_week TEXT,
-                    start_time TEXT,
-                    end_time TEXT,
-                    start_date TEXT,
-                    end_date TEXT,
-                    location TEXT,
-                    max_students INTEGER DEFAULT 30,
-                    teacher_id INTEGER,
-                    user_id INTEGER,
-                    is_recurring BOOLEAN DEFAULT 0,
-                    type TEXT DEFAULT 'lecture',
-                    difficulty TEXT DEFAULT 'intermediate',
-                    duration INTEGER DEFAULT 90,
-                    price INTEGER DEFAULT 0,
-                    tags TEXT,
-                    is_online BOOLEAN DEFAULT 0,
-                    requirements TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
+        async with db.pool.writer() as conn:
             cursor = await conn.execute('''
                 INSERT INTO schedules (title, description, subject, day_of_week, start_time, end_time,
                                      start_date, end_date, location, max_students, teacher_id, user_id,
@@ -645,36 +708,7 @@ async def get_user_schedules(user_id: int):
     try:
         print(f"📅 Loading schedules for user: {user_id}")
         
-        async with aiosqlite.connect(db.db_path) as conn:
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS schedules (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    title TEXT NOT NULL,
-                    description TEXT,
-                    subject TEXT,
-                    day_of_week TEXT,
-                    start_time TEXT,
-                    end_time TEXT,
-                    start_date TEXT,
-                    end_date TEXT,
-                    location TEXT,
-                    max_students INTEGER DEFAULT 30,
-                    teacher_id INTEGER,
-                    user_id INTEGER,
-                    is_recurring BOOLEAN DEFAULT 0,
-                    type TEXT DEFAULT 'lecture',
-                    difficulty TEXT DEFAULT 'intermediate',
-                    duration INTEGER DEFAULT 90,
-                    price INTEGER DEFAULT 0,
-                    tags TEXT,
-                    is_online BOOLEAN DEFAULT 0,
-                    requirements TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            conn.row_factory = aiosqlite.Row
+        async with db.pool.reader() as conn:
             async with conn.execute('''
                 SELECT * FROM schedules WHERE teacher_id = ? OR user_id = ? ORDER BY created_at DESC
             ''', (user_id, user_id)) as cursor:
@@ -721,37 +755,7 @@ async def get_public_schedules(user_id: int = None):
     try:
         print(f"📅 Loading public schedules for user: {user_id}")
         
-        async with aiosqlite.connect(db.db_path) as conn:
-            # Ensure table exists first
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS schedules (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    title TEXT NOT NULL,
-                    description TEXT,
-                    subject TEXT,
-                    day_of_week TEXT,
-                    start_time TEXT,
-                    end_time TEXT,
-                    start_date TEXT,
-                    end_date TEXT,
-                    location TEXT,
-                    max_students INTEGER DEFAULT 30,
-                    teacher_id INTEGER,
-                    user_id INTEGER,
-                    is_recurring BOOLEAN DEFAULT 0,
-                    type TEXT DEFAULT 'lecture',
-                    difficulty TEXT DEFAULT 'intermediate',
-                    duration INTEGER DEFAULT 90,
-                    price INTEGER DEFAULT 0,
-                    tags TEXT,
-                    is_online BOOLEAN DEFAULT 0,
-                    requirements TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            conn.row_factory = aiosqlite.Row
+        async with db.pool.reader() as conn:
             # Get all schedules (no visibility column in our simple structure)
             async with conn.execute('''
                 SELECT * FROM schedules ORDER BY created_at DESC
@@ -883,6 +887,22 @@ async def get_all_users():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def topic_progress_view(counters: Dict[str, Dict], totals: Dict[str, Dict[str, int]]) -> Dict[str, Dict]:
+    """completed/total/score/time (minutes) per topic from the user_topic_progress counters.
+    Every topic that has tests or materials is listed, untouched ones with zeros"""
+    view = {}
+    for topic in sorted(set(totals) | set(counters)):
+        row = counters.get(topic, {})
+        total = totals.get(topic, {})
+        questions = row.get('questions', 0)
+        view[topic] = {
+            "completed": row.get('tests_seen', 0) + row.get('materials_seen', 0),
+            "total": total.get('tests', 0) + total.get('materials', 0),
+            "score": round(row.get('correct', 0) * 100 / questions) if questions else 0,
+            "time": round(row.get('time_seconds', 0) / 60)
+        }
+    return view
+
 @app.get("/api/teacher/students")
 async def get_teacher_students_by_code():
     """Get all students registered with teacher code 111444"""
@@ -904,8 +924,13 @@ async def get_teacher_students_by_code():
         
         print(f"📊 Students with code 111444: {len(students)}")
         
+        # Whole-class per-topic counters in one read
+        totals = await db.get_topic_totals()
+        class_progress = await db.get_topic_progress()
+        
         # Add additional stats for each student
         for student in students:
+            student['progress'] = topic_progress_view(class_progress.get(student.get('telegram_id'), {}), totals)
             student['tests_completed'] = student.get('tests_completed', 0)
             student['points'] = student.get('points', 0)
             student['last_activity'] = student.get('last_activity', 'Никогда')
@@ -923,14 +948,13 @@ async def get_teacher_students_by_code():
 @app.get("/api/admin/stats")
 async def get_admin_stats():
     try:
-        user_count = await db.get_user_count()
-        leaderboard = await db.get_leaderboard(5)
+        stats = await db.stats.get()
         
         return {
-            "user_count": user_count,
-            "top_users": leaderboard,
-            "total_tests": 0,  # You can implement this
-            "total_materials": 0  # You can implement this
+            "user_count": stats['total_users'],
+            "top_users": stats['top_performers'],
+            "total_tests": stats['total_tests'],
+            "total_materials": stats['total_materials']
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -941,10 +965,11 @@ async def get_teacher_students():
     """Get all students with detailed stats for teacher dashboard"""
     try:
         users = await db.get_all_users()
+        totals = await db.get_topic_totals()
+        class_progress = await db.get_topic_progress()
         students = []
         
         for user in users:
-            # Calculate student stats (mock data for now, replace with real calculations)
             student_data = {
                 "id": user.get('telegram_id', user.get('id')),
                 "name": f"{user.get('first_name', 'Студент')} {user.get('last_name', '')}".strip(),
@@ -957,11 +982,7 @@ async def get_teacher_students():
                 "last_active": user.get('last_activity', ''),
                 "registration_date": user.get('registration_date', ''),
                 "status": "active" if user.get('points', 0) > 0 else "inactive",
-                "progress": {
-                    "mechanics": {"completed": 5, "total": 10, "score": 75},
-                    "electricity": {"completed": 3, "total": 8, "score": 82},
-                    "optics": {"completed": 2, "total": 6, "score": 68}
-                }
+                "progress": topic_progress_view(class_progress.get(user.get('telegram_id'), {}), totals)
             }
             students.append(student_data)
         
@@ -973,60 +994,32 @@ async def get_teacher_students():
 async def get_teacher_stats():
     """Get teacher quick actions statistics"""
     try:
-        print("📊 Getting teacher stats...")
-        
-        # Get real data from database with error handling
-        try:
-            users = await db.get_all_users()
-            print(f"👥 Found {len(users)} users")
-        except Exception as e:
-            print(f"❌ Error getting users: {e}")
-            users = []
-            
-        try:
-            tests = await db.get_all_tests()
-            print(f"📝 Found {len(tests)} tests")
-        except Exception as e:
-            print(f"❌ Error getting tests: {e}")
-            tests = []
-            
-        try:
-            materials = await db.get_all_materials()
-            print(f"📚 Found {len(materials)} materials")
-        except Exception as e:
-            print(f"❌ Error getting materials: {e}")
-            materials = []
-        
-        # Calculate real statistics with safe defaults
-        total_students = len([u for u in users if u.get('role') == 'student']) if users else 0
-        active_tests = len([t for t in tests if t.get('is_published', False)]) if tests else 0
-        total_materials = len([m for m in materials if m.get('is_published', False)]) if materials else 0
-        
-        print(f"📈 Stats: {total_students} students, {active_tests} tests, {total_materials} materials")
+        # One aggregate query, cached for a few seconds (see DashboardStats)
+        stats = await db.stats.get()
         
         # For QuickActionsPage compatibility
-        result = {
-            "totalStudents": total_students,
-            "activeTests": active_tests,
+        return {
+            "totalStudents": stats['total_students'],
+            "activeTests": stats['active_tests'],
             "newMessages": 0,  # TODO: implement messaging system
-            "pendingReports": total_materials,  # Use materials count as reports
+            "pendingReports": stats['published_materials'],  # Use materials count as reports
             
             # Additional detailed stats for dashboard
             "detailed": {
-                "total_students": total_students,
-                "active_students": len([u for u in users if u.get('points', 0) > 0]) if users else 0,
-                "inactive_students": max(0, total_students - len([u for u in users if u.get('points', 0) > 0])) if users else 0,
-                "avg_points": round(sum(u.get('points', 0) for u in users) / total_students if total_students > 0 else 0, 1),
-                "total_tests_taken": sum(u.get('tests_completed', 0) for u in users) if users else 0,
-                "published_tests": active_tests,
-                "published_materials": total_materials,
-                "top_performers": []  # Simplified for now
+                "total_students": stats['total_students'],
+                "active_students": stats['active_students'],
+                "inactive_students": stats['inactive_students'],
+                "avg_points": stats['avg_points'],
+                "total_tests_taken": stats['total_tests_taken'],
+                "published_tests": stats['active_tests'],
+                "published_materials": stats['published_materials'],
+                "active_students_week": stats['active_students_week'],
+                "tests_taken_week": stats['tests_taken_week'],
+                "study_minutes_week": stats['study_minutes_week'],
+                "top_performers": stats['top_performers']
             }
         }
         
-        print("✅ Teacher stats generated successfully")
-        return result
-        
     except Exception as e:
         print(f"❌ Error in get_teacher_stats: {e}")
         print(f"📜 Full traceback: {traceback.format_exc()}")
@@ -1040,6 +1033,12 @@ async def get_student_details(student_id: int):
         if not user:
             raise HTTPException(status_code=404, detail="Student not found")
         
+        totals = await db.get_activity_totals(student_id)
+        recent = await db.get_recent_attempts(student_id, 3)
+        topic_progress = topic_progress_view((await db.get_topic_progress(student_id)).get(student_id, {}),
+                                             await db.get_topic_totals())
+        minutes = totals['time_seconds'] // 60
+        
         # Get detailed student analytics
         student_details = {
             "id": student_id,
@@ -1053,20 +1052,16 @@ async def get_student_details(student_id: int):
             "stats": {
                 "tests_completed": user.get('tests_completed', 0),
                 "avg_score": user.get('avg_score', 0),
-                "time_spent": "12ч 45мин",
+                "time_spent": f"{minutes // 60}ч {minutes % 60}мин",
+                "active_days": totals['active_days'],
                 "materials_viewed": 23,
                 "achievements": 5
             },
-            "progress_by_topic": {
-                "mechanics": {"completed": 8, "total": 12, "score": 78, "time": "3ч 20мин"},
-                "electricity": {"completed": 5, "total": 10, "score": 85, "time": "2ч 15мин"},
-                "thermodynamics": {"completed": 3, "total": 8, "score": 72, "time": "1ч 45мин"},
-                "optics": {"completed": 2, "total": 6, "score": 68, "time": "45мин"}
-            },
+            "progress_by_topic": topic_progress,
             "recent_tests": [
-                {"topic": "Механика", "score": 85, "date": "2024-01-10", "time": "15мин"},
-                {"topic": "Электричество", "score": 92, "date": "2024-01-09", "time": "12мин"},
-                {"topic": "Оптика", "score": 78, "date": "2024-01-08", "time": "18мин"}
+                {"topic": attempt['subject'], "score": attempt['score'], "date": (attempt['completed_at'] or '')[:10],
+                 "correct": attempt['correct'], "total": attempt['total']}
+                for attempt in recent
             ],
             "achievements": [
                 {"name": "Первый тест", "icon": "🎯", "date": "2024-01-05"},
@@ -1084,28 +1079,36 @@ async def get_student_details(student_id: int):
 async def get_real_leaderboard(limit: int = 10):
     """Get real leaderboard from database"""
     try:
-        users = await db.get_all_users()
-        # Sort by points descending
-        sorted_users = sorted(users, key=lambda x: x.get('points', 0), reverse=True)[:limit]
-        
         leaderboard = []
-        for i, user in enumerate(sorted_users):
+        for user in db.leaderboard.top(limit):
             leaderboard.append({
-                "rank": i + 1,
-                "id": user.get('telegram_id', user.get('id')),
-                "name": f"{user.get('first_name', 'Пользователь')} {user.get('last_name', '')}".strip(),
-                "username": user.get('username', ''),
+                "rank": user['rank'],
+                "id": user['telegram_id'],
+                "name": f"{user.get('first_name') or 'Пользователь'} {user.get('last_name') or ''}".strip(),
+                "username": user.get('username') or '',
                 "points": user.get('points', 0),
-                "level": user.get('level', 1),
-                "streak": user.get('streak', 0),
-                "tests_completed": user.get('tests_completed', 0),
-                "avg_score": user.get('avg_score', 0)
+                "level": user.get('level') or 1,
+                "streak": user.get('streak') or 0,
+                "tests_completed": user.get('tests_completed') or 0,
+                "avg_score": user.get('avg_score') or 0
             })
         
         return {"leaderboard": leaderboard}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/leaderboard/rank/{telegram_id}")
+async def get_leaderboard_rank(telegram_id: int, radius: int = 2):
+    """Get a user's rank and the users ranked just above and below them"""
+    rank = db.leaderboard.rank(telegram_id)
+    if rank is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return {
+        "rank": rank,
+        "total": len(db.leaderboard),
+        "neighbours": db.leaderboard.around(telegram_id, max(0, min(radius, 50)))
+    }
+
 # Real data endpoints for quests
 @app.get("/api/quests/real")
 async def get_real_quests(language: str = 'ru'):
@@ -1136,32 +1139,27 @@ async def get_real_tests(subject: str = 'Физика', language: str = 'ru', li
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Kazakh weekday abbreviations, Monday first (date.weekday() order)
+WEEKDAY_LABELS = ['Дс', 'Сс', 'Ср', 'Бс', 'Жм', 'Сб', 'Жк']
+
 # Real user activity endpoint
 @app.get("/api/user/{user_id}/activity")
 async def get_user_activity(user_id: int, limit: int = 10):
-    """Get real user activity from database"""
-    try:
-        # Get user progress records as activity
-        progress_records = await db.execute("""
-            SELECT up.*, t.title as test_title, t.subject 
-            FROM user_progress up 
-            JOIN tests t ON up.test_id = t.id 
-            WHERE up.user_id = ? 
-            ORDER BY up.completed_at DESC 
-            LIMIT ?
-        """, (user_id, limit))
+    """Get the user's latest finished tests from the attempts table"""
+    try:
+        attempts = await db.get_recent_attempts(user_id, max(1, min(limit, 50)))
         
         activities = []
-        for record in progress_records:
+        for attempt in attempts:
             activities.append({
-                "id": record[0],
+                "id": attempt['id'],
                 "type": "test_completed",
-                "action": f"Тест '{record[7]}' аяқталды",
-                "score": record[3],
-                "xpGained": record[4],
-                "time": record[6],
+                "action": f"Тест '{attempt['subject'] or 'тест'}' аяқталды",
+                "score": attempt['score'],
+                "xpGained": attempt['points'],
+                "time": attempt['completed_at'],
                 "icon": "📝",
-                "subject": record[8]
+                "subject": attempt['subject']
             })
         
         return {"activities": activities}
@@ -1171,30 +1169,23 @@ async def get_user_activity(user_id: int, limit: int = 10):
 # Real weekly stats endpoint
 @app.get("/api/user/{user_id}/weekly-stats")
 async def get_user_weekly_stats(user_id: int):
-    """Get real weekly stats for user"""
+    """Last 7 days (oldest first) from the daily rollup; time is in minutes"""
     try:
-        # Get last 7 days of activity
+        today = date.today()
+        first_day = today - timedelta(days=6)
+        rows = {row['day']: row for row in await db.get_daily_stats(user_id, first_day, today)}
+        
         weekly_stats = []
-        days = ['Дс', 'Сс', 'Ср', 'Бс', 'Жм', 'Сб', 'Жк']
-        
-        for i, day in enumerate(days):
-            # Get stats for each day (mock calculation for now)
-            day_stats = await db.execute("""
-                SELECT COUNT(*) as tests, SUM(xp_gained) as xp, SUM(time_spent) as time
-                FROM user_progress 
-                WHERE user_id = ? AND DATE(completed_at) = DATE('now', '-{} days')
-            """.format(6-i), (user_id,))
-            
-            if day_stats:
-                stats = day_stats[0]
-                weekly_stats.append({
-                    "day": day,
-                    "tests": stats[0] or 0,
-                    "xp": stats[1] or 0,
-                    "time": stats[2] or 0
-                })
-            else:
-                weekly_stats.append({"day": day, "tests": 0, "xp": 0, "time": 0})
+        for offset in range(7):
+            day = first_day + timedelta(days=offset)
+            row = rows.get(day.isoformat())
+            weekly_stats.append({
+                "day": WEEKDAY_LABELS[day.weekday()],
+                "date": day.isoformat(),
+                "tests": row['tests'] if row else 0,
+                "xp": row['xp'] if row else 0,
+                "time": round(row['time_seconds'] / 60) if row else 0
+            })
         
         return {"weeklyStats": weekly_stats}
     except Exception as e:
@@ -1208,6 +1199,8 @@ async def get_user_achievements(user_id: int):
         user = await db.get_user_by_id(user_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
+        totals = await db.get_activity_totals(user_id)
+        study_hours = round(totals['time_seconds'] / 3600, 1)
         
         achievements = [
             {
@@ -1255,9 +1248,9 @@ async def get_user_achievements(user_id: int):
                 "name": "Study Marathon",
                 "icon": "📚",
                 "desc": "10 сағат оқу",
-                "progress": user.get('tests_completed', 0) * 0.5,  # estimate study time
+                "progress": study_hours,
                 "target": 10,
-                "unlocked": ((user.get('tests_completed', 0) * 0.5) >= 10),
+                "unlocked": study_hours >= 10,
                 "rarity": "rare"
             },
             {
@@ -1286,16 +1279,8 @@ async def get_teacher_profile(teacher_id: int):
         if not teacher:
             raise HTTPException(status_code=404, detail="Teacher not found")
         
-        # Get students taught by this teacher (mock for now, would need teacher-student relationship table)
-        students = await db.get_all_users()
-        student_count = len([s for s in students if s.get('role') != 'teacher'])
-        
-        # Calculate teacher stats based on students' performance
-        total_tests_assigned = len(await db.get_all_tests())
-        total_materials_created = len(await db.get_all_materials())
-        
-        # Get average student performance
-        avg_student_score = sum(s.get('avg_score', 0) for s in students if s.get('role') != 'teacher') / max(student_count, 1)
+        # Class-wide figures (no teacher-student relationship table yet)
+        stats = await db.stats.get()
         
         teacher_profile = {
             "id": teacher.get('id'),
@@ -1307,10 +1292,10 @@ async def get_teacher_profile(teacher_id: int):
             "experience": f"{teacher.get('level', 1)} жыл",
             "education": "Физика мамандығы",
             "bio": "Физика пәнінің мұғалімі",
-            "studentsCount": student_count,
-            "testsAssigned": total_tests_assigned,
-            "materialsCreated": total_materials_created,
-            "avgStudentScore": round(avg_student_score, 1),
+            "studentsCount": stats['total_students'],
+            "testsAssigned": stats['total_tests'],
+            "materialsCreated": stats['total_materials'],
+            "avgStudentScore": stats['avg_student_score'],
             "totalXP": teacher.get('points', 0),
             "level": teacher.get('level', 1),
             "streak": teacher.get('streak', 0),
@@ -1319,80 +1304,90 @@ async def get_teacher_profile(teacher_id: int):
         }
         
         return {"teacher": teacher_profile}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+CLASS_PAGE_LIMIT = 200
+
+def student_name(row: Dict) -> str:
+    return f"{row.get('first_name') or ''} {row.get('last_name') or ''}".strip()
+
 @app.get("/api/teacher/{teacher_id}/class-analytics")
-async def get_teacher_class_analytics(teacher_id: int):
-    """Get comprehensive class analytics for teacher"""
-    try:
-        async with aiosqlite.connect("ent_bot.db") as db:
-            # Get all students (for teacher analytics, we'll show all students)
-            students_cursor = await db.execute("""
-                SELECT id, username, first_name, last_name, points, streak, 
-                       tests_completed, avg_score, last_activity
-                FROM users 
-                WHERE id != ? AND id < 2000
-                ORDER BY points DESC
-            """, (teacher_id,))
-            students = await students_cursor.fetchall()
-            
-            if not students:
-                return {
-                    "analytics": {
-                        "totalStudents": 0,
-                        "activeStudents": 0,
-                        "avgClassScore": 0,
-                        "totalTestsCompleted": 0,
-                        "recentActivity": [],
-                        "topStudents": []
-                    }
-                }
-            
-            # Calculate analytics
-            total_students = len(students)
-            active_students = len([s for s in students if s[8] and s[8] != ''])  # has last_activity
-            avg_score = sum(s[7] or 0 for s in students) / total_students if total_students > 0 else 0
-            total_tests = sum(s[6] or 0 for s in students)
-            
-            # Format top students
-            top_students = [
-                {
-                    "id": s[0],
-                    "name": f"{s[2]} {s[3]}",
-                    "points": s[4] or 0,
-                    "streak": s[5] or 0,
-                    "tests_completed": s[6] or 0,
-                    "avg_score": s[7] or 0
-                }
-                for s in students[:5]
-            ]
-            
-            # Format recent activity (mock for now)
-            recent_activity = [
-                {
-                    "student": f"{s[2]} {s[3]}",
-                    "action": "Тест аяқталды",
-                    "score": s[7] or 0,
-                    "time": "Жақында"
-                }
-                for s in students[:3]
-            ]
-            
-            return {
-                "analytics": {
-                    "totalStudents": total_students,
-                    "activeStudents": active_students,
-                    "avgClassScore": round(avg_score, 1),
-                    "totalTestsCompleted": total_tests,
-                    "recentActivity": recent_activity,
-                    "topStudents": top_students
-                }
+async def get_teacher_class_analytics(teacher_id: int, cursor: Optional[str] = None, limit: int = 50):
+    """Get comprehensive class analytics for teacher.
+    Totals, top-5 and recent activity are class-wide; `students` is one page of the roster by
+    points, and `next_cursor` (when set) fetches the next page. There is no teacher-student
+    relationship table yet, so the class is every student"""
+    limit = max(1, min(limit, CLASS_PAGE_LIMIT))
+    after = None
+    if cursor:
+        points, row_id = decode_page_cursor(cursor)
+        try:
+            after = (int(points), row_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    try:
+        summary = await db.get_class_summary()
+        top = await db.get_top_students(5)
+        recent = await db.get_recent_class_activity(10)
+        page = await db.get_students_page(after=after, limit=limit)
+        
+        top_students = [
+            {
+                "id": s["telegram_id"],
+                "name": student_name(s),
+                "rank": s["rank"],
+                "points": s["points"] or 0,
+                "streak": s["streak"] or 0,
+                "tests_completed": s["tests_completed"] or 0,
+                "avg_score": s["avg_score"] or 0
             }
-            
+            for s in top
+        ]
+        
+        recent_activity = [
+            {
+                "student": student_name(a),
+                "action": "Тест аяқталды",
+                "subject": a["subject"],
+                "score": round(a["score"] or 0, 1),
+                "time": a["completed_at"]
+            }
+            for a in recent
+        ]
+        
+        students = [
+            {
+                "id": s["telegram_id"],
+                "name": student_name(s),
+                "username": s["username"] or "",
+                "points": s["points"] or 0,
+                "level": s["level"] or 1,
+                "streak": s["streak"] or 0,
+                "tests_completed": s["tests_completed"] or 0,
+                "avg_score": s["avg_score"] or 0,
+                "last_activity": s["last_activity"]
+            }
+            for s in page
+        ]
+        next_cursor = encode_page_cursor(page[-1]["points"] or 0, page[-1]["id"]) if len(page) == limit else None
         
-        return {"analytics": analytics}
+        return {
+            "analytics": {
+                "totalStudents": summary["total_students"],
+                "activeStudents": summary["active_students"],
+                "avgClassScore": round(summary["avg_score"], 1),
+                "totalTestsCompleted": summary["tests_completed"],
+                "recentActivity": recent_activity,
+                "topStudents": top_students,
+                "students": students,
+                "next_cursor": next_cursor
+            }
+        }
     except Exception as e:
+        print(f"❌ Error getting class analytics: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 # Physics-specific endpoints
@@ -1417,15 +1412,8 @@ async def get_user_physics_progress(user_id: int):
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
-        # Mock progress data - in real implementation, you'd calculate from user_progress table
-        progress = {
-            "mechanics": {"completed": 18, "total": 25, "score": 82},
-            "thermodynamics": {"completed": 12, "total": 18, "score": 75},
-            "electricity": {"completed": 15, "total": 22, "score": 78},
-            "magnetism": {"completed": 9, "total": 16, "score": 71},
-            "optics": {"completed": 8, "total": 14, "score": 79},
-            "atomic": {"completed": 5, "total": 12, "score": 68}
-        }
+        counters = (await db.get_topic_progress(user_id)).get(user_id, {})
+        progress = topic_progress_view(counters, await db.get_topic_totals())
         
         return {
             "user_id": user_id,
@@ -1440,15 +1428,17 @@ async def get_user_physics_progress(user_id: int):
 async def logout_user(user_id: int):
     """Completely remove user data from system on logout"""
     try:
-        async with aiosqlite.connect("ent_bot.db") as db:
+        async with db.pool.writer() as conn:
             # Delete user progress first (foreign key constraint)
-            await db.execute("DELETE FROM user_progress WHERE user_id = ?", (user_id,))
+            await conn.execute("DELETE FROM user_progress WHERE user_id = ?", (user_id,))
             
             # Delete user from users table
-            cursor = await db.execute("DELETE FROM users WHERE id = ?", (user_id,))
-            await db.commit()
+            cursor = await conn.execute("DELETE FROM users WHERE id = ? RETURNING telegram_id", (user_id,))
+            deleted = await cursor.fetchall()
+            await conn.commit()
             
-            if cursor.rowcount > 0:
+            if deleted:
+                db.leaderboard.remove(deleted[0]['telegram_id'])
                 return {"success": True, "message": "Пользователь успешно удален из системы"}
             else:
                 return {"success": False, "message": "Пользователь не найден"}
@@ -1457,6 +1447,17 @@ async def logout_user(user_id: int):
         print(f"Error during logout: {e}")
         return {"success": False, "message": "Ошибка при выходе из системы"}
 
+class MaterialView(BaseModel):
+    user_id: int
+    seconds: int = 0
+
+@app.post("/api/materials/{material_id}/view")
+async def record_material_view(material_id: int, view: MaterialView):
+    """Count a material as opened by a user (feeds the per-topic progress)"""
+    if not await db.record_material_view(view.user_id, material_id, view.seconds):
+        raise HTTPException(status_code=404, detail="Material not found")
+    return {"success": True}
+
 # Material Management Endpoints for Teachers
 
 @app.get("/api/materials/teacher/{teacher_id}")
@@ -1511,7 +1512,7 @@ async def create_material(material_data: Dict[str, Any]):
         print(f"📎 Attachments: {len(attachments)} files")
         
         # Insert material into database
-        async with aiosqlite.connect(db.db_path) as conn:
+        async with db.pool.writer() as conn:
             cursor = await conn.execute('''
                 INSERT INTO materials (title, description, content, type, category, difficulty, duration, 
                                      is_published, tags, video_url, pdf_url, thumbnail_url, teacher_id, attachments,
@@ -1525,6 +1526,7 @@ async def create_material(material_data: Dict[str, Any]):
             
             material_id = cursor.lastrowid
             await conn.commit()
+            db.material_cache.invalidate()
             
             print(f"✅ Material created with ID: {material_id}")
             
@@ -1652,9 +1654,6 @@ async def create_material_with_id(material_data: Dict[str, Any]):
         force_id = material_data.get('force_id', 1)
         print(f"🎯 Creating material with forced ID: {force_id}")
         
-        # Delete existing material with this ID if exists
-        await db.execute('DELETE FROM materials WHERE id = ?', (force_id,))
-        
         # Process material data
         tags = material_data.get('tags', [])
         if isinstance(tags, list):
@@ -1665,31 +1664,37 @@ async def create_material_with_id(material_data: Dict[str, Any]):
         attachments = material_data.get('attachments', [])
         attachments_json = json.dumps(attachments) if attachments else json.dumps([])
         
-        # Insert with specific ID
-        await db.execute('''
-            INSERT INTO materials (id, title, description, content, type, category, difficulty, duration, 
-                                 is_published, tags, video_url, pdf_url, thumbnail_url, teacher_id, attachments)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            force_id,
-            material_data.get('title', 'Untitled'),
-            material_data.get('description', ''),
-            material_data.get('content', ''),
-            material_data.get('type', 'text'),
-            material_data.get('category', 'mechanics'),
-            material_data.get('difficulty', 'easy'),
-            material_data.get('duration', 10),
-            material_data.get('isPublished', 1),
-            tags_json,
-            material_data.get('video_url', ''),
-            material_data.get('pdf_url', ''),
-            material_data.get('thumbnail_url', ''),
-            1,  # teacher_id
-            attachments_json
-        ))
-        
-        # Update sequence to continue from this ID
-        await db.execute(f'UPDATE sqlite_sequence SET seq = {force_id} WHERE name = "materials"')
+        async with db.pool.writer() as conn:
+            # Delete existing material with this ID if exists
+            await conn.execute('DELETE FROM materials WHERE id = ?', (force_id,))
+            
+            # Insert with specific ID
+            await conn.execute('''
+                INSERT INTO materials (id, title, description, content, type, category, difficulty, duration, 
+                                     is_published, tags, video_url, pdf_url, thumbnail_url, teacher_id, attachments)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                force_id,
+                material_data.get('title', 'Untitled'),
+                material_data.get('description', ''),
+                material_data.get('content', ''),
+                material_data.get('type', 'text'),
+                material_data.get('category', 'mechanics'),
+                material_data.get('difficulty', 'easy'),
+                material_data.get('duration', 10),
+                material_data.get('isPublished', 1),
+                tags_json,
+                material_data.get('video_url', ''),
+                material_data.get('pdf_url', ''),
+                material_data.get('thumbnail_url', ''),
+                1,  # teacher_id
+                attachments_json
+            ))
+            
+            # Update sequence to continue from this ID
+            await conn.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = 'materials'", (force_id,))
+            await conn.commit()
+        db.material_cache.invalidate()
         
         print(f"✅ Material created with ID {force_id} and sequence updated")
         return {"message": "Material created with forced ID", "material_id": force_id}
@@ -1757,7 +1762,7 @@ async def get_material(material_id: int, user_id: int = None):
         raise HTTPException(status_code=500, detail=f"Error loading material: {str(e)}")
 
 @app.get("/api/materials/{material_id}/content")
-async def get_material_content(material_id: int):
+async def get_material_content(material_id: int, request: Request, response: Response):
     """Get full content of a specific material"""
     try:
         print(f"📄 Loading content for material: {material_id}")
@@ -1774,7 +1779,7 @@ async def get_material_content(material_id: int):
         if material.get('attachments'):
             print(f"📋 Attachments count: {len(material.get('attachments', []))}")
         
-        return material
+        return conditional_json(request, response, material)
     except HTTPException:
         raise
     except Exception as e:
@@ -1783,162 +1788,21 @@ async def get_material_content(material_id: int):
 
 # AI Physics Question Generation Endpoints
 @app.post("/api/ai/generate-question")
-async def generate_physics_question():
-    """Generate AI-powered physics question with visual elements"""
+async def generate_physics_question(user_id: Optional[int] = None):
+    """Generate AI-powered physics question with visual elements; with user_id, one at the
+    difficulty nearest the user's physics ability"""
     try:
         import random
-        import json
-        
-        # Expanded physics questions with diverse topics
-        sample_questions = [
-            {
-                "id": random.randint(1000, 9999),
-                "text": "Дене 2 м биіктіктен 2 м/с жылдамдықпен көлденең лақтырылды. Дене 60 м үйдің жанынан толық өтіп кету үшін кететін уақыт:",
-                "type": "multiple_choice",
-                "topic": "Механика",
-                "difficulty": "hard",
-                "options": ["10 с", "12 с", "30 с", "29 с", "31 с"],
-                "correct_answer": "30 с",
-                "explanation": "Көлденең лақтыру есебі. Тік бағытта: h = v₀t + gt²/2, 2 = 0 + 10t²/2, t = 0.63 с. Көлденең: x = v₀t = 2×30 = 60 м",
-                "formula": "x = v₀t, h = gt²/2",
-                "image": None
-            },
-            {
-                "id": random.randint(1000, 9999),
-                "text": "Автомобиль массой 1200 кг движется со скоростью 20 м/с. Какова его кинетическая энергия?",
-                "type": "calculation",
-                "topic": "Механика",
-                "difficulty": "medium",
-                "options": ["240 кДж", "480 кДж", "120 кДж", "360 кДж"],
-                "correct_answer": "240 кДж",
-                "explanation": "Кинетическая энергия вычисляется по формуле E = mv²/2 = 1200×20²/2 = 240000 Дж = 240 кДж",
-                "formula": "E = mv²/2",
-                "image": None
-            },
-            {
-                "id": random.randint(1000, 9999),
-                "text": "Снаряд выпущен под углом 45° к горизонту со скоростью 100 м/с. Максимальная высота полета:",
-                "type": "calculation",
-                "topic": "Механика",
-                "difficulty": "hard",
-                "options": ["125 м", "250 м", "500 м", "1000 м"],
-                "correct_answer": "125 м",
-                "explanation": "H = (v₀sin α)²/(2g) = (100×sin45°)²/(2×10) = (70.7)²/20 ≈ 125 м",
-                "formula": "H = (v₀sin α)²/(2g)",
-                "image": None
-            },
-            {
-                "id": random.randint(1000, 9999),
-                "text": "Какой закон описывает зависимость силы тока от напряжения в проводнике?",
-                "type": "multiple_choice",
-                "topic": "Электричество",
-                "difficulty": "easy",
-                "options": ["Закон Ома", "Закон Кулона", "Закон Ампера", "Закон Фарадея"],
-                "correct_answer": "Закон Ома",
-                "explanation": "Закон Ома устанавливает, что сила тока прямо пропорциональна напряжению: I = U/R",
-                "formula": "I = U/R",
-                "image": None
-            },
-            {
-                "id": random.randint(1000, 9999),
-                "text": "Конденсатор емкостью 10 мкФ заряжен до напряжения 100 В. Энергия конденсатора:",
-                "type": "calculation",
-                "topic": "Электричество",
-                "difficulty": "medium",
-                "options": ["0.05 Дж", "0.1 Дж", "0.5 Дж", "1 Дж"],
-                "correct_answer": "0.05 Дж",
-                "explanation": "W = CU²/2 = 10×10⁻⁶×100²/2 = 0.05 Дж",
-                "formula": "W = CU²/2",
-                "image": None
-            },
-            {
-                "id": random.randint(1000, 9999),
-                "text": "Тело свободно падает с высоты 45 м. Сколько времени займет падение? (g = 10 м/с²)",
-                "type": "calculation",
-                "topic": "Механика",
-                "difficulty": "medium",
-                "options": ["3 с", "4.5 с", "6 с", "9 с"],
-                "correct_answer": "3 с",
-                "explanation": "Время свободного падения: t = √(2h/g) = √(2×45/10) = √9 = 3 с",
-                "formula": "h = gt²/2, откуда t = √(2h/g)",
-                "image": None
-            },
-            {
-                "id": random.randint(1000, 9999),
-                "text": "Идеальный газ изотермически расширяется от 2 л до 8 л при давлении 4 атм. Работа газа:",
-                "type": "calculation",
-                "topic": "Термодинамика",
-                "difficulty": "hard",
-                "options": ["1120 Дж", "2240 Дж", "560 Дж", "4480 Дж"],
-                "correct_answer": "1120 Дж",
-                "explanation": "A = nRT×ln(V₂/V₁) = pV×ln(V₂/V₁) = 4×101325×0.002×ln(4) ≈ 1120 Дж",
-                "formula": "A = pV×ln(V₂/V₁)",
-                "image": None
-            },
-            {
-                "id": random.randint(1000, 9999),
-                "text": "При какой температуре вода кипит при нормальном атмосферном давлении?",
-                "type": "multiple_choice",
-                "topic": "Термодинамика",
-                "difficulty": "easy",
-                "options": ["90°C", "100°C", "110°C", "120°C"],
-                "correct_answer": "100°C",
-                "explanation": "При нормальном атмосферном давлении (101.3 кПа) вода кипит при температуре 100°C",
-                "formula": None,
-                "image": None
-            },
-            {
-                "id": random.randint(1000, 9999),
-                "text": "Линза с фокусным расстоянием 20 см дает изображение предмета на расстоянии 60 см. Расстояние до предмета:",
-                "type": "calculation",
-                "topic": "Оптика",
-                "difficulty": "medium",
-                "options": ["30 см", "15 см", "12 см", "40 см"],
-                "correct_answer": "30 см",
-                "explanation": "1/F = 1/d + 1/f, 1/20 = 1/d + 1/60, 1/d = 1/20 - 1/60 = 1/30, d = 30 см",
-                "formula": "1/F = 1/d + 1/f",
-                "image": None
-            },
-            {
-                "id": random.randint(1000, 9999),
-                "text": "Частота колебаний маятника длиной 1 м равна примерно:",
-                "type": "calculation",
-                "topic": "Механика",
-                "difficulty": "hard",
-                "options": ["0.5 Гц", "1 Гц", "1.6 Гц", "2 Гц"],
-                "correct_answer": "0.5 Гц",
-                "explanation": "Период математического маятника T = 2π√(L/g) = 2π√(1/10) ≈ 2 с, частота f = 1/T ≈ 0.5 Гц",
-                "formula": "T = 2π√(L/g), f = 1/T",
-                "image": None
-            },
-            {
-                "id": random.randint(1000, 9999),
-                "text": "Электрон движется в магнитном поле с индукцией 0.1 Тл со скоростью 10⁶ м/с. Радиус траектории:",
-                "type": "calculation",
-                "topic": "Электричество",
-                "difficulty": "hard",
-                "options": ["5.7×10⁻⁵ м", "1.1×10⁻⁴ м", "2.8×10⁻⁵ м", "9.1×10⁻⁶ м"],
-                "correct_answer": "5.7×10⁻⁵ м",
-                "explanation": "r = mv/(eB) = 9.1×10⁻³¹×10⁶/(1.6×10⁻¹⁹×0.1) ≈ 5.7×10⁻⁵ м",
-                "formula": "r = mv/(eB)",
-                "image": None
-            },
-            {
-                "id": random.randint(1000, 9999),
-                "text": "Фотон с энергией 3.1 эВ падает на металл с работой выхода 2.1 эВ. Максимальная кинетическая энергия фотоэлектронов:",
-                "type": "calculation",
-                "topic": "Квантовая физика",
-                "difficulty": "medium",
-                "options": ["1 эВ", "2.1 эВ", "3.1 эВ", "5.2 эВ"],
-                "correct_answer": "1 эВ",
-                "explanation": "Уравнение Эйнштейна: Ek = hν - A = 3.1 - 2.1 = 1 эВ",
-                "formula": "Ek = hν - A",
-                "image": None
-            }
-        ]
         
-        # Select random question
-        question = random.choice(sample_questions)
+        # Select random question, at the difficulty nearest the user's ability when we know it
+        difficulty = None
+        if user_id is not None:
+            ability, _ = await db.get_user_ability(user_id, "physics")
+            gap = lambda label: abs(prior_difficulty(label) - ability)
+            labels = question_pool.difficulties()
+            nearest = min(map(gap, labels))
+            difficulty = random.choice([label for label in labels if gap(label) == nearest])
+        question = question_pool.pick(random, difficulty)
         
         print(f"🤖 Generated AI question: {question['text'][:50]}...")
         
@@ -1948,6 +1812,20 @@ async def generate_physics_question():
         print(f"❌ Error generating question: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error generating question: {str(e)}")
 
+def answer_verdict(is_correct: bool, unit_mismatch: bool) -> Dict[str, Any]:
+    if is_correct:
+        feedback = "Отлично! Правильный ответ."
+    elif unit_mismatch:
+        feedback = "Неправильно. Проверьте единицы измерения."
+    else:
+        feedback = "Неправильно. Попробуйте еще раз."
+    return {
+        "is_correct": is_correct,
+        "unit_mismatch": unit_mismatch,
+        "confidence": 0.95 if is_correct else 0.85,
+        "feedback": feedback
+    }
+
 @app.post("/api/ai/check-answer")
 async def check_physics_answer(request: Request):
     """Check physics answer with AI assistance"""
@@ -1960,38 +1838,13 @@ async def check_physics_answer(request: Request):
         print(f"🔍 Checking answer for question {question_id}")
         print(f"User answer: '{user_answer}', Correct: '{correct_answer}'")
         
-        # Simple answer checking (can be enhanced with AI)
-        is_correct = False
-        
-        # Normalize answers for comparison
-        user_normalized = user_answer.lower().replace(" ", "")
-        correct_normalized = correct_answer.lower().replace(" ", "")
-        
-        # Check exact match
-        if user_normalized == correct_normalized:
-            is_correct = True
-        
-        # Check if numeric answers are close
-        try:
-            import re
-            user_nums = re.findall(r'\d+\.?\d*', user_answer)
-            correct_nums = re.findall(r'\d+\.?\d*', correct_answer)
-            
-            if user_nums and correct_nums:
-                user_val = float(user_nums[0])
-                correct_val = float(correct_nums[0])
-                # Allow 5% tolerance for numeric answers
-                if abs(user_val - correct_val) / correct_val < 0.05:
-                    is_correct = True
-        except:
-            pass
+        # Exact match, or the same number (in SI units when both give a unit) within the tolerance
+        is_correct, unit_mismatch = check_answer(user_answer, correct_answer)
         
         result = {
-            "is_correct": is_correct,
             "user_answer": user_answer,
             "correct_answer": correct_answer,
-            "confidence": 0.95 if is_correct else 0.85,
-            "feedback": "Отлично! Правильный ответ." if is_correct else "Неправильно. Попробуйте еще раз."
+            **answer_verdict(is_correct, unit_mismatch)
         }
         
         print(f"✅ Answer check result: {is_correct}")
@@ -2002,39 +1855,71 @@ async def check_physics_answer(request: Request):
         print(f"❌ Error checking answer: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error checking answer: {str(e)}")
 
+class AnswerCheckItem(BaseModel):
+    question_id: Optional[Any] = None
+    # A question of the tests table: its correct option is used instead of correct_answer
+    test_id: Optional[int] = None
+    user_answer: str = ""
+    correct_answer: str = ""
+    tolerance: Optional[float] = None
+
+class AnswerCheckBatch(BaseModel):
+    answers: List[AnswerCheckItem]
+
+@app.post("/api/ai/check-answers")
+async def check_physics_answers(batch: AnswerCheckBatch):
+    """Check a whole test's answers in one request, one verdict per answer in order"""
+    if len(batch.answers) > ANSWER_CHECK_SETTINGS['max_batch']:
+        raise HTTPException(status_code=413, detail=f"At most {ANSWER_CHECK_SETTINGS['max_batch']} answers per request")
+    answers = batch.answers
+    test_ids = [item.test_id for item in answers if item.test_id is not None]
+    keys = await db.question_bank.answer_keys(test_ids) if test_ids else {}
+    unknown = sorted(set(test_ids) - keys.keys())
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Unknown test_id: {unknown}")
+    user_answers, correct_answers, correct_quantities = [], [], []
+    for item in answers:
+        user_answer = item.user_answer.strip()
+        if item.test_id is None:
+            correct_answer = item.correct_answer.strip()
+            quantity = parse_quantity(correct_answer)
+        else:
+            letter, correct_answer, quantity = keys[item.test_id]
+            # The option's letter counts as the option
+            if user_answer.upper() == letter:
+                user_answer = correct_answer
+        user_answers.append(user_answer)
+        correct_answers.append(correct_answer)
+        correct_quantities.append(quantity)
+    is_correct, unit_mismatch = check_answers(
+        user_answers, correct_answers,
+        [float('nan') if item.tolerance is None else item.tolerance for item in answers],
+        correct_quantities=correct_quantities
+    )
+    results = [
+        {"question_id": item.question_id, **answer_verdict(correct, mismatch)}
+        for item, correct, mismatch in zip(answers, is_correct.tolist(), unit_mismatch.tolist())
+    ]
+    return {"results": results, "correct": int(is_correct.sum()), "total": len(results)}
+
 # AI Physics Solution Checker
 @app.post("/api/ai/check-solution-photo")
 async def check_solution_photo(request: Request):
     """Check physics solution from uploaded photo"""
     try:
-        form = await request.form()
-        photo_file = form.get("photo")
+        # Streamed to disk, then decoded and re-encoded in the upload process pool
+        upload, photo = await receive_photo(request)
+        width, height = photo["width"], photo["height"]
         
-        if not photo_file:
-            raise HTTPException(status_code=400, detail="No photo uploaded")
-        
-        # Read photo data
-        photo_data = await photo_file.read()
-        
-        print(f"🔍 Analyzing solution photo: {photo_file.filename}")
-        print(f"📊 Photo size: {len(photo_data)} bytes")
+        print(f"🔍 Analyzing solution photo: {upload.filename}")
+        print(f"📊 Photo size: {upload.size} bytes, solution image: {width}x{height}")
         
         # Simulate AI solution analysis
         import random
-        import base64
-        import io
-        from PIL import Image
-        
-        # Convert photo to base64 for storage
-        photo_base64 = base64.b64encode(photo_data).decode('utf-8')
         
-        # Analyze image characteristics
-        try:
-            image = Image.open(io.BytesIO(photo_data))
-            width, height = image.size
-            print(f"📊 Solution image: {width}x{height}")
-        except:
-            width, height = 800, 600
+        # Store the re-encoded photo and its thumbnail once, by content hash
+        photo_hash = await asyncio.to_thread(blob_store.put_bytes, photo["image"])
+        thumb_hash = await asyncio.to_thread(blob_store.put_bytes, photo["thumbnail"])
         
         # Physics solution validation patterns
         solution_checks = [
@@ -2094,7 +1979,10 @@ async def check_solution_photo(request: Request):
         
         solution_analysis = {
             "id": random.randint(50000, 99999),
-            "original_photo": f"data:image/jpeg;base64,{photo_base64}",
+            "photo_hash": photo_hash,
+            "original_photo": blob_url(photo_hash),
+            "thumb_hash": thumb_hash,
+            "thumbnail": blob_url(thumb_hash),
             "is_correct": check_result["is_correct"],
             "confidence": check_result["confidence"],
             "overall_grade": check_result["overall_grade"],
@@ -2115,6 +2003,8 @@ async def check_solution_photo(request: Request):
             "analysis": solution_analysis
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Error analyzing solution: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error analyzing solution: {str(e)}")
@@ -2124,58 +2014,36 @@ async def check_solution_photo(request: Request):
 async def upload_question_photo(request: Request):
     """Upload photo of physics question and convert to virtual question"""
     try:
-        form = await request.form()
-        photo_file = form.get("photo")
+        # Streamed to disk, then decoded and re-encoded in the upload process pool
+        upload, photo = await receive_photo(request)
+        width, height = photo["width"], photo["height"]
         
-        if not photo_file:
-            raise HTTPException(status_code=400, detail="No photo uploaded")
+        print(f"📸 Processing uploaded photo: {upload.filename}")
         
-        # Read photo data
-        photo_data = await photo_file.read()
-        
-        print(f"📸 Processing uploaded photo: {photo_file.filename}")
-        print(f"📊 Photo size: {len(photo_data)} bytes")
-        
-        # Extract text from photo using OCR
         import random
-        import base64
-        import io
-        from PIL import Image
         
         # Simple image analysis without OCR dependencies
         # Analyze image characteristics to guess content type
-        try:
-            # Convert photo to PIL Image for basic analysis
-            image = Image.open(io.BytesIO(photo_data))
-            width, height = image.size
-            
-            # Get image metadata
-            photo_size = len(photo_data)
-            filename = photo_file.filename.lower() if photo_file.filename else ""
-            
-            print(f"📊 Image analysis: {width}x{height}, {photo_size} bytes, filename: {filename}")
-            
-            # Heuristic analysis based on image characteristics
-            aspect_ratio = width / height if height > 0 else 1
+        photo_size = upload.size
+        filename = upload.filename.lower() if upload.filename else ""
+        
+        print(f"📊 Image analysis: {width}x{height}, {photo_size} bytes, filename: {filename}")
+        
+        # Detect question type based on image properties
+        # For now, assume most uploaded images are the math problem type
+        # since that's what the user is testing with
+        if photo_size > 10000:  # Most real images are larger than 10KB
+            question_type = "reading_speed"  # Default to the math problem with students
+        elif "test" in filename or "exam" in filename:
+            question_type = "exam_question"
+        else:
+            question_type = "reading_speed"  # Default to math problem
             
-            # Detect question type based on image properties
-            # For now, assume most uploaded images are the math problem type
-            # since that's what the user is testing with
-            if photo_size > 10000:  # Most real images are larger than 10KB
-                question_type = "reading_speed"  # Default to the math problem with students
-            elif "test" in filename or "exam" in filename:
-                question_type = "exam_question"
-            else:
-                question_type = "reading_speed"  # Default to math problem
-                
-            print(f"🎯 Detected question type: {question_type}")
-                
-        except Exception as analysis_error:
-            print(f"⚠️ Image analysis failed: {analysis_error}, using default")
-            question_type = "reading_speed"  # Default to the math problem type
+        print(f"🎯 Detected question type: {question_type}")
         
-        # Convert photo to base64 for storage
-        photo_base64 = base64.b64encode(photo_data).decode('utf-8')
+        # Store the re-encoded photo and its thumbnail once, by content hash
+        photo_hash = await asyncio.to_thread(blob_store.put_bytes, photo["image"])
+        thumb_hash = await asyncio.to_thread(blob_store.put_bytes, photo["thumbnail"])
         
         # Match questions to photo content type
         photo_questions = {
@@ -2243,7 +2111,10 @@ async def upload_question_photo(request: Request):
             "correct_answer": selected_question["correct_answer"],
             "explanation": selected_question["explanation"],
             "formula": selected_question["formula"],
-            "original_photo": f"data:image/jpeg;base64,{photo_base64}",
+            "photo_hash": photo_hash,
+            "original_photo": blob_url(photo_hash),
+            "thumb_hash": thumb_hash,
+            "thumbnail": blob_url(thumb_hash),
             "created_from_photo": True
         }
         
@@ -2256,47 +2127,65 @@ async def upload_question_photo(request: Request):
             "virtual_question": virtual_question
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Error processing photo: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing photo: {str(e)}")
 
+AI_PAGE_LIMIT = 100
+
+def photo_urls(row: Dict) -> Dict:
+    """Add the blob URLs for a row's photo_hash/thumb_hash"""
+    row["original_photo"] = blob_url(row.get("photo_hash"))
+    row["thumbnail"] = blob_url(row.get("thumb_hash"))
+    return row
+
 @app.get("/api/ai/virtual-questions")
-async def get_virtual_questions():
-    """Get all virtual questions created from photos"""
+async def get_virtual_questions(response: Response, topic: Optional[str] = None, difficulty: Optional[str] = None,
+                                cursor: Optional[str] = None, limit: int = 20):
+    """Virtual questions created from photos, newest first (summary: no options/answer/explanation;
+    fetch those from /api/ai/virtual-questions/{question_id}). The cursor for the next page is
+    returned as next_cursor and in the X-Next-Cursor header"""
+    limit = max(1, min(limit, AI_PAGE_LIMIT))
+    after = decode_page_cursor(cursor) if cursor else None
     try:
-        questions = await get_all_virtual_questions()
-        return {"questions": questions, "total": len(questions)}
+        rows = await db.get_virtual_questions_page(topic=topic, difficulty=difficulty, after=after, limit=limit)
     except Exception as e:
         print(f"❌ Error getting virtual questions: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+    questions = []
+    for row in rows:
+        row_id = row.pop("id")
+        row["id"] = row.pop("question_id")
+        row["created_from_photo"] = True
+        questions.append(photo_urls(row))
+    next_cursor = encode_page_cursor(rows[-1]["created_at"], row_id) if len(rows) == limit else None
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return {"questions": questions, "total": len(questions), "next_cursor": next_cursor}
+
+@app.get("/api/ai/virtual-questions/{question_id}")
+async def get_virtual_question(question_id: int):
+    """Full virtual question, with options, answer and explanation"""
+    question = await db.get_virtual_question(question_id)
+    if not question:
+        raise HTTPException(status_code=404, detail="Virtual question not found")
+    del question["id"]
+    question["id"] = question.pop("question_id")
+    question["created_from_photo"] = True
+    return photo_urls(question)
+
 async def save_virtual_question(question_data):
     """Save virtual question to database"""
     try:
-        async with aiosqlite.connect("ent_bot.db") as db:
-            # Create table if not exists
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS virtual_questions (
-                    id INTEGER PRIMARY KEY,
-                    question_id INTEGER UNIQUE,
-                    text TEXT,
-                    type TEXT,
-                    topic TEXT,
-                    difficulty TEXT,
-                    options TEXT,
-                    correct_answer TEXT,
-                    explanation TEXT,
-                    formula TEXT,
-                    original_photo TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
+        async with db.pool.writer() as conn:
             # Insert question
-            await db.execute("""
+            await conn.execute("""
                 INSERT OR REPLACE INTO virtual_questions 
-                (question_id, text, type, topic, difficulty, options, correct_answer, explanation, formula, original_photo)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                (question_id, text, type, topic, difficulty, options, correct_answer, explanation, formula, photo_hash, thumb_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """, (
                 question_data["id"],
                 question_data["text"],
@@ -2307,79 +2196,29 @@ async def save_virtual_question(question_data):
                 question_data["correct_answer"],
                 question_data["explanation"],
                 question_data.get("formula"),
-                question_data.get("original_photo")
+                question_data.get("photo_hash"),
+                question_data.get("thumb_hash")
             ))
             
-            await db.commit()
+            await conn.commit()
             print(f"✅ Saved virtual question {question_data['id']} to database")
             
     except Exception as e:
         print(f"❌ Error saving virtual question: {str(e)}")
         raise e
 
-async def get_all_virtual_questions():
-    """Get all virtual questions from database"""
-    try:
-        async with aiosqlite.connect("ent_bot.db") as db:
-            cursor = await db.execute("""
-                SELECT question_id, text, type, topic, difficulty, options, correct_answer, explanation, formula, original_photo, created_at
-                FROM virtual_questions ORDER BY created_at DESC
-            """)
-            rows = await cursor.fetchall()
-            
-            questions = []
-            for row in rows:
-                questions.append({
-                    "id": row[0],
-                    "text": row[1],
-                    "type": row[2],
-                    "topic": row[3],
-                    "difficulty": row[4],
-                    "options": json.loads(row[5]) if row[5] else [],
-                    "correct_answer": row[6],
-                    "explanation": row[7],
-                    "formula": row[8],
-                    "original_photo": row[9],
-                    "created_at": row[10],
-                    "created_from_photo": True
-                })
-            
-            return questions
-            
-    except Exception as e:
-        print(f"❌ Error getting virtual questions: {str(e)}")
-        return []
-
 async def save_solution_analysis(analysis_data):
     """Save solution analysis to database"""
     try:
-        async with aiosqlite.connect("ent_bot.db") as db:
-            # Create table if not exists
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS solution_analyses (
-                    id INTEGER PRIMARY KEY,
-                    analysis_id INTEGER UNIQUE,
-                    original_photo TEXT,
-                    is_correct BOOLEAN,
-                    confidence REAL,
-                    overall_grade TEXT,
-                    score INTEGER,
-                    feedback TEXT,
-                    detailed_analysis TEXT,
-                    suggestions TEXT,
-                    checked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    ai_model TEXT
-                )
-            """)
-            
+        async with db.pool.writer() as conn:
             # Insert analysis
-            await db.execute("""
+            await conn.execute("""
                 INSERT OR REPLACE INTO solution_analyses 
-                (analysis_id, original_photo, is_correct, confidence, overall_grade, score, feedback, detailed_analysis, suggestions, ai_model)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                (analysis_id, photo_hash, is_correct, confidence, overall_grade, score, feedback, detailed_analysis, suggestions, ai_model, thumb_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """, (
                 analysis_data["id"],
-                analysis_data["original_photo"],
+                analysis_data.get("photo_hash"),
                 analysis_data["is_correct"],
                 analysis_data["confidence"],
                 analysis_data["overall_grade"],
@@ -2387,10 +2226,11 @@ async def save_solution_analysis(analysis_data):
                 analysis_data["feedback"],
                 json.dumps(analysis_data["detailed_analysis"]),
                 json.dumps(analysis_data["suggestions"]),
-                analysis_data["ai_model"]
+                analysis_data["ai_model"],
+                analysis_data.get("thumb_hash")
             ))
             
-            await db.commit()
+            await conn.commit()
             print(f"✅ Saved solution analysis {analysis_data['id']} to database")
             
     except Exception as e:
@@ -2398,37 +2238,39 @@ async def save_solution_analysis(analysis_data):
         raise e
 
 @app.get("/api/ai/solution-analyses")
-async def get_solution_analyses():
-    """Get all solution analyses"""
-    try:
-        async with aiosqlite.connect("ent_bot.db") as db:
-            cursor = await db.execute("""
-                SELECT analysis_id, original_photo, is_correct, confidence, overall_grade, score, feedback, detailed_analysis, suggestions, checked_at, ai_model
-                FROM solution_analyses ORDER BY checked_at DESC
-            """)
-            rows = await cursor.fetchall()
-            
-            analyses = []
-            for row in rows:
-                analyses.append({
-                    "id": row[0],
-                    "original_photo": row[1],
-                    "is_correct": row[2],
-                    "confidence": row[3],
-                    "overall_grade": row[4],
-                    "score": row[5],
-                    "feedback": row[6],
-                    "detailed_analysis": json.loads(row[7]) if row[7] else {},
-                    "suggestions": json.loads(row[8]) if row[8] else [],
-                    "checked_at": row[9],
-                    "ai_model": row[10]
-                })
-            
-            return {"analyses": analyses, "total": len(analyses)}
-            
+async def get_solution_analyses(response: Response, min_score: Optional[int] = None, max_score: Optional[int] = None,
+                                is_correct: Optional[bool] = None, cursor: Optional[str] = None, limit: int = 20):
+    """Solution analyses, newest first (summary: no detailed analysis or suggestions; fetch those
+    from /api/ai/solution-analyses/{analysis_id}). The cursor for the next page is returned as
+    next_cursor and in the X-Next-Cursor header"""
+    limit = max(1, min(limit, AI_PAGE_LIMIT))
+    after = decode_page_cursor(cursor) if cursor else None
+    try:
+        rows = await db.get_solution_analyses_page(min_score=min_score, max_score=max_score, is_correct=is_correct,
+                                                   after=after, limit=limit)
     except Exception as e:
         print(f"❌ Error getting solution analyses: {str(e)}")
-        return {"analyses": [], "total": 0}
+        raise HTTPException(status_code=500, detail=str(e))
+
+    analyses = []
+    for row in rows:
+        row_id = row.pop("id")
+        row["id"] = row.pop("analysis_id")
+        analyses.append(photo_urls(row))
+    next_cursor = encode_page_cursor(rows[-1]["checked_at"], row_id) if len(rows) == limit else None
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return {"analyses": analyses, "total": len(analyses), "next_cursor": next_cursor}
+
+@app.get("/api/ai/solution-analyses/{analysis_id}")
+async def get_solution_analysis(analysis_id: int):
+    """Full solution analysis, with detailed analysis and suggestions"""
+    analysis = await db.get_solution_analysis(analysis_id)
+    if not analysis:
+        raise HTTPException(status_code=404, detail="Solution analysis not found")
+    del analysis["id"]
+    analysis["id"] = analysis.pop("analysis_id")
+    return photo_urls(analysis)
 
 if __name__ == "__main__":
     import uvicorn
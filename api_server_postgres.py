@@ -8,6 +8,7 @@ import asyncio
 import uvicorn
 import os
 from database_postgres import PostgresDatabase
+from upload_pipeline import receive_photo, shutdown_executor
 import json
 import traceback
 from datetime import datetime
@@ -44,6 +45,7 @@ async def lifespan(app: FastAPI):
     # Cleanup on shutdown
     try:
         print("🛑 Shutting down API server...")
+        shutdown_executor()
         if db:
             await db.close()
     except Exception as shutdown_error:
@@ -522,32 +524,17 @@ async def get_leaderboard(limit: int = 10):
 @app.get("/api/teachers/{teacher_id}/stats")
 async def get_teacher_stats(teacher_id: int):
     try:
-        # Return mock stats without database dependency
+        # One aggregate query, cached for a few seconds (see DashboardStats)
+        stats = await db.stats.get()
         return {
-            "totalStudents": 42,
-            "totalTests": 15,
-            "averageScore": 78.5,
-            "completedAssignments": 89,
-            "pendingAssignments": 12,
-            "recentActivity": [
-                {
-                    "type": "test_completed",
-                    "student": "Айгерим К.",
-                    "score": 85,
-                    "date": datetime.now().isoformat()
-                },
-                {
-                    "type": "assignment_submitted", 
-                    "student": "Данияр М.",
-                    "date": datetime.now().isoformat()
-                },
-                {
-                    "type": "test_completed",
-                    "student": "Амина С.",
-                    "score": 92,
-                    "date": datetime.now().isoformat()
-                }
-            ]
+            "totalStudents": stats['total_students'],
+            "totalTests": stats['total_tests'],
+            "averageScore": stats['avg_student_score'],
+            "completedAssignments": stats['total_tests_taken'],
+            "pendingAssignments": 0,
+            "recentActivity": [],
+            # Field names read by the teacher dashboard
+            **stats
         }
     except Exception as e:
         print(f"❌ Error getting teacher stats: {e}")
@@ -581,24 +568,17 @@ async def get_teacher_materials(teacher_id: int = 111333):
 @app.post("/api/ai/photo-to-question")
 async def photo_to_question(request: Request):
     try:
-        # Get the uploaded file
-        form = await request.form()
-        photo_file = form.get("photo")
+        # Streamed to disk, then oriented, downscaled and re-encoded to JPEG in the upload process pool
+        upload, photo = await receive_photo(request)
+        file_size = upload.size
         
-        if not photo_file:
-            raise HTTPException(status_code=400, detail="No photo file provided")
-        
-        # Read file content to verify it's an image
-        file_content = await photo_file.read()
-        file_size = len(file_content)
-        
-        print(f"📸 Processing uploaded photo: {photo_file.filename}, size: {file_size} bytes")
+        print(f"📸 Processing uploaded photo: {upload.filename}, size: {file_size} bytes, {photo['width']}x{photo['height']}")
         
         # Generate varied physics questions
         import random
         
         # AI-powered question generation based on image analysis
-        questions = await generate_physics_questions(file_content, photo_file.filename)
+        questions = await generate_physics_questions(photo["image"], upload.filename)
         
         selected_question = random.choice(questions)
         
@@ -613,9 +593,11 @@ async def photo_to_question(request: Request):
                 "topic": selected_question["topic"],
                 "difficulty": selected_question["difficulty"],
                 "explanation": selected_question["explanation"],
-                "processed_image": f"AI обработал: {photo_file.filename} ({file_size} байт)"
+                "processed_image": f"AI обработал: {upload.filename} ({file_size} байт)"
             }
         }
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Error processing photo: {e}")
         raise HTTPException(status_code=500, detail=str(e))
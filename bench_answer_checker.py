@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark: checking free-form physics answers
+Compares the old one-at-a-time check (normalise, regex the first number, 5%
+relative check) with answer_checker.check_answers over the same answers, cold
+and with the parse cache warm, and the single and batch endpoints through the
+ASGI stack (a 25-answer test per batch request)
+"""
+import asyncio
+import random
+import re
+import time
+
+import httpx
+
+import api_server
+from answer_checker import check_answers
+from quantities import parse_quantity
+
+ANSWERS = 10_000
+TEST_SIZE = 25
+UNITS = [("Дж", "кДж", 1e3), ("м", "см", 1e-2), ("Н", "кН", 1e3), ("м/с", "км/ч", 1 / 3.6), ("с", "мс", 1e-3)]
+
+
+def old_check(user_answer, correct_answer):
+    """check_physics_answer's comparison before answer_checker (a correct 0 raised and was skipped)"""
+    is_correct = user_answer.lower().replace(" ", "") == correct_answer.lower().replace(" ", "")
+    try:
+        user_nums = re.findall(r'\d+\.?\d*', user_answer)
+        correct_nums = re.findall(r'\d+\.?\d*', correct_answer)
+        if user_nums and correct_nums:
+            if abs(float(user_nums[0]) - float(correct_nums[0])) / float(correct_nums[0]) < 0.05:
+                is_correct = True
+    except Exception:
+        pass
+    return is_correct
+
+
+def make_answers(rnd):
+    """(user, correct) pairs: right or wrong, in the same unit, a scaled one, no unit or a wrong one"""
+    corrects = []
+    for _ in range(500):
+        base, _, _ = rnd.choice(UNITS)
+        corrects.append((f"{0 if rnd.random() < 0.1 else rnd.randint(1, 999)} {base}", base))
+    pairs = []
+    for _ in range(ANSWERS):
+        correct, base = rnd.choice(corrects)
+        value = float(correct.split()[0]) * rnd.choice([1, 1, 1.02, 1.3])
+        style = rnd.random()
+        if style < 0.05:
+            user = f"{value:g} {rnd.choice([u[0] for u in UNITS if u[0] != base])}"
+        elif style < 0.4:
+            user = correct
+        elif style < 0.7:
+            user = f"{value:g} {base}"
+        elif style < 0.85:
+            _, scaled, factor = next(u for u in UNITS if u[0] == base)
+            user = f"{value / factor:g} {scaled}"
+        else:
+            user = f"{value:g}"
+        pairs.append((user, correct))
+    return pairs
+
+
+async def endpoint_rate(pairs):
+    transport = httpx.ASGITransport(app=api_server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        start = time.perf_counter()
+        for i in range(0, len(pairs), TEST_SIZE):
+            payload = {"answers": [{"question_id": j, "user_answer": user, "correct_answer": correct}
+                                   for j, (user, correct) in enumerate(pairs[i:i + TEST_SIZE])]}
+            response = await client.post("/api/ai/check-answers", json=payload)
+            assert response.status_code == 200
+        batch_rate = len(pairs) / (time.perf_counter() - start)
+
+        single = pairs[:1000]
+        start = time.perf_counter()
+        for user, correct in single:
+            response = await client.post("/api/ai/check-answer",
+                                         json={"question_id": 1, "user_answer": user, "correct_answer": correct})
+            assert response.status_code == 200
+        return batch_rate, len(single) / (time.perf_counter() - start)
+
+
+def main():
+    pairs = make_answers(random.Random(5))
+    users = [user for user, _ in pairs]
+    corrects = [correct for _, correct in pairs]
+
+    start = time.perf_counter()
+    old = [old_check(user, correct) for user, correct in pairs]
+    old_rate = ANSWERS / (time.perf_counter() - start)
+
+    parse_quantity.cache_clear()
+    start = time.perf_counter()
+    is_correct, unit_mismatch = check_answers(users, corrects)
+    cold_rate = ANSWERS / (time.perf_counter() - start)
+    start = time.perf_counter()
+    check_answers(users, corrects)
+    warm_rate = ANSWERS / (time.perf_counter() - start)
+    api_rate, single_rate = asyncio.run(endpoint_rate(pairs))
+
+    disagree = sum(a != b for a, b in zip(old, is_correct.tolist()))
+    print(f"📊 {ANSWERS} answers, {int(is_correct.sum())} correct, {int(unit_mismatch.sum())} unit mismatches; "
+          f"old check disagrees on {disagree}")
+    print(f"  {'old one-at-a-time check':<36} {old_rate:>10,.0f} answers/s")
+    print(f"  {'check_answers, cold parse cache':<36} {cold_rate:>10,.0f} answers/s")
+    print(f"  {'check_answers, warm parse cache':<36} {warm_rate:>10,.0f} answers/s")
+    print(f"  {'POST /api/ai/check-answer, 1/req':<36} {single_rate:>10,.0f} answers/s")
+    print(f"  {'POST /api/ai/check-answers, ' + str(TEST_SIZE) + '/req':<36} {api_rate:>10,.0f} answers/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark: test answer callbacks under simulated concurrency
+Every user taps through a test at once; callbacks go through a fixed number of
+handler slots and each message edit waits a simulated Telegram round trip.
+Compares the old handler (user row + question row per answer, feedback edit,
+1.5 s sleep, question edit) with AnswerFlow (cached language and questions,
+one edit with feedback and the next question)
+"""
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+import bot_storage
+from answer_flow import AnswerFlow
+from database import Database
+from translations import get_text
+
+USERS = 64
+QUESTIONS = 5
+HANDLER_SLOTS = 32
+EDIT_LATENCY = 0.05
+FEEDBACK_PAUSE = 1.5
+
+
+class FakeMessage:
+    async def edit_text(self, text, reply_markup=None):
+        await asyncio.sleep(EDIT_LATENCY)
+
+
+async def old_answer(db, sessions, message, user_id, answer):
+    """The handler before AnswerFlow, minus aiogram"""
+    user = await db.get_user(user_id)
+    session = await sessions.get(user_id)
+    if not session or session.finished:
+        return
+    current_test = await db.get_test(session.current_test_id)
+    is_correct = answer == current_test['correct_answer']
+    session = await sessions.record_answer(user_id, session.position, answer, is_correct)
+    if not session:
+        return
+    if not session.finished:
+        feedback = get_text('correct_answer', user['language']) if is_correct else \
+            get_text('wrong_answer', user['language'], answer=current_test['correct_answer'])
+        await message.edit_text(feedback)
+        await asyncio.sleep(FEEDBACK_PAUSE)
+        test = await db.get_test(session.current_test_id)
+        await message.edit_text(AnswerFlow.question_text(session, test, user['language']))
+    else:
+        await db.record_test_attempt(user_id, session.answered(), subject=session.subject, source='bot')
+        await message.edit_text("result")
+        await sessions.finish(user_id)
+
+
+async def run(label, db, start_test, handle):
+    rnd = random.Random(3)
+    slots = asyncio.Semaphore(HANDLER_SLOTS)
+    latencies = []
+    for i in range(USERS):
+        await start_test(100000 + i, rnd.sample(range(1, 201), QUESTIONS))
+
+    async def user(user_id):
+        message = FakeMessage()
+        for _ in range(QUESTIONS):
+            start = time.perf_counter()
+            async with slots:
+                await handle(message, user_id, rnd.choice("ABCD"))
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(100000 + i) for i in range(USERS)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    callbacks = USERS * QUESTIONS
+    p95 = latencies[int(len(latencies) * 0.95)] * 1000
+    print(f"  {label:<34} {callbacks / elapsed:8.1f} callbacks/s   p95 {p95:7.0f} ms")
+
+
+async def main():
+    tmp_dir = tempfile.mkdtemp(prefix="bench_answer_flow_")
+    db = Database(os.path.join(tmp_dir, "bench.db"))
+    await db.init_db()
+    async with db.pool.writer() as conn:
+        await conn.executemany(
+            "INSERT INTO users (telegram_id, first_name) VALUES (?, ?)",
+            [(100000 + i, f"Student{i}") for i in range(USERS)]
+        )
+        await conn.executemany(
+            """INSERT INTO tests (subject, question, option_a, option_b, option_c, option_d, correct_answer)
+               VALUES ('physics', ?, '1', '2', '3', '4', ?)""",
+            [(f"Q{n}", "ABCD"[n % 4]) for n in range(200)]
+        )
+    await db.load_leaderboard()
+    sessions = bot_storage.TestSessionStore(db.pool)
+
+    print(f"📊 {USERS} users x {QUESTIONS} answers, {HANDLER_SLOTS} handler slots, "
+          f"{EDIT_LATENCY * 1000:.0f} ms per edit")
+
+    await run(
+        "old handler (sleep between edits)", db,
+        lambda user_id, ids: sessions.start(user_id, ids, subject='physics'),
+        lambda message, user_id, answer: old_answer(db, sessions, message, user_id, answer)
+    )
+
+    flow = AnswerFlow(db, sessions)
+
+    async def start_with_flow(user_id, ids):
+        tests = await db.get_tests_by_ids(ids)
+        await flow.start(user_id, [tests[i] for i in ids], 'physics', None)
+
+    await run("AnswerFlow (one edit)", db, start_with_flow, flow.answer)
+
+    await db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
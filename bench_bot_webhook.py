@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Benchmark: updates/sec through aiogram polling vs the webhook's UpdateProcessor
+Fake updates (fake_updates.py) from many chats go through the same dispatcher,
+whose handlers wait a simulated Bot API round trip (10-50 ms). Polling is
+aiogram's own loop over a fake session serving getUpdates batches; the webhook
+path is the FastAPI route called by Telegram-like concurrent connections (in
+this process, so the HTTP stack's CPU time is included), and the last row feeds
+the processor directly at the same delivery pace. Also counts updates handled
+out of order within a chat
+"""
+import asyncio
+import random
+import time
+from typing import List
+
+import httpx
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import GetMe, GetUpdates
+from aiogram.types import CallbackQuery, Message, Update, User
+from fastapi import FastAPI
+
+from bot_webhook import BotWebhook, update_chat_key
+from fake_updates import FAKE_BOT_TOKEN, fake_update_stream
+
+CHATS = 100
+TAPS_PER_CHAT = 9
+HANDLER_LATENCY = (0.01, 0.05)  # one Bot API call per update
+POLL_RTT = 0.05  # one getUpdates round trip
+POLL_LIMIT = 100
+WEBHOOK_RTT = 0.02  # Telegram -> webhook -> ack, per update and connection
+WEBHOOK_CONNECTIONS = 40
+
+
+class Recorder:
+    """Dispatcher whose handlers record the update order per chat"""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.seen = {}
+        self.count = 0
+        self.done = asyncio.Event()
+        self.rnd = random.Random(1)
+        router = Router()
+        router.message(F.text)(self.on_message)
+        router.callback_query(F.data.startswith("answer_"))(self.on_answer)
+        self.dp = Dispatcher()
+        self.dp.include_router(router)
+
+    async def record(self, chat_id: int, update_id: int):
+        await asyncio.sleep(self.rnd.uniform(*HANDLER_LATENCY))
+        self.seen.setdefault(chat_id, []).append(update_id)
+        self.count += 1
+        if self.count == self.total:
+            self.done.set()
+
+    async def on_message(self, message: Message, event_update: Update):
+        await self.record(message.chat.id, event_update.update_id)
+
+    async def on_answer(self, callback: CallbackQuery, event_update: Update):
+        await self.record(callback.from_user.id, event_update.update_id)
+
+    def out_of_order(self) -> int:
+        return sum(a > b for ids in self.seen.values() for a, b in zip(ids, ids[1:]))
+
+
+class FakeTelegramSession(BaseSession):
+    """Serves getUpdates from a fixed list of updates, like the Bot API would"""
+
+    def __init__(self, updates: List[dict]):
+        super().__init__()
+        self.updates = updates
+
+    async def make_request(self, bot, method, timeout=None):
+        if isinstance(method, GetMe):
+            return User(id=123456, is_bot=True, first_name="Bot")
+        if isinstance(method, GetUpdates):
+            await asyncio.sleep(POLL_RTT)
+            offset = method.offset or 0
+            batch = [u for u in self.updates[max(offset - 1, 0):max(offset - 1, 0) + POLL_LIMIT]]
+            if not batch:
+                await asyncio.sleep(method.timeout or 0)
+            return [Update.model_validate(u, context={"bot": bot}) for u in batch]
+        raise NotImplementedError(type(method).__name__)
+
+    async def stream_content(self, *args, **kwargs):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+async def bench_polling(updates: List[dict], handle_as_tasks: bool):
+    recorder = Recorder(len(updates))
+    bot = Bot(FAKE_BOT_TOKEN, session=FakeTelegramSession(updates))
+    start = time.perf_counter()
+    polling = asyncio.create_task(recorder.dp.start_polling(
+        bot, polling_timeout=1, handle_as_tasks=handle_as_tasks, handle_signals=False
+    ))
+    await recorder.done.wait()
+    elapsed = time.perf_counter() - start
+    await recorder.dp.stop_polling()
+    await polling
+    return elapsed, recorder, None
+
+
+async def bench_webhook(updates: List[dict], concurrency: int, http: bool = True):
+    recorder = Recorder(len(updates))
+    webhook = BotWebhook(Bot(FAKE_BOT_TOKEN), recorder.dp, settings={
+        'url': None, 'secret_token': None, 'concurrency': concurrency
+    })
+    app = FastAPI()
+    app.include_router(webhook.router)
+    path = webhook.settings['path']
+    queue = iter(updates)
+    retries = 0
+
+    async def deliver(client, update) -> bool:
+        if http:
+            response = await client.post(path, json=update)
+            return response.status_code == 200
+        update = Update.model_validate(update, context={"bot": webhook.bot})
+        return webhook.processor.submit(update, update_chat_key(update))
+
+    async def connection(client):
+        nonlocal retries
+        for update in queue:
+            while True:
+                await asyncio.sleep(WEBHOOK_RTT)
+                if await deliver(client, update):
+                    break
+                retries += 1
+                await asyncio.sleep(1)
+
+    await webhook.start()
+    start = time.perf_counter()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        await asyncio.gather(*(connection(client) for _ in range(WEBHOOK_CONNECTIONS)))
+        await recorder.done.wait()
+    elapsed = time.perf_counter() - start
+    metrics = webhook.processor.metrics()
+    await webhook.stop()
+    return elapsed, recorder, dict(metrics, retries=retries)
+
+
+async def main():
+    updates = fake_update_stream(CHATS, TAPS_PER_CHAT, seed=11)
+    print(f"📊 {len(updates)} updates from {CHATS} chats, "
+          f"{HANDLER_LATENCY[0] * 1000:.0f}-{HANDLER_LATENCY[1] * 1000:.0f} ms per handler, "
+          f"getUpdates RTT {POLL_RTT * 1000:.0f} ms, webhook RTT {WEBHOOK_RTT * 1000:.0f} ms "
+          f"x {WEBHOOK_CONNECTIONS} connections")
+    runs = [
+        ("polling, sequential", bench_polling(updates, handle_as_tasks=False)),
+        ("polling, task per update", bench_polling(updates, handle_as_tasks=True)),
+        ("webhook, concurrency 16", bench_webhook(updates, 16)),
+        ("webhook, concurrency 64", bench_webhook(updates, 64)),
+        ("processor only, conc. 64", bench_webhook(updates, 64, http=False)),
+    ]
+    for label, run in runs:
+        elapsed, recorder, metrics = await run
+        line = (f"  {label:<26} {len(updates) / elapsed:8.0f} updates/s   "
+                f"out of order {recorder.out_of_order():5d}")
+        if metrics:
+            line += (f"   max pending {metrics['max_pending_seen']:4d}, avg wait {metrics['avg_wait_ms']:.1f} ms, "
+                     f"retries {metrics['retries']}")
+        print(line)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark: pooled SQLite connections vs connect-per-call
+Hits /api/users/{telegram_id} and /api/leaderboard in-process and prints requests/sec
+"""
+import asyncio
+import os
+import random
+import tempfile
+import time
+from contextlib import asynccontextmanager
+
+import aiosqlite
+import httpx
+
+USERS = 5000
+REQUESTS = 2000
+CONCURRENCY = 32
+
+# Point the API at a throwaway database before importing it
+tmp_dir = tempfile.mkdtemp(prefix="bench_pool_")
+os.environ['DATABASE_FILE'] = os.path.join(tmp_dir, "bench.db")
+
+import api_server
+from database import Database
+from database_pool import SQLitePool
+
+
+class ConnectPerCallPool(SQLitePool):
+    """Old behaviour: a fresh connection (and worker thread) for every call"""
+
+    @asynccontextmanager
+    async def _fresh(self):
+        conn = await aiosqlite.connect(self.db_path)
+        conn.row_factory = aiosqlite.Row
+        try:
+            yield conn
+            await conn.commit()
+        finally:
+            await conn.close()
+
+    def reader(self):
+        return self._fresh()
+
+    def writer(self):
+        return self._fresh()
+
+
+async def seed(db: Database):
+    await db.init_db()
+    async with db.pool.writer() as conn:
+        await conn.executemany(
+            "INSERT OR IGNORE INTO users (telegram_id, first_name, points) VALUES (?, ?, ?)",
+            [(100000 + i, f"Student{i}", random.randint(0, 5000)) for i in range(USERS)]
+        )
+        await conn.commit()
+
+
+async def run_load(client: httpx.AsyncClient, path_fn) -> float:
+    queue = list(range(REQUESTS))
+
+    async def worker():
+        while queue:
+            queue.pop()
+            response = await client.get(path_fn())
+            assert response.status_code == 200, response.text
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(CONCURRENCY)])
+    return REQUESTS / (time.perf_counter() - start)
+
+
+async def bench(label: str, pool: SQLitePool):
+    api_server.db = Database(api_server.db_file, pool=pool)
+    transport = httpx.ASGITransport(app=api_server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        user_rps = await run_load(client, lambda: f"/api/users/{100000 + random.randrange(USERS)}")
+        board_rps = await run_load(client, lambda: "/api/leaderboard?limit=10")
+    print(f"{label:<22} /api/users/{{id}}: {user_rps:8.0f} req/s   /api/leaderboard: {board_rps:8.0f} req/s")
+    await pool.close()
+
+
+async def main():
+    seed_pool = SQLitePool(api_server.db_file)
+    await seed(Database(api_server.db_file, pool=seed_pool))
+    await seed_pool.close()
+
+    print(f"📊 {USERS} users, {REQUESTS} requests per endpoint, concurrency {CONCURRENCY}")
+    await bench("connect-per-call", ConnectPerCallPool(api_server.db_file))
+    await bench("pooled (1w + 4r, WAL)", SQLitePool(api_server.db_file, readers=4))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark: ranked skip-list leaderboard vs get_all_users() + sort
+100k users; times top-10, "my rank", neighbours and a points update
+"""
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from database import Database
+
+USERS = 100_000
+QUERIES = 200
+
+
+def per_call_ms(fn, repeat: int = QUERIES) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+async def main():
+    tmp_dir = tempfile.mkdtemp(prefix="bench_leaderboard_")
+    db = Database(os.path.join(tmp_dir, "bench.db"))
+    await db.init_db()
+    rnd = random.Random(7)
+    async with db.pool.writer() as conn:
+        await conn.executemany(
+            "INSERT INTO users (telegram_id, first_name, points) VALUES (?, ?, ?)",
+            [(100000 + i, f"Student{i}", rnd.randint(0, 50000)) for i in range(USERS)]
+        )
+    ids = [100000 + rnd.randrange(USERS) for _ in range(QUERIES)]
+
+    start = time.perf_counter()
+    await db.load_leaderboard()
+    seed_ms = (time.perf_counter() - start) * 1000
+
+    # Old path: every request loads all users and sorts them
+    start = time.perf_counter()
+    for _ in range(20):
+        users = await db.get_all_users()
+        sorted(users, key=lambda x: x.get('points', 0), reverse=True)[:10]
+    old_top_ms = (time.perf_counter() - start) / 20 * 1000
+
+    users = await db.get_all_users()
+    ranked = sorted(users, key=lambda x: (-x['points'], x['telegram_id']))
+    old_sort_ms = per_call_ms(lambda: sorted(users, key=lambda x: (-x['points'], x['telegram_id'])), 20)
+    it = iter(ids)
+
+    def linear_rank():
+        telegram_id = next(it)
+        return next(i for i, u in enumerate(ranked) if u['telegram_id'] == telegram_id)
+
+    old_rank_ms = per_call_ms(linear_rank, 20)
+
+    board = db.leaderboard
+    it = iter(ids * 4)
+    new_top_ms = per_call_ms(lambda: board.top(10))
+    new_rank_ms = per_call_ms(lambda: board.rank(next(it)))
+    new_around_ms = per_call_ms(lambda: board.around(next(it), 2))
+    new_update_ms = per_call_ms(lambda: board.set_points(next(it), rnd.randint(0, 50000)))
+
+    print(f"📊 {USERS} users (seeding the skip list at startup: {seed_ms:.0f} ms)")
+    print(f"  {'top-10, get_all_users + sort':<36} {old_top_ms:10.3f} ms")
+    print(f"  {'sort only (users already in memory)':<36} {old_sort_ms:10.3f} ms")
+    print(f"  {'my rank, linear scan of sorted list':<36} {old_rank_ms:10.3f} ms")
+    print(f"  {'top-10, skip list':<36} {new_top_ms:10.3f} ms")
+    print(f"  {'my rank, skip list':<36} {new_rank_ms:10.3f} ms")
+    print(f"  {'neighbours (±2), skip list':<36} {new_around_ms:10.3f} ms")
+    print(f"  {'points update, skip list':<36} {new_update_ms:10.3f} ms")
+
+    await db.pool.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-request DDL / PRAGMA checks vs migrations applied once at startup
+Times the old add_user and schedule-list paths against the DML-only versions
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+from database import Database
+from database_migrations import SCHEDULES_TABLE_SQL
+
+ITERATIONS = 2000
+
+
+async def old_add_user(db: Database, telegram_id: int):
+    """add_user as it was: PRAGMA table_info on every call, then the upsert"""
+    async with db.pool.writer() as conn:
+        cursor = await conn.execute("PRAGMA table_info(users)")
+        column_names = [col[1] for col in await cursor.fetchall()]
+        for column, definition in (("role", "TEXT DEFAULT 'student'"), ("birth_date", "TEXT"), ("code", "TEXT")):
+            if column not in column_names:
+                await conn.execute(f"ALTER TABLE users ADD COLUMN {column} {definition}")
+        await conn.execute("""
+            INSERT OR REPLACE INTO users (telegram_id, first_name, role, code)
+            VALUES (?, ?, 'student', '111444')
+        """, (telegram_id, f"Student{telegram_id}"))
+        await conn.commit()
+
+
+async def new_add_user(db: Database, telegram_id: int):
+    async with db.pool.writer() as conn:
+        await conn.execute("""
+            INSERT OR REPLACE INTO users (telegram_id, first_name, role, code)
+            VALUES (?, ?, 'student', '111444')
+        """, (telegram_id, f"Student{telegram_id}"))
+        await conn.commit()
+
+
+async def old_user_schedules(db: Database, user_id: int):
+    """/api/schedules/user/{id} as it was: CREATE TABLE IF NOT EXISTS on the writer, then SELECT"""
+    async with db.pool.writer() as conn:
+        await conn.execute(SCHEDULES_TABLE_SQL)
+        async with conn.execute(
+            "SELECT * FROM schedules WHERE teacher_id = ? OR user_id = ? ORDER BY created_at DESC",
+            (user_id, user_id)
+        ) as cursor:
+            return await cursor.fetchall()
+
+
+async def new_user_schedules(db: Database, user_id: int):
+    async with db.pool.reader() as conn:
+        async with conn.execute(
+            "SELECT * FROM schedules WHERE teacher_id = ? OR user_id = ? ORDER BY created_at DESC",
+            (user_id, user_id)
+        ) as cursor:
+            return await cursor.fetchall()
+
+
+async def timed(label: str, fn, db: Database) -> float:
+    start = time.perf_counter()
+    for i in range(ITERATIONS):
+        await fn(db, 100000 + i % 500)
+    per_call = (time.perf_counter() - start) / ITERATIONS * 1e6
+    print(f"  {label:<34} {per_call:8.1f} µs/request")
+    return per_call
+
+
+async def main():
+    tmp_dir = tempfile.mkdtemp(prefix="bench_migrations_")
+    db = Database(os.path.join(tmp_dir, "bench.db"))
+    await db.init_db()
+    async with db.pool.writer() as conn:
+        await conn.executemany(
+            "INSERT INTO schedules (title, teacher_id, user_id) VALUES (?, ?, ?)",
+            [(f"Lesson {i}", 100000 + i % 500, 100000 + i % 500) for i in range(5000)]
+        )
+
+    print(f"📊 {ITERATIONS} sequential requests per path")
+    print("add_user:")
+    before = await timed("PRAGMA table_info + upsert", old_add_user, db)
+    after = await timed("upsert only", new_add_user, db)
+    print(f"  saved {before - after:.1f} µs/request ({(1 - after / before) * 100:.0f}%)")
+
+    print("GET /api/schedules/user/{id}:")
+    before = await timed("CREATE IF NOT EXISTS + SELECT (w)", old_user_schedules, db)
+    after = await timed("SELECT on reader", new_user_schedules, db)
+    print(f"  saved {before - after:.1f} µs/request ({(1 - after / before) * 100:.0f}%)")
+
+    await db.pool.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
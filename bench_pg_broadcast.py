@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark: PostgreSQL broadcast fan-out, per-user INSERT loop vs INSERT ... SELECT
+Needs DATABASE_URL; everything runs in a throwaway schema that is dropped afterwards
+"""
+import asyncio
+import os
+import time
+
+import asyncpg
+
+from database_postgres import PostgresDatabase
+
+USERS = 50_000
+SCHEMA = "bench_broadcast"
+
+
+async def loop_broadcast(db: PostgresDatabase, sender_id: int):
+    """send_message(is_broadcast=True) as it was: one INSERT per active user"""
+    async with db.pool.acquire() as conn:
+        users = await conn.fetch('SELECT id FROM users WHERE is_active = true')
+        for user in users:
+            await conn.execute('''
+                INSERT INTO messages (title, content, sender_id, recipient_id,
+                                    message_type, is_broadcast, priority)
+                VALUES ($1, $2, $3, $4, $5, $6, $7)
+            ''', "Loop", "Broadcast body", sender_id, user['id'], 'announcement', True, 'normal')
+
+
+async def main():
+    database_url = os.environ['DATABASE_URL']
+    admin = await asyncpg.connect(database_url)
+    await admin.execute(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE')
+    await admin.execute(f'CREATE SCHEMA {SCHEMA}')
+
+    db = PostgresDatabase()
+    db.pool = await asyncpg.create_pool(database_url, server_settings={'search_path': SCHEMA})
+    try:
+        await db.create_tables()
+        async with db.pool.acquire() as conn:
+            await conn.copy_records_to_table(
+                'users', columns=['telegram_id', 'first_name'],
+                records=[(100000 + i, f"Student{i}") for i in range(USERS)]
+            )
+            sender_id = await conn.fetchval('SELECT MIN(id) FROM users')
+
+        print(f"📊 Broadcast to {USERS} users")
+        start = time.perf_counter()
+        await loop_broadcast(db, sender_id)
+        print(f"  {'per-user INSERT loop':<28} {time.perf_counter() - start:8.2f} s")
+
+        start = time.perf_counter()
+        created = await db.send_message(sender_id, "Set-based", "Broadcast body",
+                                        is_broadcast=True, message_type='announcement')
+        print(f"  {'INSERT ... SELECT':<28} {time.perf_counter() - start:8.2f} s  ({created} rows)")
+
+        async with db.pool.acquire() as conn:
+            await conn.execute('ANALYZE messages')
+        start = time.perf_counter()
+        for i in range(200):
+            await db.get_user_messages(sender_id + i * 97 % USERS)
+        print(f"  {'get_user_messages':<28} {(time.perf_counter() - start) / 200 * 1000:8.2f} ms/call")
+    finally:
+        await db.close()
+        await admin.execute(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE')
+        await admin.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
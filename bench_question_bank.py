@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark: picking a 10-question test from a large question bank
+Compares ORDER BY RANDOM() LIMIT 10 over the subject/language slice with the
+in-memory QuestionBank (O(k) id sample + one IN (...) fetch), with and without
+skipping the user's recently answered questions
+"""
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from database import Database
+
+SUBJECTS = ["physics", "mathematics"]
+LANGUAGES = ["ru", "kz", "en"]
+QUESTIONS_PER_SLICE = 10_000
+DIFFICULTIES = ["easy", "medium", "hard"]
+RUNS = 500
+
+
+async def main():
+    tmp_dir = tempfile.mkdtemp(prefix="bench_question_bank_")
+    db = Database(os.path.join(tmp_dir, "bench.db"))
+    await db.init_db()
+    rnd = random.Random(9)
+    async with db.pool.writer() as conn:
+        await conn.executemany(
+            """INSERT INTO tests (subject, language, difficulty, question, option_a, option_b, option_c, option_d,
+                                  correct_answer, explanation)
+               VALUES (?, ?, ?, ?, 'option one', 'option two', 'option three', 'option four', ?, ?)""",
+            [(subject, language, rnd.choice(DIFFICULTIES), f"{subject} question {n} " + "x" * 200,
+              rnd.choice("ABCD"), "explanation " * 20)
+             for subject in SUBJECTS for language in LANGUAGES for n in range(QUESTIONS_PER_SLICE)]
+        )
+        await conn.execute("INSERT INTO users (telegram_id, first_name) VALUES (42, 'Aigerim')")
+    for _ in range(5):
+        test = await db.get_tests_by_subject("physics", "ru", 10)
+        await db.record_test_attempt(42, [(t["id"], "A") for t in test], subject="physics")
+
+    async def order_by_random():
+        async with db.pool.reader() as conn:
+            async with conn.execute(
+                "SELECT * FROM tests WHERE subject = ? AND language = ? ORDER BY RANDOM() LIMIT ?",
+                ("physics", "ru", 10)
+            ) as cursor:
+                return [dict(row) for row in await cursor.fetchall()]
+
+    db.question_bank.invalidate()
+    start = time.perf_counter()
+    await db.question_bank.count("physics")
+    load_ms = (time.perf_counter() - start) * 1000
+
+    cases = [
+        ("ORDER BY RANDOM() LIMIT 10", order_by_random),
+        ("question bank", lambda: db.get_tests_by_subject("physics", "ru", 10)),
+        ("question bank, one difficulty", lambda: db.get_tests_by_subject("physics", "ru", 10, "hard")),
+        ("question bank, skip recent", lambda: db.get_tests_by_subject("physics", "ru", 10, user_id=42)),
+    ]
+    print(f"📊 {len(SUBJECTS) * len(LANGUAGES) * QUESTIONS_PER_SLICE} questions, "
+          f"{QUESTIONS_PER_SLICE} per subject/language; bank load {load_ms:.0f} ms")
+    for label, pick in cases:
+        start = time.perf_counter()
+        for _ in range(RUNS):
+            tests = await pick()
+        per_pick = (time.perf_counter() - start) / RUNS * 1000
+        assert len(tests) == 10
+        print(f"  {label:<32} {per_pick:8.2f} ms/test")
+
+    await db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
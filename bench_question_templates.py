@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Benchmark: generating physics questions
+Times the templates' vectorised generation over every parameter combination,
+building the seeded question pool, picking from it, and the generate-question
+endpoint through the ASGI stack
+"""
+import asyncio
+import random
+import time
+
+import httpx
+import numpy as np
+
+import api_server
+from question_templates import TEMPLATES, QuestionPool
+
+PICKS = 100_000
+REQUESTS = 1000
+
+
+async def endpoint_rate():
+    transport = httpx.ASGITransport(app=api_server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        start = time.perf_counter()
+        for _ in range(REQUESTS):
+            response = await client.post("/api/ai/generate-question")
+            assert response.status_code == 200
+        return REQUESTS / (time.perf_counter() - start)
+
+
+def main():
+    combinations = sum(template.combinations for template in TEMPLATES)
+    start = time.perf_counter()
+    generated = sum(len(template.generate(np.arange(template.combinations))) for template in TEMPLATES)
+    generate_rate = generated / (time.perf_counter() - start)
+
+    pool = QuestionPool()
+    start = time.perf_counter()
+    pool.build()
+    build_seconds = time.perf_counter() - start
+
+    rnd = random.Random(1)
+    start = time.perf_counter()
+    for _ in range(PICKS):
+        pool.pick(rnd, "hard")
+    pick_us = (time.perf_counter() - start) / PICKS * 1e6
+
+    api_server.question_pool = pool
+    api_rate = asyncio.run(endpoint_rate())
+
+    print(f"📊 {len(TEMPLATES)} templates, {combinations} parameter combinations, {generated} valid problems")
+    print(f"  {'vectorised generation':<36} {generate_rate:>10,.0f} questions/s")
+    print(f"  {'pool build (' + str(len(pool.questions)) + ' questions)':<36} {build_seconds * 1e3:>10,.1f} ms")
+    print(f"  {'pool pick':<36} {pick_us:>10,.2f} µs")
+    print(f"  {'POST /api/ai/generate-question':<36} {api_rate:>10,.0f} requests/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark: teacher's whole-class per-topic progress for a 2,000-student class
+Compares one query per (student, topic) over the attempt history, one GROUP BY
+over the whole history, and the single read of the user_topic_progress counters
+"""
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from database import Database
+
+STUDENTS = 2_000
+TOPICS = ["mechanics", "thermodynamics", "electricity", "magnetism", "optics", "atomic"]
+TESTS_PER_TOPIC = 50
+ATTEMPTS_PER_STUDENT = 5
+QUESTIONS_PER_ATTEMPT = 10
+
+
+async def main():
+    tmp_dir = tempfile.mkdtemp(prefix="bench_topic_progress_")
+    db = Database(os.path.join(tmp_dir, "bench.db"))
+    await db.init_db()
+    rnd = random.Random(7)
+    async with db.pool.writer() as conn:
+        await conn.executemany(
+            "INSERT INTO users (telegram_id, first_name, role, code) VALUES (?, ?, 'student', '111444')",
+            [(100000 + i, f"Student{i}") for i in range(STUDENTS)]
+        )
+        await conn.executemany(
+            """INSERT INTO tests (subject, question, option_a, option_b, option_c, option_d, correct_answer)
+               VALUES (?, ?, '1', '2', '3', '4', ?)""",
+            [(topic, f"{topic} {n}", rnd.choice("ABCD")) for topic in TOPICS for n in range(TESTS_PER_TOPIC)]
+        )
+    test_ids = list(range(1, len(TOPICS) * TESTS_PER_TOPIC + 1))
+
+    start = time.perf_counter()
+    for attempt in range(ATTEMPTS_PER_STUDENT):
+        for i in range(STUDENTS):
+            answers = [(test_id, rnd.choice("ABCD")) for test_id in rnd.sample(test_ids, QUESTIONS_PER_ATTEMPT)]
+            await db.record_test_attempt(100000 + i, answers)
+    attempts = ATTEMPTS_PER_STUDENT * STUDENTS
+    write_ms = (time.perf_counter() - start) / attempts * 1000
+
+    # Old shape: one aggregate per (student, topic) over the answer history
+    start = time.perf_counter()
+    async with db.pool.reader() as conn:
+        for i in range(STUDENTS):
+            for topic in TOPICS:
+                async with conn.execute("""
+                    SELECT COUNT(DISTINCT aa.test_id), COUNT(*), SUM(aa.is_correct)
+                    FROM test_attempt_answers aa
+                    JOIN test_attempts a ON a.id = aa.attempt_id
+                    JOIN tests t ON t.id = aa.test_id
+                    WHERE a.user_id = ? AND t.subject = ?
+                """, (100000 + i, topic)) as cursor:
+                    await cursor.fetchone()
+    per_pair_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    async with db.pool.reader() as conn:
+        async with conn.execute("""
+            SELECT a.user_id, t.subject, COUNT(DISTINCT aa.test_id), COUNT(*), SUM(aa.is_correct)
+            FROM test_attempt_answers aa
+            JOIN test_attempts a ON a.id = aa.attempt_id
+            JOIN tests t ON t.id = aa.test_id
+            GROUP BY a.user_id, t.subject
+        """) as cursor:
+            await cursor.fetchall()
+    group_by_ms = (time.perf_counter() - start) * 1000
+
+    runs = 10
+    start = time.perf_counter()
+    for _ in range(runs):
+        await db.get_topic_totals()
+        progress = await db.get_topic_progress()
+    counters_ms = (time.perf_counter() - start) / runs * 1000
+    assert len(progress) == STUDENTS
+
+    print(f"📊 {STUDENTS} students x {len(TOPICS)} topics, {attempts} attempts of {QUESTIONS_PER_ATTEMPT} questions")
+    print(f"  {'record_test_attempt (incl. counters)':<40} {write_ms:10.2f} ms/attempt")
+    print(f"  {'class view, one query per student/topic':<40} {per_pair_s * 1000:10.0f} ms")
+    print(f"  {'class view, GROUP BY over history':<40} {group_by_ms:10.0f} ms")
+    print(f"  {'class view, user_topic_progress read':<40} {counters_ms:10.1f} ms")
+
+    await db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-message translation overhead in the bot
+Compares the old get_text (nested lookups + str.format on every call), keyboard
+construction per message and list-based menu button matching with the compiled
+catalog, the cached keyboards and the reverse button index
+"""
+import time
+
+from translations import (BUTTON_ACTIONS, TRANSLATIONS, button_texts, get_main_menu_keyboard, get_text,
+                          _build_main_menu_keyboard)
+
+RUNS = 200_000
+KEYBOARD_RUNS = 20_000
+
+# The handler filters bot.py used to have, one list per menu button
+OLD_BUTTON_LISTS = [
+    ["🌐 Язык", "🌐 Тіл", "🌐 Language"],
+    ["📅 Расписание", "📅 Кесте", "📅 Schedule"],
+    ["📝 Тесты", "📝 Тесттер", "📝 Tests"],
+    ["🏆 Рейтинг", "🏆 Рейтинг", "🏆 Leaderboard"],
+    ["🎯 Квесты", "🎯 Квесттер", "🎯 Quests"],
+    ["❓ Помощь", "❓ Көмек", "❓ Help"],
+    ["🎥 Видеоуроки", "🎥 Видеосабақтар", "🎥 Video Lessons"],
+    ["📖 Материалы", "📖 Материалдар", "📖 Materials"],
+]
+
+
+def old_get_text(key, language='ru', **kwargs):
+    if language not in TRANSLATIONS:
+        language = 'ru'
+    text = TRANSLATIONS[language].get(key, TRANSLATIONS['ru'].get(key, key))
+    try:
+        return text.format(**kwargs)
+    except (KeyError, ValueError):
+        return text
+
+
+def timed(label, fn, runs):
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    per_call = (time.perf_counter() - start) / runs * 1e6
+    print(f"  {label:<44} {per_call:8.2f} µs")
+    return per_call
+
+
+def main():
+    print(f"📊 translation overhead per call ({RUNS} runs, keyboards {KEYBOARD_RUNS})")
+    entry = dict(position=2, name="Айгерим", points=120, level=2)
+    timed("old get_text, plain text", lambda: old_get_text('main_menu', 'kz'), RUNS)
+    timed("catalog get_text, plain text", lambda: get_text('main_menu', 'kz'), RUNS)
+    timed("old get_text, leaderboard entry", lambda: old_get_text('leaderboard_entry', 'kz', **entry), RUNS)
+    timed("catalog get_text, leaderboard entry", lambda: get_text('leaderboard_entry', 'kz', **entry), RUNS)
+    timed("main menu keyboard built per message", lambda: _build_main_menu_keyboard('kz'), KEYBOARD_RUNS)
+    timed("main menu keyboard, cached", lambda: get_main_menu_keyboard('kz'), RUNS)
+
+    # A message is checked against every menu filter until one matches; "📖 Materials" is the last
+    text = "📖 Materials"
+    new_sets = [button_texts(key) for key in ('language_btn', 'schedule_btn', 'test_btn', 'top_btn',
+                                              'quests_btn', 'help_btn', 'videos_btn', 'materials_btn')]
+    timed("menu match, list per handler", lambda: next(i for i, l in enumerate(OLD_BUTTON_LISTS) if text in l), RUNS)
+    timed("menu match, frozenset per handler", lambda: next(i for i, s in enumerate(new_sets) if text in s), RUNS)
+    timed("menu match, reverse index", lambda: BUTTON_ACTIONS.get(text), RUNS)
+
+
+if __name__ == "__main__":
+    main()
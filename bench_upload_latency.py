@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Load test: latency of an unrelated endpoint (/api/health) while large photo
+uploads are in flight. Starts api_server under uvicorn in a subprocess twice:
+once with the upload pipeline, once with the old inline handling (whole form
+read into memory, PIL decode on the event loop), and reports p50/p99/max.
+"""
+import asyncio
+import io
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+PORT = 8765
+UPLOADERS = 4
+DURATION = 20
+PROBE_INTERVAL = 0.02
+
+
+def serve(mode: str):
+    import uvicorn
+    import api_server
+    import upload_pipeline
+
+    if mode == "inline":
+        async def receive_inline(request, field="photo"):
+            form = await request.form()
+            photo_file = form.get(field)
+            data = await photo_file.read()
+            fd, path = tempfile.mkstemp()
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(data)
+            try:
+                # What the handlers used to do: decode on the event loop thread
+                photo = upload_pipeline.process_image(path, 1600, 320, 82, 50_000_000)
+            finally:
+                os.unlink(path)
+            return upload_pipeline.Upload(path, photo_file.filename, photo_file.content_type, len(data), {}), photo
+
+        api_server.receive_photo = receive_inline
+    uvicorn.run(api_server.app, host="127.0.0.1", port=PORT, log_level="warning")
+
+
+def phone_photo() -> bytes:
+    """~12 MP noisy JPEG, roughly what a phone camera uploads"""
+    from PIL import Image
+    noise = Image.effect_noise((4032, 3024), 60).convert("RGB")
+    buffer = io.BytesIO()
+    noise.save(buffer, format="JPEG", quality=92)
+    return buffer.getvalue()
+
+
+async def run_load(photo: bytes):
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", timeout=120) as client:
+        for _ in range(200):
+            try:
+                await client.get("/api/health")
+                break
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+        await client.get("/api/health")  # warm up
+        deadline = time.perf_counter() + DURATION
+        uploads = []
+
+        async def uploader(n):
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                response = await client.post("/api/ai/upload-question-photo",
+                                             files={"photo": (f"phone{n}.jpg", photo, "image/jpeg")})
+                response.raise_for_status()
+                uploads.append(time.perf_counter() - start)
+
+        async def prober():
+            latencies = []
+            await asyncio.sleep(1)
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                (await client.get("/api/health")).raise_for_status()
+                latencies.append((time.perf_counter() - start) * 1000)
+                await asyncio.sleep(PROBE_INTERVAL + random.random() * PROBE_INTERVAL)
+            return latencies
+
+        results = await asyncio.gather(prober(), *(uploader(n) for n in range(UPLOADERS)))
+        return results[0], uploads
+
+
+def measure(mode: str, photo: bytes):
+    work_dir = tempfile.mkdtemp(prefix=f"bench_upload_{mode}_")
+    env = dict(os.environ, DATABASE_FILE=os.path.join(work_dir, "bench.db"),
+               BLOB_STORE_DIR=os.path.join(work_dir, "blobs"))
+    server = subprocess.Popen([sys.executable, __file__, "--serve", mode], env=env,
+                              stdout=subprocess.DEVNULL)
+    try:
+        latencies, uploads = asyncio.run(run_load(photo))
+    finally:
+        server.terminate()
+        server.wait()
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"  {mode:<9} health p50 {statistics.median(latencies):8.1f} ms  p99 {p99:8.1f} ms  "
+          f"max {latencies[-1]:8.1f} ms  ({len(latencies)} probes, {len(uploads)} uploads, "
+          f"{statistics.mean(uploads):.2f} s/upload)")
+
+
+def main():
+    photo = phone_photo()
+    print(f"📊 {UPLOADERS} concurrent uploaders of a {len(photo) / 1e6:.1f} MB photo for {DURATION} s, "
+          f"probing GET /api/health")
+    for mode in ("inline", "pipeline"):
+        measure(mode, photo)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--serve":
+        serve(sys.argv[2])
+    else:
+        main()
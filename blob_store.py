@@ -0,0 +1,151 @@
+"""
+Content-addressed blob store for uploaded photos.
+Blobs live on disk under <root>/<ab>/<cd>/<sha256>, keyed by the SHA-256 of
+their bytes, so identical uploads are stored once and a hash never changes
+meaning. Writes go to a temp file in the same directory and are renamed into
+place, so readers never see a partial blob. Tables keep only the hash; the
+bytes are served by GET /api/blobs/{hash}.
+"""
+
+import asyncio
+import base64
+import binascii
+import hashlib
+import os
+import re
+import tempfile
+from typing import BinaryIO, Optional
+
+HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+CHUNK_SIZE = 64 * 1024
+
+# Magic numbers of the image types we accept, for the Content-Type of served blobs
+MEDIA_TYPES = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"RIFF", "image/webp"),  # RIFF....WEBP
+    (b"BM", "image/bmp"),
+]
+
+
+def blob_url(blob_hash: Optional[str]) -> Optional[str]:
+    """API path a stored hash is served from"""
+    return f"/api/blobs/{blob_hash}" if blob_hash else None
+
+
+class BlobStore:
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, blob_hash: str) -> str:
+        if not HASH_RE.match(blob_hash or ""):
+            raise ValueError(f"Invalid blob hash: {blob_hash!r}")
+        return os.path.join(self.root, blob_hash[:2], blob_hash[2:4], blob_hash)
+
+    def exists(self, blob_hash: str) -> bool:
+        try:
+            return os.path.isfile(self.path(blob_hash))
+        except ValueError:
+            return False
+
+    def put_file(self, source: BinaryIO) -> str:
+        """Stream a file object into the store; returns its SHA-256 hex digest.
+        Blocking: call from a worker thread in async code"""
+        os.makedirs(self.root, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    tmp.write(chunk)
+            blob_hash = digest.hexdigest()
+            target = self.path(blob_hash)
+            if os.path.exists(target):
+                # Same bytes already stored
+                os.unlink(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(tmp_path, target)
+            return blob_hash
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def put_bytes(self, data: bytes) -> str:
+        """Store bytes already in memory; returns the SHA-256 hex digest (blocking)"""
+        blob_hash = hashlib.sha256(data).hexdigest()
+        target = self.path(blob_hash)
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), prefix=".upload-")
+            try:
+                with os.fdopen(fd, "wb") as tmp:
+                    tmp.write(data)
+                os.replace(tmp_path, target)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+        return blob_hash
+
+    def media_type(self, blob_hash: str) -> str:
+        with open(self.path(blob_hash), "rb") as blob:
+            head = blob.read(12)
+        for magic, media_type in MEDIA_TYPES:
+            if head.startswith(magic) and (media_type != "image/webp" or head[8:12] == b"WEBP"):
+                return media_type
+        return "application/octet-stream"
+
+
+def decode_data_url(value: str) -> Optional[bytes]:
+    """Bytes of a 'data:<type>;base64,<payload>' URL (or bare base64), None if it is not one"""
+    if not value:
+        return None
+    payload = value.split(",", 1)[1] if value.startswith("data:") else value
+    try:
+        return base64.b64decode(payload, validate=True)
+    except (binascii.Error, ValueError):
+        return None
+
+
+# Tables whose original_photo column used to hold the photo inline
+PHOTO_TABLES = ("virtual_questions", "solution_analyses")
+MOVE_BATCH = 100
+
+
+async def move_inline_photos(pool, store: BlobStore) -> int:
+    """Move base64 original_photo values into the blob store, leaving only photo_hash.
+    Idempotent (only rows that still hold inline data are touched); returns rows moved"""
+    moved = 0
+    for table in PHOTO_TABLES:
+        last_id = -1
+        while True:
+            # Keyset over the rowid so each batch starts where the last one stopped
+            async with pool.reader() as conn:
+                async with conn.execute(
+                    f"SELECT id, original_photo FROM {table} WHERE id > ? AND original_photo IS NOT NULL ORDER BY id LIMIT ?",
+                    (last_id, MOVE_BATCH)
+                ) as cursor:
+                    rows = await cursor.fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            updates = []
+            for row_id, photo in rows:
+                data = decode_data_url(photo)
+                blob_hash = await asyncio.to_thread(store.put_bytes, data) if data else None
+                updates.append((blob_hash, row_id))
+            async with pool.writer() as conn:
+                await conn.executemany(
+                    f"UPDATE {table} SET photo_hash = COALESCE(?, photo_hash), original_photo = NULL WHERE id = ?",
+                    updates
+                )
+                await conn.commit()
+            moved += len(updates)
+    if moved:
+        print(f"📦 Moved {moved} inline photos into the blob store")
+    return moved
@@ -1,20 +1,24 @@
 import asyncio
 import logging
 import os
-from typing import Dict, Any
+from datetime import datetime
+from typing import Dict
 
 from aiogram import Bot, Dispatcher, Router, F
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, WebAppInfo
 from aiogram.filters import Command, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.fsm.storage.memory import MemoryStorage
 from dotenv import load_dotenv
 
+from answer_flow import AnswerFlow
+from bot_storage import SQLiteStorage, TestSessionStore, evict_expired_loop
+from config import BOT_SETTINGS
 from database import Database
-from translations import get_text, get_language_keyboard, get_main_menu_keyboard, get_subjects_keyboard
+from translations import get_text, button_texts, get_language_keyboard, get_main_menu_keyboard, get_subjects_keyboard
 from admin import AdminManager, ADMIN_IDS, get_admin_keyboard, ADMIN_HELP_TEXT
 from admin_panel import AdvancedAdminPanel, AdminStates as AdvancedAdminStates, ADMIN_HELP_TEXT as ADVANCED_ADMIN_HELP
+from broadcast import BroadcastEngine
 
 # Load environment variables
 load_dotenv()
@@ -23,20 +27,26 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize bot and dispatcher
+# Initialize database
+db = Database()
+
+# Initialize bot and dispatcher; FSM state and test sessions live in the database,
+# so they survive restarts and several bot workers can share them
 bot = Bot(token=os.getenv('BOT_TOKEN'))
-storage = MemoryStorage()
+storage = SQLiteStorage(db.pool)
+test_sessions = TestSessionStore(db.pool)
+answer_flow = AnswerFlow(db, test_sessions)
 dp = Dispatcher(storage=storage)
 router = Router()
 
-# Initialize database
-db = Database()
+# One broadcast engine (and rate limit) shared by both admin interfaces
+broadcaster = BroadcastEngine(bot, db)
 
 # Initialize admin manager
-admin_manager = AdminManager(bot, db)
+admin_manager = AdminManager(bot, db, broadcaster)
 
 # Initialize advanced admin panel
-advanced_admin = AdvancedAdminPanel(bot, db)
+advanced_admin = AdvancedAdminPanel(bot, db, broadcaster)
 
 # States for FSM
 class TestStates(StatesGroup):
@@ -51,9 +61,6 @@ class AdminStates(StatesGroup):
     waiting_for_material = State()
     waiting_for_test = State()
 
-# Global variables for test sessions
-user_test_sessions: Dict[int, Dict[str, Any]] = {}
-
 @router.message(Command("start"))
 async def cmd_start(message: Message, state: FSMContext):
     """Handle /start command"""
@@ -101,6 +108,8 @@ async def process_language_selection(callback: CallbackQuery, state: FSMContext)
     # Check if user is admin
     is_admin = advanced_admin.is_admin(callback.from_user.id)
     
+    answer_flow.remember_language(callback.from_user.id, language)
+    
     await callback.message.edit_text(get_text('language_selected', language))
     
     if is_admin:
@@ -128,9 +137,7 @@ async def cmd_language(message: Message):
         reply_markup=get_language_keyboard()
     )
 
-@router.message(F.text.in_([
-    "🌐 Язык", "🌐 Тіл", "🌐 Language"
-]))
+@router.message(F.text.in_(button_texts('language_btn')))
 async def btn_language(message: Message):
     """Handle language button"""
     await cmd_language(message)
@@ -179,9 +186,7 @@ async def cmd_schedule(message: Message):
     
     await message.answer(schedule_text, parse_mode="Markdown")
 
-@router.message(F.text.in_([
-    "📅 Расписание", "📅 Кесте", "📅 Schedule"
-]))
+@router.message(F.text.in_(button_texts('schedule_btn')))
 async def btn_schedule(message: Message):
     """Handle schedule button"""
     await cmd_schedule(message)
@@ -200,9 +205,7 @@ async def cmd_test(message: Message, state: FSMContext):
     )
     await state.set_state(TestStates.waiting_for_subject)
 
-@router.message(F.text.in_([
-    "📝 Тесты", "📝 Тесттер", "📝 Tests"
-]))
+@router.message(F.text.in_(button_texts('test_btn')))
 async def btn_test(message: Message, state: FSMContext):
     """Handle test button"""
     await cmd_test(message, state)
@@ -214,7 +217,8 @@ async def process_subject_selection(callback: CallbackQuery, state: FSMContext):
     user = await db.get_user(callback.from_user.id)
     
     # Get tests for the subject
-    tests = await db.get_tests_by_subject(subject, user['language'], 10)
+    tests = await db.get_tests_by_subject(subject, user['language'], BOT_SETTINGS['max_test_questions'],
+                                          user_id=callback.from_user.id)
     
     if not tests:
         await callback.message.edit_text(f"No tests available for {subject}")
@@ -222,115 +226,33 @@ async def process_subject_selection(callback: CallbackQuery, state: FSMContext):
         await callback.answer()
         return
     
-    # Initialize test session
-    user_test_sessions[callback.from_user.id] = {
-        'tests': tests,
-        'current_question': 0,
-        'correct_answers': 0,
-        'user_answers': []
-    }
+    # Initialize test session; the question rows stay in the answer flow's cache
+    session = await answer_flow.start(callback.from_user.id, tests, subject,
+                                      datetime.now().isoformat(timespec='seconds'))
+    answer_flow.remember_language(callback.from_user.id, user['language'])
     
     # Send first question
-    await send_test_question(callback.message, callback.from_user.id, user['language'])
+    await answer_flow.show_question(callback.message, session, user['language'])
     await state.set_state(TestStates.taking_test)
     await callback.answer()
 
-async def send_test_question(message: Message, user_id: int, language: str):
-    """Send current test question"""
-    session = user_test_sessions[user_id]
-    current_test = session['tests'][session['current_question']]
-    
-    question_text = get_text('test_question', language, 
-                           current=session['current_question'] + 1,
-                           total=len(session['tests']))
-    question_text += f"\n\n❓ {current_test['question']}\n\n"
-    question_text += f"A) {current_test['option_a']}\n"
-    question_text += f"B) {current_test['option_b']}\n"
-    question_text += f"C) {current_test['option_c']}\n"
-    question_text += f"D) {current_test['option_d']}"
-    
-    # Create answer keyboard
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [
-            InlineKeyboardButton(text="A", callback_data="answer_A"),
-            InlineKeyboardButton(text="B", callback_data="answer_B"),
-        ],
-        [
-            InlineKeyboardButton(text="C", callback_data="answer_C"),
-            InlineKeyboardButton(text="D", callback_data="answer_D"),
-        ]
-    ])
-    
-    await message.edit_text(question_text, reply_markup=keyboard)
-
 @router.callback_query(F.data.startswith("answer_"), StateFilter(TestStates.taking_test))
 async def process_test_answer(callback: CallbackQuery, state: FSMContext):
-    """Handle test answer"""
-    user_id = callback.from_user.id
+    """Handle test answer: feedback and the next question (or the result) in one edit"""
     answer = callback.data.split("_")[1]
-    user = await db.get_user(user_id)
-    
-    if user_id not in user_test_sessions:
-        await callback.answer("Test session expired")
-        await state.clear()
-        return
-    
-    session = user_test_sessions[user_id]
-    current_test = session['tests'][session['current_question']]
-    
-    # Check if answer is correct
-    is_correct = answer == current_test['correct_answer']
-    if is_correct:
-        session['correct_answers'] += 1
-    
-    session['user_answers'].append({
-        'question': current_test['question'],
-        'user_answer': answer,
-        'correct_answer': current_test['correct_answer'],
-        'is_correct': is_correct
-    })
-    
-    # Move to next question or finish test
-    session['current_question'] += 1
-    
-    if session['current_question'] < len(session['tests']):
-        # Show feedback and next question
-        feedback = get_text('correct_answer', user['language']) if is_correct else \
-                  get_text('wrong_answer', user['language'], answer=current_test['correct_answer'])
-        
-        await callback.message.edit_text(feedback)
-        await asyncio.sleep(1.5)  # Brief pause to show feedback
-        await send_test_question(callback.message, user_id, user['language'])
-    else:
-        # Test finished
-        await finish_test(callback.message, user_id, user['language'])
+    session = await answer_flow.answer(callback.message, callback.from_user.id, answer)
+    
+    if session is None:
+        # No running test, or this question was already answered
+        if not await test_sessions.get(callback.from_user.id):
+            await callback.answer("Test session expired")
+            await state.clear()
+            return
+    elif session.finished:
         await state.clear()
     
     await callback.answer()
 
-async def finish_test(message: Message, user_id: int, language: str):
-    """Finish test and show results"""
-    session = user_test_sessions[user_id]
-    total_questions = len(session['tests'])
-    correct_answers = session['correct_answers']
-    percentage = int((correct_answers / total_questions) * 100)
-    
-    # Calculate points (10 points per correct answer)
-    points = correct_answers * 10
-    await db.add_points(user_id, points)
-    
-    # Show results
-    result_text = get_text('test_result', language,
-                          correct=correct_answers,
-                          total=total_questions,
-                          percentage=percentage,
-                          points=points)
-    
-    await message.edit_text(result_text)
-    
-    # Clean up session
-    del user_test_sessions[user_id]
-
 @router.message(Command("top"))
 async def cmd_top(message: Message):
     """Handle /top command"""
@@ -355,12 +277,13 @@ async def cmd_top(message: Message):
     
     # Add user's stats
     leaderboard_text += f"\n{get_text('your_stats', user['language'], points=user['points'], level=user['level'])}"
+    position = db.leaderboard.rank(user['telegram_id'])
+    if position:
+        leaderboard_text += f"\n{get_text('your_position', user['language'], position=position)}"
     
     await message.answer(leaderboard_text)
 
-@router.message(F.text.in_([
-    "🏆 Рейтинг", "🏆 Рейтинг", "🏆 Leaderboard"
-]))
+@router.message(F.text.in_(button_texts('top_btn')))
 async def btn_top(message: Message):
     """Handle leaderboard button"""
     await cmd_top(message)
@@ -389,9 +312,7 @@ async def cmd_quests(message: Message):
     
     await message.answer(quests_text)
 
-@router.message(F.text.in_([
-    "🎯 Квесты", "🎯 Квесттер", "🎯 Quests"
-]))
+@router.message(F.text.in_(button_texts('quests_btn')))
 async def btn_quests(message: Message):
     """Handle quests button"""
     await cmd_quests(message)
@@ -404,9 +325,7 @@ async def cmd_help(message: Message):
     
     await message.answer(get_text('help_text', language))
 
-@router.message(F.text.in_([
-    "❓ Помощь", "❓ Көмек", "❓ Help"
-]))
+@router.message(F.text.in_(button_texts('help_btn')))
 async def btn_help(message: Message):
     """Handle help button"""
     await cmd_help(message)
@@ -424,9 +343,7 @@ async def cmd_videos(message: Message):
         reply_markup=get_subjects_keyboard(user['language'])
     )
 
-@router.message(F.text.in_([
-    "🎥 Видеоуроки", "🎥 Видеосабақтар", "🎥 Video Lessons"
-]))
+@router.message(F.text.in_(button_texts('videos_btn')))
 async def btn_videos(message: Message):
     """Handle videos button"""
     await cmd_videos(message)
@@ -444,9 +361,7 @@ async def cmd_materials(message: Message):
         reply_markup=get_subjects_keyboard(user['language'])
     )
 
-@router.message(F.text.in_([
-    "📖 Материалы", "📖 Материалдар", "📖 Materials"
-]))
+@router.message(F.text.in_(button_texts('materials_btn')))
 async def btn_materials(message: Message):
     """Handle materials button"""
     await cmd_materials(message)
@@ -503,14 +418,11 @@ async def cmd_broadcast(message: Message, state: FSMContext):
         return
     
     broadcast_text = text_parts[1]
-    await message.answer("📤 Отправляю сообщение всем пользователям...")
-    
     result = await admin_manager.send_mass_notification(broadcast_text, message.from_user.id)
     
     await message.answer(
-        f"✅ Массовая рассылка завершена!\n"
-        f"📊 Успешно отправлено: {result['success']}\n"
-        f"❌ Ошибок: {result['errors']}"
+        f"📤 Рассылка #{result['job_id']} запущена для {result['total']} пользователей.\n"
+        f"Прогресс будет приходить в этот чат."
     )
 
 @router.message(Command("stats"))
@@ -551,14 +463,11 @@ async def admin_broadcast_callback(callback: CallbackQuery, state: FSMContext):
 @router.message(StateFilter(AdminStates.waiting_for_broadcast))
 async def process_broadcast_text(message: Message, state: FSMContext):
     """Process broadcast message text"""
-    await message.answer("📤 Отправляю сообщение всем пользователям...")
-    
     result = await admin_manager.send_mass_notification(message.text, message.from_user.id)
     
     await message.answer(
-        f"✅ Массовая рассылка завершена!\n"
-        f"📊 Успешно отправлено: {result['success']}\n"
-        f"❌ Ошибок: {result['errors']}"
+        f"📤 Рассылка #{result['job_id']} запущена для {result['total']} пользователей.\n"
+        f"Прогресс будет приходить в этот чат."
     )
     await state.clear()
 
@@ -1078,13 +987,37 @@ async def btn_admin_panel(message: Message):
 # Register router
 dp.include_router(router)
 
-async def main():
-    """Main function to run the bot"""
+# Background tasks started by on_startup()
+background_tasks = []
+
+async def on_startup():
+    """Prepare the bot before it takes updates (polling or webhook)"""
     # Initialize database
     await db.init_db()
     
-    # Start polling
-    await dp.start_polling(bot)
+    # Pick up points and users written by the API process
+    background_tasks.append(asyncio.create_task(db.resync_leaderboard()))
+    # Drop FSM states and test sessions nobody has touched for their TTL
+    background_tasks.append(asyncio.create_task(evict_expired_loop(db.pool)))
+    
+    # Pick up broadcasts interrupted by the last shutdown
+    await broadcaster.resume_pending()
+
+async def on_shutdown():
+    for task in background_tasks:
+        task.cancel()
+    background_tasks.clear()
+    await db.close()
+
+async def main():
+    """Main function to run the bot (polling; see bot_webhook.py for webhook mode)"""
+    try:
+        await on_startup()
+        
+        # Start polling
+        await dp.start_polling(bot)
+    finally:
+        await on_shutdown()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,205 @@
+"""
+Durable bot state kept in the shared SQLite database.
+SQLiteStorage is an aiogram FSM storage (state + data per chat/user), and
+TestSessionStore holds in-progress tests as compact records: the question ids
+plus the answers packed 2 bits per question and a bitmap of correct ones,
+instead of the full test rows. Both survive restarts, can be shared by several
+bot processes (every change is a single statement or an IMMEDIATE transaction),
+and expire entries that have not been touched for their TTL.
+"""
+
+import asyncio
+import json
+import time
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from config import BOT_STORAGE_SETTINGS
+
+ANSWER_LETTERS = "ABCD"
+# answers is a signed 64-bit SQLite integer holding 2 bits per question
+MAX_SESSION_QUESTIONS = 31
+
+
+def storage_key(key: StorageKey) -> str:
+    return f"{key.bot_id}:{key.chat_id}:{key.user_id}:{key.thread_id or 0}:{key.destiny}"
+
+
+class SQLiteStorage(BaseStorage):
+    """aiogram FSM storage on the fsm_storage table"""
+
+    def __init__(self, pool, ttl: Optional[float] = None):
+        self.pool = pool
+        self.ttl = ttl or BOT_STORAGE_SETTINGS['fsm_ttl_seconds']
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        value = state.state if isinstance(state, State) else state
+        async with self.pool.writer() as conn:
+            await conn.execute("""
+                INSERT INTO fsm_storage (storage_key, state, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(storage_key) DO UPDATE SET state = excluded.state, expires_at = excluded.expires_at
+            """, (storage_key(key), value, time.time() + self.ttl))
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        async with self.pool.reader() as conn:
+            async with conn.execute(
+                "SELECT state FROM fsm_storage WHERE storage_key = ? AND expires_at > ?",
+                (storage_key(key), time.time())
+            ) as cursor:
+                row = await cursor.fetchone()
+        return row[0] if row else None
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        async with self.pool.writer() as conn:
+            await conn.execute("""
+                INSERT INTO fsm_storage (storage_key, data, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(storage_key) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at
+            """, (storage_key(key), json.dumps(data, ensure_ascii=False), time.time() + self.ttl))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        async with self.pool.reader() as conn:
+            async with conn.execute(
+                "SELECT data FROM fsm_storage WHERE storage_key = ? AND expires_at > ?",
+                (storage_key(key), time.time())
+            ) as cursor:
+                row = await cursor.fetchone()
+        return json.loads(row[0]) if row and row[0] else {}
+
+    async def update_data(self, key: StorageKey, data: Dict[str, Any]) -> Dict[str, Any]:
+        # Read and write in one IMMEDIATE transaction, so two workers updating the
+        # same chat cannot lose each other's keys
+        async with self.pool.writer() as conn:
+            await conn.execute("BEGIN IMMEDIATE")
+            async with conn.execute(
+                "SELECT data FROM fsm_storage WHERE storage_key = ? AND expires_at > ?",
+                (storage_key(key), time.time())
+            ) as cursor:
+                row = await cursor.fetchone()
+            current = json.loads(row[0]) if row and row[0] else {}
+            current.update(data)
+            await conn.execute("""
+                INSERT INTO fsm_storage (storage_key, data, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(storage_key) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at
+            """, (storage_key(key), json.dumps(current, ensure_ascii=False), time.time() + self.ttl))
+        return current.copy()
+
+    async def close(self) -> None:
+        # The pool belongs to the Database
+        pass
+
+
+class TestSession:
+    """An in-progress test as stored in test_sessions"""
+
+    def __init__(self, user_id: int, subject: Optional[str], started_at: Optional[str], test_ids: List[int],
+                 position: int = 0, answers: int = 0, correct: int = 0):
+        self.user_id = user_id
+        self.subject = subject
+        self.started_at = started_at
+        self.test_ids = test_ids
+        self.position = position
+        self.answers = answers
+        self.correct = correct
+
+    @classmethod
+    def from_row(cls, row) -> "TestSession":
+        ids = array("I")
+        ids.frombytes(row["test_ids"])
+        return cls(row["user_id"], row["subject"], row["started_at"], ids.tolist(),
+                   row["position"], row["answers"], row["correct"])
+
+    @property
+    def total(self) -> int:
+        return len(self.test_ids)
+
+    @property
+    def finished(self) -> bool:
+        return self.position >= len(self.test_ids)
+
+    @property
+    def current_test_id(self) -> Optional[int]:
+        return None if self.finished else self.test_ids[self.position]
+
+    @property
+    def correct_count(self) -> int:
+        return bin(self.correct).count("1")
+
+    def answer(self, index: int) -> str:
+        return ANSWER_LETTERS[(self.answers >> (2 * index)) & 3]
+
+    def answered(self) -> List[Tuple[int, str]]:
+        """(test_id, answer letter) for every question answered so far"""
+        return [(self.test_ids[i], self.answer(i)) for i in range(min(self.position, len(self.test_ids)))]
+
+
+class TestSessionStore:
+    """Per-user test sessions on the test_sessions table"""
+
+    def __init__(self, pool, ttl: Optional[float] = None):
+        self.pool = pool
+        self.ttl = ttl or BOT_STORAGE_SETTINGS['test_session_ttl_seconds']
+
+    async def start(self, user_id: int, test_ids: List[int], subject: Optional[str] = None,
+                    started_at: Optional[str] = None) -> TestSession:
+        """Start (or restart) a user's test over the given questions"""
+        if not test_ids or len(test_ids) > MAX_SESSION_QUESTIONS:
+            raise ValueError(f"A test session needs 1..{MAX_SESSION_QUESTIONS} questions, got {len(test_ids)}")
+        async with self.pool.writer() as conn:
+            await conn.execute("""
+                INSERT OR REPLACE INTO test_sessions (user_id, subject, started_at, test_ids, position, answers,
+                                                      correct, expires_at)
+                VALUES (?, ?, ?, ?, 0, 0, 0, ?)
+            """, (user_id, subject, started_at, array("I", test_ids).tobytes(), time.time() + self.ttl))
+        return TestSession(user_id, subject, started_at, list(test_ids))
+
+    async def get(self, user_id: int) -> Optional[TestSession]:
+        async with self.pool.reader() as conn:
+            async with conn.execute(
+                "SELECT * FROM test_sessions WHERE user_id = ? AND expires_at > ?", (user_id, time.time())
+            ) as cursor:
+                row = await cursor.fetchone()
+        return TestSession.from_row(row) if row else None
+
+    async def record_answer(self, user_id: int, position: int, answer: str, is_correct: bool) -> Optional[TestSession]:
+        """Store the answer to question `position` and move on. Returns None if the session
+        is gone or that question was already answered (double tap, another worker)"""
+        code = ANSWER_LETTERS.index(answer)
+        async with self.pool.writer() as conn:
+            async with conn.execute("""
+                UPDATE test_sessions
+                SET answers = answers | (? << (2 * position)), correct = correct | (? << position),
+                    position = position + 1, expires_at = ?
+                WHERE user_id = ? AND position = ? AND expires_at > ?
+                RETURNING *
+            """, (code, int(is_correct), time.time() + self.ttl, user_id, position, time.time())) as cursor:
+                row = await cursor.fetchone()
+        return TestSession.from_row(row) if row else None
+
+    async def finish(self, user_id: int):
+        async with self.pool.writer() as conn:
+            await conn.execute("DELETE FROM test_sessions WHERE user_id = ?", (user_id,))
+
+
+async def evict_expired(pool) -> int:
+    """Delete expired FSM entries and abandoned test sessions; returns rows removed"""
+    now = time.time()
+    async with pool.writer() as conn:
+        fsm = await conn.execute("DELETE FROM fsm_storage WHERE expires_at <= ?", (now,))
+        sessions = await conn.execute("DELETE FROM test_sessions WHERE expires_at <= ?", (now,))
+        return fsm.rowcount + sessions.rowcount
+
+
+async def evict_expired_loop(pool, interval: Optional[float] = None):
+    """Run evict_expired() every interval seconds. Run as a task"""
+    interval = interval or BOT_STORAGE_SETTINGS['evict_interval_seconds']
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            removed = await evict_expired(pool)
+            if removed:
+                print(f"🧹 Evicted {removed} expired bot states and test sessions")
+        except Exception as e:
+            print(f"❌ Bot storage eviction failed: {e}")
@@ -0,0 +1,236 @@
+"""
+Webhook mode for the Telegram bot.
+Telegram POSTs each update to the webhook route, which hands it to an
+UpdateProcessor and answers at once. The processor runs updates concurrently
+(up to `concurrency` at a time) but one at a time per chat, in arrival order,
+so a user's taps are never handled out of order. At most `max_pending`
+updates may be accepted and unprocessed; past that the route answers 503 and
+Telegram delivers the update again later. On shutdown the processor stops
+accepting and drains what it has already acknowledged.
+
+Run standalone with `python bot_webhook.py`, or set BOT_WEBHOOK_IN_API=1 to
+serve the webhook from api_server (see WEBHOOK_SETTINGS in config.py).
+"""
+
+import asyncio
+import hmac
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional, Tuple
+
+from aiogram import Bot, Dispatcher
+from aiogram.dispatcher.middlewares.user_context import UserContextMiddleware
+from aiogram.types import Update
+from fastapi import APIRouter, FastAPI, HTTPException, Request
+
+from config import WEBHOOK_SETTINGS
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def update_chat_key(update: Update) -> Hashable:
+    """The ordering key of an update: its chat, else its user, else the update itself"""
+    chat, user, _ = UserContextMiddleware.resolve_event_context(update)
+    if chat:
+        return chat.id
+    if user:
+        return user.id
+    return ("update", update.update_id)
+
+
+class UpdateProcessor:
+    """Bounded, per-chat ordered concurrent processing of updates"""
+
+    def __init__(self, handle: Callable[[Any], Awaitable[Any]], max_pending: Optional[int] = None,
+                 concurrency: Optional[int] = None):
+        self.handle = handle
+        self.max_pending = max_pending or WEBHOOK_SETTINGS['max_pending']
+        self.concurrency = concurrency or WEBHOOK_SETTINGS['concurrency']
+        self.slots = asyncio.Semaphore(self.concurrency)
+        # chat key -> updates waiting for that chat; the head is the one being processed
+        self.lanes: Dict[Hashable, Deque[Tuple[Any, float]]] = {}
+        self.tasks = set()
+        self.accepting = True
+        self.pending = 0
+        self.in_flight = 0
+        self.idle = asyncio.Event()
+        self.idle.set()
+        self.received = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.max_pending_seen = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.handle_total = 0.0
+
+    def submit(self, update: Any, key: Hashable) -> bool:
+        """Accept an update for processing; False if draining or the queue is full"""
+        if not self.accepting or self.pending >= self.max_pending:
+            self.rejected += 1
+            return False
+        self.received += 1
+        self.pending += 1
+        self.max_pending_seen = max(self.max_pending_seen, self.pending)
+        self.idle.clear()
+        lane = self.lanes.get(key)
+        if lane is not None:
+            lane.append((update, time.monotonic()))
+            return True
+        self.lanes[key] = deque([(update, time.monotonic())])
+        task = asyncio.create_task(self._run_lane(key))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return True
+
+    async def _run_lane(self, key: Hashable):
+        lane = self.lanes[key]
+        try:
+            while lane:
+                update, queued_at = lane[0]
+                async with self.slots:
+                    started = time.monotonic()
+                    waited = started - queued_at
+                    self.wait_total += waited
+                    self.wait_max = max(self.wait_max, waited)
+                    self.in_flight += 1
+                    try:
+                        await self.handle(update)
+                        self.processed += 1
+                    except Exception as e:
+                        self.failed += 1
+                        print(f"❌ Update failed: {type(e).__name__}: {e}")
+                    finally:
+                        self.in_flight -= 1
+                        self.handle_total += time.monotonic() - started
+                lane.popleft()
+                self.pending -= 1
+        finally:
+            del self.lanes[key]
+            if not self.lanes:
+                self.idle.set()
+
+    async def drain(self, timeout: Optional[float] = None) -> bool:
+        """Stop accepting updates and wait for the accepted ones. Returns False if the
+        timeout ran out first; whatever was still running is then cancelled"""
+        self.accepting = False
+        try:
+            await asyncio.wait_for(self.idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            for task in list(self.tasks):
+                task.cancel()
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+            return False
+
+    def metrics(self) -> Dict:
+        done = self.processed + self.failed
+        return {
+            'accepting': self.accepting,
+            'pending': self.pending,
+            'max_pending': self.max_pending,
+            'max_pending_seen': self.max_pending_seen,
+            'in_flight': self.in_flight,
+            'concurrency': self.concurrency,
+            'active_chats': len(self.lanes),
+            'received': self.received,
+            'processed': self.processed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'avg_wait_ms': round(self.wait_total / done * 1000, 2) if done else 0.0,
+            'max_wait_ms': round(self.wait_max * 1000, 2),
+            'avg_handle_ms': round(self.handle_total / done * 1000, 2) if done else 0.0,
+        }
+
+
+def webhook_router(bot: Bot, processor: UpdateProcessor, path: Optional[str] = None,
+                   secret_token: Optional[str] = None) -> APIRouter:
+    """FastAPI routes for the webhook (POST path) and its metrics (GET path/metrics)"""
+    path = path or WEBHOOK_SETTINGS['path']
+    router = APIRouter()
+
+    @router.post(path, include_in_schema=False)
+    async def telegram_webhook(request: Request):
+        if secret_token and not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), secret_token):
+            raise HTTPException(status_code=401, detail="Invalid secret token")
+        update = Update.model_validate(await request.json(), context={"bot": bot})
+        if not processor.submit(update, update_chat_key(update)):
+            # Not acknowledged, so Telegram keeps the update and retries
+            raise HTTPException(status_code=503, detail="Not accepting updates right now", headers={"Retry-After": "1"})
+        return {"ok": True}
+
+    @router.get(f"{path}/metrics")
+    async def telegram_webhook_metrics():
+        return processor.metrics()
+
+    return router
+
+
+class BotWebhook:
+    """A bot served through the webhook: the processor, its routes, startup and shutdown"""
+
+    def __init__(self, bot: Bot, dp: Dispatcher, on_startup: Callable[[], Awaitable[Any]] = None,
+                 on_shutdown: Callable[[], Awaitable[Any]] = None, settings: Dict = None):
+        self.bot = bot
+        self.dp = dp
+        self.on_startup = on_startup
+        self.on_shutdown = on_shutdown
+        self.settings = {**WEBHOOK_SETTINGS, **(settings or {})}
+        self.processor = UpdateProcessor(
+            lambda update: dp.feed_update(bot, update),
+            max_pending=self.settings['max_pending'], concurrency=self.settings['concurrency']
+        )
+        self.router = webhook_router(bot, self.processor, self.settings['path'], self.settings['secret_token'])
+
+    async def start(self):
+        if self.on_startup:
+            await self.on_startup()
+        await self.dp.emit_startup(bot=self.bot)
+        if self.settings['url']:
+            await self.bot.set_webhook(
+                self.settings['url'].rstrip('/') + self.settings['path'],
+                secret_token=self.settings['secret_token'],
+                max_connections=self.settings['max_connections'],
+                allowed_updates=self.dp.resolve_used_update_types(),
+            )
+            print(f"✅ Bot webhook set to {self.settings['url']}")
+        else:
+            print("⚠️ BOT_WEBHOOK_URL is not set; the webhook is served but not registered with Telegram")
+
+    async def stop(self):
+        # The webhook stays registered: Telegram holds new updates until a server is back
+        drained = await self.processor.drain(self.settings['drain_timeout_seconds'])
+        print(f"{'✅' if drained else '⚠️'} Bot webhook drained: {self.processor.metrics()}")
+        try:
+            await self.dp.emit_shutdown(bot=self.bot)
+            if self.on_shutdown:
+                await self.on_shutdown()
+        finally:
+            await self.bot.session.close()
+
+
+def bot_webhook_from_bot_module() -> BotWebhook:
+    """The BotWebhook for bot.py's bot and dispatcher (imported here: it needs BOT_TOKEN)"""
+    import bot as bot_app
+    return BotWebhook(bot_app.bot, bot_app.dp, bot_app.on_startup, bot_app.on_shutdown)
+
+
+def create_app(webhook: BotWebhook) -> FastAPI:
+    """A standalone app that serves only the webhook"""
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        await webhook.start()
+        yield
+        await webhook.stop()
+
+    app = FastAPI(title="Physics Bot webhook", lifespan=lifespan)
+    app.include_router(webhook.router)
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(create_app(bot_webhook_from_bot_module()), host=WEBHOOK_SETTINGS['host'],
+                port=WEBHOOK_SETTINGS['port'], log_level="info")
@@ -0,0 +1,250 @@
+"""
+Background broadcast engine for Telegram mass notifications.
+Recipients are snapshotted into broadcast_recipients when a job starts, then a
+bounded pool of workers sends through a global token bucket. RetryAfter backs
+off only the affected chat, results are flushed to the database in batches so
+an interrupted job resumes where it stopped, and progress is reported by
+editing a message in the admin chat.
+"""
+
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+
+from config import BROADCAST_SETTINGS
+
+PENDING_CHUNK = 500  # recipients loaded per query
+FLUSH_EVERY = 100  # results buffered before they are written
+
+
+class TokenBucket:
+    """Global send rate limiter: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        # The lock queues waiters so tokens are handed out in FIFO order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class BroadcastEngine:
+    def __init__(self, bot, db, rate: float = None, burst: float = None, workers: int = None,
+                 max_attempts: int = None, progress_interval: float = None):
+        self.bot = bot
+        self.db = db
+        self.bucket = TokenBucket(rate or BROADCAST_SETTINGS['messages_per_second'],
+                                  burst or BROADCAST_SETTINGS['burst'])
+        self.workers = workers or BROADCAST_SETTINGS['workers']
+        self.max_attempts = max_attempts or BROADCAST_SETTINGS['max_attempts']
+        self.progress_interval = progress_interval or BROADCAST_SETTINGS['progress_interval_seconds']
+        self.tasks: Dict[int, asyncio.Task] = {}
+
+    # Job state
+
+    async def create_job(self, text: str, admin_id: int, parse_mode: Optional[str] = None) -> Tuple[int, int]:
+        """Persist a job and snapshot its recipients (everyone except the sender)"""
+        async with self.db.pool.writer() as conn:
+            cursor = await conn.execute(
+                "INSERT INTO broadcast_jobs (admin_id, text, parse_mode) VALUES (?, ?, ?)",
+                (admin_id, text, parse_mode)
+            )
+            job_id = cursor.lastrowid
+            cursor = await conn.execute("""
+                INSERT INTO broadcast_recipients (job_id, telegram_id)
+                SELECT ?, telegram_id FROM users WHERE telegram_id != ?
+            """, (job_id, admin_id))
+            total = cursor.rowcount
+            await conn.execute("UPDATE broadcast_jobs SET total = ? WHERE id = ?", (total, job_id))
+            await conn.commit()
+        return job_id, total
+
+    async def get_job(self, job_id: int) -> Optional[Dict]:
+        async with self.db.pool.reader() as conn:
+            async with conn.execute("SELECT * FROM broadcast_jobs WHERE id = ?", (job_id,)) as cursor:
+                row = await cursor.fetchone()
+                return dict(row) if row else None
+
+    async def _pending_chunks(self, job_id: int):
+        """Pending recipients in telegram_id order, PENDING_CHUNK at a time"""
+        last_id = None
+        while True:
+            async with self.db.pool.reader() as conn:
+                async with conn.execute("""
+                    SELECT telegram_id FROM broadcast_recipients
+                    WHERE job_id = ? AND status = 'pending' AND telegram_id > COALESCE(?, -9223372036854775808)
+                    ORDER BY telegram_id
+                    LIMIT ?
+                """, (job_id, last_id, PENDING_CHUNK)) as cursor:
+                    rows = await cursor.fetchall()
+            if not rows:
+                return
+            yield [row[0] for row in rows]
+            last_id = rows[-1][0]
+
+    async def _flush(self, job_id: int, results: List[Tuple[str, int, Optional[str], int]]):
+        """Write buffered (status, attempts, error, telegram_id) results and bump the job counters"""
+        if not results:
+            return
+        batch = results[:]
+        del results[:]
+        sent = sum(1 for status, *_ in batch if status == 'sent')
+        async with self.db.pool.writer() as conn:
+            await conn.executemany(
+                "UPDATE broadcast_recipients SET status = ?, attempts = ?, error = ? WHERE job_id = ? AND telegram_id = ?",
+                [(status, attempts, error, job_id, telegram_id) for status, attempts, error, telegram_id in batch]
+            )
+            await conn.execute("""
+                UPDATE broadcast_jobs SET sent = sent + ?, failed = failed + ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (sent, len(batch) - sent, job_id))
+            await conn.commit()
+
+    # Sending
+
+    async def _deliver(self, job: Dict, chat_id: int) -> Tuple[str, int, Optional[str], int]:
+        attempts = 0
+        while True:
+            attempts += 1
+            await self.bucket.acquire()
+            try:
+                await self.bot.send_message(chat_id=chat_id, text=job['text'], parse_mode=job['parse_mode'])
+                return 'sent', attempts, None, chat_id
+            except TelegramRetryAfter as e:
+                if attempts >= self.max_attempts:
+                    return 'failed', attempts, str(e), chat_id
+                # Only this worker (and chat) waits; the others keep draining the queue
+                await asyncio.sleep(e.retry_after)
+            except TelegramForbiddenError as e:
+                return 'blocked', attempts, str(e), chat_id
+            except Exception as e:
+                print(f"Failed to send message to {chat_id}: {e}")
+                return 'failed', attempts, str(e), chat_id
+
+    async def _worker(self, job: Dict, queue: asyncio.Queue, results: list):
+        while True:
+            chat_id = await queue.get()
+            if chat_id is None:
+                return
+            results.append(await self._deliver(job, chat_id))
+            if len(results) >= FLUSH_EVERY:
+                await self._flush(job['id'], results)
+
+    async def _report(self, job_id: int, progress_message, final: bool = False):
+        """Send (progress_message is None) or edit the admin's progress message; returns it"""
+        job = await self.get_job(job_id)
+        if final and job['status'] == 'failed':
+            text = (f"❌ Рассылка #{job_id} остановлена из-за ошибки\n"
+                    f"📊 Успешно отправлено: {job['sent']} из {job['total']}")
+        elif final:
+            text = (f"✅ Рассылка #{job_id} завершена!\n"
+                    f"📊 Успешно отправлено: {job['sent']}\n"
+                    f"❌ Ошибок: {job['failed']}")
+        else:
+            done = job['sent'] + job['failed']
+            text = f"📤 Рассылка #{job_id}: {done}/{job['total']}\n✅ {job['sent']}  ❌ {job['failed']}"
+        try:
+            if progress_message is None:
+                return await self.bot.send_message(chat_id=job['admin_id'], text=text)
+            await self.bot.edit_message_text(text=text, chat_id=progress_message.chat.id,
+                                             message_id=progress_message.message_id)
+        except Exception as e:
+            print(f"⚠️ Could not report broadcast progress: {e}")
+        return progress_message
+
+    async def run(self, job_id: int):
+        """Send every pending recipient of a job, then mark it done"""
+        job = await self.get_job(job_id)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.workers * 4)
+        results: list = []
+        progress_message = await self._report(job_id, None)
+
+        async def report_progress():
+            nonlocal progress_message
+            while True:
+                await asyncio.sleep(self.progress_interval)
+                try:
+                    await self._flush(job_id, results)
+                    # Keep the message we got back, so a failed first send is retried once, then edited
+                    progress_message = await self._report(job_id, progress_message)
+                except Exception as e:
+                    print(f"⚠️ Broadcast #{job_id} progress update failed: {e}")
+
+        async def produce():
+            async for chunk in self._pending_chunks(job_id):
+                for chat_id in chunk:
+                    await queue.put(chat_id)
+            for _ in workers:
+                await queue.put(None)
+
+        workers = [asyncio.create_task(self._worker(job, queue, results)) for _ in range(self.workers)]
+        producer = asyncio.create_task(produce())
+        reporter = asyncio.create_task(report_progress())
+        status = 'done'
+        try:
+            # A crashed worker must not leave the producer blocked on a full queue
+            done, _ = await asyncio.wait([producer, *workers], return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if task.exception():
+                    raise task.exception()
+        except Exception as e:
+            status = 'failed'
+            print(f"❌ Broadcast #{job_id} failed: {e}")
+        finally:
+            reporter.cancel()
+            producer.cancel()
+            for worker in workers:
+                worker.cancel()
+            # Keep whatever was delivered so a resumed job skips it
+            try:
+                await self._flush(job_id, results)
+            except Exception as e:
+                status = 'failed'
+                print(f"❌ Broadcast #{job_id} could not save results: {e}")
+
+        async with self.db.pool.writer() as conn:
+            await conn.execute("""
+                UPDATE broadcast_jobs SET status = ?, finished_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (status, job_id))
+            await conn.commit()
+        await self._report(job_id, progress_message, final=True)
+        print(f"{'✅' if status == 'done' else '❌'} Broadcast #{job_id} {'finished' if status == 'done' else 'failed'}")
+
+    def _spawn(self, job_id: int) -> asyncio.Task:
+        task = asyncio.create_task(self.run(job_id))
+        self.tasks[job_id] = task
+        task.add_done_callback(lambda _: self.tasks.pop(job_id, None))
+        return task
+
+    async def start(self, text: str, admin_id: int, parse_mode: Optional[str] = None) -> Dict[str, int]:
+        """Create a job and send it in the background; returns immediately"""
+        job_id, total = await self.create_job(text, admin_id, parse_mode)
+        self._spawn(job_id)
+        print(f"📢 Broadcast #{job_id} started for {total} users")
+        return {"job_id": job_id, "total": total}
+
+    async def resume_pending(self) -> List[int]:
+        """Restart jobs interrupted by a shutdown (call once at startup)"""
+        async with self.db.pool.reader() as conn:
+            async with conn.execute("SELECT id FROM broadcast_jobs WHERE status = 'running'") as cursor:
+                job_ids = [row[0] for row in await cursor.fetchall()]
+        for job_id in job_ids:
+            if job_id not in self.tasks:
+                print(f"🔄 Resuming broadcast #{job_id}")
+                self._spawn(job_id)
+        return job_ids
@@ -9,6 +9,7 @@ async def clear_database():
     # Initialize database with proper schema
     db_instance = Database(db_path)
     await db_instance.init_db()
+    await db_instance.close()
     print("✅ Database schema initialized")
     
     async with aiosqlite.connect(db_path) as db:
@@ -40,8 +40,8 @@ const Materials = ({ materials: propMaterials = [] }) => {
         thumbnail: getTypeIcon(item.type),
         description: item.description || 'Описание отсутствует',
         isBookmarked: false,
-        progress: 0,
-        content: item.content
+        progress: 0
+        // content is not part of the list; fetch it with apiClient.getMaterial(id) when opened
       }));
       
       setMaterials(formattedMaterials);
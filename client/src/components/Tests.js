@@ -221,15 +221,18 @@ const Tests = () => {
       
       const newScore = testSession.score + (isCorrect ? 1 : 0);
       
-      // Submit answer to API
-      try {
-        await apiClient.submitTestAnswer({
-          test_id: currentQuestion.id,
-          answer: answer,
-          user_id: 12345 // Mock user ID
-        });
-      } catch (error) {
-        console.log('Answer submission failed, continuing offline');
+      // Submit the whole attempt once the last question is answered; the server scores it
+      if (testSession.currentQuestion + 1 >= tests.length) {
+        try {
+          await apiClient.submitTestAttempt({
+            user_id: 12345, // Mock user ID
+            subject: testSession.subject,
+            started_at: testSession.startTime.toISOString(),
+            answers: newAnswers.map(a => ({ test_id: a.questionId, answer: a.answer }))
+          });
+        } catch (error) {
+          console.log('Attempt submission failed, continuing offline');
+        }
       }
       
       setTestSession({
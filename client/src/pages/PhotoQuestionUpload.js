@@ -95,7 +95,7 @@ const PhotoQuestionUpload = ({ onQuestionCreated }) => {
 
   const loadVirtualQuestions = async () => {
     try {
-      const response = await apiClient.getVirtualQuestions();
+      const response = await apiClient.getVirtualQuestions({ limit: 6 });
       setUploadedQuestions(response.questions || []);
     } catch (error) {
       console.error('❌ Error loading virtual questions:', error);
@@ -174,7 +174,7 @@ const PhotoQuestionUpload = ({ onQuestionCreated }) => {
               <div className="original-photo-display">
                 <h4>📸 Загруженное изображение:</h4>
                 <img 
-                  src={processedQuestion.original_photo} 
+                  src={apiClient.blobUrl(processedQuestion.original_photo)} 
                   alt="Загруженная задача" 
                   className="uploaded-image-display"
                 />
@@ -221,7 +221,7 @@ const PhotoQuestionUpload = ({ onQuestionCreated }) => {
                 {question.original_photo && (
                   <div className="original-photo-display">
                     <img 
-                      src={question.original_photo} 
+                      src={apiClient.blobUrl(question.thumbnail || question.original_photo)} 
                       alt="Загруженная задача" 
                       className="uploaded-image-display"
                     />
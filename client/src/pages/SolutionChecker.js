@@ -80,7 +80,7 @@ const SolutionChecker = () => {
 
   const loadRecentAnalyses = async () => {
     try {
-      const response = await apiClient.getSolutionAnalyses();
+      const response = await apiClient.getSolutionAnalyses({ limit: 6 });
       setRecentAnalyses(response.analyses || []);
     } catch (error) {
       console.error('❌ Error loading analyses:', error);
@@ -173,7 +173,7 @@ const SolutionChecker = () => {
             <div className="original-solution">
               <h4>📝 Ваше решение:</h4>
               <img 
-                src={analysis.original_photo} 
+                src={apiClient.blobUrl(analysis.original_photo)} 
                 alt="Проверенное решение" 
                 className="solution-image"
               />
@@ -233,7 +233,7 @@ const SolutionChecker = () => {
                 {analysisItem.original_photo && (
                   <div className="card-photo">
                     <img 
-                      src={analysisItem.original_photo} 
+                      src={apiClient.blobUrl(analysisItem.thumbnail || analysisItem.original_photo)} 
                       alt="Проверенное решение" 
                       className="card-solution-image"
                     />
@@ -14,12 +14,34 @@ class ApiClient {
     return response.json();
   }
 
+  // Photos are served by the API as /api/blobs/<sha256>; make those paths absolute
+  blobUrl(path) {
+    return path && path.startsWith('/') ? `${this.baseURL}${path}` : path;
+  }
+
   // Get all materials
   async getMaterials() {
     const response = await fetch(`${this.baseURL}/api/materials`);
     return this.handleResponse(response);
   }
 
+  // Get published materials for students, following X-Next-Cursor until the last page.
+  // List rows carry no content/attachments; load those with getMaterial(id)
+  async getMaterialsForStudent(userId = null, category = null) {
+    const materials = [];
+    let cursor = null;
+    do {
+      const params = new URLSearchParams({ limit: '200' });
+      if (userId) params.set('user_id', userId);
+      if (category) params.set('category', category);
+      if (cursor) params.set('cursor', cursor);
+      const response = await fetch(`${this.baseURL}/api/materials/published?${params}`);
+      materials.push(...(await this.handleResponse(response)));
+      cursor = response.headers.get('X-Next-Cursor');
+    } while (cursor);
+    return materials;
+  }
+
   // Get material by ID
   async getMaterial(id) {
     const response = await fetch(`${this.baseURL}/api/materials/${id}`);
@@ -138,9 +160,10 @@ class ApiClient {
     return response.json();
   }
 
-  // Get all virtual questions
-  async getVirtualQuestions() {
-    const response = await fetch(`${this.baseURL}/api/ai/virtual-questions`);
+  // Get a page of virtual questions (summary; pass next_cursor back as cursor for the next page)
+  async getVirtualQuestions(params = {}) {
+    const query = new URLSearchParams(params).toString();
+    const response = await fetch(`${this.baseURL}/api/ai/virtual-questions${query ? `?${query}` : ''}`);
     
     if (!response.ok) {
       throw new Error(`HTTP error! status: ${response.status}`);
@@ -170,6 +193,23 @@ class ApiClient {
     return await response.json();
   }
 
+  // Submit a finished test; the server scores it and returns the updated counters
+  async submitTestAttempt(attempt) {
+    const response = await fetch(`${this.baseURL}/api/tests/attempts`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify(attempt)
+    });
+    
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    
+    return response.json();
+  }
+
   // Check solution photo with AI
   async checkSolutionPhoto(photoFile) {
     const formData = new FormData();
@@ -187,9 +227,10 @@ class ApiClient {
     return response.json();
   }
 
-  // Get all solution analyses
-  async getSolutionAnalyses() {
-    const response = await fetch(`${this.baseURL}/api/ai/solution-analyses`);
+  // Get a page of solution analyses (summary; pass next_cursor back as cursor for the next page)
+  async getSolutionAnalyses(params = {}) {
+    const query = new URLSearchParams(params).toString();
+    const response = await fetch(`${this.baseURL}/api/ai/solution-analyses${query ? `?${query}` : ''}`);
     
     if (!response.ok) {
       throw new Error(`HTTP error! status: ${response.status}`);
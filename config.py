@@ -2,6 +2,7 @@
 Configuration file for the ЕНТ preparation bot
 Add admin/teacher user IDs here
 """
+import os
 
 # Admin/Teacher user IDs - add your teacher IDs here
 # To get your Telegram user ID, send a message to @userinfobot
@@ -23,6 +24,126 @@ BOT_SETTINGS = {
     'max_test_questions': 10,
 }
 
+# Mass notification settings (Telegram allows ~30 messages/second per bot)
+BROADCAST_SETTINGS = {
+    'messages_per_second': 25,
+    'burst': 25,
+    'workers': 16,
+    'max_attempts': 3,
+    'progress_interval_seconds': 10,
+}
+
+# How often the bot and the API reseed their in-memory leaderboards from the users table
+LEADERBOARD_RESYNC_SECONDS = int(os.environ.get('LEADERBOARD_RESYNC_SECONDS', 300))
+
+# Bot FSM state and in-progress test sessions live in the SQLite database, so they survive
+# restarts and several bot workers can share them. Untouched entries expire after the TTLs
+BOT_STORAGE_SETTINGS = {
+    'fsm_ttl_seconds': 7 * 24 * 60 * 60,
+    'test_session_ttl_seconds': 2 * 60 * 60,
+    'evict_interval_seconds': 600,
+}
+
+# Bot answer flow: users' languages and the questions of running tests are cached per
+# process (a language changed through another worker shows up after the TTL)
+ANSWER_FLOW_SETTINGS = {
+    'language_cache_size': 10_000,
+    'language_ttl_seconds': 600,
+    'question_cache_size': 5_000,
+    'question_ttl_seconds': 600,
+}
+
+# Question bank (question_bank.py): test ids per subject/language/difficulty are held in memory.
+# A change to the tests table from this process shows at once, from another process after at
+# most version_check_seconds. Tests avoid the questions of a user's last recent_questions answers
+QUESTION_BANK_SETTINGS = {
+    'version_check_seconds': 2,
+    'recent_questions': 50,
+}
+
+# Adaptive test selection (skill_model.py). Abilities and question difficulties are Elo/Rasch
+# ratings in logits; each answer moves them by a step that shrinks from *_k to *_k_min as
+# the estimate collects answers. A test is drawn at random from the `candidates` + k - 1 unseen
+# questions whose difficulty is nearest the user's ability, among those rated by at least
+# min_rating_answers answers; explore_share of each test is drawn uniformly instead, so new
+# questions get rated (label-only ratings are too rough to aim with). The sorted rating index
+# of a pool is rebuilt after resort_every rating updates, and ratings written by other
+# processes are picked up every resync_seconds
+ADAPTIVE_SETTINGS = {
+    'user_k': 0.6,
+    'user_k_min': 0.1,
+    'question_k': 0.3,
+    'question_k_min': 0.02,
+    'decay_answers': 10,
+    'candidates': 5,
+    'min_rating_answers': 5,
+    'explore_share': 0.2,
+    'resort_every': 1000,
+    'resync_seconds': 300,
+    'difficulty_priors': {'easy': -1.0, 'medium': 0.0, 'hard': 1.0},
+}
+
+# Telegram webhook mode (bot_webhook.py). Updates are processed concurrently, in order per
+# chat, with at most max_pending accepted and unprocessed; past that the webhook answers 503
+# and Telegram delivers the update again later. Set BOT_WEBHOOK_IN_API=1 to serve the
+# webhook from api_server instead of running bot_webhook.py on its own
+WEBHOOK_SETTINGS = {
+    'url': os.environ.get('BOT_WEBHOOK_URL') or None,
+    'path': '/telegram/webhook',
+    'secret_token': os.environ.get('BOT_WEBHOOK_SECRET') or None,
+    'mount_in_api': os.environ.get('BOT_WEBHOOK_IN_API') == '1',
+    'host': '0.0.0.0',
+    'port': int(os.environ.get('BOT_WEBHOOK_PORT', 8080)),
+    'max_pending': 1000,
+    'concurrency': 64,
+    'max_connections': 40,
+    'drain_timeout_seconds': 30,
+}
+
+# Read-through cache for material detail/list queries. Writes through Database (and the
+# API's own material endpoints) invalidate it at once; writes made by another process
+# (e.g. the bot) only show up after ttl_seconds, since each process has its own cache
+MATERIAL_CACHE_SETTINGS = {
+    'max_entries': 512,
+    'ttl_seconds': 60,
+}
+
+# Teacher/admin dashboard figures are cached this long per process; counts may lag
+# writes by up to ttl_seconds
+DASHBOARD_STATS_SETTINGS = {
+    'ttl_seconds': 15,
+    'top_performers': 5,
+    'week_days': 7,
+}
+
+# Free-form answer checking (answer_checker.py): numeric answers match within rel_tolerance of
+# the correct value, or abs_tolerance when that is larger (so a correct 0 can match); a batch
+# request checks at most max_batch answers
+ANSWER_CHECK_SETTINGS = {
+    'rel_tolerance': 0.05,
+    'abs_tolerance': 1e-9,
+    'max_batch': 1000,
+    'parse_cache_size': 65536,
+}
+
+# Generated physics problems (question_templates.py): the question pool holds up to per_template
+# problems of each template, drawn with this seed, so ids and texts are the same on every start
+QUESTION_TEMPLATE_SETTINGS = {
+    'per_template': 2000,
+    'seed': 2024,
+}
+
+# Photo uploads: size cap, and how the image kept for a question/solution is re-encoded
+UPLOAD_SETTINGS = {
+    'max_bytes': 10 * 1024 * 1024,
+    'max_pixels': 50_000_000,
+    'max_side': 1600,
+    'thumbnail_side': 320,
+    'jpeg_quality': 82,
+    'workers': int(os.environ.get('UPLOAD_WORKERS', 2)),
+    'tmp_dir': os.environ.get('UPLOAD_TMP_DIR') or None,
+}
+
 # Database settings
 DATABASE_SETTINGS = {
     'db_path': 'ent_bot.db',
@@ -0,0 +1,37 @@
+"""
+Shared pytest fixtures
+"""
+from contextlib import asynccontextmanager
+
+import pytest
+
+from database import Database
+
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+    """Factory for a migrated Database in tmp_path, used as
+    `async with sqlite_db(users=[(telegram_id, first_name), ...]) as db:`.
+    The pool is always closed on exit, so a failing test fails instead of hanging"""
+    @asynccontextmanager
+    async def open_db(users=()):
+        db = Database(str(tmp_path / "test.db"))
+        try:
+            await db.init_db()
+            if users:
+                async with db.pool.writer() as conn:
+                    await conn.executemany("INSERT INTO users (telegram_id, first_name) VALUES (?, ?)", users)
+                await db.load_leaderboard()
+            yield db
+        finally:
+            await db.close()
+
+    return open_db
+
+
+@pytest.fixture(autouse=True)
+def upload_executor():
+    """Stop the upload process pool a test may have started, so its event loop can go away with it"""
+    yield
+    from upload_pipeline import shutdown_executor
+    shutdown_executor()
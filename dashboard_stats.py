@@ -0,0 +1,53 @@
+"""
+Teacher/admin dashboard statistics.
+Each backend answers get_dashboard_totals(since) with one aggregate statement
+(user counts by role and activity, points, scores, the test bank, materials and
+the last week's activity) and get_top_performers(limit) from an index, so a
+dashboard never loads users, tests or materials into Python just to count them.
+The combined figures are cached for a few seconds: a dashboard refresh storm
+costs one query per TTL, and no query grows with the size of the class.
+"""
+
+from datetime import date, timedelta
+from typing import Any, Dict, Optional
+
+from config import DASHBOARD_STATS_SETTINGS
+from ttl_cache import TTLCache
+
+
+class DashboardStats:
+    def __init__(self, db, ttl: Optional[float] = None):
+        # db: Database or PostgresDatabase
+        self.db = db
+        self.cache = TTLCache(maxsize=8, ttl=DASHBOARD_STATS_SETTINGS['ttl_seconds'] if ttl is None else ttl)
+
+    async def get(self, today: Optional[date] = None) -> Dict[str, Any]:
+        """All dashboard figures (read-only, shared between callers until the TTL expires)"""
+        since = (today or date.today()) - timedelta(days=DASHBOARD_STATS_SETTINGS['week_days'] - 1)
+        return await self.cache.get_or_load(('dashboard', since), lambda: self._load(since))
+
+    def invalidate(self):
+        self.cache.invalidate()
+
+    async def _load(self, since: date) -> Dict[str, Any]:
+        totals = await self.db.get_dashboard_totals(since)
+        students = totals['students']
+        return {
+            "total_users": totals['total_users'],
+            "total_students": students,
+            "total_teachers": totals['teachers'],
+            "active_students": totals['active_students'],
+            "inactive_students": students - totals['active_students'],
+            "avg_points": round(totals['student_points'] / students, 1) if students else 0,
+            "avg_student_score": round(totals['student_score_sum'] / students, 1) if students else 0,
+            "total_tests_taken": totals['tests_taken'],
+            "total_tests": totals['tests'],
+            # SQLite's test bank has no active flag: every question is live
+            "active_tests": totals.get('active_tests', totals['tests']),
+            "total_materials": totals['materials'],
+            "published_materials": totals['published_materials'],
+            "active_students_week": totals['active_students_week'],
+            "tests_taken_week": totals['tests_week'],
+            "study_minutes_week": round(totals['time_seconds_week'] / 60),
+            "top_performers": await self.db.get_top_performers(DASHBOARD_STATS_SETTINGS['top_performers']),
+        }
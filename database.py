@@ -1,202 +1,109 @@
 import aiosqlite
 import asyncio
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple
 import json
+from datetime import date, datetime, timedelta
+
+from config import BOT_SETTINGS, LEADERBOARD_RESYNC_SECONDS, MATERIAL_CACHE_SETTINGS
+from database_migrations import run_sqlite_migrations
+from database_pool import SQLitePool
+from dashboard_stats import DashboardStats
+from leaderboard import Leaderboard, PROFILE_FIELDS
+from question_bank import QuestionBank
+from skill_model import elo_update, prior_difficulty
+from ttl_cache import TTLCache
+
+# An attempt left open longer than this (tab forgotten overnight) counts as this long
+MAX_ATTEMPT_SECONDS = 2 * 60 * 60
+
+
+def _elapsed_seconds(started_at: Optional[str]) -> int:
+    """Seconds from an ISO started_at to now, clamped to [0, MAX_ATTEMPT_SECONDS]; 0 if unknown"""
+    if not started_at:
+        return 0
+    try:
+        started = datetime.fromisoformat(started_at)
+    except ValueError:
+        return 0
+    now = datetime.now(started.tzinfo) if started.tzinfo else datetime.now()
+    return int(min(max((now - started).total_seconds(), 0), MAX_ATTEMPT_SECONDS))
+
 
 class Database:
-    def __init__(self, db_path: str = "ent_bot.db"):
+    def __init__(self, db_path: str = "ent_bot.db", pool: Optional[SQLitePool] = None):
         self.db_path = db_path
+        # Shared pool (owned by the API lifespan); standalone users get a lazy private pool
+        self.pool = pool or SQLitePool(db_path)
+        self._owns_pool = pool is None
+        # In-memory ranking, seeded by init_db and kept current by the write paths below
+        self.leaderboard = Leaderboard()
+        # Material detail/list results; every material write below invalidates it
+        self.material_cache = TTLCache(MATERIAL_CACHE_SETTINGS['max_entries'], MATERIAL_CACHE_SETTINGS['ttl_seconds'])
+        # Teacher/admin dashboard figures, cached for a few seconds
+        self.stats = DashboardStats(self)
+        # Test question ids per subject/language/difficulty, for random test selection
+        self.question_bank = QuestionBank(self)
     
+    async def close(self):
+        """Close the private pool (a shared pool is closed by its owner).
+        Must be awaited before exit: open pool connections keep the process alive"""
+        if self._owns_pool:
+            await self.pool.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
     async def init_db(self):
-        """Initialize database with all required tables"""
-        async with aiosqlite.connect(self.db_path) as db:
-            # Check if attachments column exists, if not add it
-            cursor = await db.execute("PRAGMA table_info(materials)")
-            columns = await cursor.fetchall()
-            column_names = [col[1] for col in columns]
-            
-            if 'attachments' not in column_names:
-                await db.execute("ALTER TABLE materials ADD COLUMN attachments TEXT")
-                print("✅ Added attachments column to materials table")
-            # Users table
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY,
-                    telegram_id INTEGER UNIQUE NOT NULL,
-                    username TEXT,
-                    first_name TEXT,
-                    last_name TEXT,
-                    language TEXT DEFAULT 'ru',
-                    points INTEGER DEFAULT 0,
-                    level INTEGER DEFAULT 1,
-                    streak INTEGER DEFAULT 0,
-                    tests_completed INTEGER DEFAULT 0,
-                    avg_score REAL DEFAULT 0,
-                    last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    registration_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            # Schedules table
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS schedules (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    title TEXT NOT NULL,
-                    description TEXT,
-                    creator_id INTEGER NOT NULL,
-                    creator_type TEXT NOT NULL DEFAULT 'student',  -- 'student', 'teacher'
-                    visibility TEXT NOT NULL DEFAULT 'private',  -- 'private', 'public', 'global'
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (creator_id) REFERENCES users (telegram_id)
-                )
-            """)
-            
-            # Schedule entries table
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS schedule_entries (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    schedule_id INTEGER NOT NULL,
-                    day_of_week INTEGER NOT NULL,  -- 0=Monday, 6=Sunday
-                    time_start TEXT NOT NULL,  -- HH:MM format
-                    time_end TEXT NOT NULL,    -- HH:MM format
-                    subject TEXT NOT NULL,
-                    topic TEXT,
-                    location TEXT,
-                    notes TEXT,
-                    color TEXT DEFAULT '#3498db',
-                    FOREIGN KEY (schedule_id) REFERENCES schedules (id) ON DELETE CASCADE
-                )
-            """)
+        """Bring the schema up to date (runs pending migrations once)"""
+        await run_sqlite_migrations(self.pool)
+        await self.load_leaderboard()
 
-            # Materials table (enhanced for teacher management)
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS materials (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    subject TEXT NOT NULL,
-                    topic TEXT NOT NULL,
-                    type TEXT NOT NULL,  -- 'text', 'video', 'pdf', 'interactive'
-                    title TEXT NOT NULL,
-                    url TEXT,
-                    description TEXT,
-                    content TEXT,
-                    category TEXT NOT NULL,  -- 'mechanics', 'thermodynamics', etc.
-                    difficulty TEXT DEFAULT 'easy',  -- 'easy', 'medium', 'hard'
-                    duration INTEGER DEFAULT 10,  -- minutes
-                    is_published BOOLEAN DEFAULT 0,
-                    tags TEXT,  -- JSON array of tags
-                    video_url TEXT,
-                    pdf_url TEXT,
-                    thumbnail_url TEXT,
-                    teacher_id INTEGER,
-                    attachments TEXT,  -- JSON array of file attachments
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    language TEXT DEFAULT 'ru',
-                    FOREIGN KEY (teacher_id) REFERENCES users (id)
-                )
-            """)
-            
-            # Tests table
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS tests (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    subject TEXT NOT NULL,
-                    question TEXT NOT NULL,
-                    option_a TEXT NOT NULL,
-                    option_b TEXT NOT NULL,
-                    option_c TEXT NOT NULL,
-                    option_d TEXT NOT NULL,
-                    correct_answer TEXT NOT NULL,  -- 'A', 'B', 'C', 'D'
-                    explanation TEXT,
-                    language TEXT DEFAULT 'ru'
-                )
-            """)
-            
-            # Quests table
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS quests (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    title TEXT NOT NULL,
-                    description TEXT NOT NULL,
-                    reward_points INTEGER DEFAULT 50,
-                    quest_type TEXT NOT NULL,  -- 'test', 'video', 'daily'
-                    target_count INTEGER DEFAULT 1,
-                    start_date DATE,
-                    end_date DATE,
-                    is_active BOOLEAN DEFAULT 1,
-                    language TEXT DEFAULT 'ru'
-                )
-            """)
-            
-            # Schedule table (old - will be replaced by new schedule system)
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS schedule (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    day_of_week INTEGER NOT NULL,  -- 0=Monday, 6=Sunday
-                    time_start TEXT NOT NULL,
-                    time_end TEXT,
-                    subject TEXT NOT NULL,
-                    topic TEXT,
-                    teacher TEXT,
-                    classroom TEXT,
-                    description TEXT,
-                    is_active BOOLEAN DEFAULT 1,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            # User progress table
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS user_progress (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL,
-                    quest_id INTEGER,
-                    test_id INTEGER,
-                    material_id INTEGER,
-                    progress_type TEXT NOT NULL,  -- 'quest', 'test', 'material'
-                    completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    score INTEGER,
-                    FOREIGN KEY (user_id) REFERENCES users (telegram_id)
-                )
-            """)
-            
-            await db.commit()
+    async def load_leaderboard(self):
+        """(Re)seed the in-memory leaderboard from the users table.
+        The new board is built in a worker thread; updates made meanwhile are replayed onto it"""
+        self.leaderboard.begin_rebuild()
+        try:
+            async with self.pool.reader() as db:
+                async with db.execute(f"SELECT {', '.join(PROFILE_FIELDS)} FROM users") as cursor:
+                    rows = await cursor.fetchall()
+            board = await asyncio.to_thread(Leaderboard.from_snapshot, (dict(row) for row in rows))
+        except BaseException:
+            self.leaderboard.abort_rebuild()
+            raise
+        self.leaderboard.finish_rebuild(board)
+
+    async def resync_leaderboard(self, interval: float = LEADERBOARD_RESYNC_SECONDS):
+        """Reseed the leaderboard every interval seconds, picking up points written by
+        other processes (the bot and the API each keep their own board). Run as a task"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.load_leaderboard()
+            except Exception as e:
+                print(f"⚠️ Leaderboard resync failed: {e}")
     
     async def add_user(self, telegram_id: int, username: str = None, first_name: str = None, last_name: str = None, birth_date: str = None, language: str = 'ru', role: str = 'student', registration_date: str = None):
         """Add new user or update existing"""
-        async with aiosqlite.connect(self.db_path) as db:
-            # Check if role and birth_date columns exist, if not add them
-            cursor = await db.execute("PRAGMA table_info(users)")
-            columns = await cursor.fetchall()
-            column_names = [col[1] for col in columns]
-            
-            if 'role' not in column_names:
-                await db.execute("ALTER TABLE users ADD COLUMN role TEXT DEFAULT 'student'")
-                print("✅ Added role column to users table")
-            
-            if 'birth_date' not in column_names:
-                await db.execute("ALTER TABLE users ADD COLUMN birth_date TEXT")
-                print("✅ Added birth_date column to users table")
-            
-            if 'code' not in column_names:
-                await db.execute("ALTER TABLE users ADD COLUMN code TEXT")
-                print("✅ Added code column to users table")
-            
+        async with self.pool.writer() as db:
             # Set code to 111444 for students
             code = '111444' if role == 'student' else None
             
-            await db.execute("""
+            cursor = await db.execute(f"""
                 INSERT OR REPLACE INTO users (telegram_id, username, first_name, last_name, birth_date, language, role, code, registration_date)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                RETURNING {', '.join(PROFILE_FIELDS)}
             """, (telegram_id, username, first_name, last_name, birth_date, language, role, code, registration_date))
+            row = await cursor.fetchone()
             await db.commit()
+            self.leaderboard.upsert(dict(row))
             print(f"✅ User {telegram_id} saved with role {role} and code {code}")
     
     async def get_user(self, telegram_id: int) -> Optional[Dict]:
         """Get user by telegram_id"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self.pool.reader() as db:
             async with db.execute(
                 "SELECT * FROM users WHERE telegram_id = ?", (telegram_id,)
             ) as cursor:
@@ -205,7 +112,7 @@ class Database:
     
     async def update_user_language(self, telegram_id: int, language: str):
         """Update user language"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self.pool.writer() as db:
             await db.execute(
                 "UPDATE users SET language = ? WHERE telegram_id = ?",
                 (language, telegram_id)
@@ -214,22 +121,373 @@ class Database:
     
     async def add_points(self, telegram_id: int, points: int):
         """Add points to user and update level"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self.pool.writer() as db:
+            # Update level based on points (every 100 points = 1 level)
+            cursor = await db.execute("""
+                UPDATE users SET points = points + ?, level = ((points + ?) / 100) + 1
+                WHERE telegram_id = ?
+                RETURNING points, level
+            """, (points, points, telegram_id))
+            row = await cursor.fetchone()
+            await db.commit()
+        if row:
+            self.leaderboard.set_points(telegram_id, row['points'], row['level'])
+    
+    async def record_test_attempt(self, telegram_id: int, answers: List[Tuple[int, str]], subject: str = None,
+                                  source: str = None, started_at: str = None, today: Optional[date] = None) -> Dict:
+        """Score a finished test against tests.correct_answer and store it (used by the bot and the API).
+        answers is [(test_id, answer), ...] in question order. The attempt, its answers, the points and
+        the users.tests_completed/avg_score/streak counters, the per-topic counters and the skill
+        ratings (the user's topic abilities, each question's difficulty) are written in one transaction.
+        Raises ValueError for an empty attempt, an unknown test id or an unknown user"""
+        if not answers:
+            raise ValueError("A test attempt needs at least one answer")
+        test_ids = sorted({test_id for test_id, _ in answers})
+        async with self.pool.reader() as db:
+            async with db.execute(
+                f"SELECT id, correct_answer, subject, difficulty FROM tests WHERE id IN ({', '.join('?' * len(test_ids))})",
+                test_ids
+            ) as cursor:
+                rows = await cursor.fetchall()
+        correct_answers = {row['id']: row['correct_answer'] for row in rows}
+        topics = {row['id']: row['subject'] for row in rows}
+        labels = {row['id']: row['difficulty'] for row in rows}
+        unknown = [test_id for test_id in test_ids if test_id not in correct_answers]
+        if unknown:
+            raise ValueError(f"Unknown test ids: {unknown}")
+
+        graded = []
+        for test_id, answer in answers:
+            answer = (answer or '').strip().upper()
+            graded.append((test_id, answer, answer == correct_answers[test_id].strip().upper()))
+        correct = sum(is_correct for _, _, is_correct in graded)
+        score = round(correct * 100 / len(graded), 1)
+        points = correct * BOT_SETTINGS['points_per_correct_answer']
+        today = (today or date.today()).isoformat()
+        time_seconds = _elapsed_seconds(started_at)
+
+        async with self.pool.writer() as db:
+            # Counters move by this attempt only; the right-hand sides see the old row
+            cursor = await db.execute("""
+                UPDATE users SET
+                    points = points + :points,
+                    level = ((points + :points) / :per_level) + 1,
+                    tests_completed = COALESCE(tests_completed, 0) + 1,
+                    avg_score = (COALESCE(avg_score, 0) * COALESCE(tests_completed, 0) + :score)
+                                / (COALESCE(tests_completed, 0) + 1),
+                    streak = CASE
+                        WHEN last_test_date = :today THEN MAX(COALESCE(streak, 0), 1)
+                        WHEN last_test_date = date(:today, '-1 day') THEN COALESCE(streak, 0) + 1
+                        ELSE 1
+                    END,
+                    last_test_date = :today,
+                    last_activity = CURRENT_TIMESTAMP
+                WHERE telegram_id = :telegram_id
+                RETURNING points, level, tests_completed, avg_score, streak
+            """, {'points': points, 'per_level': BOT_SETTINGS['points_per_level'], 'score': score,
+                  'today': today, 'telegram_id': telegram_id})
+            user = await cursor.fetchone()
+            if not user:
+                raise ValueError(f"Unknown user {telegram_id}")
+            cursor = await db.execute("""
+                INSERT INTO test_attempts (user_id, subject, total, correct, score, points, source, started_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (telegram_id, subject, len(graded), correct, score, points, source, started_at))
+            attempt_id = cursor.lastrowid
+            await db.executemany(
+                "INSERT INTO test_attempt_answers (attempt_id, position, test_id, answer, is_correct) VALUES (?, ?, ?, ?, ?)",
+                [(attempt_id, position, test_id, answer, is_correct)
+                 for position, (test_id, answer, is_correct) in enumerate(graded)]
+            )
+            await db.execute("""
+                INSERT INTO user_daily_stats (user_id, day, tests, questions, correct, xp, time_seconds, score_sum)
+                VALUES (?, ?, 1, ?, ?, ?, ?, ?)
+                ON CONFLICT (user_id, day) DO UPDATE SET
+                    tests = tests + 1,
+                    questions = questions + excluded.questions,
+                    correct = correct + excluded.correct,
+                    xp = xp + excluded.xp,
+                    time_seconds = time_seconds + excluded.time_seconds,
+                    score_sum = score_sum + excluded.score_sum
+            """, (telegram_id, today, len(graded), correct, points, time_seconds, score))
+
+            # Per-topic counters; only tests this user has never answered before add to tests_seen
+            async with db.execute(
+                f"SELECT item_id FROM user_items_seen WHERE user_id = ? AND kind = 'test' AND item_id IN ({', '.join('?' * len(test_ids))})",
+                [telegram_id, *test_ids]
+            ) as cursor:
+                seen = {row['item_id'] for row in await cursor.fetchall()}
+            new_tests = [test_id for test_id in test_ids if test_id not in seen]
+            await db.executemany("INSERT INTO user_items_seen (user_id, kind, item_id) VALUES (?, 'test', ?)",
+                                 [(telegram_id, test_id) for test_id in new_tests])
+            by_topic: Dict[str, List[int]] = {}
+            for test_id, _, is_correct in graded:
+                counts = by_topic.setdefault(topics[test_id], [0, 0, 0, 0])
+                counts[1] += 1
+                counts[2] += is_correct
+            for test_id in new_tests:
+                by_topic[topics[test_id]][0] += 1
+            for counts in by_topic.values():
+                # The attempt's time is shared out by the number of questions in each topic
+                counts[3] = time_seconds * counts[1] // len(graded)
+
+            # Skill ratings, answer by answer in question order (skill_model.py)
+            async with db.execute(
+                f"SELECT test_id, rating, answers FROM question_ratings WHERE test_id IN ({', '.join('?' * len(test_ids))})",
+                test_ids
+            ) as cursor:
+                ratings = {row['test_id']: [row['rating'], row['answers']] for row in await cursor.fetchall()}
+            async with db.execute(
+                f"SELECT topic, ability, ability_answers FROM user_topic_progress WHERE user_id = ? AND topic IN ({', '.join('?' * len(by_topic))})",
+                [telegram_id, *by_topic]
+            ) as cursor:
+                abilities = {row['topic']: [row['ability'], row['ability_answers']] for row in await cursor.fetchall()}
+            for test_id, _, is_correct in graded:
+                rating = ratings.setdefault(test_id, [prior_difficulty(labels[test_id]), 0])
+                ability = abilities.setdefault(topics[test_id], [0.0, 0])
+                ability[0], rating[0] = elo_update(ability[0], ability[1], rating[0], rating[1], is_correct)
+                ability[1] += 1
+                rating[1] += 1
+            await db.executemany("""
+                INSERT INTO question_ratings (test_id, rating, answers) VALUES (?, ?, ?)
+                ON CONFLICT (test_id) DO UPDATE SET rating = excluded.rating, answers = excluded.answers
+            """, [(test_id, *ratings[test_id]) for test_id in test_ids])
+
+            await db.executemany("""
+                INSERT INTO user_topic_progress (user_id, topic, tests_seen, questions, correct, time_seconds,
+                                                 ability, ability_answers)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (user_id, topic) DO UPDATE SET
+                    tests_seen = tests_seen + excluded.tests_seen,
+                    questions = questions + excluded.questions,
+                    correct = correct + excluded.correct,
+                    time_seconds = time_seconds + excluded.time_seconds,
+                    ability = excluded.ability,
+                    ability_answers = excluded.ability_answers
+            """, [(telegram_id, topic, *counts, *abilities[topic]) for topic, counts in by_topic.items()])
+            await db.commit()
+        self.leaderboard.set_points(telegram_id, user['points'], user['level'])
+        self.question_bank.update_ratings({test_id: tuple(ratings[test_id]) for test_id in test_ids})
+
+        return {
+            'attempt_id': attempt_id,
+            'total': len(graded),
+            'correct': correct,
+            'score': score,
+            'points': points,
+            'tests_completed': user['tests_completed'],
+            'avg_score': round(user['avg_score'], 1),
+            'streak': user['streak'],
+            'answers': [
+                {'test_id': test_id, 'answer': answer, 'correct_answer': correct_answers[test_id],
+                 'is_correct': is_correct}
+                for test_id, answer, is_correct in graded
+            ],
+        }
+
+    async def record_material_view(self, telegram_id: int, material_id: int, seconds: int = 0) -> bool:
+        """Record that a user opened a material (user_progress row + topic counters).
+        Returns False if the material does not exist"""
+        async with self.pool.writer() as db:
+            async with db.execute("SELECT category FROM materials WHERE id = ?", (material_id,)) as cursor:
+                material = await cursor.fetchone()
+            if not material:
+                return False
+            cursor = await db.execute(
+                "INSERT OR IGNORE INTO user_items_seen (user_id, kind, item_id) VALUES (?, 'material', ?)",
+                (telegram_id, material_id)
+            )
+            first_view = cursor.rowcount == 1
             await db.execute(
-                "UPDATE users SET points = points + ? WHERE telegram_id = ?",
-                (points, telegram_id)
+                "INSERT INTO user_progress (user_id, material_id, progress_type) VALUES (?, ?, 'material')",
+                (telegram_id, material_id)
             )
-            
-            # Update level based on points (every 100 points = 1 level)
             await db.execute("""
-                UPDATE users SET level = (points / 100) + 1 WHERE telegram_id = ?
-            """, (telegram_id,))
+                INSERT INTO user_topic_progress (user_id, topic, materials_seen, time_seconds)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (user_id, topic) DO UPDATE SET
+                    materials_seen = materials_seen + excluded.materials_seen,
+                    time_seconds = time_seconds + excluded.time_seconds
+            """, (telegram_id, material['category'], int(first_view), max(0, min(seconds, MAX_ATTEMPT_SECONDS))))
             await db.commit()
-    
+        return True
+
+    async def get_topic_totals(self) -> Dict[str, Dict[str, int]]:
+        """Number of tests and published materials per topic (tests.subject / materials.category).
+        Cached with the materials; new tests show up within the cache TTL"""
+        return await self.material_cache.get_or_load(('topic_totals',), self._load_topic_totals)
+
+    async def _load_topic_totals(self) -> Dict[str, Dict[str, int]]:
+        totals: Dict[str, Dict[str, int]] = {}
+        async with self.pool.reader() as db:
+            async with db.execute("SELECT subject AS topic, COUNT(*) AS count FROM tests GROUP BY subject") as cursor:
+                for row in await cursor.fetchall():
+                    totals.setdefault(row['topic'], {'tests': 0, 'materials': 0})['tests'] = row['count']
+            async with db.execute("""
+                SELECT category AS topic, COUNT(*) AS count FROM materials WHERE is_published = 1 GROUP BY category
+            """) as cursor:
+                for row in await cursor.fetchall():
+                    totals.setdefault(row['topic'], {'tests': 0, 'materials': 0})['materials'] = row['count']
+        return totals
+
+    async def get_topic_progress(self, telegram_id: Optional[int] = None) -> Dict[int, Dict[str, Dict]]:
+        """Per-topic counters, {telegram_id: {topic: row}}; one user, or the whole class in one read"""
+        query = """
+            SELECT user_id, topic, tests_seen, questions, correct, materials_seen, time_seconds
+            FROM user_topic_progress
+        """
+        params = ()
+        if telegram_id is not None:
+            query += " WHERE user_id = ?"
+            params = (telegram_id,)
+        progress: Dict[int, Dict[str, Dict]] = {}
+        async with self.pool.reader() as db:
+            async with db.execute(query, params) as cursor:
+                async for row in cursor:
+                    progress.setdefault(row['user_id'], {})[row['topic']] = dict(row)
+        return progress
+
+    async def get_daily_stats(self, telegram_id: int, first_day: date, last_day: date) -> List[Dict]:
+        """Rollup rows for first_day..last_day (inclusive); days without activity are absent"""
+        async with self.pool.reader() as db:
+            async with db.execute("""
+                SELECT day, tests, questions, correct, xp, time_seconds, score_sum
+                FROM user_daily_stats
+                WHERE user_id = ? AND day BETWEEN ? AND ?
+                ORDER BY day
+            """, (telegram_id, first_day.isoformat(), last_day.isoformat())) as cursor:
+                return [dict(row) for row in await cursor.fetchall()]
+
+    async def get_activity_totals(self, telegram_id: int) -> Dict:
+        """Lifetime totals of a user's daily rollup (days active, tests, xp, study time)"""
+        async with self.pool.reader() as db:
+            async with db.execute("""
+                SELECT COUNT(*) AS active_days, COALESCE(SUM(tests), 0) AS tests,
+                       COALESCE(SUM(questions), 0) AS questions, COALESCE(SUM(correct), 0) AS correct,
+                       COALESCE(SUM(xp), 0) AS xp, COALESCE(SUM(time_seconds), 0) AS time_seconds
+                FROM user_daily_stats WHERE user_id = ?
+            """, (telegram_id,)) as cursor:
+                return dict(await cursor.fetchone())
+
+    async def get_class_activity(self, since: date) -> Dict:
+        """Students active, tests taken, xp and study time across everyone since a day (inclusive)"""
+        async with self.pool.reader() as db:
+            async with db.execute("""
+                SELECT COUNT(DISTINCT user_id) AS active_students, COALESCE(SUM(tests), 0) AS tests,
+                       COALESCE(SUM(xp), 0) AS xp, COALESCE(SUM(time_seconds), 0) AS time_seconds
+                FROM user_daily_stats WHERE day >= ?
+            """, (since.isoformat(),)) as cursor:
+                return dict(await cursor.fetchone())
+
+    async def get_dashboard_totals(self, since: date) -> Dict:
+        """Every dashboard count in one statement (see DashboardStats): users by role and
+        activity, student points/scores, the test bank, materials and activity since a day"""
+        async with self.pool.reader() as db:
+            async with db.execute("""
+                SELECT u.*,
+                       (SELECT COUNT(*) FROM tests) AS tests,
+                       (SELECT COUNT(*) FROM materials) AS materials,
+                       (SELECT COUNT(*) FROM materials WHERE is_published = 1) AS published_materials,
+                       w.*
+                FROM (
+                    SELECT COUNT(*) AS total_users,
+                           COALESCE(SUM(role = 'student'), 0) AS students,
+                           COALESCE(SUM(role = 'teacher'), 0) AS teachers,
+                           COALESCE(SUM(role = 'student' AND points > 0), 0) AS active_students,
+                           COALESCE(SUM(CASE WHEN role = 'student' THEN points END), 0) AS student_points,
+                           COALESCE(SUM(CASE WHEN role = 'student' THEN avg_score END), 0) AS student_score_sum,
+                           COALESCE(SUM(CASE WHEN role = 'student' THEN tests_completed END), 0) AS tests_taken
+                    FROM users
+                ) AS u, (
+                    SELECT COUNT(DISTINCT user_id) AS active_students_week, COALESCE(SUM(tests), 0) AS tests_week,
+                           COALESCE(SUM(time_seconds), 0) AS time_seconds_week
+                    FROM user_daily_stats WHERE day >= ?
+                ) AS w
+            """, (since.isoformat(),)) as cursor:
+                return dict(await cursor.fetchone())
+
+    async def get_top_performers(self, limit: int = 5) -> List[Dict]:
+        """Top of the leaderboard (the in-memory ranking, or idx_users_points before it is loaded)"""
+        return await self.get_leaderboard(limit)
+
+    async def get_recent_attempts(self, telegram_id: int, limit: int = 10) -> List[Dict]:
+        """A user's latest finished tests, newest first"""
+        async with self.pool.reader() as db:
+            async with db.execute("""
+                SELECT id, subject, total, correct, score, points, started_at, completed_at
+                FROM test_attempts
+                WHERE user_id = ?
+                ORDER BY completed_at DESC, id DESC
+                LIMIT ?
+            """, (telegram_id, limit)) as cursor:
+                return [dict(row) for row in await cursor.fetchall()]
+
+    async def get_class_summary(self) -> Dict:
+        """Student count, active students (any points), average score and tests taken across the class"""
+        async with self.pool.reader() as db:
+            async with db.execute("""
+                SELECT COUNT(*) AS total_students, COALESCE(SUM(points > 0), 0) AS active_students,
+                       COALESCE(AVG(avg_score), 0) AS avg_score, COALESCE(SUM(tests_completed), 0) AS tests_completed
+                FROM users WHERE role = 'student'
+            """) as cursor:
+                return dict(await cursor.fetchone())
+
+    async def get_top_students(self, limit: int = 5) -> List[Dict]:
+        """Highest-scoring students with their competition rank (ties share a rank)"""
+        async with self.pool.reader() as db:
+            async with db.execute("""
+                SELECT telegram_id, first_name, last_name, points, streak, tests_completed, avg_score,
+                       RANK() OVER (ORDER BY points DESC) AS rank
+                FROM (
+                    SELECT id, telegram_id, first_name, last_name, points, streak, tests_completed, avg_score
+                    FROM users WHERE role = 'student'
+                    ORDER BY points DESC, id DESC LIMIT ?
+                )
+                ORDER BY points DESC, id DESC
+            """, (limit,)) as cursor:
+                return [dict(row) for row in await cursor.fetchall()]
+
+    async def get_students_page(self, after: Optional[Tuple[int, int]] = None, limit: int = 50) -> List[Dict]:
+        """Students by points, highest first.
+        Keyset pagination: pass the (points, id) of the last row seen as after"""
+        query = """
+            SELECT id, telegram_id, username, first_name, last_name, points, level, streak,
+                   tests_completed, avg_score, last_activity
+            FROM users
+        """
+        conditions, params = ["role = 'student'"], []
+        if after:
+            conditions.append("(points, id) < (?, ?)")
+            params.extend(after)
+        query += " WHERE " + " AND ".join(conditions) + " ORDER BY points DESC, id DESC LIMIT ?"
+        params.append(limit)
+
+        async with self.pool.reader() as db:
+            async with db.execute(query, params) as cursor:
+                return [dict(row) for row in await cursor.fetchall()]
+
+    async def get_recent_class_activity(self, limit: int = 10) -> List[Dict]:
+        """Latest finished tests across the class, newest first: attempts recorded by
+        record_test_attempt plus the older per-test user_progress rows"""
+        async with self.pool.reader() as db:
+            async with db.execute("""
+                SELECT u.first_name, u.last_name, test_attempts.subject, test_attempts.score,
+                       test_attempts.completed_at
+                FROM test_attempts JOIN users u ON u.telegram_id = test_attempts.user_id
+                WHERE u.role = 'student'
+                UNION ALL
+                SELECT u.first_name, u.last_name, t.subject, p.score, p.completed_at
+                FROM user_progress p JOIN users u ON u.telegram_id = p.user_id
+                LEFT JOIN tests t ON t.id = p.test_id
+                WHERE p.progress_type = 'test' AND u.role = 'student'
+                ORDER BY completed_at DESC
+                LIMIT ?
+            """, (limit,)) as cursor:
+                return [dict(row) for row in await cursor.fetchall()]
+
     async def get_user_by_id(self, user_id: int) -> Optional[Dict]:
         """Get user by id (telegram_id)"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self.pool.reader() as db:
             async with db.execute(
                 "SELECT * FROM users WHERE telegram_id = ?", (user_id,)
             ) as cursor:
@@ -238,8 +496,7 @@ class Database:
     
     async def get_user_progress(self, user_id: int) -> List[Dict]:
         """Get user progress history"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self.pool.reader() as db:
             async with db.execute("""
                 SELECT * FROM user_progress 
                 WHERE user_id = ? 
@@ -250,14 +507,23 @@ class Database:
     
     async def delete_user(self, user_id: int) -> bool:
         """Delete user and all related data"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self.pool.writer() as db:
             try:
                 # Delete user progress first (foreign key constraint)
                 await db.execute("DELETE FROM user_progress WHERE user_id = ?", (user_id,))
+                await db.execute(
+                    "DELETE FROM test_attempt_answers WHERE attempt_id IN (SELECT id FROM test_attempts WHERE user_id = ?)",
+                    (user_id,)
+                )
+                await db.execute("DELETE FROM test_attempts WHERE user_id = ?", (user_id,))
+                await db.execute("DELETE FROM user_daily_stats WHERE user_id = ?", (user_id,))
+                await db.execute("DELETE FROM user_topic_progress WHERE user_id = ?", (user_id,))
+                await db.execute("DELETE FROM user_items_seen WHERE user_id = ?", (user_id,))
                 
                 # Delete user
                 cursor = await db.execute("DELETE FROM users WHERE telegram_id = ?", (user_id,))
                 await db.commit()
+                self.leaderboard.remove(user_id)
                 
                 # Return True if user was deleted (affected rows > 0)
                 return cursor.rowcount > 0
@@ -267,8 +533,9 @@ class Database:
     
     async def get_leaderboard(self, limit: int = 10) -> List[Dict]:
         """Get top users by points"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        if self.leaderboard.loaded:
+            return self.leaderboard.top(limit)
+        async with self.pool.reader() as db:
             async with db.execute("""
                 SELECT telegram_id, first_name, username, points, level
                 FROM users 
@@ -280,8 +547,7 @@ class Database:
     
     async def get_all_tests(self, language: str = 'ru') -> List[Dict]:
         """Get all tests"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self.pool.reader() as db:
             async with db.execute("""
                 SELECT * FROM tests 
                 WHERE language = ?
@@ -290,23 +556,78 @@ class Database:
                 rows = await cursor.fetchall()
                 return [dict(row) for row in rows]
 
-    async def get_tests_by_subject(self, subject: str, language: str = 'ru', limit: int = 10) -> List[Dict]:
-        """Get random tests by subject"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+    async def get_tests_by_subject(self, subject: str, language: str = 'ru', limit: int = 10,
+                                   difficulty: Optional[str] = None, user_id: Optional[int] = None) -> List[Dict]:
+        """Get random tests by subject (from the question bank; with user_id, questions the user
+        answered recently are only used when there are not enough others)"""
+        return await self.question_bank.sample(subject, language, limit, difficulty, user_id)
+    
+    async def get_question_bank_ids(self) -> List[Tuple]:
+        """(subject, language, difficulty, id, rating, rating answers) of every test question, in bank
+        index order; rating and answers are None for a question nobody has answered yet"""
+        async with self.pool.reader() as db:
             async with db.execute("""
-                SELECT * FROM tests 
-                WHERE subject = ? AND language = ?
-                ORDER BY RANDOM() 
+                SELECT tests.subject, tests.language, tests.difficulty, tests.id, r.rating, r.answers
+                FROM tests LEFT JOIN question_ratings r ON r.test_id = tests.id
+                ORDER BY tests.subject, tests.language, tests.difficulty, tests.id
+            """) as cursor:
+                return [tuple(row) for row in await cursor.fetchall()]
+    
+    async def get_user_ability(self, telegram_id: int, topic: str) -> Tuple[float, int]:
+        """(ability, answers) of a user in a topic; (0.0, 0) before their first answer"""
+        async with self.pool.reader() as db:
+            async with db.execute(
+                "SELECT ability, ability_answers FROM user_topic_progress WHERE user_id = ? AND topic = ?",
+                (telegram_id, topic)
+            ) as cursor:
+                row = await cursor.fetchone()
+                return (row[0], row[1]) if row else (0.0, 0)
+    
+    async def get_table_version(self, name: str) -> Optional[int]:
+        """Change counter of a table kept by triggers (see table_versions)"""
+        async with self.pool.reader() as db:
+            async with db.execute("SELECT version FROM table_versions WHERE name = ?", (name,)) as cursor:
+                row = await cursor.fetchone()
+                return row[0] if row else None
+    
+    async def get_recent_test_ids(self, telegram_id: int, limit: int) -> List[int]:
+        """Ids of the questions in a user's last `limit` recorded answers"""
+        async with self.pool.reader() as db:
+            async with db.execute("""
+                SELECT aa.test_id FROM test_attempts
+                JOIN test_attempt_answers aa ON aa.attempt_id = test_attempts.id
+                WHERE test_attempts.user_id = ?
+                ORDER BY test_attempts.completed_at DESC
                 LIMIT ?
-            """, (subject, language, limit)) as cursor:
-                rows = await cursor.fetchall()
-                return [dict(row) for row in rows]
+            """, (telegram_id, limit)) as cursor:
+                return [row[0] for row in await cursor.fetchall()]
+    
+    async def get_test(self, test_id: int) -> Optional[Dict]:
+        """Get one test question by id"""
+        async with self.pool.reader() as db:
+            async with db.execute("SELECT * FROM tests WHERE id = ?", (test_id,)) as cursor:
+                row = await cursor.fetchone()
+                return dict(row) if row else None
+    
+    async def get_tests_by_ids(self, test_ids: List[int]) -> Dict[int, Dict]:
+        """Test questions by id, in one query ({id: row}; unknown ids are left out)"""
+        if not test_ids:
+            return {}
+        ids = sorted(set(test_ids))
+        async with self.pool.reader() as db:
+            async with db.execute(
+                f"SELECT * FROM tests WHERE id IN ({', '.join('?' * len(ids))})", ids
+            ) as cursor:
+                return {row['id']: dict(row) for row in await cursor.fetchall()}
     
     async def get_materials_by_subject(self, subject: str, language: str = 'ru') -> List[Dict]:
-        """Get materials by subject"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        """Get materials by subject (cached, treat the result as read-only)"""
+        return await self.material_cache.get_or_load(
+            ('subject', subject, language), lambda: self._load_materials_by_subject(subject, language)
+        )
+
+    async def _load_materials_by_subject(self, subject: str, language: str) -> List[Dict]:
+        async with self.pool.reader() as db:
             async with db.execute("""
                 SELECT * FROM materials 
                 WHERE subject = ? AND language = ?
@@ -317,8 +638,7 @@ class Database:
     
     async def get_schedule(self) -> List[Dict]:
         """Get active schedule"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self.pool.reader() as db:
             async with db.execute("""
                 SELECT * FROM schedule 
                 WHERE is_active = 1
@@ -329,8 +649,7 @@ class Database:
     
     async def get_active_quests(self, language: str = 'ru') -> List[Dict]:
         """Get active quests"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self.pool.reader() as db:
             async with db.execute("""
                 SELECT * FROM quests 
                 WHERE is_active = 1 AND language = ?
@@ -341,7 +660,7 @@ class Database:
     
     async def add_schedule(self, day_of_week: int, time_start: str, subject: str, topic: str = None, teacher: str = None, time_end: str = None, classroom: str = None, description: str = None):
         """Add schedule entry"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self.pool.writer() as db:
             await db.execute("""
                 INSERT INTO schedule (day_of_week, time_start, time_end, subject, topic, teacher, classroom, description)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?)
@@ -350,17 +669,17 @@ class Database:
     
     async def delete_schedule(self, schedule_id: int):
         """Delete schedule entry by ID"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self.pool.writer() as db:
             cursor = await db.execute("DELETE FROM schedule WHERE id = ?", (schedule_id,))
             await db.commit()
             return cursor.rowcount > 0
     
     async def get_all_users(self) -> List[Dict]:
         """Get all users for admin panel"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self.pool.reader() as db:
             async with db.execute("""
-                SELECT telegram_id, username, first_name, language, points, level, registration_date
+                SELECT telegram_id, username, first_name, last_name, language, role, code, points, level,
+                       streak, tests_completed, avg_score, last_activity, registration_date
                 FROM users 
                 ORDER BY registration_date DESC
             """) as cursor:
@@ -369,7 +688,7 @@ class Database:
     
     async def get_user_count(self) -> int:
         """Get total user count"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self.pool.reader() as db:
             async with db.execute("SELECT COUNT(*) FROM users") as cursor:
                 result = await cursor.fetchone()
                 return result[0] if result else 0
@@ -378,8 +697,7 @@ class Database:
     
     async def get_materials_by_teacher(self, teacher_id: int) -> List[Dict]:
         """Get all materials created by a specific teacher"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self.pool.reader() as db:
             async with db.execute("""
                 SELECT id, title, description, content, type, category, difficulty, 
                        duration, is_published as isPublished, tags, video_url as videoUrl, 
@@ -406,7 +724,7 @@ class Database:
 
     async def clear_all_materials(self):
         """Clear all materials from database and reset auto-increment sequence"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self.pool.writer() as db:
             # Delete all materials
             await db.execute("DELETE FROM materials")
             # Reset auto-increment sequence
@@ -420,7 +738,7 @@ class Database:
                             pdf_url: str = None, thumbnail_url: str = None,
                             teacher_id: int = None) -> int:
         """Create a new material and return its ID"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self.pool.writer() as db:
             cursor = await db.execute("""
                 INSERT INTO materials (title, description, content, type, category, difficulty,
                                      duration, is_published, tags, video_url, pdf_url, 
@@ -429,11 +747,12 @@ class Database:
             """, (title, description, content, type, category, difficulty, duration,
                   is_published, tags, video_url, pdf_url, thumbnail_url, teacher_id, category))
             await db.commit()
+            self.material_cache.invalidate()
             return cursor.lastrowid
 
     async def add_material(self, material_dict: Dict) -> int:
         """Add a new material from dictionary and return its ID"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self.pool.writer() as db:
             # Build dynamic insert query
             columns = []
             values = []
@@ -458,11 +777,12 @@ class Database:
             query = f"INSERT INTO materials ({', '.join(columns)}) VALUES ({', '.join(placeholders)})"
             cursor = await db.execute(query, values)
             await db.commit()
+            self.material_cache.invalidate()
             return cursor.lastrowid
 
     async def update_material(self, material_id: int, update_data: Dict) -> bool:
         """Update an existing material"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self.pool.writer() as db:
             # Build dynamic update query
             set_clauses = []
             values = []
@@ -494,19 +814,20 @@ class Database:
             values.append(material_id)
             cursor = await db.execute(query, values)
             await db.commit()
+            self.material_cache.invalidate()
             return cursor.rowcount > 0
 
     async def delete_material(self, material_id: int) -> bool:
         """Delete a material"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self.pool.writer() as db:
             cursor = await db.execute("DELETE FROM materials WHERE id = ?", (material_id,))
             await db.commit()
+            self.material_cache.invalidate()
             return cursor.rowcount > 0
 
     async def get_material_by_id(self, material_id: int) -> Optional[Dict]:
         """Get a specific material by ID"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self.pool.reader() as db:
             async with db.execute("""
                 SELECT id, title, description, content, type, category, difficulty, 
                        duration, is_published as isPublished, tags, video_url as videoUrl, 
@@ -542,17 +863,7 @@ class Database:
     async def get_all_materials(self) -> List[Dict]:
         """Get all materials (published and unpublished)"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                db.row_factory = aiosqlite.Row
-                
-                # Check if materials table exists
-                async with db.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='materials'") as cursor:
-                    table_exists = await cursor.fetchone()
-                    if not table_exists:
-                        print("⚠️ Materials table does not exist, creating it...")
-                        await self.create_materials_table(db)
-                        return []
-                
+            async with self.pool.reader() as db:
                 async with db.execute("""
                     SELECT id, title, description, content, type, category, difficulty, 
                            duration, is_published, tags, video_url as videoUrl, 
@@ -589,38 +900,13 @@ class Database:
             print(f"❌ Error in get_all_materials: {e}")
             return []
 
-    async def create_materials_table(self, db):
-        """Create materials table if it doesn't exist"""
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS materials (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                description TEXT,
-                content TEXT,
-                type TEXT DEFAULT 'text',
-                category TEXT,
-                difficulty TEXT DEFAULT 'medium',
-                duration INTEGER DEFAULT 30,
-                is_published INTEGER DEFAULT 0,
-                tags TEXT,
-                video_url TEXT,
-                pdf_url TEXT,
-                thumbnail_url TEXT,
-                teacher_id INTEGER,
-                attachments TEXT,
-                subject TEXT DEFAULT 'Физика',
-                language TEXT DEFAULT 'ru',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        await db.commit()
-        print("✅ Materials table created")
-
     async def get_material_by_id(self, material_id: int) -> Optional[Dict]:
-        """Get material by ID"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        """Get material by ID (cached, treat the result as read-only)"""
+        return await self.material_cache.get_or_load(('material', material_id),
+                                                     lambda: self._load_material(material_id))
+
+    async def _load_material(self, material_id: int) -> Optional[Dict]:
+        async with self.pool.reader() as db:
             
             async with db.execute("""
                 SELECT id, title, description, content, type, category, difficulty, 
@@ -654,16 +940,24 @@ class Database:
                     return material
                 return None
 
-    async def get_published_materials(self, category: str = None) -> List[Dict]:
-        """Get all published materials, optionally filtered by category"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            
+    async def get_published_materials(self, category: str = None, after: Optional[Tuple[str, int]] = None,
+                                      limit: Optional[int] = None) -> List[Dict]:
+        """Get published materials (list projection, newest first), optionally filtered by category.
+        Keyset pagination: pass the (updated_at, id) of the last row seen as after.
+        Cached, treat the result as read-only"""
+        key = ('published', category, tuple(after) if after else None, limit)
+        return await self.material_cache.get_or_load(
+            key, lambda: self._load_published_materials(category, after, limit)
+        )
+
+    async def _load_published_materials(self, category: Optional[str], after: Optional[Tuple[str, int]],
+                                        limit: Optional[int]) -> List[Dict]:
+        async with self.pool.reader() as db:
             query = """
-                SELECT id, title, description, content, type, category, difficulty, 
-                       duration, is_published as isPublished, tags, video_url as videoUrl, 
+                SELECT id, title, description, type, category, difficulty, 
+                       duration, is_published, is_published as isPublished, tags, video_url as videoUrl, 
                        pdf_url as pdfUrl, thumbnail_url as thumbnailUrl, teacher_id as teacherId,
-                       created_at, updated_at
+                       subject, created_at, updated_at
                 FROM materials 
                 WHERE is_published = 1
             """
@@ -672,8 +966,16 @@ class Database:
             if category:
                 query += " AND category = ?"
                 params.append(category)
+
+            if after:
+                query += " AND (updated_at, id) < (?, ?)"
+                params.extend(after)
                 
-            query += " ORDER BY updated_at DESC"
+            query += " ORDER BY updated_at DESC, id DESC"
+
+            if limit:
+                query += " LIMIT ?"
+                params.append(limit)
             
             async with db.execute(query, params) as cursor:
                 rows = await cursor.fetchall()
@@ -693,10 +995,103 @@ class Database:
 
     async def clear_all_materials(self):
         """Clear all materials from database and reset auto-increment sequence"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self.pool.writer() as db:
             # Delete all materials
             await db.execute("DELETE FROM materials")
             # Reset auto-increment sequence
             await db.execute("UPDATE sqlite_sequence SET seq = 0 WHERE name = 'materials'")
             await db.commit()
+            self.material_cache.invalidate()
             print("✅ All materials cleared and sequence reset")
+
+    # AI photo tables: list pages carry a summary projection, the detail getters the full row
+
+    async def get_virtual_questions_page(self, topic: Optional[str] = None, difficulty: Optional[str] = None,
+                                         after: Optional[Tuple[str, int]] = None, limit: int = 20) -> List[Dict]:
+        """Virtual questions newest first (no options/answer/explanation).
+        Keyset pagination: pass the (created_at, id) of the last row seen as after"""
+        query = """
+            SELECT id, question_id, text, type, topic, difficulty, photo_hash, thumb_hash, created_at
+            FROM virtual_questions
+        """
+        conditions, params = [], []
+        if topic:
+            conditions.append("topic = ?")
+            params.append(topic)
+        if difficulty:
+            conditions.append("difficulty = ?")
+            params.append(difficulty)
+        if after:
+            conditions.append("(created_at, id) < (?, ?)")
+            params.extend(after)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        params.append(limit)
+
+        async with self.pool.reader() as db:
+            async with db.execute(query, params) as cursor:
+                return [dict(row) for row in await cursor.fetchall()]
+
+    async def get_virtual_question(self, question_id: int) -> Optional[Dict]:
+        """Full virtual question by its public question_id"""
+        async with self.pool.reader() as db:
+            async with db.execute("""
+                SELECT id, question_id, text, type, topic, difficulty, options, correct_answer, explanation,
+                       formula, photo_hash, thumb_hash, created_at
+                FROM virtual_questions WHERE question_id = ?
+            """, (question_id,)) as cursor:
+                row = await cursor.fetchone()
+        if not row:
+            return None
+        question = dict(row)
+        question['options'] = json.loads(question['options']) if question['options'] else []
+        return question
+
+    async def get_solution_analyses_page(self, min_score: Optional[int] = None, max_score: Optional[int] = None,
+                                         is_correct: Optional[bool] = None,
+                                         after: Optional[Tuple[str, int]] = None, limit: int = 20) -> List[Dict]:
+        """Solution analyses newest first (no detailed analysis/suggestions).
+        Keyset pagination: pass the (checked_at, id) of the last row seen as after"""
+        query = """
+            SELECT id, analysis_id, is_correct, confidence, overall_grade, score, feedback,
+                   photo_hash, thumb_hash, checked_at, ai_model
+            FROM solution_analyses
+        """
+        conditions, params = [], []
+        if min_score is not None:
+            conditions.append("score >= ?")
+            params.append(min_score)
+        if max_score is not None:
+            conditions.append("score <= ?")
+            params.append(max_score)
+        if is_correct is not None:
+            conditions.append("is_correct = ?")
+            params.append(int(is_correct))
+        if after:
+            conditions.append("(checked_at, id) < (?, ?)")
+            params.extend(after)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY checked_at DESC, id DESC LIMIT ?"
+        params.append(limit)
+
+        async with self.pool.reader() as db:
+            async with db.execute(query, params) as cursor:
+                return [dict(row) for row in await cursor.fetchall()]
+
+    async def get_solution_analysis(self, analysis_id: int) -> Optional[Dict]:
+        """Full solution analysis by its public analysis_id"""
+        async with self.pool.reader() as db:
+            async with db.execute("""
+                SELECT id, analysis_id, is_correct, confidence, overall_grade, score, feedback,
+                       detailed_analysis, suggestions, photo_hash, thumb_hash, checked_at, ai_model
+                FROM solution_analyses WHERE analysis_id = ?
+            """, (analysis_id,)) as cursor:
+                row = await cursor.fetchone()
+        if not row:
+            return None
+        analysis = dict(row)
+        analysis['detailed_analysis'] = json.loads(analysis['detailed_analysis']) if analysis['detailed_analysis'] else {}
+        analysis['suggestions'] = json.loads(analysis['suggestions']) if analysis['suggestions'] else []
+        return analysis
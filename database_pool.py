@@ -0,0 +1,103 @@
+"""
+Shared SQLite connection pool for the ЕНТ bot and API server.
+One writer connection (serialized with a lock) plus N reader connections,
+all opened once in WAL mode and reused for the lifetime of the process.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+import aiosqlite
+
+# Pragmas applied to every pooled connection
+CONNECTION_PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",  # ~16 MB page cache per connection
+    "PRAGMA mmap_size = 134217728",  # 128 MB
+]
+
+
+class SQLitePool:
+    def __init__(self, db_path: str = "ent_bot.db", readers: int = 4):
+        self.db_path = db_path
+        self.readers = max(1, readers)
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._reader_conns: List[aiosqlite.Connection] = []
+        self._reader_queue: Optional[asyncio.Queue] = None
+        self._write_lock = asyncio.Lock()
+        self._open_lock = asyncio.Lock()
+        self.is_open = False
+
+    async def _connect(self, read_only: bool = False) -> aiosqlite.Connection:
+        """Open a single connection with the pool pragmas applied"""
+        conn = await aiosqlite.connect(self.db_path)
+        conn.row_factory = aiosqlite.Row
+        for pragma in CONNECTION_PRAGMAS:
+            await conn.execute(pragma)
+        if read_only:
+            await conn.execute("PRAGMA query_only = 1")
+        return conn
+
+    async def open(self):
+        """Open writer and reader connections (safe to call more than once)"""
+        async with self._open_lock:
+            if self.is_open:
+                return
+            # Writer first so WAL mode is set before readers attach
+            self._writer = await self._connect()
+            self._reader_queue = asyncio.Queue()
+            for _ in range(self.readers):
+                conn = await self._connect(read_only=True)
+                self._reader_conns.append(conn)
+                self._reader_queue.put_nowait(conn)
+            self.is_open = True
+            print(f"✅ SQLite pool opened: {self.db_path} (1 writer, {self.readers} readers)")
+
+    async def close(self):
+        """Close all pooled connections"""
+        async with self._open_lock:
+            if not self.is_open:
+                return
+            for conn in self._reader_conns:
+                await conn.close()
+            self._reader_conns = []
+            self._reader_queue = None
+            if self._writer:
+                # Refresh planner statistics for the indexes (cheap, no-op when fresh)
+                await self._writer.execute("PRAGMA optimize")
+                await self._writer.close()
+                self._writer = None
+            self.is_open = False
+            print("🛑 SQLite pool closed")
+
+    @asynccontextmanager
+    async def reader(self):
+        """Borrow a read-only connection"""
+        if not self.is_open:
+            await self.open()
+        conn = await self._reader_queue.get()
+        try:
+            yield conn
+        finally:
+            self._reader_queue.put_nowait(conn)
+
+    @asynccontextmanager
+    async def writer(self):
+        """Borrow the single writer connection; rolls back on error"""
+        if not self.is_open:
+            await self.open()
+        async with self._write_lock:
+            try:
+                yield self._writer
+            except Exception:
+                if self._writer.in_transaction:
+                    await self._writer.rollback()
+                raise
+            else:
+                # Commit anything the caller left open so the next writer starts clean
+                if self._writer.in_transaction:
+                    await self._writer.commit()
@@ -1,52 +1,29 @@
 import aiosqlite
 from typing import Optional, List, Dict
 
+from database_migrations import run_sqlite_migrations
+from database_pool import SQLitePool
+
 class ScheduleDatabase:
-    def __init__(self, db_path: str = "ent_bot.db"):
+    def __init__(self, db_path: str = "ent_bot.db", pool: Optional[SQLitePool] = None):
         self.db_path = db_path
+        self.pool = pool or SQLitePool(db_path)
+        self._owns_pool = pool is None
+
+    async def close(self):
+        """Close the private pool (a shared pool is closed by its owner)"""
+        if self._owns_pool:
+            await self.pool.close()
     
     async def init_schedule_tables(self):
-        """Initialize schedule-related tables"""
-        async with aiosqlite.connect(self.db_path) as db:
-            # Schedules table
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS schedules (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    title TEXT NOT NULL,
-                    description TEXT,
-                    creator_id INTEGER NOT NULL,
-                    creator_type TEXT NOT NULL DEFAULT 'student',  -- 'student', 'teacher'
-                    visibility TEXT NOT NULL DEFAULT 'private',  -- 'private', 'public', 'global'
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (creator_id) REFERENCES users (telegram_id)
-                )
-            """)
-            
-            # Schedule entries table
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS schedule_entries (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    schedule_id INTEGER NOT NULL,
-                    day_of_week INTEGER NOT NULL,  -- 0=Monday, 6=Sunday
-                    time_start TEXT NOT NULL,  -- HH:MM format
-                    time_end TEXT NOT NULL,    -- HH:MM format
-                    subject TEXT NOT NULL,
-                    topic TEXT,
-                    location TEXT,
-                    notes TEXT,
-                    color TEXT DEFAULT '#3498db',
-                    FOREIGN KEY (schedule_id) REFERENCES schedules (id) ON DELETE CASCADE
-                )
-            """)
-            
-            await db.commit()
-            print("✅ Schedule tables initialized successfully")
+        """Initialize schedule-related tables (shared migration run)"""
+        await run_sqlite_migrations(self.pool)
+        print("✅ Schedule tables initialized successfully")
 
     # Schedule methods
     async def create_schedule(self, title: str, description: str, creator_id: int, creator_type: str = 'student', visibility: str = 'private'):
         """Create a new schedule"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self.pool.writer() as db:
             cursor = await db.execute("""
                 INSERT INTO schedules (title, description, creator_id, creator_type, visibility)
                 VALUES (?, ?, ?, ?, ?)
@@ -56,8 +33,7 @@ class ScheduleDatabase:
 
     async def get_user_schedules(self, user_id: int):
         """Get all schedules created by a user"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self.pool.reader() as db:
             async with db.execute("""
                 SELECT * FROM schedules WHERE creator_id = ? ORDER BY updated_at DESC
             """, (user_id,)) as cursor:
@@ -66,8 +42,7 @@ class ScheduleDatabase:
 
     async def get_public_schedules(self, user_id: int = None):
         """Get all public schedules (excluding user's own if user_id provided)"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self.pool.reader() as db:
             query = """
                 SELECT s.*, u.first_name, u.last_name 
                 FROM schedules s 
@@ -88,8 +63,7 @@ class ScheduleDatabase:
 
     async def get_schedule_by_id(self, schedule_id: int):
         """Get schedule by ID with entries"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self.pool.reader() as db:
             
             # Get schedule info
             async with db.execute("""
@@ -116,7 +90,7 @@ class ScheduleDatabase:
     async def add_schedule_entry(self, schedule_id: int, day_of_week: int, time_start: str, time_end: str, 
                                 subject: str, topic: str = None, location: str = None, notes: str = None, color: str = '#3498db'):
         """Add entry to schedule"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self.pool.writer() as db:
             cursor = await db.execute("""
                 INSERT INTO schedule_entries (schedule_id, day_of_week, time_start, time_end, subject, topic, location, notes, color)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
@@ -129,7 +103,7 @@ class ScheduleDatabase:
 
     async def update_schedule_visibility(self, schedule_id: int, visibility: str):
         """Update schedule visibility"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self.pool.writer() as db:
             await db.execute("""
                 UPDATE schedules SET visibility = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?
             """, (visibility, schedule_id))
@@ -137,13 +111,13 @@ class ScheduleDatabase:
 
     async def delete_schedule(self, schedule_id: int):
         """Delete schedule and all its entries"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self.pool.writer() as db:
             await db.execute("DELETE FROM schedules WHERE id = ?", (schedule_id,))
             await db.commit()
 
     async def delete_schedule_entry(self, entry_id: int):
         """Delete schedule entry"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self.pool.writer() as db:
             await db.execute("DELETE FROM schedule_entries WHERE id = ?", (entry_id,))
             await db.commit()
 
@@ -163,6 +137,6 @@ class ScheduleDatabase:
         values.append(entry_id)
         query = f"UPDATE schedule_entries SET {', '.join(fields)} WHERE id = ?"
         
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self.pool.writer() as db:
             await db.execute(query, values)
             await db.commit()
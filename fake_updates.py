@@ -0,0 +1,76 @@
+"""
+Fake Telegram updates for exercising the bot locally (bench_bot_webhook.py, tests).
+Each chat sends a /start-like message followed by answer-button taps, as raw
+update dicts in the shape the Bot API sends to getUpdates and to webhooks.
+"""
+
+import random
+import time
+from typing import Dict, Iterator, List
+
+FAKE_BOT_TOKEN = "123456:FAKE-token-for-local-updates"
+BUTTON_DATA = ["answer_A", "answer_B", "answer_C", "answer_D"]
+
+
+def fake_user(chat_id: int) -> Dict:
+    return {"id": chat_id, "is_bot": False, "first_name": f"Student{chat_id}", "language_code": "ru"}
+
+
+def fake_message_update(update_id: int, chat_id: int, text: str, message_id: int = 1) -> Dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private", "first_name": f"Student{chat_id}"},
+            "from": fake_user(chat_id),
+            "text": text,
+        },
+    }
+
+
+def fake_callback_update(update_id: int, chat_id: int, data: str, message_id: int = 1) -> Dict:
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": fake_user(chat_id),
+            "chat_instance": str(chat_id),
+            "data": data,
+            "message": {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private", "first_name": f"Student{chat_id}"},
+                "from": {"id": 123456, "is_bot": True, "first_name": "Bot"},
+                "text": "question",
+            },
+        },
+    }
+
+
+def fake_chat_updates(chat_id: int, taps: int, rnd: random.Random) -> Iterator[Dict]:
+    """One chat's updates, without update ids: a message, then `taps` button presses"""
+    yield fake_message_update(0, chat_id, "/test")
+    for _ in range(taps):
+        yield fake_callback_update(0, chat_id, rnd.choice(BUTTON_DATA))
+
+
+def fake_update_stream(chats: int, taps_per_chat: int, seed: int = 0, first_chat_id: int = 100000) -> List[Dict]:
+    """Updates from `chats` chats interleaved at random (each chat's own updates stay
+    in order), numbered with increasing update ids like Telegram's"""
+    rnd = random.Random(seed)
+    streams = [fake_chat_updates(first_chat_id + i, taps_per_chat, rnd) for i in range(chats)]
+    remaining = [taps_per_chat + 1] * chats
+    live = list(range(chats))
+    updates = []
+    while live:
+        slot = rnd.randrange(len(live))
+        chat = live[slot]
+        update = next(streams[chat])
+        update["update_id"] = len(updates) + 1
+        updates.append(update)
+        remaining[chat] -= 1
+        if not remaining[chat]:
+            live[slot] = live[-1]
+            live.pop()
+    return updates
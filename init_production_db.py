@@ -18,29 +18,32 @@ async def init_production_database():
         print(f"📁 Creating new database {db_file}")
     
     db = Database(db_file)
-    await db.init_db()
+    try:
+        await db.init_db()
     
-    # Create sample teacher user
-    teacher_id = await db.create_user(
-        telegram_id=111333,
-        username="teacher_demo",
-        first_name="Demo",
-        last_name="Teacher",
-        language="ru",
-        role="teacher"
-    )
-    print(f"👨‍🏫 Created teacher user with ID: {teacher_id}")
+        # Create sample teacher user
+        teacher_id = await db.create_user(
+            telegram_id=111333,
+            username="teacher_demo",
+            first_name="Demo",
+            last_name="Teacher",
+            language="ru",
+            role="teacher"
+        )
+        print(f"👨‍🏫 Created teacher user with ID: {teacher_id}")
     
-    # Create sample student user
-    student_id = await db.create_user(
-        telegram_id=222444,
-        username="student_demo", 
-        first_name="Demo",
-        last_name="Student",
-        language="ru",
-        role="student"
-    )
-    print(f"👨‍🎓 Created student user with ID: {student_id}")
+        # Create sample student user
+        student_id = await db.create_user(
+            telegram_id=222444,
+            username="student_demo", 
+            first_name="Demo",
+            last_name="Student",
+            language="ru",
+            role="student"
+        )
+        print(f"👨‍🎓 Created student user with ID: {student_id}")
+    finally:
+        await db.close()
     
     print("✅ Production database initialized successfully!")
 
@@ -0,0 +1,274 @@
+"""
+In-process ranked leaderboard.
+An indexable skip list keyed on (-points, telegram_id) answers top-N, "my rank"
+and "neighbours around me" in O(log n). It is seeded from the users table at
+startup and updated incrementally whenever a user's points change. Periodic
+resyncs build a new board off the event loop and swap it in, replaying the
+updates that arrived while it was being built.
+"""
+
+import random
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+MAX_LEVEL = 32  # plenty for 2**32 users
+
+# Columns copied into each leaderboard entry
+PROFILE_FIELDS = ("telegram_id", "first_name", "last_name", "username", "points", "level",
+                  "streak", "tests_completed", "avg_score")
+
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, height: int):
+        self.key = key
+        self.next: List[Optional["_Node"]] = [None] * height
+        # width[i] = number of level-0 steps from this node to next[i]
+        self.width: List[int] = [1] * height
+
+
+class RankedSkipList:
+    """Sorted set of keys with O(log n) insert, remove, rank and positional access"""
+
+    def __init__(self, seed: Optional[int] = None):
+        self._random = random.Random(seed)
+        self.clear()
+
+    def clear(self):
+        self.head = _Node(None, MAX_LEVEL)
+        self.level = 1
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _random_height(self) -> int:
+        height = 1
+        while height < MAX_LEVEL and self._random.random() < 0.5:
+            height += 1
+        return height
+
+    def build(self, sorted_keys: Iterable):
+        """Replace the contents with already-sorted keys in O(n)"""
+        self.clear()
+        last = [self.head] * MAX_LEVEL
+        last_positions = [0] * MAX_LEVEL
+        position = 0
+        for key in sorted_keys:
+            position += 1
+            height = self._random_height()
+            node = _Node(key, height)
+            for i in range(height):
+                last[i].next[i] = node
+                last[i].width[i] = position - last_positions[i]
+                last[i] = node
+                last_positions[i] = position
+            self.level = max(self.level, height)
+        for i in range(self.level):
+            last[i].width[i] = position + 1 - last_positions[i]
+        self.size = position
+
+    def insert(self, key):
+        update = [self.head] * MAX_LEVEL
+        positions = [0] * MAX_LEVEL
+        node, position = self.head, 0
+        for i in reversed(range(self.level)):
+            while node.next[i] is not None and node.next[i].key < key:
+                position += node.width[i]
+                node = node.next[i]
+            update[i] = node
+            positions[i] = position
+
+        height = self._random_height()
+        if height > self.level:
+            for i in range(self.level, height):
+                # Head spans the whole list on levels that were empty until now
+                self.head.width[i] = self.size + 1
+            self.level = height
+
+        new = _Node(key, height)
+        for i in range(height):
+            prev = update[i]
+            new.next[i] = prev.next[i]
+            prev.next[i] = new
+            new.width[i] = prev.width[i] - (position - positions[i])
+            prev.width[i] = position + 1 - positions[i]
+        for i in range(height, self.level):
+            update[i].width[i] += 1
+        self.size += 1
+
+    def remove(self, key):
+        update = [self.head] * MAX_LEVEL
+        node = self.head
+        for i in reversed(range(self.level)):
+            while node.next[i] is not None and node.next[i].key < key:
+                node = node.next[i]
+            update[i] = node
+
+        target = node.next[0]
+        if target is None or target.key != key:
+            raise KeyError(key)
+
+        for i in range(self.level):
+            if update[i].next[i] is target:
+                update[i].width[i] += target.width[i] - 1
+                update[i].next[i] = target.next[i]
+            else:
+                update[i].width[i] -= 1
+        while self.level > 1 and self.head.next[self.level - 1] is None:
+            self.level -= 1
+        self.size -= 1
+
+    def index(self, key) -> int:
+        """0-based position of key"""
+        node, position = self.head, 0
+        for i in reversed(range(self.level)):
+            while node.next[i] is not None and node.next[i].key < key:
+                position += node.width[i]
+                node = node.next[i]
+        node = node.next[0]
+        if node is None or node.key != key:
+            raise KeyError(key)
+        return position
+
+    def _node_at(self, index: int) -> _Node:
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        node, position = self.head, 0
+        target = index + 1
+        for i in reversed(range(self.level)):
+            while node.next[i] is not None and position + node.width[i] <= target:
+                position += node.width[i]
+                node = node.next[i]
+        return node
+
+    def __getitem__(self, index: int):
+        return self._node_at(index).key
+
+    def slice(self, start: int, count: int) -> List[Any]:
+        """Up to count keys starting at position start"""
+        start = max(0, start)
+        if count <= 0 or start >= self.size:
+            return []
+        node = self._node_at(start)
+        keys = []
+        while node is not None and len(keys) < count:
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+
+class Leaderboard:
+    """Ranked view of users by points (ties broken by telegram_id)"""
+
+    def __init__(self):
+        self._ranks = RankedSkipList()
+        self._entries: Dict[int, Dict] = {}
+        self.loaded = False
+        # Updates recorded while a rebuild is in progress (None when idle)
+        self._journal: Optional[List[Tuple[str, tuple]]] = None
+
+    @classmethod
+    def from_snapshot(cls, users: Iterable[Dict]) -> "Leaderboard":
+        """A new board built from a full users snapshot (safe to run in a worker thread)"""
+        board = cls()
+        board.reset(users)
+        return board
+
+    def begin_rebuild(self):
+        """Start recording updates; call before reading the snapshot for a rebuild"""
+        self._journal = []
+
+    def abort_rebuild(self):
+        self._journal = None
+
+    def finish_rebuild(self, board: "Leaderboard"):
+        """Replay updates recorded since begin_rebuild() onto board, then adopt its state.
+        Every update is absolute (profile, new total, removal), so replaying one that the
+        snapshot already contains is harmless"""
+        for name, args in self._journal or ():
+            getattr(board, name)(*args)
+        self._ranks, self._entries = board._ranks, board._entries
+        self._journal = None
+        self.loaded = True
+
+    def _record(self, name: str, *args):
+        if self._journal is not None:
+            self._journal.append((name, args))
+
+    @staticmethod
+    def _key(entry: Dict) -> Tuple[int, int]:
+        return (-(entry.get("points") or 0), entry["telegram_id"])
+
+    def __len__(self) -> int:
+        return len(self._ranks)
+
+    def reset(self, users: Iterable[Dict]):
+        """Rebuild from a full users snapshot"""
+        self._entries = {}
+        for user in users:
+            entry = {field: user.get(field) for field in PROFILE_FIELDS}
+            entry["points"] = entry["points"] or 0
+            self._entries[entry["telegram_id"]] = entry
+        self._ranks.build(sorted(self._key(entry) for entry in self._entries.values()))
+        self.loaded = True
+
+    def clear(self):
+        self._record("clear")
+        self._ranks.clear()
+        self._entries = {}
+
+    def upsert(self, user: Dict):
+        """Insert a user or refresh their profile/points"""
+        self._record("upsert", dict(user))
+        entry = {field: user.get(field) for field in PROFILE_FIELDS}
+        entry["points"] = entry["points"] or 0
+        old = self._entries.get(entry["telegram_id"])
+        if old is not None:
+            self._ranks.remove(self._key(old))
+        self._entries[entry["telegram_id"]] = entry
+        self._ranks.insert(self._key(entry))
+
+    def set_points(self, telegram_id: int, points: int, level: Optional[int] = None):
+        """Move a user to their new points total"""
+        old = self._entries.get(telegram_id)
+        if old is None:
+            # upsert() records itself
+            self.upsert({"telegram_id": telegram_id, "points": points, "level": level})
+            return
+        self._record("set_points", telegram_id, points, level)
+        self._ranks.remove(self._key(old))
+        old["points"] = points
+        if level is not None:
+            old["level"] = level
+        self._ranks.insert(self._key(old))
+
+    def remove(self, telegram_id: int):
+        self._record("remove", telegram_id)
+        old = self._entries.pop(telegram_id, None)
+        if old is not None:
+            self._ranks.remove(self._key(old))
+
+    def _ranked(self, start: int, count: int) -> List[Dict]:
+        return [
+            dict(self._entries[telegram_id], rank=start + offset + 1)
+            for offset, (_, telegram_id) in enumerate(self._ranks.slice(start, count))
+        ]
+
+    def top(self, limit: int = 10) -> List[Dict]:
+        return self._ranked(0, limit)
+
+    def rank(self, telegram_id: int) -> Optional[int]:
+        """1-based rank, or None for unknown users"""
+        entry = self._entries.get(telegram_id)
+        if entry is None:
+            return None
+        return self._ranks.index(self._key(entry)) + 1
+
+    def around(self, telegram_id: int, radius: int = 2) -> List[Dict]:
+        """The user plus up to radius neighbours above and below"""
+        rank = self.rank(telegram_id)
+        if rank is None:
+            return []
+        start = max(0, rank - 1 - radius)
+        return self._ranked(start, rank - start + radius)
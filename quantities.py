@@ -0,0 +1,197 @@
+"""
+Physical quantities in free-form answer and option text.
+parse_quantity reads the first number in a string together with the unit
+written after it and converts it to SI: "240 кДж", "5.7×10⁻⁵ м", "1,2e3 Па",
+"9,8 м/с²", "72 км/сағ", "4200 Дж/(кг·°C)", "90°C". Numbers may use a decimal
+comma, e-notation or ×10ⁿ (×, x, х, *, · with Unicode superscripts or ^n).
+Units may be Latin, Russian or Kazakh symbols with an SI prefix (Latin or
+Cyrillic, "мк" and "µ" for micro), multiplied with ·/*, divided with / (one
+level of parentheses) and raised to powers (², ⁻¹, ^2, or a plain digit as in
+"м2"). A unit that does not parse is ignored: the number counts as unitless.
+A dimension is a tuple of exponents over DIMENSIONS, so two quantities are
+comparable when their dimensions are equal. Parses are cached, since the same
+option and answer strings come up again and again.
+"""
+
+import math
+import re
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from config import ANSWER_CHECK_SETTINGS
+
+DIMENSIONS = ('m', 'kg', 's', 'A', 'K', 'mol', 'cd', 'rad')
+
+Dimension = Tuple[int, ...]
+# (value as written, value in SI units or None without a unit, dimension or None)
+Quantity = Tuple[float, Optional[float], Optional[Dimension]]
+
+
+def _dim(**exponents) -> Dimension:
+    return tuple(exponents.get(name, 0) for name in DIMENSIONS)
+
+# Units that take an SI prefix: symbol -> (factor to SI, dimension)
+PREFIXABLE = {}
+# Units that do not (and symbols that would otherwise read as a prefix + unit)
+UNPREFIXED = {}
+
+
+def _units(table: Dict, factor: float, dimension: Dimension, *symbols: str):
+    for symbol in symbols:
+        table[symbol] = (factor, dimension)
+
+
+_units(PREFIXABLE, 1.0, _dim(m=1), 'm', 'м')
+_units(PREFIXABLE, 1e-3, _dim(kg=1), 'g', 'г')
+_units(PREFIXABLE, 1.0, _dim(s=1), 's', 'с')
+_units(PREFIXABLE, 1.0, _dim(A=1), 'A', 'А')
+_units(PREFIXABLE, 1.0, _dim(K=1), 'K', 'К')
+_units(PREFIXABLE, 1.0, _dim(mol=1), 'mol', 'моль')
+_units(PREFIXABLE, 1.0, _dim(kg=1, m=1, s=-2), 'N', 'Н')
+_units(PREFIXABLE, 1.0, _dim(kg=1, m=2, s=-2), 'J', 'Дж')
+_units(PREFIXABLE, 1.602176634e-19, _dim(kg=1, m=2, s=-2), 'eV', 'эВ')
+_units(PREFIXABLE, 1.0, _dim(kg=1, m=2, s=-3), 'W', 'Вт')
+_units(PREFIXABLE, 1.0, _dim(kg=1, m=-1, s=-2), 'Pa', 'Па')
+_units(PREFIXABLE, 1.0, _dim(s=-1), 'Hz', 'Гц')
+_units(PREFIXABLE, 1.0, _dim(A=1, s=1), 'C', 'Кл')
+_units(PREFIXABLE, 1.0, _dim(kg=1, m=2, s=-3, A=-1), 'V', 'В')
+_units(PREFIXABLE, 1.0, _dim(kg=1, m=2, s=-3, A=-2), 'Ω', 'Ом', 'Ohm')
+_units(PREFIXABLE, 1.0, _dim(kg=-1, m=-2, s=4, A=2), 'F', 'Ф')
+_units(PREFIXABLE, 1.0, _dim(kg=1, s=-2, A=-1), 'T', 'Тл')
+_units(PREFIXABLE, 1.0, _dim(kg=1, m=2, s=-2, A=-1), 'Wb', 'Вб')
+_units(PREFIXABLE, 1.0, _dim(kg=1, m=2, s=-2, A=-2), 'H', 'Гн')
+_units(PREFIXABLE, 1e-3, _dim(m=3), 'L', 'l', 'л')
+_units(PREFIXABLE, 1.0, _dim(rad=1), 'rad', 'рад')
+
+_units(UNPREFIXED, 60.0, _dim(s=1), 'min', 'мин')
+# Kazakh: сағ(ат) hour, тәул(ік) day
+_units(UNPREFIXED, 3600.0, _dim(s=1), 'h', 'ч', 'сағ')
+_units(UNPREFIXED, 86400.0, _dim(s=1), 'сут', 'тәул', 'тәулік')
+_units(UNPREFIXED, 1e3, _dim(kg=1), 't', 'т')
+_units(UNPREFIXED, 101325.0, _dim(kg=1, m=-1, s=-2), 'atm', 'атм')
+_units(UNPREFIXED, math.pi / 180, _dim(rad=1), '°', 'град')
+# A temperature difference inside a compound unit; a standalone °C is shifted to kelvin
+_units(UNPREFIXED, 1.0, _dim(K=1), '°C', '°С', '℃')
+
+PREFIXES = {
+    'T': 1e12, 'G': 1e9, 'M': 1e6, 'k': 1e3, 'h': 1e2, 'd': 1e-1, 'c': 1e-2, 'm': 1e-3,
+    'µ': 1e-6, 'μ': 1e-6, 'u': 1e-6, 'n': 1e-9, 'p': 1e-12,
+    'Т': 1e12, 'Г': 1e9, 'М': 1e6, 'к': 1e3, 'г': 1e2, 'д': 1e-1, 'с': 1e-2, 'м': 1e-3,
+    'мк': 1e-6, 'н': 1e-9, 'п': 1e-12,
+}
+# Longest first, so "мк" is tried before "м"
+_PREFIX_ORDER = sorted(PREFIXES, key=len, reverse=True)
+_CELSIUS = {'°C', '°С', '℃'}
+
+_SUPERSCRIPTS = str.maketrans('⁰¹²³⁴⁵⁶⁷⁸⁹⁻⁺', '0123456789-+')
+_SUP = '⁰¹²³⁴⁵⁶⁷⁸⁹'
+
+_NUMBER = re.compile(
+    r'(?<![\w.,])([+\-−]?\d+(?:[.,]\d+)?)'
+    r'(?:[eE]([+\-−]?\d+)'
+    r'|\s*[×xх*·⋅]\s*10\s*(?:\^\s*\(?([+\-−]?\d+)\)?|([⁻⁺]?[' + _SUP + ']+))'
+    r'|(?<=10)([⁻⁺]?[' + _SUP + ']+))?'
+)
+# The unit text right after a number: symbol characters, joined by ·, *, / (spaces allowed around them)
+_LETTER = r'[^\W\d_' + _SUP + ']'
+_UNIT_TEXT = re.compile(
+    r'\s*(' + _LETTER + r'|[°℃(])[^\s,;:!?]*(?:\s*[/·⋅∙*]\s*[^\s,;:!?]+)*'
+)
+_UNIT_TERM = re.compile(
+    r'(' + _LETTER + r'+|°[CС]?|℃)(?:\^?\(?([+\-−]?\d+)\)?|([⁻⁺]?[' + _SUP + ']+))?'
+)
+
+
+def _signed(text: str) -> int:
+    return int(text.translate(_SUPERSCRIPTS).replace('−', '-'))
+
+
+def unit_symbol(symbol: str) -> Optional[Tuple[float, Dimension]]:
+    """(factor to SI, dimension) of a single unit symbol such as "кДж", "мкм", "kPa"; None if unknown"""
+    if symbol in UNPREFIXED:
+        return UNPREFIXED[symbol]
+    if symbol in PREFIXABLE:
+        return PREFIXABLE[symbol]
+    for prefix in _PREFIX_ORDER:
+        if symbol.startswith(prefix) and symbol[len(prefix):] in PREFIXABLE:
+            factor, dimension = PREFIXABLE[symbol[len(prefix):]]
+            return PREFIXES[prefix] * factor, dimension
+    return None
+
+
+def parse_unit(text: str) -> Optional[Tuple[float, Dimension]]:
+    """(factor to SI, dimension) of a unit expression such as "м/с²" or "Дж/(кг·К)"; None if it does not parse"""
+    text = text.strip().rstrip('.')
+    if not text:
+        return None
+    factor, dimension = 1.0, [0] * len(DIMENSIONS)
+    position, sign, group_sign, divided = 0, 1, None, False
+    while position < len(text):
+        char = text[position]
+        if char in ' ·⋅∙*.':
+            position += 1
+            continue
+        if char == '/':
+            if group_sign is not None or divided:
+                return None
+            sign, divided = -1, True
+            position += 1
+            continue
+        if char == '(':
+            if group_sign is not None:
+                return None
+            group_sign = sign
+            position += 1
+            continue
+        if char == ')':
+            if group_sign is None:
+                return None
+            group_sign, sign = None, 1
+            position += 1
+            continue
+        match = _UNIT_TERM.match(text, position)
+        if match is None:
+            return None
+        unit = unit_symbol(match.group(1))
+        if unit is None:
+            return None
+        power = _signed(match.group(2) or match.group(3) or '1') * (group_sign or sign)
+        factor *= unit[0] ** power
+        for i, exponent in enumerate(unit[1]):
+            dimension[i] += exponent * power
+        position, divided = match.end(), False
+        if group_sign is None:
+            sign = 1
+    # An unclosed group, or nothing after the last /
+    if group_sign is not None or divided:
+        return None
+    return factor, tuple(dimension)
+
+
+@lru_cache(maxsize=ANSWER_CHECK_SETTINGS['parse_cache_size'])
+def parse_quantity(text: str) -> Optional[Quantity]:
+    """The first number in text with the unit right after it, if any; None without a number"""
+    match = _NUMBER.search(text)
+    if match is None:
+        return None
+    mantissa = match.group(1).replace(',', '.').replace('−', '-')
+    exponent = match.group(2) or match.group(3) or match.group(4)
+    if exponent is None and match.group(5) is not None and mantissa.lstrip('+') == '10':
+        # "10⁻⁵" on its own: the 10 was read as the mantissa
+        mantissa, exponent = '1', match.group(5)
+    # Through the decimal string, so 1.1×10⁻⁴ is 0.00011 and not 1.1 * 1e-4
+    value = float(f"{mantissa}e{_signed(exponent)}" if exponent is not None else mantissa)
+    unit_match = _UNIT_TEXT.match(text, match.end())
+    if unit_match is None:
+        return value, None, None
+    unit_text = unit_match.group(0).strip().rstrip('.')
+    unit = parse_unit(unit_text)
+    if unit is None:
+        # "2 м / t": the first symbol may still be a unit on its own
+        unit = parse_unit(unit_text.split()[0]) if ' ' in unit_text else None
+        if unit is None:
+            return value, None, None
+    factor, dimension = unit
+    if unit_text in _CELSIUS:
+        return value, value + 273.15, dimension
+    return value, value * factor, dimension
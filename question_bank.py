@@ -0,0 +1,193 @@
+"""
+In-memory question bank for test selection.
+The ids of every test question are kept as packed arrays per (subject,
+language, difficulty), plus one per (subject, language) over all
+difficulties, loaded in one pass over a covering index. Picking a test is a
+without-replacement sample of k ids in O(k) (optionally skipping the questions
+a user answered recently) and one `IN (...)` query for the chosen rows,
+instead of ORDER BY RANDOM() sorting the whole subject on every test start.
+The arrays are reloaded when table_versions says the tests table changed
+(checked at most every few seconds), or at once after invalidate().
+
+With a user id the pick is adaptive: each question's difficulty rating sits in
+a packed array indexed by test id, kept current from this process's recorded
+answers (update_ratings) and resynced from the database every few minutes, and
+most of a test is drawn from the questions rated nearest the user's ability in
+the topic, found by binary search in a per-pool RatingIndex (skill_model.py)
+over the questions with enough answers behind their rating; the rest is drawn
+uniformly so that unrated questions get answered. The index is a sorted
+snapshot, rebuilt after every `resort_every` rating updates.
+
+answer_keys() keeps each question's correct option parsed as a quantity
+(quantities.py), so checking a typed answer against it is a float comparison;
+the keys are dropped with the ids whenever the bank reloads.
+"""
+
+import asyncio
+import random
+import time
+from array import array
+from typing import Collection, Dict, List, Optional, Tuple
+
+from config import ADAPTIVE_SETTINGS, QUESTION_BANK_SETTINGS
+from quantities import Quantity, parse_quantity
+from skill_model import RatingIndex, prior_difficulty
+
+PoolKey = Tuple[str, str, Optional[str]]
+# (correct letter, correct option text, the option parsed)
+AnswerKey = Tuple[str, str, Optional[Quantity]]
+
+
+def sample_ids(ids, k: int, exclude: Collection[int] = (), rnd: random.Random = random) -> List[int]:
+    """k distinct ids from ids, in random order, preferring ids not in exclude.
+    O(k) expected while at most half of the pool is excluded, O(len(ids)) otherwise"""
+    n = len(ids)
+    k = max(0, min(k, n))
+    if not exclude:
+        return rnd.sample(ids, k)
+    picked = []
+    if 2 * len(exclude) <= n:
+        # Rejection sampling: each draw hits an unseen, unpicked id with probability >= 1/2 - k/n
+        chosen = set()
+        for _ in range(8 * k + 32):
+            test_id = ids[rnd.randrange(n)]
+            if test_id not in exclude and test_id not in chosen:
+                chosen.add(test_id)
+                picked.append(test_id)
+                if len(picked) == k:
+                    return picked
+    picked_set = set(picked)
+    fresh = [test_id for test_id in ids if test_id not in exclude and test_id not in picked_set]
+    picked += rnd.sample(fresh, min(k - len(picked), len(fresh)))
+    if len(picked) < k:
+        # Not enough unseen questions: fill up with seen ones
+        seen = [test_id for test_id in ids if test_id in exclude]
+        picked += rnd.sample(seen, k - len(picked))
+    return picked
+
+
+class QuestionBank:
+    def __init__(self, db, version_check_seconds: Optional[float] = None, rnd: Optional[random.Random] = None):
+        self.db = db
+        self.version_check_seconds = QUESTION_BANK_SETTINGS['version_check_seconds'] \
+            if version_check_seconds is None else version_check_seconds
+        self.rnd = rnd or random.Random()
+        self.pools: Optional[Dict[PoolKey, array]] = None
+        # Indexed by test id
+        self.ratings: Optional[array] = None
+        self.rating_answers: Optional[array] = None
+        self.indexes: Dict[PoolKey, RatingIndex] = {}
+        self.updates = 0
+        self.keys: Dict[int, AnswerKey] = {}
+        self.version = None
+        self.checked_at = 0.0
+        self.loaded_at = 0.0
+        self.lock = asyncio.Lock()
+
+    def invalidate(self):
+        """Reload on the next use (call after changing tests from this process)"""
+        self.pools = None
+
+    async def _load(self, version: Optional[int]):
+        rows = await self.db.get_question_bank_ids()
+        size = max((row[3] for row in rows), default=0) + 1
+        pools: Dict[PoolKey, array] = {}
+        ratings = array('d', bytes(8 * size))
+        rating_answers = array('I', bytes(4 * size))
+        for subject, language, difficulty, test_id, rating, answers in rows:
+            pools.setdefault((subject, language, difficulty), array('I')).append(test_id)
+            if difficulty is not None:
+                pools.setdefault((subject, language, None), array('I')).append(test_id)
+            ratings[test_id] = prior_difficulty(difficulty) if rating is None else rating
+            rating_answers[test_id] = answers or 0
+        self.pools = pools
+        self.ratings = ratings
+        self.rating_answers = rating_answers
+        self.indexes = {}
+        self.keys = {}
+        self.version = version
+        self.loaded_at = time.monotonic()
+
+    async def _current_pools(self) -> Dict[PoolKey, array]:
+        if self.pools is not None and time.monotonic() - self.checked_at < self.version_check_seconds:
+            return self.pools
+        async with self.lock:
+            if self.pools is not None and time.monotonic() - self.checked_at < self.version_check_seconds:
+                return self.pools
+            # Read the version first: a change made while the ids load triggers another reload
+            version = await self.db.get_table_version('tests')
+            # Ratings recorded by other processes are picked up by the periodic resync
+            if self.pools is None or version != self.version \
+                    or time.monotonic() - self.loaded_at >= ADAPTIVE_SETTINGS['resync_seconds']:
+                await self._load(version)
+            self.checked_at = time.monotonic()
+            return self.pools
+
+    def update_ratings(self, changes: Dict[int, Tuple[float, int]]):
+        """Apply {test_id: (rating, answers)} just written by record_test_attempt"""
+        ratings, rating_answers = self.ratings, self.rating_answers
+        if ratings is None:
+            return
+        for test_id, (rating, answers) in changes.items():
+            # A question added since the last reload gets its rating then
+            if test_id < len(ratings):
+                ratings[test_id] = rating
+                rating_answers[test_id] = answers
+        self.updates += len(changes)
+
+    def _index(self, key: PoolKey, ids: array) -> RatingIndex:
+        index = self.indexes.get(key)
+        if index is None or self.updates - index.built_at >= ADAPTIVE_SETTINGS['resort_every']:
+            min_answers, rating_answers = ADAPTIVE_SETTINGS['min_rating_answers'], self.rating_answers
+            rated = [test_id for test_id in ids if rating_answers[test_id] >= min_answers]
+            index = self.indexes[key] = RatingIndex(rated, self.ratings, self.updates)
+        return index
+
+    async def answer_keys(self, test_ids: Collection[int]) -> Dict[int, AnswerKey]:
+        """{test_id: answer key} for the given questions, parsed on first use (unknown ids are left out)"""
+        await self._current_pools()
+        keys = self.keys
+        missing = [test_id for test_id in set(test_ids) if test_id not in keys]
+        if missing:
+            for test_id, row in (await self.db.get_tests_by_ids(missing)).items():
+                letter = (row['correct_answer'] or '').strip().upper()
+                text = row.get(f'option_{letter.lower()}') or row['correct_answer'] or ''
+                keys[test_id] = (letter, text, parse_quantity(text))
+        return {test_id: keys[test_id] for test_id in test_ids if test_id in keys}
+
+    async def count(self, subject: str, language: str = 'ru', difficulty: Optional[str] = None) -> int:
+        return len((await self._current_pools()).get((subject, language, difficulty), ()))
+
+    async def sample_ids(self, subject: str, language: str = 'ru', k: int = 10, difficulty: Optional[str] = None,
+                         user_id: Optional[int] = None) -> List[int]:
+        """Ids of k random questions; with user_id, mostly from those rated nearest the user's ability
+        in the subject, the user's recent questions coming last in line"""
+        key = (subject, language, difficulty)
+        ids = (await self._current_pools()).get(key)
+        if not ids:
+            return []
+        if user_id is None:
+            return sample_ids(ids, k, (), self.rnd)
+        exclude = set(await self.db.get_recent_test_ids(user_id, QUESTION_BANK_SETTINGS['recent_questions']))
+        index = self._index(key, ids)
+        candidates = ADAPTIVE_SETTINGS['candidates']
+        aimed = k - int(k * ADAPTIVE_SETTINGS['explore_share'])
+        picked = []
+        # Too few rated questions to choose among: all at random until they are answered
+        if len(index) >= aimed + candidates:
+            ability, _ = await self.db.get_user_ability(user_id, subject)
+            picked = index.nearest(ability, aimed, exclude, candidates, self.rnd)
+        aimed_ids = set(picked)
+        # k distinct ids hold at least k - len(picked) that are not picked yet
+        rest = sample_ids(ids, k, exclude | aimed_ids, self.rnd)
+        picked += [test_id for test_id in rest if test_id not in aimed_ids][:k - len(picked)]
+        self.rnd.shuffle(picked)
+        return picked
+
+    async def sample(self, subject: str, language: str = 'ru', k: int = 10, difficulty: Optional[str] = None,
+                     user_id: Optional[int] = None) -> List[Dict]:
+        """k random question rows, fetched in one query"""
+        ids = await self.sample_ids(subject, language, k, difficulty, user_id)
+        rows = await self.db.get_tests_by_ids(ids)
+        # A question deleted since the last reload is skipped
+        return [rows[test_id] for test_id in ids if test_id in rows]
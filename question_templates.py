@@ -0,0 +1,299 @@
+"""
+Parametrised physics problems.
+A Template is one problem type: a grid of values for each parameter, a
+formula, and distractor rules (the answers that common mistakes give), all
+written as NumPy expressions over whole parameter arrays, so a batch of
+problems is evaluated in a few vectorised operations and only the final text
+is formatted per problem. Rows whose options are not all positive, finite and
+distinct after rounding are dropped.
+A problem's id is its template's number times ID_STRIDE plus the index of its
+parameter combination, so ids are deterministic, never collide, and decode
+back to the problem (question_by_id). The option order is derived from the id
+as well. QuestionPool pre-generates a seeded sample of every template (and
+holds the fixed, non-numeric questions) so picking a question is O(1).
+"""
+
+import itertools
+import math
+import random
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from config import QUESTION_TEMPLATE_SETTINGS
+
+ID_STRIDE = 10 ** 9
+G = 10.0
+ELECTRON_MASS = 9.11e-31
+ELECTRON_CHARGE = 1.6e-19
+ATM = 101325.0
+SIGNIFICANT_DIGITS = 3
+
+_SUPERSCRIPT_DIGITS = str.maketrans('-0123456789', '⁻⁰¹²³⁴⁵⁶⁷⁸⁹')
+_PERMUTATIONS = np.array(list(itertools.permutations(range(4))))
+
+Params = Dict[str, np.ndarray]
+
+
+def round_significant(values: np.ndarray, digits: int = SIGNIFICANT_DIGITS) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        magnitude = np.floor(np.log10(np.abs(values)))
+        scale = 10.0 ** (digits - 1 - np.where(np.isfinite(magnitude), magnitude, 0))
+    return np.round(values * scale) / scale
+
+
+def format_number(value: float) -> str:
+    """240, 0.05, 1.4, or 5.7×10⁻⁵ outside 0.001..10⁶"""
+    if value == 0:
+        return "0"
+    exponent = math.floor(math.log10(abs(value)))
+    if -3 <= exponent < 6:
+        text = f"{value:.{max(0, SIGNIFICANT_DIGITS - 1 - exponent)}f}"
+        return text.rstrip('0').rstrip('.') if '.' in text else text
+    mantissa = f"{value / 10 ** exponent:.{SIGNIFICANT_DIGITS}g}"
+    return f"{mantissa}×10{str(exponent).translate(_SUPERSCRIPT_DIGITS)}"
+
+
+class Template:
+    def __init__(self, number: int, name: str, topic: str, difficulty: str, text: str, unit: str,
+                 params: Dict[str, Sequence[float]], answer: Callable[[Params], np.ndarray],
+                 distractors: Sequence[Callable[[Params, np.ndarray], np.ndarray]],
+                 formula: str, explanation: str):
+        # text and explanation are str.format templates over the parameters (explanation also gets {answer})
+        if len(distractors) != 3:
+            raise ValueError("a template needs three distractors")
+        self.number = number
+        self.name = name
+        self.topic = topic
+        self.difficulty = difficulty
+        self.text = text
+        self.unit = unit
+        self.names = list(params)
+        self.grids = [np.asarray(values, dtype=float) for values in params.values()]
+        self.shape = tuple(len(grid) for grid in self.grids)
+        self.combinations = math.prod(self.shape)
+        if self.combinations >= ID_STRIDE:
+            raise ValueError(f"{name}: too many parameter combinations for an id")
+        self.answer = answer
+        self.distractors = distractors
+        self.formula = formula
+        self.explanation = explanation
+
+    def generate(self, combos: np.ndarray) -> List[Dict]:
+        """The problems for the given parameter combination indices (invalid ones are left out)"""
+        combos = np.asarray(combos, dtype=np.int64)
+        indices = np.unravel_index(combos, self.shape)
+        params = {name: grid[index] for name, grid, index in zip(self.names, self.grids, indices)}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            answer = self.answer(params)
+            options = np.stack([answer] + [rule(params, answer) for rule in self.distractors], axis=1)
+        options = round_significant(options)
+
+        ordered = np.sort(options, axis=1)
+        valid = np.isfinite(options).all(axis=1) & (options > 0).all(axis=1) & (np.diff(ordered, axis=1) > 0).all(axis=1)
+        ids = self.number * ID_STRIDE + combos
+        # The correct option's position follows from the id
+        order = _PERMUTATIONS[(combos * 7919 + self.number) % len(_PERMUTATIONS)]
+        shuffled = np.take_along_axis(options, order, axis=1)
+        correct_at = np.argmin(order, axis=1)
+
+        questions = []
+        for row in np.flatnonzero(valid):
+            values = {name: format_number(float(params[name][row])) for name in self.names}
+            texts = [f"{format_number(value)} {self.unit}" for value in shuffled[row].tolist()]
+            correct = texts[correct_at[row]]
+            questions.append({
+                "id": int(ids[row]),
+                "text": self.text.format(**values),
+                "type": "calculation",
+                "topic": self.topic,
+                "difficulty": self.difficulty,
+                "options": texts,
+                "correct_answer": correct,
+                "explanation": self.explanation.format(answer=correct, **values),
+                "formula": self.formula,
+                "image": None
+            })
+        return questions
+
+    def sample(self, n: int, rng: np.random.Generator) -> List[Dict]:
+        """Up to n distinct problems drawn at random"""
+        if n >= self.combinations:
+            return self.generate(np.arange(self.combinations))
+        return self.generate(np.sort(rng.choice(self.combinations, size=n, replace=False)))
+
+
+TEMPLATES = [
+    Template(
+        1, "kinetic_energy", "Механика", "medium",
+        "Автомобиль массой {m} кг движется со скоростью {v} м/с. Какова его кинетическая энергия?", "кДж",
+        {"m": np.arange(500, 2501, 50), "v": np.arange(1, 61)},
+        lambda p: p["m"] * p["v"] ** 2 / 2 / 1e3,
+        [lambda p, a: 2 * a, lambda p, a: p["m"] * p["v"] / 2 / 1e3, lambda p, a: a / 2],
+        "E = mv²/2", "E = mv²/2 = {m}×{v}²/2 = {answer}"
+    ),
+    Template(
+        2, "free_fall_time", "Механика", "easy",
+        "Тело свободно падает с высоты {h} м. Сколько времени займет падение? (g = 10 м/с²)", "с",
+        {"h": np.arange(1, 1001)},
+        lambda p: np.sqrt(2 * p["h"] / G),
+        [lambda p, a: np.sqrt(p["h"] / G), lambda p, a: 2 * a, lambda p, a: p["h"] / G],
+        "h = gt²/2, откуда t = √(2h/g)", "t = √(2h/g) = √(2×{h}/10) = {answer}"
+    ),
+    Template(
+        3, "projectile_max_height", "Механика", "hard",
+        "Снаряд выпущен под углом {angle}° к горизонту со скоростью {v} м/с. Максимальная высота полета:", "м",
+        {"v": np.arange(10, 301), "angle": [15, 30, 45, 60, 75]},
+        lambda p: (p["v"] * np.sin(np.radians(p["angle"]))) ** 2 / (2 * G),
+        [lambda p, a: p["v"] ** 2 / (2 * G), lambda p, a: 2 * a,
+         lambda p, a: p["v"] ** 2 * np.sin(np.radians(p["angle"])) / (2 * G)],
+        "H = (v₀sin α)²/(2g)", "H = (v₀sin α)²/(2g) = ({v}×sin{angle}°)²/20 = {answer}"
+    ),
+    Template(
+        4, "capacitor_energy", "Электричество", "medium",
+        "Конденсатор емкостью {c} мкФ заряжен до напряжения {u} В. Энергия конденсатора:", "Дж",
+        {"c": [1, 2, 4.7, 5, 10, 20, 22, 47, 50, 100, 220, 470, 1000], "u": np.arange(5, 501, 5)},
+        lambda p: p["c"] * 1e-6 * p["u"] ** 2 / 2,
+        [lambda p, a: 2 * a, lambda p, a: p["c"] * 1e-6 * p["u"] / 2, lambda p, a: 4 * a],
+        "W = CU²/2", "W = CU²/2 = {c}×10⁻⁶×{u}²/2 = {answer}"
+    ),
+    Template(
+        5, "lens_object_distance", "Оптика", "medium",
+        "Линза с фокусным расстоянием {focus} см дает изображение предмета на расстоянии {image} см. "
+        "Расстояние до предмета:", "см",
+        {"focus": np.arange(5, 61), "image": np.arange(10, 301)},
+        lambda p: np.where(p["image"] > p["focus"], p["focus"] * p["image"] / (p["image"] - p["focus"]), np.nan),
+        [lambda p, a: p["image"] - p["focus"], lambda p, a: p["focus"] * p["image"] / (p["image"] + p["focus"]),
+         lambda p, a: p["image"] + p["focus"]],
+        "1/F = 1/d + 1/f", "1/d = 1/F - 1/f = 1/{focus} - 1/{image}, d = {answer}"
+    ),
+    Template(
+        6, "pendulum_frequency", "Механика", "hard",
+        "Частота колебаний маятника длиной {length} м равна примерно:", "Гц",
+        {"length": np.round(np.arange(0.05, 10.001, 0.05), 2)},
+        lambda p: np.sqrt(G / p["length"]) / (2 * np.pi),
+        [lambda p, a: 1 / a, lambda p, a: np.sqrt(G / p["length"]), lambda p, a: np.sqrt(p["length"] / G) / (2 * np.pi)],
+        "T = 2π√(L/g), f = 1/T", "T = 2π√({length}/10), f = 1/T = {answer}"
+    ),
+    Template(
+        7, "electron_radius", "Электричество", "hard",
+        "Электрон движется в магнитном поле с индукцией {b} Тл со скоростью {v} м/с. Радиус траектории:", "м",
+        {"b": np.round(np.arange(0.01, 1.001, 0.01), 2), "v": np.outer([1, 2, 3, 5, 8], [1e5, 1e6, 1e7]).ravel()},
+        lambda p: ELECTRON_MASS * p["v"] / (ELECTRON_CHARGE * p["b"]),
+        [lambda p, a: 2 * a, lambda p, a: a / 2, lambda p, a: 2 * np.pi * a],
+        "r = mv/(eB)", "r = mv/(eB) = 9.11×10⁻³¹×{v}/(1.6×10⁻¹⁹×{b}) = {answer}"
+    ),
+    Template(
+        8, "photoelectric_effect", "Квантовая физика", "easy",
+        "Фотон с энергией {photon} эВ падает на металл с работой выхода {work} эВ. "
+        "Максимальная кинетическая энергия фотоэлектронов:", "эВ",
+        {"photon": np.round(np.arange(1.5, 8.01, 0.05), 2), "work": [1.9, 2.1, 2.2, 2.3, 2.9, 3.7, 4.1, 4.3, 4.5, 4.7, 5.0]},
+        lambda p: np.where(p["photon"] > p["work"], p["photon"] - p["work"], np.nan),
+        [lambda p, a: p["photon"] + p["work"], lambda p, a: p["work"], lambda p, a: p["photon"]],
+        "Ek = hν - A", "Ek = hν - A = {photon} - {work} = {answer}"
+    ),
+    Template(
+        9, "isothermal_work", "Термодинамика", "hard",
+        "Идеальный газ изотермически расширяется от {v1} л до {v2} л при начальном давлении {p} атм. Работа газа:",
+        "Дж",
+        {"p": np.arange(1, 11), "v1": np.arange(1, 11), "v2": np.arange(2, 41)},
+        lambda p: np.where(p["v2"] > p["v1"], p["p"] * ATM * p["v1"] * 1e-3 * np.log(p["v2"] / p["v1"]), np.nan),
+        [lambda p, a: p["p"] * ATM * (p["v2"] - p["v1"]) * 1e-3, lambda p, a: p["p"] * ATM * p["v2"] * 1e-3 * np.log(p["v2"] / p["v1"]),
+         lambda p, a: p["p"] * ATM * p["v1"] * 1e-3 * p["v2"] / p["v1"]],
+        "A = p₁V₁×ln(V₂/V₁)", "A = p₁V₁ ln(V₂/V₁) = {p}×101325×{v1}×10⁻³×ln({v2}/{v1}) = {answer}"
+    ),
+]
+TEMPLATES_BY_NUMBER = {template.number: template for template in TEMPLATES}
+
+# Questions that are not calculations; their ids are below ID_STRIDE
+FIXED_QUESTIONS = [
+    {
+        "id": 1,
+        "text": "Дене 2 м биіктіктен 2 м/с жылдамдықпен көлденең лақтырылды. Дене 60 м үйдің жанынан толық өтіп кету үшін кететін уақыт:",
+        "type": "multiple_choice",
+        "topic": "Механика",
+        "difficulty": "hard",
+        "options": ["10 с", "12 с", "30 с", "29 с", "31 с"],
+        "correct_answer": "30 с",
+        "explanation": "Көлденең лақтыру есебі. Тік бағытта: h = v₀t + gt²/2, 2 = 0 + 10t²/2, t = 0.63 с. Көлденең: x = v₀t = 2×30 = 60 м",
+        "formula": "x = v₀t, h = gt²/2",
+        "image": None
+    },
+    {
+        "id": 2,
+        "text": "Какой закон описывает зависимость силы тока от напряжения в проводнике?",
+        "type": "multiple_choice",
+        "topic": "Электричество",
+        "difficulty": "easy",
+        "options": ["Закон Ома", "Закон Кулона", "Закон Ампера", "Закон Фарадея"],
+        "correct_answer": "Закон Ома",
+        "explanation": "Закон Ома: I = U/R, сила тока прямо пропорциональна напряжению",
+        "formula": "I = U/R",
+        "image": None
+    },
+    {
+        "id": 3,
+        "text": "При какой температуре вода кипит при нормальном атмосферном давлении?",
+        "type": "multiple_choice",
+        "topic": "Термодинамика",
+        "difficulty": "easy",
+        "options": ["90°C", "100°C", "110°C", "120°C"],
+        "correct_answer": "100°C",
+        "explanation": "При нормальном атмосферном давлении (101325 Па) вода кипит при 100°C",
+        "formula": None,
+        "image": None
+    },
+]
+_FIXED_BY_ID = {question["id"]: question for question in FIXED_QUESTIONS}
+
+
+def question_by_id(question_id: int) -> Optional[Dict]:
+    """The problem with this id, regenerated from it (None for an unknown or invalid id)"""
+    if question_id < ID_STRIDE:
+        return _FIXED_BY_ID.get(question_id)
+    template = TEMPLATES_BY_NUMBER.get(question_id // ID_STRIDE)
+    combo = question_id % ID_STRIDE
+    if template is None or combo >= template.combinations:
+        return None
+    questions = template.generate(np.array([combo]))
+    return questions[0] if questions else None
+
+
+class QuestionPool:
+    """Pre-generated problems of every template plus the fixed questions, picked in O(1)"""
+
+    def __init__(self, templates: Sequence[Template] = TEMPLATES, per_template: Optional[int] = None,
+                 seed: Optional[int] = None):
+        self.templates = templates
+        self.per_template = QUESTION_TEMPLATE_SETTINGS['per_template'] if per_template is None else per_template
+        self.seed = QUESTION_TEMPLATE_SETTINGS['seed'] if seed is None else seed
+        self.questions: List[Dict] = []
+        self.by_difficulty: Dict[str, List[Dict]] = {}
+        self.by_id: Dict[int, Dict] = {}
+
+    def build(self):
+        rng = np.random.default_rng(self.seed)
+        questions = list(FIXED_QUESTIONS)
+        for template in self.templates:
+            questions += template.sample(self.per_template, rng)
+        by_difficulty = {}
+        for question in questions:
+            by_difficulty.setdefault(question["difficulty"], []).append(question)
+        self.by_id = {question["id"]: question for question in questions}
+        self.by_difficulty = by_difficulty
+        self.questions = questions
+        print(f"✅ Question pool: {len(questions)} questions from {len(self.templates)} templates")
+
+    def difficulties(self) -> List[str]:
+        if not self.questions:
+            self.build()
+        return list(self.by_difficulty)
+
+    def pick(self, rnd: random.Random = random, difficulty: Optional[str] = None) -> Dict:
+        """A random question, of the given difficulty if there are any (treat it as read-only)"""
+        if not self.questions:
+            self.build()
+        return rnd.choice(self.by_difficulty.get(difficulty) or self.questions)
+
+    def get(self, question_id: int) -> Optional[Dict]:
+        return self.by_id.get(question_id) or question_by_id(question_id)
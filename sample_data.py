@@ -8,6 +8,7 @@ async def populate_sample_data():
     """Add sample data to the database"""
     db = Database()
     await db.init_db()
+    await db.close()  # the inserts below use their own connections
     
     # Sample tests data
     sample_tests = [
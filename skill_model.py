@@ -0,0 +1,87 @@
+"""
+Skill estimates for adaptive test selection.
+Users have an ability per topic and questions a difficulty, both in logits
+under the Rasch model: P(correct) = 1 / (1 + e^(difficulty - ability)).
+Each recorded answer moves both like an Elo rating, by a step that shrinks as
+the estimate collects answers. The most informative question for a user is
+the one whose difficulty is nearest their ability (p(1 - p) peaks at
+p = 1/2), so RatingIndex keeps a pool's question ids sorted by difficulty and
+finds the nearest ones with a binary search.
+"""
+
+import math
+import random
+from array import array
+from bisect import bisect_left
+from typing import Collection, List, Optional, Sequence, Tuple
+
+from config import ADAPTIVE_SETTINGS
+
+
+def p_correct(ability: float, difficulty: float) -> float:
+    return 1.0 / (1.0 + math.exp(difficulty - ability))
+
+
+def information(ability: float, difficulty: float) -> float:
+    """Fisher information of one answer about the ability"""
+    p = p_correct(ability, difficulty)
+    return p * (1.0 - p)
+
+
+def step_size(k: float, k_min: float, answers: int) -> float:
+    return max(k_min, k / (1.0 + answers / ADAPTIVE_SETTINGS['decay_answers']))
+
+
+def prior_difficulty(label: Optional[str]) -> float:
+    """Starting difficulty of a question from its easy/medium/hard label"""
+    return ADAPTIVE_SETTINGS['difficulty_priors'].get(label, 0.0)
+
+
+def elo_update(ability: float, ability_answers: int, difficulty: float, difficulty_answers: int,
+               correct: bool) -> Tuple[float, float]:
+    """(ability, difficulty) after one answer"""
+    surprise = float(correct) - p_correct(ability, difficulty)
+    ability += step_size(ADAPTIVE_SETTINGS['user_k'], ADAPTIVE_SETTINGS['user_k_min'], ability_answers) * surprise
+    difficulty -= step_size(ADAPTIVE_SETTINGS['question_k'], ADAPTIVE_SETTINGS['question_k_min'],
+                            difficulty_answers) * surprise
+    return ability, difficulty
+
+
+class RatingIndex:
+    """A pool's question ids sorted by difficulty (a snapshot: rebuild it as ratings drift)"""
+
+    def __init__(self, ids: Sequence[int], ratings: Sequence[float], built_at: int = 0):
+        # ratings is indexed by test id
+        order = sorted(ids, key=ratings.__getitem__)
+        self.ids = array('I', order)
+        self.keys = array('d', (ratings[test_id] for test_id in order))
+        self.built_at = built_at
+
+    def __len__(self):
+        return len(self.ids)
+
+    def nearest(self, ability: float, k: int, exclude: Collection[int] = (), candidates: int = 1,
+                rnd: random.Random = random) -> List[int]:
+        """k ids drawn at random from the k + candidates - 1 questions nearest the ability,
+        skipping excluded ones while there are enough others. O(log n + k + candidates + skipped)"""
+        n = len(self.ids)
+        k = max(0, min(k, n))
+        want = min(n, k + max(candidates, 1) - 1)
+        below = bisect_left(self.keys, ability) - 1
+        above = below + 1
+        fresh, skipped = [], []
+        while len(fresh) < want and (below >= 0 or above < n):
+            if above >= n or (below >= 0 and ability - self.keys[below] <= self.keys[above] - ability):
+                test_id = self.ids[below]
+                below -= 1
+            else:
+                test_id = self.ids[above]
+                above += 1
+            if test_id in exclude:
+                if len(skipped) < k:
+                    skipped.append(test_id)
+            else:
+                fresh.append(test_id)
+        picked = rnd.sample(fresh, min(k, len(fresh)))
+        # Not enough unseen questions: the nearest seen ones fill the test
+        return picked + skipped[:k - len(picked)]
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Tests for the paginated virtual-question and solution-analysis listings
+"""
+import asyncio
+import json
+
+import httpx
+
+import api_server
+
+
+async def seed(db, rows=45):
+    async with db.pool.writer() as conn:
+        await conn.executemany(
+            """INSERT INTO virtual_questions (question_id, text, topic, difficulty, options, correct_answer, created_at)
+               VALUES (?, ?, ?, ?, ?, 'A', ?)""",
+            [(1000 + i, f"Question {i}", "Механика" if i % 3 else "Оптика", ("easy", "hard")[i % 2],
+              json.dumps(["A", "B"]), f"2024-01-01 10:{i // 2:02d}:00") for i in range(rows)]
+        )
+        await conn.executemany(
+            """INSERT INTO solution_analyses (analysis_id, is_correct, score, feedback, detailed_analysis, suggestions, checked_at)
+               VALUES (?, ?, ?, 'ok', ?, '[]', ?)""",
+            [(5000 + i, i % 2, i * 2, json.dumps({"units": "✅"}), f"2024-01-01 10:{i // 2:02d}:00") for i in range(rows)]
+        )
+        await conn.commit()
+
+
+def with_client(sqlite_db, monkeypatch, check):
+    async def scenario():
+        async with sqlite_db() as db:
+            monkeypatch.setattr(api_server, "db", db)
+            await seed(db)
+            transport = httpx.ASGITransport(app=api_server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                await check(client)
+
+    asyncio.run(scenario())
+
+
+async def walk(client, url, key, **params):
+    items, cursor = [], None
+    while True:
+        response = await client.get(url, params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        body = response.json()
+        items.extend(body[key])
+        cursor = body["next_cursor"]
+        assert response.headers.get("X-Next-Cursor") == cursor
+        if not cursor:
+            return items
+
+
+def test_virtual_questions_pages_cover_every_row_once(sqlite_db, monkeypatch):
+    async def check(client):
+        questions = await walk(client, "/api/ai/virtual-questions", "questions", limit=20)
+        assert sorted(q["id"] for q in questions) == list(range(1000, 1045))
+        # Newest first, ties broken by id
+        assert [q["id"] for q in questions[:3]] == [1044, 1043, 1042]
+        assert "options" not in questions[0] and "correct_answer" not in questions[0]
+
+        hard_optics = await walk(client, "/api/ai/virtual-questions", "questions",
+                                 topic="Оптика", difficulty="hard", limit=2)
+        assert {q["id"] for q in hard_optics} == {1000 + i for i in range(45) if i % 3 == 0 and i % 2 == 1}
+
+        detail = (await client.get("/api/ai/virtual-questions/1007")).json()
+        assert detail["options"] == ["A", "B"] and detail["correct_answer"] == "A"
+        assert (await client.get("/api/ai/virtual-questions/1")).status_code == 404
+        assert (await client.get("/api/ai/virtual-questions", params={"cursor": "nope"})).status_code == 400
+
+    with_client(sqlite_db, monkeypatch, check)
+
+
+def test_solution_analyses_filter_by_score_in_sql(sqlite_db, monkeypatch):
+    async def check(client):
+        analyses = await walk(client, "/api/ai/solution-analyses", "analyses",
+                              min_score=20, max_score=60, is_correct=True, limit=4)
+        assert sorted(a["score"] for a in analyses) == [s for s in range(20, 61, 2) if (s // 2) % 2 == 1]
+        assert "detailed_analysis" not in analyses[0]
+
+        detail = (await client.get("/api/ai/solution-analyses/5003")).json()
+        assert detail["detailed_analysis"] == {"units": "✅"} and detail["suggestions"] == []
+        assert (await client.get("/api/ai/solution-analyses/1")).status_code == 404
+
+    with_client(sqlite_db, monkeypatch, check)
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Tests for free-form answer checking and the batch check endpoint
+"""
+import asyncio
+import math
+
+import httpx
+
+import api_server
+from answer_checker import check_answer, check_answers
+from quantities import parse_quantity
+
+
+def test_parse_quantity_reads_value_and_si_unit():
+    joule, speed, metre = parse_quantity("1 J")[2], parse_quantity("1 m/s")[2], parse_quantity("1 m")[2]
+    assert parse_quantity("240 кДж") == (240.0, 240000.0, joule)
+    assert parse_quantity("0,5 m/s") == (0.5, 0.5, speed)
+    value, si, dimension = parse_quantity("72 км/ч")
+    assert value == 72 and math.isclose(si, 20.0) and dimension == speed
+    assert parse_quantity("1.5e3 Па") == (1500.0, 1500.0, parse_quantity("1 Pa")[2])
+    assert parse_quantity("-12 мм") == (-12.0, -0.012, metre)
+    # A unit has to stand on its own, and digits inside words are not numbers
+    assert parse_quantity("10 секунд") == (10.0, None, None)
+    assert parse_quantity("H2O") is None
+    assert parse_quantity("Ответ: 30 с") == (30.0, 30.0, parse_quantity("1 s")[2])
+    assert parse_quantity("не знаю") is None
+
+
+def test_check_answers_compares_in_si_units_and_around_zero():
+    user = ["240000 Дж", "0", "0.0000000001", "5", "240 кДж", "30 м", "31", "Ньютон", "ньютон", "102", ""]
+    correct = ["240 кДж", "0", "0", "0", "240 Дж", "30 с", "30 с", "ньютон", "Ньютон", "100", "5"]
+    is_correct, unit_mismatch = check_answers(user, correct)
+    assert is_correct.tolist() == [True, True, True, False, False, False, True, True, True, True, False]
+    assert unit_mismatch.tolist() == [False, False, False, False, False, True, False, False, False, False, False]
+
+    # One tolerance per answer; NaN means the default
+    is_correct, _ = check_answers(["102", "102", "102"], ["100", "100", "100"], [0.01, float("nan"), 0.05])
+    assert is_correct.tolist() == [False, True, True]
+    assert check_answer("9.5", "10", rel_tolerance=0.1) == (True, False)
+    assert check_answers([], [])[0].tolist() == []
+
+
+def test_check_endpoints(monkeypatch):
+    async def scenario():
+        transport = httpx.ASGITransport(app=api_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post("/api/ai/check-answer", json={
+                "question_id": 1, "user_answer": "0", "correct_answer": "0 м"
+            })
+            assert response.json()["is_correct"] is True
+
+            response = await client.post("/api/ai/check-answers", json={"answers": [
+                {"question_id": 1, "user_answer": "240 кДж", "correct_answer": "240000 Дж"},
+                {"question_id": 2, "user_answer": "30 м", "correct_answer": "30 с"},
+                {"question_id": 3, "user_answer": "12", "correct_answer": "10", "tolerance": 0.25},
+            ]})
+            assert response.status_code == 200
+            body = response.json()
+            assert [r["question_id"] for r in body["results"]] == [1, 2, 3]
+            assert [r["is_correct"] for r in body["results"]] == [True, False, True]
+            assert body["results"][1]["unit_mismatch"] is True
+            assert body["correct"] == 2 and body["total"] == 3
+
+            monkeypatch.setitem(api_server.ANSWER_CHECK_SETTINGS, "max_batch", 2)
+            response = await client.post("/api/ai/check-answers", json={"answers": [{}, {}, {}]})
+            assert response.status_code == 413
+
+    asyncio.run(scenario())
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Tests for the bot's test answer flow
+"""
+import asyncio
+
+import bot_storage
+from answer_flow import AnswerFlow
+from translations import get_text
+
+
+class FakeMessage:
+    """Records the edits a handler makes to the test message"""
+
+    def __init__(self):
+        self.edits = []
+
+    async def edit_text(self, text, reply_markup=None):
+        self.edits.append(text)
+
+
+async def seed_tests(db):
+    async with db.pool.writer() as conn:
+        await conn.executemany(
+            """INSERT INTO tests (id, subject, question, option_a, option_b, option_c, option_d, correct_answer)
+               VALUES (?, 'physics', ?, '1', '2', '3', '4', ?)""",
+            [(i, f"Q{i}", "ABCD"[i % 4]) for i in range(1, 6)]
+        )
+
+
+def count_calls(db, name):
+    calls = []
+    original = getattr(db, name)
+
+    async def counted(*args, **kwargs):
+        calls.append(args)
+        return await original(*args, **kwargs)
+
+    setattr(db, name, counted)
+    return calls
+
+
+def test_each_answer_is_one_edit_with_feedback_and_next_question(sqlite_db):
+    async def scenario():
+        async with sqlite_db(users=[(42, "Aigerim")]) as db:
+            await seed_tests(db)
+            flow = AnswerFlow(db, bot_storage.TestSessionStore(db.pool))
+            tests = list((await db.get_tests_by_ids([1, 2, 3])).values())
+            user_lookups = count_calls(db, "get_user")
+            question_loads = count_calls(db, "get_tests_by_ids")
+
+            session = await flow.start(42, tests, "physics", "2024-03-01T10:00:00")
+            message = FakeMessage()
+            await flow.show_question(message, session, "ru")
+            assert message.edits == [flow.question_text(session, tests[0], "ru")]
+
+            session = await flow.answer(message, 42, "B")
+            assert len(message.edits) == 2
+            assert message.edits[-1].startswith(get_text("correct_answer", "ru") + "\n\nВопрос 2/3")
+            assert "❓ Q2" in message.edits[-1]
+
+            # A double tap on question 2 goes through as one answer
+            first, second = await asyncio.gather(flow.answer(message, 42, "A"), flow.answer(message, 42, "A"))
+            assert [first is None, second is None].count(True) == 1
+            assert len(message.edits) == 3
+            assert message.edits[-1].startswith(get_text("wrong_answer", "ru", answer="C") + "\n\nВопрос 3/3")
+
+            session = await flow.answer(message, 42, "D")
+            assert session.finished
+            assert message.edits[-1].startswith(get_text("correct_answer", "ru") + "\n\n")
+            assert "2/3" in message.edits[-1]
+            assert await flow.sessions.get(42) is None
+            assert await flow.answer(message, 42, "A") is None
+
+            user = await db.get_user(42)
+            assert (user["tests_completed"], user["points"]) == (1, 20)
+            # The language was read once, the questions never after the start
+            assert len(user_lookups) == 2 and question_loads == []
+
+    asyncio.run(scenario())
+
+
+def test_another_worker_loads_the_remaining_questions_in_one_query(sqlite_db):
+    async def scenario():
+        async with sqlite_db(users=[(42, "Aigerim")]) as db:
+            await seed_tests(db)
+            sessions = bot_storage.TestSessionStore(db.pool)
+            await AnswerFlow(db, sessions).start(42, list((await db.get_tests_by_ids([5, 1, 4])).values()),
+                                                 "physics", None)
+            # Questions come back in id order; the session keeps that order
+            worker = AnswerFlow(db, sessions)
+            worker.remember_language(42, "ru")
+            question_loads = count_calls(db, "get_tests_by_ids")
+            message = FakeMessage()
+
+            await worker.answer(message, 42, "B")
+            await worker.answer(message, 42, "A")
+            assert len(question_loads) == 1
+            assert "❓ Q5" in message.edits[-1]
+
+    asyncio.run(scenario())
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Tests for the content-addressed photo blob store
+"""
+import asyncio
+import base64
+import hashlib
+import io
+import os
+
+import httpx
+from PIL import Image
+
+import api_server
+from blob_store import BlobStore, move_inline_photos
+
+
+def png_bytes(color=(200, 30, 30)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (16, 16), color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_blobs_are_sharded_and_deduplicated(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    data = png_bytes()
+    blob_hash = store.put_bytes(data)
+
+    assert blob_hash == hashlib.sha256(data).hexdigest()
+    assert store.put_file(io.BytesIO(data)) == blob_hash
+    assert store.path(blob_hash) == os.path.join(str(tmp_path / "blobs"), blob_hash[:2], blob_hash[2:4], blob_hash)
+    assert sum(len(files) for _, _, files in os.walk(tmp_path / "blobs")) == 1
+    assert store.media_type(blob_hash) == "image/png"
+    assert not store.exists("../../etc/passwd")
+
+
+def test_inline_photos_move_to_the_store(sqlite_db, tmp_path):
+    async def scenario():
+        store = BlobStore(str(tmp_path / "blobs"))
+        data = png_bytes()
+        inline = "data:image/jpeg;base64," + base64.b64encode(data).decode()
+        async with sqlite_db() as db:
+            async with db.pool.writer() as conn:
+                await conn.executemany("INSERT INTO virtual_questions (question_id, original_photo) VALUES (?, ?)",
+                                       [(1, inline), (2, inline), (3, None)])
+                await conn.execute("INSERT INTO solution_analyses (analysis_id, original_photo) VALUES (1, 'not base64!')")
+
+            assert await move_inline_photos(db.pool, store) == 3
+            assert await move_inline_photos(db.pool, store) == 0
+            async with db.pool.reader() as conn:
+                cursor = await conn.execute("SELECT question_id, photo_hash, original_photo FROM virtual_questions ORDER BY question_id")
+                rows = [tuple(row) for row in await cursor.fetchall()]
+            digest = hashlib.sha256(data).hexdigest()
+            assert rows == [(1, digest, None), (2, digest, None), (3, None, None)]
+            assert store.exists(digest)
+
+    asyncio.run(scenario())
+
+
+def test_uploaded_photo_is_served_from_blob_endpoint(sqlite_db, tmp_path, monkeypatch):
+    async def scenario():
+        async with sqlite_db() as db:
+            monkeypatch.setattr(api_server, "db", db)
+            monkeypatch.setattr(api_server, "blob_store", BlobStore(str(tmp_path / "blobs")))
+            data = png_bytes()
+            transport = httpx.ASGITransport(app=api_server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                response = await client.post("/api/ai/upload-question-photo",
+                                             files={"photo": ("task.png", data, "image/png")})
+                question = response.json()["virtual_question"]
+                assert question["original_photo"] == f"/api/blobs/{question['photo_hash']}"
+
+                listed = (await client.get("/api/ai/virtual-questions")).json()["questions"]
+                assert [q["original_photo"] for q in listed] == [question["original_photo"]]
+
+                blob = await client.get(question["original_photo"])
+                assert blob.status_code == 200
+                # Uploads are re-encoded to JPEG by the upload pipeline
+                assert hashlib.sha256(blob.content).hexdigest() == question["photo_hash"]
+                assert blob.headers["content-type"] == "image/jpeg"
+                cached = await client.get(question["original_photo"], headers={"If-None-Match": blob.headers["etag"]})
+                assert cached.status_code == 304
+
+                assert (await client.get("/api/blobs/" + "0" * 64)).status_code == 404
+
+    asyncio.run(scenario())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Tests for the durable bot FSM storage and test sessions
+"""
+import asyncio
+
+import pytest
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.base import StorageKey
+
+import bot_storage
+from database import Database
+
+KEY = StorageKey(bot_id=1, chat_id=42, user_id=42)
+
+
+class Flow(StatesGroup):
+    waiting = State()
+
+
+async def seed_tests(db):
+    async with db.pool.writer() as conn:
+        await conn.executemany(
+            """INSERT INTO tests (id, subject, question, option_a, option_b, option_c, option_d, correct_answer)
+               VALUES (?, 'physics', ?, '1', '2', '3', '4', ?)""",
+            [(i, f"Q{i}", "ABCD"[i % 4]) for i in range(1, 6)]
+        )
+
+
+def test_fsm_state_and_data_survive_a_restart(sqlite_db):
+    async def scenario():
+        async with sqlite_db() as db:
+            storage = bot_storage.SQLiteStorage(db.pool)
+            await storage.set_state(KEY, Flow.waiting)
+            await storage.set_data(KEY, {"day_of_week": 2})
+            assert await storage.update_data(KEY, {"topic": "Оптика"}) == {"day_of_week": 2, "topic": "Оптика"}
+            other = StorageKey(bot_id=1, chat_id=42, user_id=42, thread_id=7)
+            assert await storage.get_state(other) is None and await storage.get_data(other) == {}
+
+        # A new process on the same database file
+        async with sqlite_db() as db:
+            storage = bot_storage.SQLiteStorage(db.pool)
+            assert await storage.get_state(KEY) == "Flow:waiting"
+            assert await storage.get_data(KEY) == {"day_of_week": 2, "topic": "Оптика"}
+            await storage.set_state(KEY, None)
+            assert await storage.get_state(KEY) is None
+
+    asyncio.run(scenario())
+
+
+def test_workers_sharing_the_store_do_not_lose_updates(sqlite_db, tmp_path):
+    async def scenario():
+        async with sqlite_db() as db:
+            second = Database(str(tmp_path / "test.db"))
+            try:
+                workers = [bot_storage.SQLiteStorage(db.pool), bot_storage.SQLiteStorage(second.pool)]
+                await asyncio.gather(*(workers[i % 2].update_data(KEY, {f"k{i}": i}) for i in range(20)))
+                assert await workers[0].get_data(KEY) == {f"k{i}": i for i in range(20)}
+            finally:
+                await second.close()
+
+    asyncio.run(scenario())
+
+
+def test_expired_entries_are_invisible_and_evicted(sqlite_db):
+    async def scenario():
+        async with sqlite_db(users=[(42, "Aigerim")]) as db:
+            await seed_tests(db)
+            storage = bot_storage.SQLiteStorage(db.pool, ttl=-1)
+            sessions = bot_storage.TestSessionStore(db.pool, ttl=-1)
+            await storage.set_state(KEY, Flow.waiting)
+            await sessions.start(42, [1, 2])
+            assert await storage.get_state(KEY) is None
+            assert await sessions.get(42) is None
+
+            live = bot_storage.SQLiteStorage(db.pool)
+            await live.set_state(StorageKey(bot_id=1, chat_id=7, user_id=7), Flow.waiting)
+            assert await bot_storage.evict_expired(db.pool) == 2
+            assert await bot_storage.evict_expired(db.pool) == 0
+
+    asyncio.run(scenario())
+
+
+def test_test_session_is_packed_and_guards_double_answers(sqlite_db):
+    async def scenario():
+        async with sqlite_db(users=[(42, "Aigerim")]) as db:
+            await seed_tests(db)
+            sessions = bot_storage.TestSessionStore(db.pool)
+            session = await sessions.start(42, [3, 1, 4], subject="physics", started_at="2024-03-01T10:00:00")
+            assert (session.current_test_id, session.total) == (3, 3)
+
+            session = await sessions.record_answer(42, 0, "D", True)
+            # A second tap on the same question, or another worker handling it, is ignored
+            assert await sessions.record_answer(42, 0, "A", False) is None
+            session = await sessions.record_answer(42, 1, "C", False)
+            session = await sessions.get(42)
+            assert (session.position, session.current_test_id, session.correct_count) == (2, 4, 1)
+            assert session.answered() == [(3, "D"), (1, "C")]
+            session = await sessions.record_answer(42, 2, "A", True)
+            assert session.finished and session.current_test_id is None
+
+            async with db.pool.reader() as conn:
+                cursor = await conn.execute("SELECT length(test_ids), answers, correct FROM test_sessions")
+                # 4 bytes per question id; answers D, C, A = 3 | 2 << 2 | 0 << 4
+                assert tuple(await cursor.fetchone()) == (12, 3 | 2 << 2, 0b101)
+
+            result = await db.record_test_attempt(42, session.answered(), subject=session.subject)
+            assert (result["correct"], result["total"]) == (2, 3)
+            await sessions.finish(42)
+            assert await sessions.get(42) is None
+
+            with pytest.raises(ValueError):
+                await sessions.start(42, list(range(1, 40)))
+
+    asyncio.run(scenario())
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Tests for the bot's webhook mode: per-chat ordering, backpressure and drain
+"""
+import asyncio
+import random
+
+import httpx
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.types import CallbackQuery, Message
+from fastapi import FastAPI
+
+from bot_webhook import SECRET_HEADER, BotWebhook, UpdateProcessor
+from fake_updates import FAKE_BOT_TOKEN, fake_message_update, fake_update_stream
+
+
+def test_updates_run_concurrently_but_in_order_per_chat():
+    async def scenario():
+        rnd = random.Random(5)
+        seen = {}
+        running = 0
+        peak = 0
+
+        async def handle(update):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(rnd.random() / 500)
+            seen.setdefault(update[0], []).append(update[1])
+            running -= 1
+
+        processor = UpdateProcessor(handle, max_pending=1000, concurrency=8)
+        for n in range(400):
+            chat = rnd.randrange(20)
+            assert processor.submit((chat, n), chat)
+            if n % 7 == 0:
+                await asyncio.sleep(0)
+        assert await processor.drain(timeout=10)
+
+        assert sum(len(numbers) for numbers in seen.values()) == 400
+        assert all(numbers == sorted(numbers) for numbers in seen.values())
+        assert 1 < peak <= 8
+        metrics = processor.metrics()
+        assert (metrics['processed'], metrics['pending'], metrics['active_chats']) == (400, 0, 0)
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_rejects_and_drain_waits_for_accepted_updates():
+    async def scenario():
+        release = asyncio.Event()
+        handled = []
+
+        async def handle(update):
+            await release.wait()
+            if update == "boom":
+                raise RuntimeError(update)
+            handled.append(update)
+
+        processor = UpdateProcessor(handle, max_pending=3, concurrency=2)
+        assert [processor.submit(n, n % 2) for n in range(5)] == [True, True, True, False, False]
+        await asyncio.sleep(0)
+        metrics = processor.metrics()
+        assert (metrics['pending'], metrics['in_flight'], metrics['rejected']) == (3, 2, 2)
+
+        # Nothing finishes within the timeout: the stragglers are cancelled
+        assert not await processor.drain(timeout=0.05)
+        assert not processor.submit(5, 1)
+
+        processor = UpdateProcessor(handle, max_pending=3, concurrency=2)
+        processor.submit("boom", 1)
+        processor.submit(7, 1)
+        drain = asyncio.create_task(processor.drain(timeout=5))
+        await asyncio.sleep(0)
+        assert not processor.submit(8, 2)
+        release.set()
+        assert await drain
+        assert handled == [7]
+        assert (processor.metrics()['failed'], processor.metrics()['processed']) == (1, 1)
+
+    asyncio.run(scenario())
+
+
+def test_webhook_route_feeds_the_dispatcher():
+    async def scenario():
+        router = Router()
+        handled = []
+
+        @router.message(F.text)
+        async def on_message(message: Message):
+            handled.append((message.chat.id, message.text))
+
+        @router.callback_query(F.data.startswith("answer_"))
+        async def on_answer(callback: CallbackQuery):
+            handled.append((callback.from_user.id, callback.data))
+
+        dp = Dispatcher()
+        dp.include_router(router)
+        webhook = BotWebhook(Bot(FAKE_BOT_TOKEN), dp, settings={'url': None, 'secret_token': 's3cret'})
+        app = FastAPI()
+        app.include_router(webhook.router)
+        path = webhook.settings['path']
+        updates = fake_update_stream(chats=5, taps_per_chat=3, seed=2)
+
+        await webhook.start()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post(path, json=fake_message_update(1, 7, "hi"))
+            assert response.status_code == 401
+            headers = {SECRET_HEADER: "s3cret"}
+            responses = await asyncio.gather(*(client.post(path, json=update, headers=headers) for update in updates))
+            assert [r.status_code for r in responses] == [200] * len(updates)
+            await webhook.stop()
+
+            response = await client.post(path, json=fake_message_update(99, 7, "late"), headers=headers)
+            assert response.status_code == 503
+            metrics = (await client.get(f"{path}/metrics")).json()
+
+        assert (metrics['received'], metrics['processed'], metrics['rejected']) == (20, 20, 1)
+        assert len(handled) == 20
+        for chat in range(100000, 100005):
+            taps = [data for chat_id, data in handled if chat_id == chat]
+            assert taps[0] == "/test" and len(taps) == 4
+
+    asyncio.run(scenario())
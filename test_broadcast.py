@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Tests for the background broadcast engine against a fake Bot
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+
+from broadcast import BroadcastEngine, TokenBucket
+
+ADMIN_ID = 1
+
+
+class FakeBot:
+    """Records sends; chats in `flood` raise RetryAfter once, chats in `blocked` always raise Forbidden"""
+
+    def __init__(self, flood=(), blocked=(), fail_first_admin_send=False):
+        self.sent = []
+        self.edits = []
+        self.flood = set(flood)
+        self.blocked = set(blocked)
+        self.fail_first_admin_send = fail_first_admin_send
+        self.message_ids = 0
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        if chat_id == ADMIN_ID and self.fail_first_admin_send:
+            self.fail_first_admin_send = False
+            raise RuntimeError("admin chat unavailable")
+        if chat_id in self.blocked:
+            raise TelegramForbiddenError(method=None, message="bot was blocked by the user")
+        if chat_id in self.flood:
+            self.flood.discard(chat_id)
+            raise TelegramRetryAfter(method=None, message="flood control", retry_after=0)
+        self.sent.append((chat_id, text))
+        self.message_ids += 1
+        return SimpleNamespace(chat=SimpleNamespace(id=chat_id), message_id=self.message_ids)
+
+    async def edit_message_text(self, text, chat_id, message_id):
+        self.edits.append((chat_id, text))
+
+
+def audience(students: int):
+    """The admin plus `students` recipients with telegram_id 1000, 1001, ..."""
+    return [(ADMIN_ID, "Admin")] + [(1000 + i, f"Student{i}") for i in range(students)]
+
+
+def test_broadcast_delivers_once_with_backoff_and_blocked_users(sqlite_db):
+    async def scenario():
+        async with sqlite_db(users=audience(300)) as db:
+            bot = FakeBot(flood={1005, 1100}, blocked={1010})
+            engine = BroadcastEngine(bot, db, rate=10_000, burst=100, workers=8)
+
+            result = await engine.start("hello", ADMIN_ID)
+            assert result["total"] == 300
+            await engine.tasks[result["job_id"]]
+
+            delivered = [chat_id for chat_id, _ in bot.sent if chat_id != ADMIN_ID]
+            assert sorted(delivered) == sorted(set(delivered))
+            assert len(delivered) == 299
+            assert 1010 not in delivered
+
+            job = await engine.get_job(result["job_id"])
+            assert (job["status"], job["sent"], job["failed"]) == ("done", 299, 1)
+            async with db.pool.reader() as conn:
+                cursor = await conn.execute(
+                    "SELECT status, attempts FROM broadcast_recipients WHERE job_id = ? AND telegram_id IN (1005, 1010)",
+                    (result["job_id"],)
+                )
+                assert sorted(tuple(row) for row in await cursor.fetchall()) == [("blocked", 1), ("sent", 2)]
+
+            # Progress goes to the admin chat: a start message, then the final summary
+            assert bot.sent[0][0] == ADMIN_ID
+            assert "завершена" in bot.edits[-1][1]
+
+    asyncio.run(scenario())
+
+
+def test_interrupted_job_resumes_pending_recipients_only(sqlite_db):
+    async def scenario():
+        async with sqlite_db(users=audience(50)) as db:
+            engine = BroadcastEngine(FakeBot(), db, rate=10_000, burst=100, workers=4)
+            job_id, total = await engine.create_job("resume me", ADMIN_ID)
+            # Pretend the first 20 went out before a restart
+            async with db.pool.writer() as conn:
+                await conn.execute(
+                    "UPDATE broadcast_recipients SET status = 'sent' WHERE job_id = ? AND telegram_id < 1020", (job_id,)
+                )
+                await conn.execute("UPDATE broadcast_jobs SET sent = 20 WHERE id = ?", (job_id,))
+
+            bot = FakeBot()
+            restarted = BroadcastEngine(bot, db, rate=10_000, burst=100, workers=4)
+            assert await restarted.resume_pending() == [job_id]
+            await restarted.tasks[job_id]
+
+            delivered = sorted(chat_id for chat_id, _ in bot.sent if chat_id != ADMIN_ID)
+            assert delivered == list(range(1020, 1050))
+            job = await restarted.get_job(job_id)
+            assert (job["status"], job["sent"], total) == ("done", 50, 50)
+
+    asyncio.run(scenario())
+
+
+class SlowBot(FakeBot):
+    async def send_message(self, chat_id, text, parse_mode=None):
+        await asyncio.sleep(0.005)
+        return await super().send_message(chat_id, text, parse_mode)
+
+
+def test_progress_message_is_sent_once_then_edited(sqlite_db):
+    async def scenario():
+        async with sqlite_db(users=audience(40)) as db:
+            bot = SlowBot(fail_first_admin_send=True)
+            engine = BroadcastEngine(bot, db, rate=10_000, burst=100, workers=1, progress_interval=0.02)
+            result = await engine.start("hello", ADMIN_ID)
+            await engine.tasks[result["job_id"]]
+
+            # The failed first send is retried by the reporter once; later updates edit that message
+            assert [chat_id for chat_id, _ in bot.sent].count(ADMIN_ID) == 1
+            assert len(bot.edits) >= 2
+
+    asyncio.run(scenario())
+
+
+def test_flush_error_marks_job_failed(sqlite_db):
+    async def scenario():
+        async with sqlite_db(users=audience(250)) as db:
+            bot = FakeBot()
+            engine = BroadcastEngine(bot, db, rate=10_000, burst=100, workers=2)
+            flush = engine._flush
+
+            async def broken_flush(job_id, results):
+                if len(results) >= 100:
+                    raise RuntimeError("disk I/O error")
+                await flush(job_id, results)
+
+            engine._flush = broken_flush
+            result = await asyncio.wait_for(engine.start("hello", ADMIN_ID), 5)
+            await asyncio.wait_for(engine.tasks[result["job_id"]], 5)
+
+            job = await engine.get_job(result["job_id"])
+            assert job["status"] == "failed"
+            assert "остановлена" in bot.edits[-1][1]
+
+    asyncio.run(scenario())
+
+
+def test_token_bucket_limits_rate():
+    async def scenario():
+        bucket = TokenBucket(rate=200, capacity=10)
+        start = time.monotonic()
+        await asyncio.gather(*[bucket.acquire() for _ in range(60)])
+        # 10 burst tokens, the remaining 50 arrive at 200/s
+        assert time.monotonic() - start >= 50 / 200 * 0.9
+
+    asyncio.run(scenario())
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tests for the teacher class analytics endpoint
+"""
+import asyncio
+from datetime import date
+
+import httpx
+
+import api_server
+
+
+async def seed_class(db, students=7):
+    async with db.pool.writer() as conn:
+        await conn.execute("INSERT INTO users (telegram_id, first_name, role, points) VALUES (1, 'Teacher', 'teacher', 5000)")
+        # Points 600, 500, 500, 400, ... so ranks tie and pages split a tie
+        await conn.executemany(
+            """INSERT INTO users (telegram_id, first_name, last_name, role, points, tests_completed, avg_score)
+               VALUES (?, ?, 'S', 'student', ?, ?, ?)""",
+            [(100 + i, f"Student{i}", [600, 500, 500][i] if i < 3 else 400 - 100 * (i - 3), i, 10 * i)
+             for i in range(students)]
+        )
+        await conn.execute(
+            """INSERT INTO tests (id, subject, question, option_a, option_b, option_c, option_d, correct_answer)
+               VALUES (1, 'optics', 'Q1', '1', '2', '3', '4', 'A')"""
+        )
+        # An older result, recorded before test_attempts existed
+        await conn.execute(
+            """INSERT INTO user_progress (user_id, test_id, progress_type, score, completed_at)
+               VALUES (101, 1, 'test', 80, '2024-03-02 10:00:00')"""
+        )
+
+
+def test_class_analytics_is_computed_in_sql(sqlite_db, monkeypatch):
+    async def scenario():
+        async with sqlite_db() as db:
+            monkeypatch.setattr(api_server, "db", db)
+            await seed_class(db)
+            await db.record_test_attempt(105, [(1, "A")], subject="physics", today=date(2024, 3, 5))
+            async with db.pool.writer() as conn:
+                await conn.execute("UPDATE test_attempts SET completed_at = '2024-03-05 09:00:00'")
+
+            transport = httpx.ASGITransport(app=api_server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                analytics = (await client.get("/api/teacher/1/class-analytics")).json()["analytics"]
+
+            # Student6 has 100 points, everyone but the teacher is a student
+            assert (analytics["totalStudents"], analytics["activeStudents"]) == (7, 7)
+            assert analytics["totalTestsCompleted"] == sum(range(7)) + 1
+            assert [(s["id"], s["rank"]) for s in analytics["topStudents"]] == \
+                [(100, 1), (102, 2), (101, 2), (103, 4), (104, 5)]
+            assert [(a["student"], a["subject"], a["score"]) for a in analytics["recentActivity"]] == \
+                [("Student5 S", "physics", 100.0), ("Student1 S", "optics", 80.0)]
+            assert len(analytics["students"]) == 7 and analytics["next_cursor"] is None
+
+    asyncio.run(scenario())
+
+
+def test_student_roster_pages_cover_the_class_once(sqlite_db, monkeypatch):
+    async def scenario():
+        async with sqlite_db() as db:
+            monkeypatch.setattr(api_server, "db", db)
+            await seed_class(db, students=9)
+            transport = httpx.ASGITransport(app=api_server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                seen, cursor = [], None
+                while True:
+                    params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+                    analytics = (await client.get("/api/teacher/1/class-analytics", params=params)).json()["analytics"]
+                    seen.extend(s["id"] for s in analytics["students"])
+                    cursor = analytics["next_cursor"]
+                    if not cursor:
+                        break
+                assert (await client.get("/api/teacher/1/class-analytics",
+                                         params={"cursor": "not-a-cursor"})).status_code == 400
+
+            assert seen == [100, 102, 101] + list(range(103, 109))
+
+    asyncio.run(scenario())
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Tests for the teacher/admin dashboard statistics service.
+The PostgreSQL round trip runs only when DATABASE_URL is set (in a throwaway schema).
+"""
+import asyncio
+import os
+from datetime import date, datetime
+
+import httpx
+import pytest
+
+import api_server
+from database_postgres import PostgresDatabase
+
+SCHEMA = "test_dashboard_stats"
+TODAY = date(2024, 3, 10)
+
+
+async def seed_class(db):
+    async with db.pool.writer() as conn:
+        await conn.executemany(
+            """INSERT INTO users (telegram_id, first_name, role, points, tests_completed, avg_score)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            [(1, "Teacher", "teacher", 900, 0, 0),
+             (2, "Aigerim", "student", 300, 4, 80),
+             (3, "Daniyar", "student", 100, 2, 60),
+             (4, "Amina", "student", 0, 0, 0)]
+        )
+        await conn.executemany(
+            """INSERT INTO tests (id, subject, question, option_a, option_b, option_c, option_d, correct_answer)
+               VALUES (?, 'physics', ?, '1', '2', '3', '4', 'A')""",
+            [(i, f"Q{i}") for i in range(1, 4)]
+        )
+        await conn.executemany(
+            """INSERT INTO materials (subject, topic, type, title, category, is_published)
+               VALUES ('physics', 'Motion', 'text', ?, 'mechanics', ?)""",
+            [("Published", 1), ("Draft", 0)]
+        )
+    await db.load_leaderboard()
+
+
+def test_dashboard_figures_come_from_one_query(sqlite_db):
+    async def scenario():
+        async with sqlite_db() as db:
+            await seed_class(db)
+            await db.record_test_attempt(3, [(1, "A"), (2, "B")], today=TODAY)
+
+            stats = await db.stats.get(today=TODAY)
+            assert (stats["total_users"], stats["total_students"], stats["total_teachers"]) == (4, 3, 1)
+            assert (stats["active_students"], stats["inactive_students"]) == (2, 1)
+            # Daniyar: 100 + 10 points, 3 tests, (60 * 2 + 50) / 3 average
+            assert stats["avg_points"] == round((300 + 110) / 3, 1)
+            assert stats["total_tests_taken"] == 7
+            assert stats["avg_student_score"] == round((80 + (60 * 2 + 50) / 3) / 3, 1)
+            assert (stats["total_tests"], stats["active_tests"]) == (3, 3)
+            assert (stats["total_materials"], stats["published_materials"]) == (2, 1)
+            assert (stats["active_students_week"], stats["tests_taken_week"]) == (1, 1)
+            assert [user["telegram_id"] for user in stats["top_performers"]][:3] == [1, 2, 3]
+
+    asyncio.run(scenario())
+
+
+def test_dashboard_is_cached_until_the_ttl(sqlite_db):
+    async def scenario():
+        async with sqlite_db() as db:
+            await seed_class(db)
+            first = await db.stats.get(today=TODAY)
+            async with db.pool.writer() as conn:
+                await conn.execute("INSERT INTO users (telegram_id, first_name, role) VALUES (5, 'New', 'student')")
+
+            assert await db.stats.get(today=TODAY) is first
+            db.stats.invalidate()
+            assert (await db.stats.get(today=TODAY))["total_students"] == 4
+            assert db.stats.cache.stats()["hits"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_dashboard_endpoints(sqlite_db, monkeypatch):
+    async def scenario():
+        async with sqlite_db() as db:
+            monkeypatch.setattr(api_server, "db", db)
+            await seed_class(db)
+            transport = httpx.ASGITransport(app=api_server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                teacher = (await client.get("/api/teacher/stats")).json()
+                assert (teacher["totalStudents"], teacher["activeTests"], teacher["pendingReports"]) == (3, 3, 1)
+                assert teacher["detailed"]["active_students"] == 2
+                assert teacher["detailed"]["top_performers"][0]["telegram_id"] == 1
+
+                admin = (await client.get("/api/admin/stats")).json()
+                assert (admin["user_count"], admin["total_tests"], admin["total_materials"]) == (4, 3, 2)
+
+                profile = (await client.get("/api/teacher/1/profile")).json()["teacher"]
+                assert (profile["studentsCount"], profile["testsAssigned"], profile["materialsCreated"]) == (3, 3, 2)
+                assert (await client.get("/api/teacher/999/profile")).status_code == 404
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.skipif(not os.environ.get("DATABASE_URL"), reason="needs a PostgreSQL server (DATABASE_URL)")
+def test_postgres_dashboard_totals():
+    import asyncpg
+
+    async def scenario():
+        admin = await asyncpg.connect(os.environ["DATABASE_URL"])
+        await admin.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await admin.execute(f"CREATE SCHEMA {SCHEMA}")
+        db = PostgresDatabase()
+        db.pool = await asyncpg.create_pool(os.environ["DATABASE_URL"], server_settings={"search_path": SCHEMA})
+        try:
+            await db.create_tables()
+            async with db.pool.acquire() as conn:
+                await conn.executemany(
+                    "INSERT INTO users (telegram_id, first_name, role, points, is_active) VALUES ($1, $2, $3, $4, $5)",
+                    [(1, "Teacher", "teacher", 900, True), (2, "Aigerim", "student", 300, True),
+                     (3, "Daniyar", "student", 100, True), (4, "Amina", "student", 0, True),
+                     (5, "Left", "student", 500, False)]
+                )
+                ids = {row["telegram_id"]: row["id"] for row in await conn.fetch("SELECT id, telegram_id FROM users")}
+                test_id = await conn.fetchval(
+                    "INSERT INTO tests (title, questions, is_active) VALUES ('Kinematics', '[]', true) RETURNING id")
+                await conn.execute("INSERT INTO tests (title, questions, is_active) VALUES ('Old', '[]', false)")
+                await conn.executemany(
+                    """INSERT INTO test_attempts (test_id, user_id, answers, score, max_score, time_taken, completed_at)
+                       VALUES ($1, $2, '[]', $3, 10, $4, $5)""",
+                    [(test_id, ids[2], 8, 600, datetime(2024, 3, 9)), (test_id, ids[2], 6, 300, datetime(2024, 1, 1)),
+                     (test_id, ids[3], 5, 120, datetime(2024, 3, 10))]
+                )
+                await conn.execute(
+                    "INSERT INTO materials (title, is_published, teacher_id) VALUES ('Published', true, $1), ('Draft', false, $1)",
+                    ids[1])
+
+            stats = await db.stats.get(today=TODAY)
+            assert (stats["total_users"], stats["total_students"], stats["total_teachers"]) == (5, 4, 1)
+            assert (stats["active_students"], stats["total_tests_taken"]) == (3, 3)
+            assert stats["avg_student_score"] == round((70 + 50) / 4, 1)
+            assert (stats["total_tests"], stats["active_tests"]) == (2, 1)
+            assert (stats["total_materials"], stats["published_materials"]) == (2, 1)
+            assert (stats["active_students_week"], stats["tests_taken_week"], stats["study_minutes_week"]) == (2, 2, 12)
+            assert [user["first_name"] for user in stats["top_performers"]] == ["Aigerim", "Daniyar", "Amina"]
+        finally:
+            await db.pool.close()
+            await admin.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            await admin.close()
+
+    asyncio.run(scenario())
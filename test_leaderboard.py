@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Tests for the ranked skip-list leaderboard against a plain sorted list
+"""
+import bisect
+import random
+
+from leaderboard import Leaderboard, RankedSkipList
+
+
+def test_skip_list_matches_sorted_list():
+    rnd = random.Random(11)
+    reference = sorted({(rnd.randint(-100, 0), rnd.randint(0, 10**6)) for _ in range(2000)})
+    ranks = RankedSkipList(seed=1)
+    ranks.build(reference)
+
+    for _ in range(5000):
+        if reference and rnd.random() < 0.5:
+            key = rnd.choice(reference)
+            reference.remove(key)
+            ranks.remove(key)
+        else:
+            key = (rnd.randint(-100, 0), rnd.randint(0, 10**6))
+            if key in reference:
+                continue
+            bisect.insort(reference, key)
+            ranks.insert(key)
+
+    assert len(ranks) == len(reference)
+    assert ranks.slice(0, len(reference)) == reference
+    for position in range(0, len(reference), 17):
+        assert ranks[position] == reference[position]
+        assert ranks.index(reference[position]) == position
+
+
+def test_rank_top_and_neighbours():
+    board = Leaderboard()
+    board.reset([
+        {"telegram_id": 1, "points": 50},
+        {"telegram_id": 2, "points": 70},
+        {"telegram_id": 3, "points": 50},
+        {"telegram_id": 4, "points": 10},
+    ])
+
+    assert [user["telegram_id"] for user in board.top(3)] == [2, 1, 3]
+    assert board.rank(3) == 3
+    assert [(user["telegram_id"], user["rank"]) for user in board.around(3, 1)] == [(1, 2), (3, 3), (4, 4)]
+    assert board.rank(99) is None
+
+    board.set_points(4, 100)
+    assert board.rank(4) == 1
+    board.remove(2)
+    assert [user["telegram_id"] for user in board.top()] == [4, 1, 3]
+
+
+def test_rebuild_replays_updates_made_during_the_build():
+    board = Leaderboard()
+    board.reset([{"telegram_id": 1, "points": 10}, {"telegram_id": 2, "points": 20}])
+
+    board.begin_rebuild()
+    snapshot = [{"telegram_id": 1, "points": 10}, {"telegram_id": 2, "points": 20}]
+    # Updates that land after the snapshot was read but before the swap
+    board.set_points(1, 50)
+    board.upsert({"telegram_id": 3, "points": 30})
+    board.remove(2)
+    board.finish_rebuild(Leaderboard.from_snapshot(snapshot))
+
+    assert [(user["telegram_id"], user["points"]) for user in board.top()] == [(1, 50), (3, 30)]
+    # Recording stops once the swap is done
+    board.set_points(3, 60)
+    assert board._journal is None and board.rank(3) == 1
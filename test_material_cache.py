@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Tests for the material read-through cache and ETag revalidation
+"""
+import asyncio
+
+import httpx
+
+import api_server
+from admin import AdminManager
+from ttl_cache import TTLCache
+
+
+def test_ttl_cache_expiry_lru_and_counters(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("ttl_cache.time.monotonic", lambda: now[0])
+    cache = TTLCache(maxsize=2, ttl=10)
+
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+    now[0] += 11
+    assert cache.get("a") is None
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_load_in_flight_during_invalidate_is_not_stored():
+    async def scenario():
+        cache = TTLCache()
+
+        async def loader():
+            cache.invalidate()  # a write lands while the read is running
+            return "stale"
+
+        assert await cache.get_or_load("k", loader) == "stale"
+        assert cache.get("k") is None
+
+    asyncio.run(scenario())
+
+
+KINEMATICS = {"subject": "Физика", "topic": "Механика", "type": "text", "category": "mechanics",
+              "title": "Kinematics", "content": "v = s / t", "is_published": 1, "language": "ru",
+              "tags": '["motion"]'}
+
+
+def test_reads_are_cached_until_a_material_write(sqlite_db):
+    async def scenario():
+        async with sqlite_db() as db:
+            await db.add_material(dict(KINEMATICS))
+            first = await db.get_material_by_id(1)
+            assert await db.get_material_by_id(1) is first
+            assert await db.get_published_materials() is await db.get_published_materials()
+            assert db.material_cache.hits == 2
+
+            await db.update_material(1, {"title": "Dynamics"})
+            assert (await db.get_material_by_id(1))["title"] == "Dynamics"
+            assert [m["title"] for m in await db.get_published_materials()] == ["Dynamics"]
+
+            await db.delete_material(1)
+            assert await db.get_material_by_id(1) is None
+            assert await db.get_materials_by_subject("Физика") == []
+
+    asyncio.run(scenario())
+
+
+def test_bot_material_writes_invalidate_the_cache(sqlite_db):
+    async def scenario():
+        async with sqlite_db() as db:
+            assert await db.get_materials_by_subject("Физика") == []
+            await AdminManager(bot=None, db=db).add_material("Физика", "Оптика", "video", "Линзы", "https://example.com")
+            assert [m["title"] for m in await db.get_materials_by_subject("Физика")] == ["Линзы"]
+
+    asyncio.run(scenario())
+
+
+def test_etag_is_computed_once_per_cache_entry(sqlite_db):
+    async def scenario():
+        async with sqlite_db() as db:
+            await db.add_material(dict(KINEMATICS))
+            hashed = []
+            material = await db.get_material_by_id(1)
+            for _ in range(3):
+                db.material_cache.etag(await db.get_material_by_id(1), lambda value: hashed.append(value) or "tag")
+            assert hashed == [material]
+
+    asyncio.run(scenario())
+
+
+def test_etag_revalidation(sqlite_db, monkeypatch):
+    async def scenario():
+        async with sqlite_db() as db:
+            await db.add_material(dict(KINEMATICS))
+            monkeypatch.setattr(api_server, "db", db)
+            transport = httpx.ASGITransport(app=api_server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                etags = {}
+                for path in ["/api/materials/1", "/api/materials/1/content",
+                             "/api/materials/by-subject/Физика", "/api/materials/published"]:
+                    response = await client.get(path)
+                    assert response.status_code == 200
+                    etags[path] = response.headers["etag"]
+
+                    unchanged = await client.get(path, headers={"If-None-Match": etags[path]})
+                    assert unchanged.status_code == 304
+                    assert unchanged.content == b""
+
+                await db.update_material(1, {"title": "Dynamics"})
+                changed = await client.get("/api/materials/1", headers={"If-None-Match": etags["/api/materials/1"]})
+                assert changed.status_code == 200
+                assert changed.json()["title"] == "Dynamics"
+                assert changed.headers["etag"] != etags["/api/materials/1"]
+
+                stats = (await client.get("/api/cache/stats")).json()["materials"]
+                assert stats["hits"] > 0 and stats["invalidations"] >= 2
+
+    asyncio.run(scenario())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Tests for PostgresDatabase.send_message fan-out.
+The command-tag tests use a fake connection; the round trip against a real
+server runs only when DATABASE_URL is set (in a throwaway schema).
+"""
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+import pytest
+
+from database_postgres import PostgresDatabase
+
+SCHEMA = "test_send_message"
+
+
+class FakeConnection:
+    def __init__(self, status):
+        self.status = status
+        self.calls = []
+
+    async def execute(self, sql, *args):
+        self.calls.append((sql, args))
+        return self.status
+
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self.conn
+
+
+def make_db(status: str):
+    db = PostgresDatabase()
+    db.pool = FakePool(FakeConnection(status))
+    return db
+
+
+@pytest.mark.parametrize("status,expected", [("INSERT 0 50000", 50000), ("INSERT 0 0", 0)])
+def test_broadcast_returns_rows_from_command_tag(status, expected):
+    db = make_db(status)
+    created = asyncio.run(db.send_message(7, "Title", "Body", is_broadcast=True, message_type='announcement'))
+    assert created == expected
+    # One set-based statement, no per-user round trips
+    [(sql, args)] = db.pool.conn.calls
+    assert "INSERT INTO messages" in sql and "SELECT" in sql
+    assert args == ("Title", "Body", 7, 'announcement', 'normal')
+
+
+def test_personal_message_returns_one():
+    db = make_db("INSERT 0 1")
+    assert asyncio.run(db.send_message(7, "Title", "Body", recipient_id=9)) == 1
+    assert db.pool.conn.calls[0][1][3] == 9
+
+
+@pytest.mark.skipif(not os.environ.get("DATABASE_URL"), reason="needs a PostgreSQL server (DATABASE_URL)")
+def test_broadcast_reaches_active_users_only():
+    import asyncpg
+
+    async def scenario():
+        admin = await asyncpg.connect(os.environ["DATABASE_URL"])
+        await admin.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await admin.execute(f"CREATE SCHEMA {SCHEMA}")
+        db = PostgresDatabase()
+        db.pool = await asyncpg.create_pool(os.environ["DATABASE_URL"], server_settings={"search_path": SCHEMA})
+        try:
+            await db.create_tables()
+            async with db.pool.acquire() as conn:
+                await conn.executemany(
+                    "INSERT INTO users (telegram_id, first_name, is_active) VALUES ($1, $2, $3)",
+                    [(100 + i, f"Student{i}", i % 4 != 0) for i in range(40)]
+                )
+                sender_id = await conn.fetchval("SELECT MIN(id) FROM users")
+
+            assert await db.send_message(sender_id, "Hi", "All", is_broadcast=True) == 30
+            async with db.pool.acquire() as conn:
+                assert await conn.fetchval("SELECT COUNT(DISTINCT recipient_id) FROM messages") == 30
+        finally:
+            await db.pool.close()
+            await admin.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            await admin.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Tests for the quantity parser, on a corpus drawn from the app's question text
+"""
+import asyncio
+import json
+import math
+import re
+from pathlib import Path
+
+import httpx
+
+import api_server
+from answer_checker import check_answers
+from quantities import DIMENSIONS, parse_quantity, parse_unit
+from question_templates import QuestionPool
+from test_question_bank import seed_tests
+
+
+def dim(**exponents):
+    return tuple(exponents.get(name, 0) for name in DIMENSIONS)
+
+
+ENERGY, LENGTH, TIME = dim(kg=1, m=2, s=-2), dim(m=1), dim(s=1)
+
+# Options, answers and explanation fragments of the sample and photo questions: text -> (SI value, dimension)
+CORPUS = {
+    "240 кДж": (240e3, ENERGY),
+    "5.7×10⁻⁵ м": (5.7e-5, LENGTH),
+    "1.1×10⁻⁴ м": (1.1e-4, LENGTH),
+    "9.1×10⁻⁶ м": (9.1e-6, LENGTH),
+    "0.05 Дж": (0.05, ENERGY),
+    "30 см": (0.3, LENGTH),
+    "30 с": (30.0, TIME),
+    "1.4 с": (1.4, TIME),
+    "1.6 Гц": (1.6, dim(s=-1)),
+    "3.1 эВ": (3.1 * 1.602176634e-19, ENERGY),
+    "100°C": (373.15, dim(K=1)),
+    "2240 Дж": (2240.0, ENERGY),
+    "125 м": (125.0, LENGTH),
+    "240000 Дж": (240000.0, ENERGY),
+    "2 м/с жылдамдықпен": (2.0, dim(m=1, s=-1)),
+    "2 м биіктіктен": (2.0, LENGTH),
+    "10 м/с²": (10.0, dim(m=1, s=-2)),
+    "66.7 м/мин": (66.7 / 60, dim(m=1, s=-1)),
+    "4200 Дж/(кг·°C)": (4200.0, dim(m=2, s=-2, K=-1)),
+    "54 км/сағ": (15.0, dim(m=1, s=-1)),
+    "2 кВт·ч": (7.2e6, ENERGY),
+    "1,5·10³ Па": (1500.0, dim(kg=1, m=-1, s=-2)),
+    "3 x 10^8 m/s": (3e8, dim(m=1, s=-1)),
+    "10⁻³ кг": (1e-3, dim(kg=1)),
+    "200 мкФ": (2e-4, dim(kg=-1, m=-2, s=4, A=2)),
+    "0,2 Тл": (0.2, dim(kg=1, s=-2, A=-1)),
+    "45°": (math.pi / 4, dim(rad=1)),
+    "2 тәулік": (172800.0, TIME),
+}
+
+
+def test_corpus_parses_to_si():
+    for text, (si, dimension) in CORPUS.items():
+        quantity = parse_quantity(text)
+        assert quantity is not None, text
+        assert math.isclose(quantity[1], si, rel_tol=1e-9), (text, quantity)
+        assert quantity[2] == dimension, (text, quantity)
+
+
+def test_every_option_in_the_api_questions_parses():
+    source = Path(api_server.__file__).read_text(encoding="utf-8")
+    options = {option for block in re.findall(r'"options": (\[[^\]]*\])', source) for option in json.loads(block)}
+    # The fixed questions and a sample of every template
+    pool = QuestionPool(per_template=50, seed=1)
+    pool.build()
+    options |= {option for question in pool.questions for option in question["options"]}
+    assert len(options) > 400
+    for option in options:
+        quantity = parse_quantity(option)
+        if re.search(r"\d", option):
+            assert quantity is not None and quantity[2] is not None, option
+        else:
+            # Names and laws: compared as text
+            assert quantity is None, option
+
+
+def test_units_and_numbers_edge_cases():
+    assert parse_unit("кг·м/с²") == (1.0, dim(kg=1, m=1, s=-2))
+    assert parse_unit("мм") == (1e-3, LENGTH) and parse_unit("Мм") == (1e6, LENGTH)
+    assert parse_unit("мс") == (1e-3, TIME) and parse_unit("мин") == (60.0, TIME)
+    assert parse_unit("Дж/кг/") is None and parse_unit("Дж/(кг") is None and parse_unit("жылдам") is None
+    assert parse_quantity("10 секунд") == (10.0, None, None)
+    assert parse_quantity("−5 °С")[1] == 268.15
+    assert parse_quantity("210² м")[1] == 210.0
+    assert parse_quantity("1.1×10⁻⁴ м")[0] == 0.00011
+    assert parse_quantity("v = 2×30 = 60 м")[0] == 2.0
+
+
+def test_answers_match_across_notations():
+    user = ["0.057 мм", "57 мкм", "5.7e-5 m", "1.1×10⁻⁴ м", "240000 Дж", "15 м/с", "373.15 K", "2 кг"]
+    correct = ["5.7×10⁻⁵ м", "5.7×10⁻⁵ м", "5.7×10⁻⁵ м", "5.7×10⁻⁵ м", "240 кДж", "54 км/сағ", "100°C", "2000 г"]
+    is_correct, unit_mismatch = check_answers(user, correct)
+    assert is_correct.tolist() == [True, True, True, False, True, True, True, True]
+    assert not unit_mismatch.any()
+
+
+def test_batch_check_uses_cached_answer_keys(sqlite_db, monkeypatch):
+    async def scenario():
+        async with sqlite_db() as db:
+            monkeypatch.setattr(api_server, "db", db)
+            async with db.pool.writer() as conn:
+                await seed_tests(conn, [(1, "physics", "ru", None)])
+                await conn.execute("UPDATE tests SET option_c = '240 кДж', correct_answer = 'C' WHERE id = 1")
+            keys = await db.question_bank.answer_keys([1, 99])
+            assert keys == {1: ("C", "240 кДж", parse_quantity("240 кДж"))}
+
+            transport = httpx.ASGITransport(app=api_server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                response = await client.post("/api/ai/check-answers", json={"answers": [
+                    {"test_id": 1, "user_answer": "240000 Дж"},
+                    {"test_id": 1, "user_answer": "c"},
+                    {"test_id": 1, "user_answer": "240 Дж"},
+                ]})
+                assert [r["is_correct"] for r in response.json()["results"]] == [True, True, False]
+                response = await client.post("/api/ai/check-answers", json={"answers": [{"test_id": 99}]})
+                assert response.status_code == 404
+
+            # Changing the question drops its key
+            async with db.pool.writer() as conn:
+                await conn.execute("UPDATE tests SET option_c = '5 м' WHERE id = 1")
+            db.question_bank.invalidate()
+            assert (await db.question_bank.answer_keys([1]))[1][1] == "5 м"
+
+    asyncio.run(scenario())
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Query-plan regression tests for the SQLite schema
+Runs EXPLAIN QUERY PLAN for every SQL statement in database.py,
+database_schedule.py, api_server.py and bot_storage.py against a 100k-row synthetic
+database and fails if a filtered query falls back to a SCAN (only SEARCH
+counts as keyed access; whole-index walks need an ALLOWED_INDEX_WALKS entry).
+"""
+import ast
+import asyncio
+import os
+import random
+import re
+import sqlite3
+
+import pytest
+
+from database_migrations import run_sqlite_migrations
+from database_pool import SQLitePool
+
+ROWS = 100_000
+SOURCE_FILES = ["database.py", "database_schedule.py", "api_server.py", "bot_storage.py"]
+SQL_START = re.compile(r"^\s*(SELECT|UPDATE|DELETE)\s")
+
+# Queries assembled at runtime (string concatenation), listed in their final form
+PUBLISHED_PAGE_QUERIES = [
+    ("database.py:get_published_materials(category, after)",
+     "SELECT id, title FROM materials WHERE is_published = 1 AND category = ? "
+     "AND (updated_at, id) < (?, ?) ORDER BY updated_at DESC, id DESC LIMIT ?"),
+    ("database.py:get_published_materials(after)",
+     "SELECT id, title FROM materials WHERE is_published = 1 "
+     "AND (updated_at, id) < (?, ?) ORDER BY updated_at DESC, id DESC LIMIT ?"),
+]
+AI_PAGE_QUERIES = [
+    ("database.py:get_virtual_questions_page(after)",
+     "SELECT id, text FROM virtual_questions "
+     "WHERE (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC LIMIT ?"),
+    ("database.py:get_virtual_questions_page(topic, difficulty, after)",
+     "SELECT id, text FROM virtual_questions WHERE topic = ? AND difficulty = ? "
+     "AND (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC LIMIT ?"),
+    ("database.py:get_virtual_questions_page(difficulty)",
+     "SELECT id, text FROM virtual_questions WHERE difficulty = ? "
+     "ORDER BY created_at DESC, id DESC LIMIT ?"),
+    ("database.py:get_solution_analyses_page(min_score, max_score, after)",
+     "SELECT id, score FROM solution_analyses WHERE score >= ? AND score <= ? "
+     "AND (checked_at, id) < (?, ?) ORDER BY checked_at DESC, id DESC LIMIT ?"),
+]
+STUDENT_PAGE_QUERIES = [
+    ("database.py:get_students_page(after)",
+     "SELECT id, telegram_id FROM users WHERE role = 'student' "
+     "AND (points, id) < (?, ?) ORDER BY points DESC, id DESC LIMIT ?"),
+]
+COMPOSED_QUERIES = PUBLISHED_PAGE_QUERIES + AI_PAGE_QUERIES + STUDENT_PAGE_QUERIES
+
+# Whole-index walks that are fine because the statement stops after LIMIT rows
+# read in index order: (table, index) -> why
+ALLOWED_INDEX_WALKS = {
+    ("users", "idx_users_points"): "top-N by points (leaderboard before the in-memory board is loaded)",
+    ("virtual_questions", "idx_virtual_questions_created"): "newest-first page of virtual questions",
+    ("solution_analyses", "idx_solution_analyses_checked"): "newest-first page of analyses, score filter applied per row",
+    ("test_attempts", "idx_test_attempts_completed"): "class recent-activity feed, newest attempts first",
+}
+
+# Statements that aggregate whole tables on purpose, keyed by a SQL fragment: they may walk
+# covering indexes (and their own one-row derived tables) but never the table rows themselves
+WHOLE_TABLE_AGGREGATES = {
+    "AS total_users": "dashboard totals, one pass per table behind DashboardStats' TTL cache",
+}
+
+# Known full scans, keyed by a SQL fragment; strict xfail so a fix has to remove the entry
+KNOWN_SCANS = {}
+
+
+def collect_queries():
+    """All literal SELECT/UPDATE/DELETE statements in the source files"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    queries = []
+    for filename in SOURCE_FILES:
+        with open(os.path.join(here, filename), encoding="utf-8") as f:
+            tree = ast.parse(f.read())
+        # Skip the literal fragments of f-strings (dynamic SET/column lists)
+        fragments = {id(part) for node in ast.walk(tree) if isinstance(node, ast.JoinedStr) for part in node.values}
+        for node in ast.walk(tree):
+            if id(node) in fragments:
+                continue
+            if isinstance(node, ast.Constant) and isinstance(node.value, str) and SQL_START.match(node.value):
+                # '{}' placeholders are filled with str.format() by the caller
+                sql = " ".join(node.value.split()).replace("{}", "0")
+                queries.append((f"{filename}:{node.lineno}", sql))
+    return queries + COMPOSED_QUERIES
+
+
+QUERIES = collect_queries()
+
+
+def seed(conn: sqlite3.Connection):
+    """Fill every table with ROWS synthetic rows"""
+    rnd = random.Random(42)
+    subjects = ["Физика", "Математика", "История", "Химия"]
+    languages = ["ru", "kk"]
+    categories = ["mechanics", "thermodynamics", "optics", "electricity", "atomic"]
+
+    conn.executemany(
+        "INSERT INTO users (telegram_id, first_name, points, language, role) VALUES (?, ?, ?, ?, ?)",
+        ((100000 + i, f"Student{i}", rnd.randint(0, 10000), rnd.choice(languages),
+          "teacher" if i % 100 == 0 else "student") for i in range(ROWS))
+    )
+    conn.executemany(
+        "INSERT INTO user_progress (user_id, test_id, progress_type, score, completed_at) VALUES (?, ?, 'test', ?, ?)",
+        ((100000 + rnd.randrange(ROWS), rnd.randint(1, ROWS), rnd.randint(0, 100),
+          f"2024-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d} 12:00:00") for _ in range(ROWS))
+    )
+    conn.executemany(
+        """INSERT INTO materials (subject, topic, type, title, category, is_published, teacher_id, language, updated_at)
+           VALUES (?, ?, 'text', ?, ?, ?, ?, ?, ?)""",
+        ((rnd.choice(subjects), f"Topic {i % 50}", f"Material {i}", rnd.choice(categories),
+          rnd.randint(0, 1), rnd.randint(1, 1000), rnd.choice(languages),
+          f"2024-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}") for i in range(ROWS))
+    )
+    conn.executemany(
+        """INSERT INTO tests (subject, question, option_a, option_b, option_c, option_d, correct_answer, language)
+           VALUES (?, ?, 'a', 'b', 'c', 'd', 'A', ?)""",
+        ((rnd.choice(subjects), f"Question {i}", rnd.choice(languages)) for i in range(ROWS))
+    )
+    conn.executemany(
+        "INSERT INTO quests (title, description, quest_type, is_active, language) VALUES (?, 'd', 'daily', ?, ?)",
+        ((f"Quest {i}", int(i % 20 == 0), rnd.choice(languages)) for i in range(ROWS))
+    )
+    conn.executemany(
+        "INSERT INTO schedule (day_of_week, time_start, subject, is_active) VALUES (?, '09:00', ?, ?)",
+        ((i % 7, rnd.choice(subjects), int(i % 20 == 0)) for i in range(ROWS))
+    )
+    conn.executemany(
+        """INSERT INTO schedules (title, creator_id, visibility, teacher_id, user_id, created_at, updated_at)
+           VALUES (?, ?, ?, ?, ?, ?, ?)""",
+        ((f"Schedule {i}", 100000 + rnd.randrange(ROWS), "public" if i % 50 == 0 else "private",
+          rnd.randint(1, 1000), 100000 + rnd.randrange(ROWS),
+          f"2024-01-{i % 28 + 1:02d}", f"2024-02-{i % 28 + 1:02d}") for i in range(ROWS))
+    )
+    conn.executemany(
+        "INSERT INTO schedule_entries (schedule_id, day_of_week, time_start, time_end, subject) VALUES (?, ?, '09:00', '10:30', ?)",
+        ((rnd.randint(1, ROWS), i % 7, rnd.choice(subjects)) for i in range(ROWS))
+    )
+    conn.executemany(
+        "INSERT INTO virtual_questions (question_id, text, topic, difficulty, created_at) VALUES (?, ?, ?, ?, ?)",
+        ((i, f"Question {i}", rnd.choice(subjects), rnd.choice(["easy", "medium", "hard"]),
+          f"2024-01-{i % 28 + 1:02d}") for i in range(ROWS))
+    )
+    conn.executemany(
+        "INSERT INTO solution_analyses (analysis_id, score, checked_at) VALUES (?, ?, ?)",
+        ((i, rnd.randint(0, 100), f"2024-01-{i % 28 + 1:02d}") for i in range(ROWS))
+    )
+    conn.commit()
+    # Production connections run PRAGMA optimize on close; give the planner the same statistics
+    conn.execute("ANALYZE")
+
+
+@pytest.fixture(scope="module")
+def conn(tmp_path_factory):
+    db_path = str(tmp_path_factory.mktemp("query_plans") / "plans.db")
+
+    async def migrate():
+        pool = SQLitePool(db_path, readers=1)
+        await run_sqlite_migrations(pool)
+        await pool.close()
+
+    asyncio.run(migrate())
+    connection = sqlite3.connect(db_path)
+    seed(connection)
+    yield connection
+    connection.close()
+
+
+def null_params(sql: str):
+    """NULL for every ? or :name placeholder"""
+    names = re.findall(r"(?<![:\w]):(\w+)", sql)
+    return {name: None for name in names} if names else [None] * sql.count("?")
+
+
+def full_scans(conn: sqlite3.Connection, sql: str):
+    """Plan lines that walk a whole user table, with or without an index (only SEARCH is keyed access)"""
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", null_params(sql)).fetchall()
+    scans = []
+    for row in plan:
+        detail = row[-1]
+        match = re.match(r"SCAN (\w+)(?: USING (?:COVERING )?INDEX (\w+))?", detail)
+        if not match or match.group(1).startswith("sqlite_"):
+            continue
+        if match.group(2) and (match.group(1), match.group(2)) in ALLOWED_INDEX_WALKS and " LIMIT " in f" {sql.upper()} ":
+            continue
+        scans.append(detail)
+    return scans
+
+
+def uses_temp_sort(conn: sqlite3.Connection, sql: str) -> bool:
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", null_params(sql)).fetchall()
+    return any("TEMP B-TREE" in row[-1] for row in plan)
+
+
+def test_seeded_dataset_size(conn):
+    assert conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == ROWS
+
+
+@pytest.mark.parametrize("location,sql", QUERIES, ids=[location for location, _ in QUERIES])
+def test_query_plan_avoids_full_scan(conn, location, sql):
+    try:
+        scans = full_scans(conn, sql)
+    except sqlite3.OperationalError as e:
+        pytest.xfail(f"{location} does not compile against the schema: {e}")
+
+    # Unbounded statements without a WHERE clause (listings, COUNT(*), clear-all)
+    # read the whole table by design; top-N queries must still walk an index
+    padded = f" {sql.upper()} "
+    if " WHERE " not in padded and " LIMIT " not in padded:
+        return
+    for fragment, reason in KNOWN_SCANS.items():
+        if fragment in sql:
+            if scans:
+                pytest.xfail(f"{location}: {reason}")
+            pytest.fail(f"{location} no longer scans; remove it from KNOWN_SCANS")
+    for fragment in WHOLE_TABLE_AGGREGATES:
+        if fragment in sql:
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            scans = [scan for scan in scans if "COVERING INDEX" not in scan and scan.split()[1] in tables]
+    assert not scans, f"{location} regressed to a full table scan: {scans}\n{sql}"
+
+
+@pytest.mark.parametrize("location,sql", COMPOSED_QUERIES, ids=[location for location, _ in COMPOSED_QUERIES])
+def test_keyset_page_reads_in_index_order(conn, location, sql):
+    # A keyset page must stop after LIMIT rows instead of sorting every matching row
+    assert not uses_temp_sort(conn, sql), f"{location} sorts the whole result set"
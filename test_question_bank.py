@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Tests for the in-memory question bank behind test selection
+"""
+import asyncio
+import random
+
+import httpx
+
+import api_server
+from database import Database
+from question_bank import sample_ids
+
+
+async def seed_tests(conn, rows):
+    await conn.executemany(
+        """INSERT INTO tests (id, subject, language, difficulty, question, option_a, option_b, option_c, option_d,
+                              correct_answer)
+           VALUES (?, ?, ?, ?, ?, '1', '2', '3', '4', 'A')""",
+        [(test_id, subject, language, difficulty, f"Q{test_id}") for test_id, subject, language, difficulty in rows]
+    )
+
+
+def test_sample_ids_is_distinct_and_prefers_unseen():
+    rnd = random.Random(4)
+    ids = list(range(1, 101))
+    for _ in range(50):
+        picked = sample_ids(ids, 10, rnd=rnd)
+        assert len(set(picked)) == 10 and set(picked) <= set(ids)
+
+    seen = set(range(1, 41))
+    for _ in range(50):
+        assert not set(sample_ids(ids, 10, seen, rnd)) & seen
+    # Most of the pool seen: the unseen ones first, then seen ones to fill the test
+    seen = set(range(1, 96))
+    picked = sample_ids(ids, 10, seen, rnd)
+    assert set(picked[:5]) == {96, 97, 98, 99, 100} and len(set(picked)) == 10
+    assert sorted(sample_ids(ids[:3], 10, {1}, rnd)) == [1, 2, 3]
+    assert sample_ids(ids, 0) == []
+
+
+def test_bank_samples_by_slice_and_follows_changes(sqlite_db, tmp_path):
+    async def scenario():
+        async with sqlite_db() as db:
+            async with db.pool.writer() as conn:
+                await seed_tests(conn, [(i, "physics", "ru", "easy" if i % 2 else "hard") for i in range(1, 21)]
+                                 + [(i, "physics", "kz", None) for i in range(21, 26)]
+                                 + [(i, "mathematics", "ru", None) for i in range(26, 31)])
+            bank = db.question_bank
+            bank.version_check_seconds = 0
+            lookups = []
+            get_tests_by_ids = db.get_tests_by_ids
+
+            async def counted(test_ids):
+                lookups.append(list(test_ids))
+                return await get_tests_by_ids(test_ids)
+
+            db.get_tests_by_ids = counted
+
+            tests = await db.get_tests_by_subject("physics", "ru", 8)
+            assert len(tests) == 8 and len(lookups) == 1
+            assert [t["id"] for t in tests] == lookups[0]
+            assert all(t["subject"] == "physics" and t["language"] == "ru" for t in tests)
+            easy = await db.get_tests_by_subject("physics", "ru", 50, difficulty="easy")
+            assert sorted(t["id"] for t in easy) == list(range(1, 21, 2))
+            assert {t["id"] for t in await db.get_tests_by_subject("physics", "kz", 10)} == set(range(21, 26))
+            assert await db.get_tests_by_subject("chemistry", "ru", 10) == []
+
+            # Another process adds and moves questions; the triggers bump the version
+            other = Database(str(tmp_path / "test.db"))
+            try:
+                async with other.pool.writer() as conn:
+                    await seed_tests(conn, [(31, "chemistry", "ru", None)])
+                    await conn.execute("UPDATE tests SET language = 'en' WHERE id = 21")
+                    await conn.execute("DELETE FROM tests WHERE id = 22")
+            finally:
+                await other.close()
+            assert [t["id"] for t in await db.get_tests_by_subject("chemistry", "ru", 10)] == [31]
+            assert {t["id"] for t in await db.get_tests_by_subject("physics", "kz", 10)} == {23, 24, 25}
+            assert await bank.count("physics", "ru") == 20 and await bank.count("physics", "ru", "hard") == 10
+
+    asyncio.run(scenario())
+
+
+def test_recent_questions_are_avoided(sqlite_db):
+    async def scenario():
+        async with sqlite_db(users=[(42, "Aigerim")]) as db:
+            async with db.pool.writer() as conn:
+                await seed_tests(conn, [(i, "physics", "ru", None) for i in range(1, 21)])
+            first = await db.get_tests_by_subject("physics", "ru", 10, user_id=42)
+            await db.record_test_attempt(42, [(t["id"], "A") for t in first], subject="physics")
+            assert set(await db.get_recent_test_ids(42, 50)) == {t["id"] for t in first}
+
+            second = await db.get_tests_by_subject("physics", "ru", 10, user_id=42)
+            assert not {t["id"] for t in first} & {t["id"] for t in second}
+            # Only 20 questions: a third test has to reuse some
+            await db.record_test_attempt(42, [(t["id"], "A") for t in second], subject="physics")
+            assert len(await db.get_tests_by_subject("physics", "ru", 10, user_id=42)) == 10
+
+    asyncio.run(scenario())
+
+
+def test_tests_endpoint_returns_questions(sqlite_db, monkeypatch):
+    async def scenario():
+        async with sqlite_db() as db:
+            monkeypatch.setattr(api_server, "db", db)
+            async with db.pool.writer() as conn:
+                await seed_tests(conn, [(i, "physics", "ru", None) for i in range(1, 6)])
+            transport = httpx.ASGITransport(app=api_server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                response = await client.get("/api/tests/physics", params={"limit": 3})
+            assert response.status_code == 200
+            assert len(response.json()["tests"]) == 3
+
+    asyncio.run(scenario())
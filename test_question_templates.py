@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Tests for the physics problem templates and the question pool
+"""
+import asyncio
+import math
+import random
+
+import httpx
+import numpy as np
+
+import api_server
+from answer_checker import check_answer
+from question_templates import FIXED_QUESTIONS, ID_STRIDE, TEMPLATES, QuestionPool, question_by_id
+from quantities import parse_quantity
+
+
+def test_generated_answers_follow_the_formula():
+    kinetic = TEMPLATES[0]
+    combo = int(np.ravel_multi_index((14, 19), kinetic.shape))  # m = 1200 kg, v = 20 m/s
+    question = question_by_id(kinetic.number * ID_STRIDE + combo)
+    assert question["text"].startswith("Автомобиль массой 1200 кг движется со скоростью 20 м/с")
+    assert question["correct_answer"] == "240 кДж"
+    assert set(question["options"]) == {"12 кДж", "120 кДж", "240 кДж", "480 кДж"}
+
+    rng = np.random.default_rng(0)
+    for template in TEMPLATES:
+        questions = template.sample(200, rng)
+        assert len(questions) > 100, template.name
+        for question in questions:
+            # The correct answer is the formula's value for the numbers in the text
+            combo = np.unravel_index(question["id"] % ID_STRIDE, template.shape)
+            params = {name: grid[[i]] for name, grid, i in zip(template.names, template.grids, combo)}
+            expected = float(template.answer(params)[0])
+            value = parse_quantity(question["correct_answer"])[0]
+            assert math.isclose(value, expected, rel_tol=5e-3), (template.name, question["text"])
+            assert check_answer(f"{expected} {template.unit}", question["correct_answer"])[0]
+            assert len(set(question["options"])) == 4 and question["correct_answer"] in question["options"]
+            assert all(parse_quantity(option)[2] is not None for option in question["options"])
+
+
+def test_ids_are_unique_and_deterministic():
+    first, second = QuestionPool(per_template=300, seed=7), QuestionPool(per_template=300, seed=7)
+    first.build()
+    second.build()
+    ids = [question["id"] for question in first.questions]
+    assert len(ids) == len(set(ids)) > 2000
+    assert first.questions == second.questions
+    for question in random.Random(1).sample(first.questions, 50):
+        assert question_by_id(question["id"]) == question == first.get(question["id"])
+    # The correct option's position varies with the problem
+    positions = {question["options"].index(question["correct_answer"]) for question in first.questions}
+    assert positions == {0, 1, 2, 3}
+    assert question_by_id(FIXED_QUESTIONS[1]["id"]) == FIXED_QUESTIONS[1]
+    assert question_by_id(99 * ID_STRIDE) is None and question_by_id(TEMPLATES[0].number * ID_STRIDE + 10 ** 8) is None
+
+
+def test_pool_picks_by_difficulty(monkeypatch):
+    pool = QuestionPool(per_template=100, seed=3)
+    assert set(pool.difficulties()) == {"easy", "medium", "hard"}
+    rnd = random.Random(5)
+    assert all(pool.pick(rnd, "easy")["difficulty"] == "easy" for _ in range(20))
+    assert pool.pick(rnd, "unknown") in pool.questions
+
+    async def scenario():
+        monkeypatch.setattr(api_server, "question_pool", pool)
+        transport = httpx.ASGITransport(app=api_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            questions = [(await client.post("/api/ai/generate-question")).json()["question"] for _ in range(10)]
+            assert all(pool.get(question["id"]) == question for question in questions)
+
+    asyncio.run(scenario())
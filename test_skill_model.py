@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Tests for the skill ratings behind adaptive test selection
+"""
+import asyncio
+import random
+
+import httpx
+
+import api_server
+from skill_model import RatingIndex, elo_update, information, p_correct, prior_difficulty
+from test_question_bank import seed_tests
+
+
+def test_elo_update_moves_both_ratings_and_settles():
+    ability, difficulty = elo_update(0.0, 0, 0.0, 0, True)
+    assert ability > 0 > difficulty
+    ability, difficulty = elo_update(0.0, 0, 0.0, 0, False)
+    assert ability < 0 < difficulty
+    # An expected answer teaches little, a surprise a lot
+    assert abs(elo_update(0.0, 0, -3.0, 0, True)[0]) < abs(elo_update(0.0, 0, -3.0, 0, False)[0])
+    # Steps shrink as the estimates collect answers
+    assert elo_update(0.0, 200, 0.0, 200, True)[0] < elo_update(0.0, 0, 0.0, 0, True)[0]
+    assert information(1.0, 1.0) > information(1.0, 3.0)
+    assert p_correct(0.5, 0.5) == 0.5
+    assert prior_difficulty("hard") > prior_difficulty("medium") == prior_difficulty(None) > prior_difficulty("easy")
+
+
+def test_nearest_picks_from_the_closest_difficulties():
+    ratings = [0.0] + [i / 10 - 5 for i in range(1, 101)]  # test i rated i/10 - 5
+    index = RatingIndex(list(range(100, 0, -1)), ratings)
+    assert list(index.ids) == list(range(1, 101))
+    rnd = random.Random(1)
+    assert sorted(index.nearest(0.0, 3, rnd=rnd)) == [49, 50, 51]
+    assert sorted(index.nearest(0.02, 2, exclude={50}, rnd=rnd)) == [49, 51]
+    for _ in range(20):
+        assert set(index.nearest(-0.01, 4, candidates=3, rnd=rnd)) <= {47, 48, 49, 50, 51, 52}
+    # Past either end, and when the unseen ones run out
+    assert sorted(index.nearest(9.0, 2, rnd=rnd)) == [99, 100]
+    assert sorted(index.nearest(-9.0, 2, exclude={1}, rnd=rnd)) == [2, 3]
+    small = RatingIndex([1, 2, 3], ratings)
+    assert sorted(small.nearest(0.0, 3, exclude={1, 2}, rnd=rnd)) == [1, 2, 3]
+    assert small.nearest(0.0, 0) == []
+
+
+def test_attempts_update_ratings_and_steer_selection(sqlite_db):
+    async def scenario():
+        async with sqlite_db(users=[(42, "Aigerim")]) as db:
+            async with db.pool.writer() as conn:
+                await seed_tests(conn, [(i, "physics", "ru", ("easy", "medium", "hard")[i % 3]) for i in range(1, 61)])
+            # Unrated questions are drawn at random
+            bank = db.question_bank
+            assert len(await bank.sample_ids("physics", "ru", 10, user_id=42)) == 10
+            assert len(bank.indexes[("physics", "ru", None)]) == 0
+            async with db.pool.writer() as conn:
+                await conn.executemany(
+                    "INSERT INTO question_ratings (test_id, rating, answers) VALUES (?, ?, 5)",
+                    [(i, prior_difficulty(("easy", "medium", "hard")[i % 3])) for i in range(1, 61)]
+                )
+            bank.invalidate()
+
+            assert await db.get_user_ability(42, "physics") == (0.0, 0)
+            first = await db.get_tests_by_subject("physics", "ru", 10, user_id=42)
+            # A new user starts on the medium questions, two of ten are exploratory
+            assert sum(t["difficulty"] == "medium" for t in first) >= 5
+
+            # Answering everything right pushes the ability up and the questions' ratings down
+            await db.record_test_attempt(42, [(t["id"], "A") for t in first], subject="physics")
+            ability, answers = await db.get_user_ability(42, "physics")
+            assert ability > 1.0 and answers == 10
+            async with db.pool.reader() as conn:
+                async with conn.execute("SELECT test_id, rating, answers FROM question_ratings WHERE answers > 5") as cursor:
+                    rows = await cursor.fetchall()
+            assert sorted(row["test_id"] for row in rows) == sorted(t["id"] for t in first)
+            assert all(row["answers"] == 6 for row in rows)
+            assert all(row["rating"] < prior_difficulty(("easy", "medium", "hard")[row["test_id"] % 3]) for row in rows)
+            assert db.question_bank.ratings[rows[0]["test_id"]] == rows[0]["rating"]
+
+            tests = await db.get_tests_by_subject("physics", "ru", 10, user_id=42)
+            assert sum(t["difficulty"] == "hard" for t in tests) >= 6
+            # Getting them wrong brings the ability back down
+            await db.record_test_attempt(42, [(t["id"], "B") for t in tests], subject="physics")
+            assert (await db.get_user_ability(42, "physics"))[0] < ability
+
+            # The ratings survive a reload
+            db.question_bank.invalidate()
+            await db.get_tests_by_subject("physics", "ru", 1)
+            assert db.question_bank.ratings[rows[0]["test_id"]] == rows[0]["rating"]
+
+    asyncio.run(scenario())
+
+
+def test_generated_question_follows_the_ability(sqlite_db, monkeypatch):
+    async def scenario():
+        async with sqlite_db(users=[(42, "Aigerim")]) as db:
+            monkeypatch.setattr(api_server, "db", db)
+            async with db.pool.writer() as conn:
+                await conn.execute(
+                    "INSERT INTO user_topic_progress (user_id, topic, ability, ability_answers) VALUES (42, 'physics', 2.5, 40)"
+                )
+            transport = httpx.ASGITransport(app=api_server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                for _ in range(5):
+                    response = await client.post("/api/ai/generate-question", params={"user_id": 42})
+                    assert response.json()["question"]["difficulty"] == "hard"
+                response = await client.post("/api/ai/generate-question")
+                assert response.status_code == 200
+
+    asyncio.run(scenario())
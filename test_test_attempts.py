@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Tests for server-side test scoring and the incremental user counters
+"""
+import asyncio
+from datetime import date, datetime, timedelta
+
+import httpx
+import pytest
+
+import api_server
+
+
+async def seed_tests(db):
+    async with db.pool.writer() as conn:
+        await conn.executemany(
+            """INSERT INTO tests (id, subject, question, option_a, option_b, option_c, option_d, correct_answer)
+               VALUES (?, 'physics', ?, '1', '2', '3', '4', ?)""",
+            [(i, f"Q{i}", "ABCD"[i % 4]) for i in range(1, 11)]
+        )
+        await conn.commit()
+
+
+def test_attempt_is_scored_and_counters_move_incrementally(sqlite_db):
+    async def scenario():
+        async with sqlite_db(users=[(42, "Aigerim")]) as db:
+            await seed_tests(db)
+            # 3 of 4 right, answers compared case-insensitively
+            first = await db.record_test_attempt(42, [(1, "b"), (2, "C"), (3, "D"), (4, "B")],
+                                                 subject="physics", source="bot", today=date(2024, 3, 1))
+            assert (first["correct"], first["total"], first["score"], first["points"]) == (3, 4, 75.0, 30)
+            assert [a["is_correct"] for a in first["answers"]] == [True, True, True, False]
+            assert (first["tests_completed"], first["avg_score"], first["streak"]) == (1, 75.0, 1)
+
+            second = await db.record_test_attempt(42, [(1, "B"), (2, "A")], today=date(2024, 3, 2))
+            assert (second["tests_completed"], second["avg_score"], second["streak"]) == (2, 62.5, 2)
+            same_day = await db.record_test_attempt(42, [(5, "B")], today=date(2024, 3, 2))
+            assert (same_day["tests_completed"], same_day["streak"]) == (3, 2)
+            after_gap = await db.record_test_attempt(42, [(5, "B")], today=date(2024, 3, 5))
+            assert after_gap["streak"] == 1
+
+            user = await db.get_user(42)
+            assert (user["points"], user["tests_completed"], user["streak"]) == (60, 4, 1)
+            assert db.leaderboard.top(1)[0]["points"] == 60
+            async with db.pool.reader() as conn:
+                cursor = await conn.execute("SELECT COUNT(*), SUM(correct) FROM test_attempts WHERE user_id = 42")
+                assert tuple(await cursor.fetchone()) == (4, 6)
+                cursor = await conn.execute("SELECT COUNT(*) FROM test_attempt_answers")
+                assert (await cursor.fetchone())[0] == 8
+
+    asyncio.run(scenario())
+
+
+def test_invalid_attempt_writes_nothing(sqlite_db):
+    async def scenario():
+        async with sqlite_db(users=[(42, "Aigerim")]) as db:
+            await seed_tests(db)
+            with pytest.raises(ValueError):
+                await db.record_test_attempt(42, [(1, "B"), (999, "A")])
+            with pytest.raises(ValueError):
+                await db.record_test_attempt(7, [(1, "B")])
+            with pytest.raises(ValueError):
+                await db.record_test_attempt(42, [])
+            async with db.pool.reader() as conn:
+                cursor = await conn.execute("SELECT COUNT(*) FROM test_attempts")
+                assert (await cursor.fetchone())[0] == 0
+            assert (await db.get_user(42))["tests_completed"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_api_scores_attempts_server_side(sqlite_db, monkeypatch):
+    async def scenario():
+        async with sqlite_db(users=[(42, "Aigerim")]) as db:
+            monkeypatch.setattr(api_server, "db", db)
+            await seed_tests(db)
+            transport = httpx.ASGITransport(app=api_server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                response = await client.post("/api/tests/attempts", json={
+                    "user_id": 42, "subject": "physics",
+                    "answers": [{"test_id": 1, "answer": "B"}, {"test_id": 2, "answer": "A"}]})
+                assert response.status_code == 200
+                assert (response.json()["correct"], response.json()["points"]) == (1, 10)
+
+                # The old endpoint no longer awards points for a wrong answer
+                wrong = (await client.post("/api/tests/submit", json={"user_id": 42, "test_id": 3, "answer": "A"})).json()
+                assert (wrong["points_awarded"], wrong["is_correct"], wrong["correct_answer"]) == (0, False, "D")
+
+                unknown = await client.post("/api/tests/attempts", json={
+                    "user_id": 42, "answers": [{"test_id": 999, "answer": "A"}]})
+                assert unknown.status_code == 400
+            assert (await db.get_user(42))["tests_completed"] == 2
+
+    asyncio.run(scenario())
+
+
+def test_daily_rollup_feeds_weekly_stats_and_activity(sqlite_db, monkeypatch):
+    async def scenario():
+        async with sqlite_db(users=[(42, "Aigerim"), (43, "Nurlan")]) as db:
+            monkeypatch.setattr(api_server, "db", db)
+            await seed_tests(db)
+            today = date.today()
+            started = (datetime.now() - timedelta(minutes=10)).isoformat()
+            await db.record_test_attempt(42, [(1, "B"), (2, "C")], subject="physics", started_at=started)
+            await db.record_test_attempt(42, [(3, "A")], subject="physics")
+            await db.record_test_attempt(42, [(1, "B")], today=today - timedelta(days=2))
+            await db.record_test_attempt(43, [(1, "B")], today=today - timedelta(days=9))
+
+            [older, latest] = await db.get_daily_stats(42, today - timedelta(days=6), today)
+            assert (latest["day"], latest["tests"], latest["questions"], latest["correct"], latest["xp"]) == \
+                (today.isoformat(), 2, 3, 2, 20)
+            assert 590 <= latest["time_seconds"] <= 610
+            assert older["tests"] == 1
+            assert (await db.get_class_activity(today - timedelta(days=6)))["active_students"] == 1
+
+            transport = httpx.ASGITransport(app=api_server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                week = (await client.get("/api/user/42/weekly-stats")).json()["weeklyStats"]
+                assert [d["tests"] for d in week] == [0, 0, 0, 0, 1, 0, 2]
+                assert week[-1]["time"] == 10 and week[-1]["date"] == today.isoformat()
+
+                activity = (await client.get("/api/user/42/activity", params={"limit": 2})).json()["activities"]
+                assert [a["xpGained"] for a in activity] == [10, 0]
+
+    asyncio.run(scenario())
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Tests for the per-(user, topic) progress counters
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+
+import api_server
+
+
+async def seed(db):
+    async with db.pool.writer() as conn:
+        await conn.executemany(
+            """INSERT INTO tests (id, subject, question, option_a, option_b, option_c, option_d, correct_answer)
+               VALUES (?, ?, ?, '1', '2', '3', '4', 'A')""",
+            [(1, "mechanics", "Q1"), (2, "mechanics", "Q2"), (3, "mechanics", "Q3"), (4, "optics", "Q4"), (5, "optics", "Q5")]
+        )
+        await conn.executemany(
+            """INSERT INTO materials (id, subject, topic, type, title, category, is_published)
+               VALUES (?, 'physics', 'Линзы', 'text', ?, 'optics', ?)""",
+            [(1, "Линзы", 1), (2, "Зеркала", 1), (3, "Черновик", 0)]
+        )
+        # Students registered with the teacher code (what /api/teacher/students lists)
+        await conn.execute("UPDATE users SET role = 'student', code = '111444'")
+        await conn.commit()
+
+
+def test_counters_track_distinct_items_score_and_time(sqlite_db, monkeypatch):
+    async def scenario():
+        async with sqlite_db(users=[(42, "Aigerim"), (43, "Nurlan")]) as db:
+            monkeypatch.setattr(api_server, "db", db)
+            await seed(db)
+            started = (datetime.now() - timedelta(minutes=4)).isoformat()
+            # 3 mechanics questions + 1 optics: 4 minutes shared 3:1
+            await db.record_test_attempt(42, [(1, "A"), (2, "B"), (3, "A"), (4, "A")], started_at=started)
+            # Repeating a question adds to the score but not to "completed"
+            await db.record_test_attempt(42, [(1, "A")])
+            await db.record_test_attempt(43, [(5, "B")])
+            assert await db.record_material_view(42, 1, seconds=120)
+            assert await db.record_material_view(42, 1, seconds=60)
+            assert not await db.record_material_view(42, 99)
+
+            transport = httpx.ASGITransport(app=api_server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                progress = (await client.get("/api/physics/progress/42")).json()["progress"]
+                assert progress["mechanics"] == {"completed": 3, "total": 3, "score": 75, "time": 3}
+                # optics: 1 test + 1 material of 2 tests + 2 published materials
+                assert progress["optics"] == {"completed": 2, "total": 4, "score": 100, "time": 4}
+
+                students = (await client.get("/api/teacher/students")).json()["students"]
+                by_id = {s["telegram_id"]: s["progress"] for s in students}
+                assert by_id[43]["optics"]["score"] == 0 and by_id[43]["mechanics"]["completed"] == 0
+
+                details = (await client.get("/api/teacher/student/42")).json()
+                assert details["progress_by_topic"] == progress
+
+                viewed = await client.post("/api/materials/2/view", json={"user_id": 43})
+                assert viewed.status_code == 200
+                assert (await client.post("/api/materials/99/view", json={"user_id": 43})).status_code == 404
+
+    asyncio.run(scenario())
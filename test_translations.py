@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Tests for the compiled translation catalog and cached keyboards
+"""
+import translations
+from translations import (BUTTON_ACTIONS, MENU_BUTTONS, TRANSLATIONS, button_texts, get_main_menu_keyboard,
+                          get_subjects_keyboard, get_text)
+
+
+def reference_get_text(key, language='ru', **kwargs):
+    """get_text as it was before the catalog was compiled"""
+    if language not in TRANSLATIONS:
+        language = 'ru'
+    text = TRANSLATIONS[language].get(key, TRANSLATIONS['ru'].get(key, key))
+    try:
+        return text.format(**kwargs)
+    except (KeyError, ValueError):
+        return text
+
+
+def test_catalog_matches_formatting_every_message():
+    values = dict(current=3, total=10, correct=7, percentage=70, points=70, answer="C", position=2,
+                  name="Айгерим", level=1, title="Оптика", description="5 тестов", reward=50)
+    for language in ["ru", "kz", "en", "de", None]:
+        for key in list(TRANSLATIONS["ru"]) + ["no_such_key"]:
+            for kwargs in (values, {}, {"current": 1}):
+                assert get_text(key, language, **kwargs) == reference_get_text(key, language, **kwargs), (key, language)
+    assert get_text("wrong_answer", "kz", answer="B") == "❌ Қате. Дұрыс жауап: B"
+
+
+def test_templates_are_parsed_once():
+    assert translations._compile("plain") == ("plain", None)
+    assert translations._compile("{a} and {b!r:>5}")[1] == (("", "a", "", None), (" and ", "b", ">5", "r"))
+    # Shown as is when the template is broken, left to str.format when it uses positions
+    assert translations._compile("{broken") == ("{broken", None)
+    assert translations._compile("{0} of {1}")[1] == ()
+    assert translations._render(translations._compile("{a} and {b!r:>5}")[1], {"a": 1, "b": "x"}) == "1 and   'x'"
+
+
+def test_keyboards_are_built_once_per_language():
+    assert get_main_menu_keyboard("kz") is get_main_menu_keyboard("kz")
+    assert get_main_menu_keyboard("kz") is not get_main_menu_keyboard("en")
+    assert get_subjects_keyboard("xx") is get_subjects_keyboard("ru")
+    assert get_subjects_keyboard("en").inline_keyboard[0][0].text == "Physics"
+
+
+def test_every_menu_button_maps_back_to_its_key():
+    for language in TRANSLATIONS:
+        rows = get_main_menu_keyboard(language).keyboard
+        texts = [button.text for row in rows for button in row]
+        assert [BUTTON_ACTIONS[text] for text in texts] == list(MENU_BUTTONS)
+    assert button_texts("test_btn") == {"📝 Тесты", "📝 Тесттер", "📝 Tests"}
+    assert button_texts("top_btn") == {"🏆 Рейтинг", "🏆 Leaderboard"}
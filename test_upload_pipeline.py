@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming photo upload pipeline
+"""
+import asyncio
+import io
+
+import httpx
+from PIL import Image
+
+import api_server
+import upload_pipeline
+from blob_store import BlobStore
+
+
+def jpeg_bytes(size=(400, 200), orientation=None, quality=95) -> bytes:
+    image = Image.new("RGB", size, (30, 120, 200))
+    # Left half red so rotation is visible in the pixels too
+    image.paste((220, 20, 20), (0, 0, size[0] // 2, size[1]))
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality, exif=exif)
+    return buffer.getvalue()
+
+
+def test_process_image_orients_downscales_and_thumbnails(tmp_path):
+    path = tmp_path / "phone.jpg"
+    path.write_bytes(jpeg_bytes(size=(4000, 2000), orientation=6))
+
+    result = upload_pipeline.process_image(str(path), 1600, 320, 82, 50_000_000)
+
+    # Orientation 6 = rotate 90° clockwise: the landscape sensor image is a portrait photo
+    assert (result["width"], result["height"]) == (2000, 4000)
+    image = Image.open(io.BytesIO(result["image"]))
+    assert image.format == "JPEG" and image.size == (800, 1600)
+    assert 0x0112 not in image.getexif()
+    assert image.getpixel((400, 100))[0] > 150  # the red half is now on top
+    thumbnail = Image.open(io.BytesIO(result["thumbnail"]))
+    assert thumbnail.size == (160, 320)
+    assert len(result["image"]) < path.stat().st_size
+
+
+def test_transparent_png_is_flattened_onto_white(tmp_path):
+    path = tmp_path / "scan.png"
+    Image.new("RGBA", (50, 50), (0, 0, 0, 0)).save(path)
+    result = upload_pipeline.process_image(str(path), 1600, 320, 82, 50_000_000)
+    assert Image.open(io.BytesIO(result["image"])).getpixel((25, 25)) >= (250, 250, 250)
+
+
+def post_photo(files, data=None, headers=None):
+    async def scenario():
+        transport = httpx.ASGITransport(app=api_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/api/ai/check-solution-photo", files=files, data=data, headers=headers)
+    return scenario()
+
+
+def test_oversized_upload_is_rejected_while_streaming(tmp_path, monkeypatch):
+    monkeypatch.setitem(upload_pipeline.UPLOAD_SETTINGS, "max_bytes", 10_000)
+    monkeypatch.setitem(upload_pipeline.UPLOAD_SETTINGS, "tmp_dir", str(tmp_path))
+    response = asyncio.run(post_photo({"photo": ("big.jpg", b"\xff" * 20_000, "image/jpeg")}))
+    assert response.status_code == 413
+    # The partial temp file is removed
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_declared_oversized_body_is_rejected_before_reading(monkeypatch):
+    monkeypatch.setitem(upload_pipeline.UPLOAD_SETTINGS, "max_bytes", 10_000)
+
+    async def body():
+        raise AssertionError("the body must not be read")
+        yield b""
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=api_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/api/ai/upload-question-photo", content=body(), headers={
+                "content-type": "multipart/form-data; boundary=x", "content-length": str(10_000_000)})
+
+    assert asyncio.run(scenario()).status_code == 413
+
+
+def test_missing_photo_and_non_image_are_client_errors(tmp_path, monkeypatch):
+    monkeypatch.setitem(upload_pipeline.UPLOAD_SETTINGS, "tmp_dir", str(tmp_path))
+    assert asyncio.run(post_photo({"comment": (None, "no file")})).status_code == 400
+    assert asyncio.run(post_photo(None, data={"comment": "no file"},
+                                  headers={"content-type": "multipart/form-data; boundary=x"})).status_code == 400
+    response = asyncio.run(post_photo({"photo": ("notes.txt", b"not an image", "text/plain")}))
+    assert response.status_code == 400
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_upload_stores_reencoded_photo_and_thumbnail(sqlite_db, tmp_path, monkeypatch):
+    async def scenario():
+        async with sqlite_db() as db:
+            monkeypatch.setattr(api_server, "db", db)
+            store = BlobStore(str(tmp_path / "blobs"))
+            monkeypatch.setattr(api_server, "blob_store", store)
+            transport = httpx.ASGITransport(app=api_server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                response = await client.post("/api/ai/upload-question-photo",
+                                             files={"photo": ("task.jpg", jpeg_bytes(orientation=8), "image/jpeg")})
+                assert response.status_code == 200
+                question = response.json()["virtual_question"]
+                assert question["thumbnail"] == f"/api/blobs/{question['thumb_hash']}"
+
+                listed = (await client.get("/api/ai/virtual-questions")).json()["questions"]
+                assert listed[0]["thumbnail"] == question["thumbnail"]
+
+                photo = Image.open(store.path(question["photo_hash"]))
+                assert photo.format == "JPEG" and photo.size == (200, 400)
+                assert Image.open(store.path(question["thumb_hash"])).size == (160, 320)
+
+    asyncio.run(scenario())
@@ -1,7 +1,14 @@
 """
 Multilingual support for the ЕНТ preparation bot
 Supports Russian (ru), Kazakh (kz), and English (en)
+
+TRANSLATIONS is compiled once at import into CATALOG: missing keys fall back to
+Russian up front, and templates are pre-parsed, so get_text() is two dict
+lookups plus, for templates, one join. Keyboards are built once per language
+and shared, so treat them as read-only.
 """
+from string import Formatter
+from typing import Dict, FrozenSet, Optional, Tuple
 
 TRANSLATIONS = {
     'ru': {
@@ -277,21 +284,91 @@ TRANSLATIONS = {
     }
 }
 
+DEFAULT_LANGUAGE = 'ru'
+
+# Reply-keyboard buttons of the main menu; their text (in any language) maps back to the key
+MENU_BUTTONS = ('schedule_btn', 'videos_btn', 'materials_btn', 'test_btn', 'top_btn', 'quests_btn',
+                'webapp_btn', 'help_btn', 'language_btn')
+
+_CONVERSIONS = {'r': repr, 's': str, 'a': ascii}
+# parts of templates with positional/attribute/index fields, which are left to str.format
+_STR_FORMAT = ()
+
+
+def _compile(text: str) -> Tuple[str, Optional[tuple]]:
+    """(text, parts): parts is None for plain text, else (literal, field, spec, conversion) tuples"""
+    if '{' not in text and '}' not in text:
+        return text, None
+    try:
+        parts = tuple(Formatter().parse(text))
+    except ValueError:
+        # Not a valid template: shown as is, like str.format failing on it
+        return text, None
+    if any(field is not None and not field.isidentifier() for _, field, _, _ in parts):
+        return text, _STR_FORMAT
+    return text, parts
+
+
+def _render(parts: tuple, kwargs: Dict) -> str:
+    out = []
+    for literal, field, spec, conversion in parts:
+        out.append(literal)
+        if field is not None:
+            value = kwargs[field]
+            if conversion:
+                value = _CONVERSIONS[conversion](value)
+            out.append(format(value, spec))
+    return "".join(out)
+
+
+# language -> key -> (text, parts), with Russian filling in missing keys
+CATALOG = {
+    language: {key: _compile(text) for key, text in {**TRANSLATIONS[DEFAULT_LANGUAGE], **texts}.items()}
+    for language, texts in TRANSLATIONS.items()
+}
+
+# Button text -> translation key, for every language
+BUTTON_ACTIONS: Dict[str, str] = {
+    CATALOG[language][key][0]: key for language in CATALOG for key in MENU_BUTTONS
+}
+
+
 def get_text(key: str, language: str = 'ru', **kwargs) -> str:
     """Get translated text by key and language"""
-    if language not in TRANSLATIONS:
-        language = 'ru'  # fallback to Russian
-    
-    text = TRANSLATIONS[language].get(key, TRANSLATIONS['ru'].get(key, key))
-    
-    # Format with provided kwargs
+    entry = CATALOG.get(language, CATALOG[DEFAULT_LANGUAGE]).get(key)
+    if entry is None:
+        return key
+    text, parts = entry
+    if parts is None:
+        return text
     try:
-        return text.format(**kwargs)
+        return _render(parts, kwargs) if parts else text.format(**kwargs)
     except (KeyError, ValueError):
         return text
 
+
+def button_texts(key: str) -> FrozenSet[str]:
+    """The texts of a menu button in every language (for F.text.in_ filters)"""
+    return frozenset(text for text, action in BUTTON_ACTIONS.items() if action == key)
+
+
+_KEYBOARDS = {}
+
+
+def _cached_keyboard(name: str, language: str, build):
+    language = language if language in CATALOG else DEFAULT_LANGUAGE
+    keyboard = _KEYBOARDS.get((name, language))
+    if keyboard is None:
+        keyboard = _KEYBOARDS[(name, language)] = build(language)
+    return keyboard
+
+
 def get_language_keyboard():
     """Get language selection keyboard"""
+    return _cached_keyboard('language', DEFAULT_LANGUAGE, _build_language_keyboard)
+
+
+def _build_language_keyboard(language: str):
     from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
@@ -305,8 +382,13 @@ def get_language_keyboard():
     ])
     return keyboard
 
+
 def get_main_menu_keyboard(language: str = 'ru'):
     """Get main menu keyboard"""
+    return _cached_keyboard('main_menu', language, _build_main_menu_keyboard)
+
+
+def _build_main_menu_keyboard(language: str):
     from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, WebAppInfo
     
     keyboard = ReplyKeyboardMarkup(
@@ -339,8 +421,13 @@ def get_main_menu_keyboard(language: str = 'ru'):
     )
     return keyboard
 
+
 def get_subjects_keyboard(language: str = 'ru'):
     """Get subjects selection keyboard - Physics and Mathematics only"""
+    return _cached_keyboard('subjects', language, _build_subjects_keyboard)
+
+
+def _build_subjects_keyboard(language: str):
     from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
     
     subjects = [
@@ -0,0 +1,96 @@
+"""
+Small in-process TTL + LRU cache for read-mostly query results.
+Entries expire after `ttl` seconds and the least recently used entry is evicted
+once `maxsize` is reached. Writers call invalidate(); a load that was already
+in flight when that happened is not stored, so a stale row never outlives the
+write that replaced it. An entry can also carry a validator (ETag) that is
+computed once and reused for as long as the entry lives.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List
+
+
+class TTLCache:
+    def __init__(self, maxsize: int = 512, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # key -> [expires, value, etag or None]
+        self._entries: "OrderedDict[Hashable, List]" = OrderedDict()
+        # id(value) -> entry, so a caller holding a cached value can find its ETag
+        self._by_value: Dict[int, List] = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _drop(self, entry: List):
+        if self._by_value.get(id(entry[1])) is entry:
+            del self._by_value[id(entry[1])]
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+                self._drop(entry)
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._drop(old)
+        entry = [time.monotonic() + self.ttl, value, None]
+        self._entries[key] = entry
+        if value is not None:
+            self._by_value[id(value)] = entry
+        while len(self._entries) > self.maxsize:
+            _, evicted = self._entries.popitem(last=False)
+            self._drop(evicted)
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value for key, calling loader() on a miss.
+        Cached values are shared between callers and must be treated as read-only"""
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            return value
+        generation = self._generation
+        value = await loader()
+        if generation == self._generation:
+            self.set(key, value)
+        return value
+
+    def etag(self, value: Any, compute: Callable[[Any], str]) -> str:
+        """ETag for a value returned by get_or_load(): compute(value) runs once per cached
+        entry; values that are not (or no longer) cached are hashed every time"""
+        entry = self._by_value.get(id(value))
+        if entry is None or entry[1] is not value:
+            return compute(value)
+        if entry[2] is None:
+            entry[2] = compute(value)
+        return entry[2]
+
+    def invalidate(self):
+        """Drop every entry (called after any write to the underlying table)"""
+        self._entries.clear()
+        self._by_value.clear()
+        self._generation += 1
+        self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,219 @@
+"""
+Upload pipeline for the photo endpoints.
+The multipart body is parsed as it arrives and the file part is streamed to a
+temp file, so a photo is never held in memory whole and an oversized one is
+rejected with 413 as soon as it crosses the limit. Decoding, EXIF orientation,
+downscaling, thumbnailing and re-encoding to JPEG run in a process pool, so a
+large phone photo never blocks the event loop (or the GIL of the server process).
+"""
+
+import asyncio
+import io
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException, Request
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import MultipartParser, parse_options_header
+from PIL import Image
+
+from config import UPLOAD_SETTINGS
+
+# Non-file form fields are small; anything bigger is not a form we serve
+MAX_FIELD_BYTES = 64 * 1024
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+class Upload:
+    """A file part streamed to disk; call cleanup() once it has been processed"""
+
+    def __init__(self, path: str, filename: str, content_type: str, size: int, fields: Dict[str, str]):
+        self.path = path
+        self.filename = filename
+        self.content_type = content_type
+        self.size = size
+        self.fields = fields
+
+    def cleanup(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Photo is larger than {max_bytes // (1024 * 1024)} MB")
+
+
+async def receive_upload(request: Request, field: str = "photo", max_bytes: Optional[int] = None) -> Upload:
+    """Stream the multipart request body, writing the `field` file part to a temp file.
+    Raises 400 if there is no such part and 413 once it exceeds max_bytes"""
+    max_bytes = max_bytes or UPLOAD_SETTINGS['max_bytes']
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+
+    # Reject before reading a byte when the client announces an oversized body
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_bytes + MAX_FIELD_BYTES:
+        raise _too_large(max_bytes)
+
+    state: Dict[str, Any] = {
+        "header_field": b"", "header_value": b"", "headers": {},
+        "name": None, "filename": None, "content_type": "", "in_file": False,
+        "size": 0, "field_value": b"",
+    }
+    fields: Dict[str, str] = {}
+    pending: List[bytes] = []  # file bytes parsed from the current chunk, written after each feed
+
+    def on_part_begin():
+        state.update(headers={}, name=None, filename=None, content_type="", in_file=False, field_value=b"")
+
+    def on_header_field(data, start, end):
+        state["header_field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        state["header_value"] += data[start:end]
+
+    def on_header_end():
+        state["headers"][state["header_field"].lower()] = state["header_value"]
+        state["header_field"] = b""
+        state["header_value"] = b""
+
+    def on_headers_finished():
+        _, options = parse_options_header(state["headers"].get(b"content-disposition", b""))
+        state["name"] = options.get(b"name", b"").decode("latin-1")
+        filename = options.get(b"filename")
+        state["filename"] = filename.decode("utf-8", "replace") if filename is not None else None
+        state["content_type"] = state["headers"].get(b"content-type", b"").decode("latin-1")
+        state["in_file"] = state["name"] == field and state["filename"] is not None
+
+    def on_part_data(data, start, end):
+        if state["in_file"]:
+            state["size"] += end - start
+            if state["size"] > max_bytes:
+                raise _too_large(max_bytes)
+            pending.append(data[start:end])
+        else:
+            state["field_value"] += data[start:end]
+            if len(state["field_value"]) > MAX_FIELD_BYTES:
+                raise HTTPException(status_code=413, detail="Form field too large")
+
+    def on_part_end():
+        if state["in_file"]:
+            state["found"] = {"filename": state["filename"], "content_type": state["content_type"]}
+        elif state["name"]:
+            fields[state["name"]] = state["field_value"].decode("utf-8", "replace")
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+    })
+
+    fd, path = tempfile.mkstemp(prefix="upload-", dir=UPLOAD_SETTINGS.get('tmp_dir'))
+    tmp = os.fdopen(fd, "wb")
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if pending:
+                data = b"".join(pending)
+                pending.clear()
+                await asyncio.to_thread(tmp.write, data)
+        parser.finalize()
+        tmp.close()
+    except MultipartParseError as e:
+        tmp.close()
+        os.unlink(path)
+        raise HTTPException(status_code=400, detail=f"Malformed multipart body: {e}")
+    except BaseException:
+        tmp.close()
+        os.unlink(path)
+        raise
+
+    found = state.get("found")
+    if not found:
+        os.unlink(path)
+        raise HTTPException(status_code=400, detail="No photo uploaded")
+    return Upload(path, found["filename"], found["content_type"], state["size"], fields)
+
+
+def process_image(path: str, max_side: int, thumb_side: int, quality: int, max_pixels: int) -> Dict[str, Any]:
+    """Decode, orient, downscale and re-encode an image file (runs in a worker process).
+    Returns the upright size of the original plus JPEG bytes of the image and its thumbnail"""
+    from PIL import ImageOps
+
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    with Image.open(path) as image:
+        if image.width * image.height > max_pixels:
+            raise ValueError(f"Image is too large: {image.width}x{image.height}")
+        transpose = image.getexif().get(0x0112, 1) in (5, 6, 7, 8)  # orientation rotates by 90°
+        width, height = (image.height, image.width) if transpose else image.size
+        # JPEG can decode straight at 1/2, 1/4 or 1/8 scale, which is most of the work saved
+        image.draft("RGB", (max_side, max_side))
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+        encoded = io.BytesIO()
+        image.save(encoded, format="JPEG", quality=quality, optimize=True, progressive=True)
+        image.thumbnail((thumb_side, thumb_side), Image.LANCZOS)
+        thumbnail = io.BytesIO()
+        image.save(thumbnail, format="JPEG", quality=quality, optimize=True)
+
+    return {"width": width, "height": height, "image": encoded.getvalue(), "thumbnail": thumbnail.getvalue()}
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn: never fork a server process that already runs the event loop and DB threads
+        _executor = ProcessPoolExecutor(max_workers=UPLOAD_SETTINGS['workers'],
+                                        mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def process_upload(upload: Upload) -> Dict[str, Any]:
+    """Run process_image() for an upload in the process pool; 400 if it is not an image"""
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(
+            get_executor(), process_image, upload.path,
+            UPLOAD_SETTINGS['max_side'], UPLOAD_SETTINGS['thumbnail_side'],
+            UPLOAD_SETTINGS['jpeg_quality'], UPLOAD_SETTINGS['max_pixels'],
+        )
+    except (OSError, ValueError, SyntaxError, Image.DecompressionBombError) as e:
+        # PIL raises these for unreadable, truncated or decompression-bomb images
+        raise HTTPException(status_code=400, detail=f"Not a readable image: {e}")
+
+
+async def receive_photo(request: Request, field: str = "photo"):
+    """receive_upload() + process_upload(); the temp file is removed either way.
+    Returns (upload, processed image)"""
+    upload = await receive_upload(request, field)
+    try:
+        return upload, await process_upload(upload)
+    finally:
+        await asyncio.to_thread(upload.cleanup)